@@ -1,341 +1,139 @@
-
-import sqlite3
+import datetime
 import os
 import logging
 import secrets
-from app import crud
-from app.database import SQLALCHEMY_DATABASE_URL
+from sqlalchemy import Enum, inspect, literal, select
+from sqlalchemy.engine import Connection
+from app import crud, models
+from app.database import Base, engine
 
 logger = logging.getLogger("uvicorn")
 
-def run_auto_migrations():
+
+def _column_ddl(conn: Connection, column) -> str:
+    """`name TYPE [DEFAULT ...]` for ALTER TABLE ADD COLUMN, in the connection's dialect.
+
+    Added columns are always nullable: existing rows have no value for them.
+    Scalar Python defaults become a literal DEFAULT so existing rows get them too;
+    callable defaults (ids, timestamps) only apply to new rows, as before.
+    """
+    dialect = conn.dialect
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+    return ddl
+
+
+def _add_missing_columns(conn: Connection, table) -> list:
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        logger.info(f"Migrating: Adding '{column.name}' column to {table.name} table.")
+        if isinstance(column.type, Enum):
+            column.type.create(conn, checkfirst=True)  # PostgreSQL enum types
+        conn.exec_driver_sql(
+            f"ALTER TABLE {conn.dialect.identifier_preparer.format_table(table)} ADD COLUMN {_column_ddl(conn, column)}"
+        )
+        added.append(column.name)
+    return added
+
+
+def _create_indexes(bind, table, columns: list):
+    """Model indexes on newly added columns (e.g. unique token_hash lookups)."""
+    for index in table.indexes:
+        if not any(column.name in columns for column in index.columns):
+            continue
+        try:
+            with bind.begin() as conn:
+                index.create(conn, checkfirst=True)
+        except Exception as e:
+            logger.warning(f"Auto migration: could not create index {index.name}: {e}")
+
+
+def _uppercase_priorities(conn: Connection):
+    # Old SQLite volumes stored lowercase values; native enums (PostgreSQL) never had them
+    if conn.dialect.name != "sqlite":
+        return
+    count = conn.exec_driver_sql(
+        "UPDATE events SET priority = UPPER(priority) WHERE priority IN ('high', 'medium', 'low')"
+    ).rowcount
+    if count:
+        logger.info(f"Migrating: Converted {count} priority values to uppercase.")
+
+
+def _backfill_redirect_uris(conn: Connection):
+    # Backfill redirect URIs from oauth_clients.redirect_uri
+    clients = models.OAuthClient.__table__
+    redirects = models.OAuthClientRedirectUri.__table__
+    missing_redirects = conn.execute(
+        select(clients.c.id, clients.c.redirect_uri)
+        .select_from(clients.outerjoin(
+            redirects,
+            (redirects.c.oauth_client_id == clients.c.id) & (redirects.c.redirect_uri == clients.c.redirect_uri),
+        ))
+        .where(clients.c.redirect_uri.is_not(None), clients.c.redirect_uri != "", redirects.c.id.is_(None))
+    ).all()
+    if missing_redirects:
+        logger.info(
+            "Migrating: Backfilling %s OAuth redirect URI registrations.",
+            len(missing_redirects),
+        )
+        now = datetime.datetime.utcnow()
+        conn.execute(redirects.insert(), [
+            {"id": secrets.token_urlsafe(24), "oauth_client_id": oauth_client_id,
+             "redirect_uri": redirect_uri, "created_at": now}
+            for oauth_client_id, redirect_uri in missing_redirects
+        ])
+
+
+def _unique_webhook_deliveries(bind):
+    # Volumes from before the unique index may hold duplicate fan-outs; keep one of each
+    index = next(index for index in models.WebhookDelivery.__table__.indexes
+                 if index.name == "ix_webhook_deliveries_subscription_outbox")
+    if index.name in {existing["name"] for existing in inspect(bind).get_indexes("webhook_deliveries")}:
+        return
+    with bind.begin() as conn:
+        count = conn.exec_driver_sql(
+            "DELETE FROM webhook_deliveries WHERE id NOT IN"
+            " (SELECT MIN(id) FROM webhook_deliveries GROUP BY subscription_id, outbox_id)"
+        ).rowcount
+        if count:
+            logger.info(f"Migrating: Removed {count} duplicate webhook deliveries.")
+        index.create(conn, checkfirst=True)
+
+
+def run_auto_migrations(bind=None):
     """
     Automatically runs necessary DB migrations (ALTER TABLEs, etc.)
     that SQLAlchemy create_all doesn't handle for existing databases.
-    """
-    # Parse DB path from URL (sqlite:///./classly.db -> ./classly.db)
-    if "sqlite" in SQLALCHEMY_DATABASE_URL:
-        db_path = SQLALCHEMY_DATABASE_URL.replace("sqlite:///", "")
-        
-        if not os.path.exists(db_path):
-            return
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # 1. Check Priority Column in Events
-            logger.info("Checking schema migrations...")
-
-            # 0. Add timetable public-share columns to classes (if missing)
-            cursor.execute("PRAGMA table_info(classes)")
-            class_columns = [info[1] for info in cursor.fetchall()]
-
-            if "timetable_public_enabled" not in class_columns:
-                logger.info("Migrating: Adding 'timetable_public_enabled' column to classes table.")
-                cursor.execute("ALTER TABLE classes ADD COLUMN timetable_public_enabled BOOLEAN DEFAULT 0")
-                conn.commit()
-
-            if "timetable_public_token" not in class_columns:
-                logger.info("Migrating: Adding 'timetable_public_token' column to classes table.")
-                cursor.execute("ALTER TABLE classes ADD COLUMN timetable_public_token VARCHAR")
-                try:
-                    cursor.execute("CREATE INDEX ix_classes_timetable_public_token ON classes(timetable_public_token)")
-                except Exception:
-                    pass
-                conn.commit()
-
-            cursor.execute("PRAGMA table_info(events)")
-            columns = [info[1] for info in cursor.fetchall()]
-             
-            if "priority" not in columns:
-                logger.info("Migrating: Adding 'priority' column to events table.")
-                cursor.execute("ALTER TABLE events ADD COLUMN priority VARCHAR DEFAULT 'MEDIUM'")
-                conn.commit()
-
-            # 2. Migrate lowercase priority values to uppercase
-            cursor.execute("SELECT COUNT(*) FROM events WHERE priority IN ('high', 'medium', 'low')")
-            count = cursor.fetchone()[0]
 
-            if count > 0:
-                logger.info(f"Migrating: Converting {count} priority values to uppercase.")
-                cursor.execute("UPDATE events SET priority = 'HIGH' WHERE priority = 'high'")
-                cursor.execute("UPDATE events SET priority = 'MEDIUM' WHERE priority = 'medium'")
-                cursor.execute("UPDATE events SET priority = 'LOW' WHERE priority = 'low'")
-                conn.commit()
-
-            # 3. Check if grades table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='grades'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'grades' table.")
-                cursor.execute("""
-                    CREATE TABLE grades (
-                        id VARCHAR PRIMARY KEY,
-                        user_id VARCHAR NOT NULL,
-                        event_id VARCHAR NOT NULL,
-                        grade FLOAT NOT NULL,
-                        weight FLOAT DEFAULT 1.0,
-                        created_at DATETIME,
-                        FOREIGN KEY (user_id) REFERENCES users(id),
-                        FOREIGN KEY (event_id) REFERENCES events(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_grades_user_id ON grades(user_id)")
-                cursor.execute("CREATE INDEX ix_grades_event_id ON grades(event_id)")
-                conn.commit()
-            else:
-                # 4. Check if weight column exists in grades table
-                cursor.execute("PRAGMA table_info(grades)")
-                grade_columns = [info[1] for info in cursor.fetchall()]
-                if "weight" not in grade_columns:
-                    logger.info("Migrating: Adding 'weight' column to grades table.")
-                    cursor.execute("ALTER TABLE grades ADD COLUMN weight FLOAT DEFAULT 1.0")
-                    conn.commit()
-
-            # 5. Create timetable_settings table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='timetable_settings'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'timetable_settings' table.")
-                cursor.execute("""
-                    CREATE TABLE timetable_settings (
-                        id VARCHAR PRIMARY KEY,
-                        class_id VARCHAR NOT NULL UNIQUE,
-                        slot_duration INTEGER DEFAULT 45,
-                        break_duration INTEGER DEFAULT 15,
-                        day_start_hour INTEGER DEFAULT 8,
-                        day_start_minute INTEGER DEFAULT 0,
-                        day_end_hour INTEGER DEFAULT 16,
-                        day_end_minute INTEGER DEFAULT 0,
-                        FOREIGN KEY (class_id) REFERENCES classes(id)
-                    )
-                """)
-                conn.commit()
-
-            # 6. Create timetable_slots table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='timetable_slots'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'timetable_slots' table.")
-                cursor.execute("""
-                    CREATE TABLE timetable_slots (
-                        id VARCHAR PRIMARY KEY,
-                        class_id VARCHAR NOT NULL,
-                        weekday INTEGER NOT NULL,
-                        slot_number INTEGER NOT NULL,
-                        subject_id VARCHAR,
-                        subject_name VARCHAR,
-                        group_name VARCHAR,
-                        room VARCHAR,
-                        FOREIGN KEY (class_id) REFERENCES classes(id),
-                        FOREIGN KEY (subject_id) REFERENCES subjects(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_timetable_slots_class_id ON timetable_slots(class_id)")
-                conn.commit()
-
-            # 7. Create user_timetable_selections table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_timetable_selections'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'user_timetable_selections' table.")
-                cursor.execute("""
-                    CREATE TABLE user_timetable_selections (
-                        id VARCHAR PRIMARY KEY,
-                        user_id VARCHAR NOT NULL,
-                        slot_id VARCHAR NOT NULL,
-                        FOREIGN KEY (user_id) REFERENCES users(id),
-                        FOREIGN KEY (slot_id) REFERENCES timetable_slots(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_user_timetable_selections_user_id ON user_timetable_selections(user_id)")
-                conn.commit()
-
-            # 8. Create integration_tokens table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='integration_tokens'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'integration_tokens' table.")
-                cursor.execute("""
-                    CREATE TABLE integration_tokens (
-                        id VARCHAR PRIMARY KEY,
-                        token VARCHAR UNIQUE,
-                        user_id VARCHAR NOT NULL,
-                        class_id VARCHAR NOT NULL,
-                        scopes VARCHAR DEFAULT 'read:events',
-                        expires_at DATETIME,
-                        created_at DATETIME,
-                        last_used_at DATETIME,
-                        revoked BOOLEAN DEFAULT 0,
-                        FOREIGN KEY (user_id) REFERENCES users(id),
-                        FOREIGN KEY (class_id) REFERENCES classes(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_integration_tokens_token ON integration_tokens(token)")
-                cursor.execute("CREATE INDEX ix_integration_tokens_user_id ON integration_tokens(user_id)")
-                conn.commit()
-
-            # 9. Create oauth_clients table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='oauth_clients'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'oauth_clients' table.")
-                cursor.execute("""
-                    CREATE TABLE oauth_clients (
-                        id VARCHAR PRIMARY KEY,
-                        client_id VARCHAR UNIQUE NOT NULL,
-                        client_secret VARCHAR NOT NULL,
-                        name VARCHAR NOT NULL,
-                        redirect_uri VARCHAR NOT NULL,
-                        created_at DATETIME
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_oauth_clients_client_id ON oauth_clients(client_id)")
-                conn.commit()
-
-            # 9b. Create oauth_client_redirect_uris table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='oauth_client_redirect_uris'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'oauth_client_redirect_uris' table.")
-                cursor.execute("""
-                    CREATE TABLE oauth_client_redirect_uris (
-                        id VARCHAR PRIMARY KEY,
-                        oauth_client_id VARCHAR NOT NULL,
-                        redirect_uri VARCHAR NOT NULL,
-                        created_at DATETIME,
-                        FOREIGN KEY (oauth_client_id) REFERENCES oauth_clients(id)
-                    )
-                """)
-                cursor.execute(
-                    "CREATE INDEX ix_oauth_client_redirect_uris_redirect_uri ON oauth_client_redirect_uris(redirect_uri)"
-                )
-                cursor.execute(
-                    "CREATE UNIQUE INDEX ix_oauth_client_redirect_uris_unique ON oauth_client_redirect_uris(oauth_client_id, redirect_uri)"
-                )
-                conn.commit()
-
-            # 9c. Backfill redirect URIs from oauth_clients.redirect_uri
-            cursor.execute(
-                """
-                SELECT oc.id, oc.redirect_uri
-                FROM oauth_clients oc
-                LEFT JOIN oauth_client_redirect_uris ocru
-                  ON ocru.oauth_client_id = oc.id
-                 AND ocru.redirect_uri = oc.redirect_uri
-                WHERE oc.redirect_uri IS NOT NULL
-                  AND oc.redirect_uri != ''
-                  AND ocru.id IS NULL
-                """
-            )
-            missing_redirects = cursor.fetchall()
-            if missing_redirects:
-                logger.info(
-                    "Migrating: Backfilling %s OAuth redirect URI registrations.",
-                    len(missing_redirects),
-                )
-                for oauth_client_id, redirect_uri in missing_redirects:
-                    cursor.execute(
-                        """
-                        INSERT INTO oauth_client_redirect_uris (id, oauth_client_id, redirect_uri, created_at)
-                        VALUES (?, ?, ?, datetime('now'))
-                        """,
-                        (secrets.token_urlsafe(24), oauth_client_id, redirect_uri),
-                    )
-                conn.commit()
-
-            # 10. Create oauth_authorization_codes table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='oauth_authorization_codes'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'oauth_authorization_codes' table.")
-                cursor.execute("""
-                    CREATE TABLE oauth_authorization_codes (
-                        id VARCHAR PRIMARY KEY,
-                        code VARCHAR UNIQUE,
-                        client_id VARCHAR NOT NULL,
-                        user_id VARCHAR NOT NULL,
-                        redirect_uri VARCHAR NOT NULL,
-                        scope VARCHAR DEFAULT 'read:events',
-                        expires_at DATETIME NOT NULL,
-                        used BOOLEAN DEFAULT 0,
-                        created_at DATETIME,
-                        FOREIGN KEY (user_id) REFERENCES users(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_oauth_authorization_codes_code ON oauth_authorization_codes(code)")
-                conn.commit()
-
-            # 11. Create device_tokens table if not exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='device_tokens'")
-            if not cursor.fetchone():
-                logger.info("Migrating: Creating 'device_tokens' table.")
-                cursor.execute("""
-                    CREATE TABLE device_tokens (
-                        id VARCHAR PRIMARY KEY,
-                        user_id VARCHAR NOT NULL,
-                        device_token VARCHAR NOT NULL,
-                        platform VARCHAR NOT NULL,
-                        created_at DATETIME,
-                        updated_at DATETIME,
-                        FOREIGN KEY (user_id) REFERENCES users(id)
-                    )
-                """)
-                cursor.execute("CREATE INDEX ix_device_tokens_device_token ON device_tokens(device_token)")
-                cursor.execute("CREATE INDEX ix_device_tokens_user_id ON device_tokens(user_id)")
-                conn.commit()
-
-            # 12. Add new columns to integration_tokens for API-Key system
-            cursor.execute("PRAGMA table_info(integration_tokens)")
-            token_columns = [info[1] for info in cursor.fetchall()]
-            
-            # Add 'name' column
-            if "name" not in token_columns:
-                logger.info("Migrating: Adding 'name' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN name VARCHAR")
-                conn.commit()
-            
-            # Add 'token_hash' column
-            if "token_hash" not in token_columns:
-                logger.info("Migrating: Adding 'token_hash' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN token_hash VARCHAR")
-                # Create index for token_hash lookups
-                try:
-                    cursor.execute("CREATE UNIQUE INDEX ix_integration_tokens_token_hash ON integration_tokens(token_hash)")
-                except Exception:
-                    pass  # Index might already exist
-                conn.commit()
-            
-            # Add 'token_prefix' column
-            if "token_prefix" not in token_columns:
-                logger.info("Migrating: Adding 'token_prefix' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN token_prefix VARCHAR")
-                conn.commit()
-            
-            # Add 'created_by' column
-            if "created_by" not in token_columns:
-                logger.info("Migrating: Adding 'created_by' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN created_by VARCHAR")
-                conn.commit()
-            
-            # Add 'rate_limit_per_minute' column
-            if "rate_limit_per_minute" not in token_columns:
-                logger.info("Migrating: Adding 'rate_limit_per_minute' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN rate_limit_per_minute INTEGER DEFAULT 60")
-                conn.commit()
-            
-            # Add 'ip_allowlist' column
-            if "ip_allowlist" not in token_columns:
-                logger.info("Migrating: Adding 'ip_allowlist' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN ip_allowlist VARCHAR")
-                conn.commit()
-            
-            # Add 'revoked_at' column
-            if "revoked_at" not in token_columns:
-                logger.info("Migrating: Adding 'revoked_at' column to integration_tokens table.")
-                cursor.execute("ALTER TABLE integration_tokens ADD COLUMN revoked_at DATETIME")
-                conn.commit()
-
-            # Add other migrations here as needed
-            
-        except Exception as e:
-            logger.error(f"Auto migration failed: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+    Dialect-aware (SQLite, PostgreSQL, ...): columns the models have but an
+    existing table lacks are added, missing tables are created, then the data
+    fixes run. A fresh database just gets the full schema.
+    """
+    bind = bind if bind is not None else engine
+    logger.info("Checking schema migrations...")
+    try:
+        existing = set(inspect(bind).get_table_names())
+        added = {}
+        with bind.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                if table.name in existing:
+                    added[table.name] = _add_missing_columns(conn, table)
+            Base.metadata.create_all(bind=conn)
+        for name, columns in added.items():
+            if columns:
+                _create_indexes(bind, Base.metadata.tables[name], columns)
+        with bind.begin() as conn:
+            _uppercase_priorities(conn)
+            _backfill_redirect_uris(conn)
+        _unique_webhook_deliveries(bind)
+    except Exception as e:
+        logger.error(f"Auto migration failed: {e}")
 
 
 def seed_default_oauth_clients(db):
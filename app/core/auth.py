@@ -14,7 +14,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
 
     if user and hasattr(user, "language") and user.language in i18n.translations:
         request.state.lang = user.language
-        request.state.t = lambda key: i18n.get_translation(request.state.lang, key)
+        request.state.t = i18n.translator(user.language)
 
     return user
 
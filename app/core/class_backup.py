@@ -0,0 +1,336 @@
+"""
+Per-class backup archive: export (streamed to the admin download) and restore.
+
+The archive is NDJSON, compressed with zstd (optional `zstandard` package)
+or gzip otherwise:
+
+    {"format": "classly-class-backup", "version": 1, "class_id": ..., "created_at": ...}
+    {"table": "events", "columns": ["id", "class_id", ...]}
+    ["<id>", "<class_id>", ...]                   one array per row
+    ...
+    {"end": {"classes": 1, "events": 412, ...}}   row counts; missing = truncated
+
+Rows are read in keyset-paginated batches of BATCH_SIZE and compressed batch
+by batch, so memory stays flat no matter how big the class is. Every batch is
+a complete query, but all of them run in one read transaction (`_snapshot`):
+an event edited during the export is in the archive either before or after
+the edit, never with its topics from one side and itself from the other. On
+SQLite that transaction holds the read lock until the export is done, so the
+admin download writes the archive to a temporary file first. All tables of a class are included (`class_tables`); queues and
+other transient rows (webhook outbox/deliveries, live updates, OAuth codes)
+are not. The archive contains session tokens and password hashes, like the
+database itself.
+
+    python -m app.core.class_backup export <class_id> <file>
+    python -m app.core.class_backup restore <file> [--replace]
+
+With SHARDS both commands use the class's shard; a restored class without a
+route gets one assigned like a new class.
+"""
+
+import contextlib
+import datetime
+import enum
+import gzip
+import io
+import json
+import sys
+import zlib
+from typing import IO, Iterator
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.types import Date, DateTime, Time
+
+from app import models
+
+try:
+    import zstandard
+except ImportError:  # optional - gzip fallback
+    zstandard = None
+
+FORMAT = "classly-class-backup"
+VERSION = 1
+BATCH_SIZE = 1000
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class BackupError(Exception):
+    pass
+
+
+_CORRUPT = (EOFError, OSError, ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def class_tables(class_id: str) -> list:
+    """(model, row filter) of every table holding class data, parents before children."""
+    users = select(models.User.id).where(models.User.class_id == class_id)
+    events = select(models.Event.id).where(models.Event.class_id == class_id)
+    slots = select(models.TimetableSlot.id).where(models.TimetableSlot.class_id == class_id)
+    return [
+        (models.Class, models.Class.id == class_id),
+        (models.User, models.User.class_id == class_id),
+        (models.UserPreferences, models.UserPreferences.user_id.in_(users)),
+        (models.Subject, models.Subject.class_id == class_id),
+        (models.Event, models.Event.class_id == class_id),
+        (models.EventTopic, models.EventTopic.event_id.in_(events)),
+        (models.EventLink, models.EventLink.event_id.in_(events)),
+        (models.Grade, models.Grade.event_id.in_(events)),
+        (models.LoginToken, models.LoginToken.class_id == class_id),
+        (models.IntegrationToken, models.IntegrationToken.class_id == class_id),
+        (models.AuditLog, models.AuditLog.class_id == class_id),
+        (models.TimetableSettings, models.TimetableSettings.class_id == class_id),
+        (models.TimetableSlot, models.TimetableSlot.class_id == class_id),
+        (models.UserTimetableSelection, models.UserTimetableSelection.slot_id.in_(slots)),
+        (models.TimetableHoliday, models.TimetableHoliday.class_id == class_id),
+        (models.DeviceToken, models.DeviceToken.user_id.in_(users)),
+        (models.WebhookSubscription, models.WebhookSubscription.class_id == class_id),
+    ]
+
+
+def compression() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def filename(class_id: str) -> str:
+    suffix = "zst" if compression() == "zstd" else "gz"
+    return f"classly_backup_{class_id}_{datetime.date.today()}.ndjson.{suffix}"
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.name  # SQLAlchemy stores enum names
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _line(obj) -> bytes:
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _compressor():
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+
+
+@contextlib.contextmanager
+def _snapshot(conn: Connection):
+    """Read-only transaction in which every query sees the same database state."""
+    if conn.in_transaction():
+        raise BackupError("Export needs a connection without an open transaction")
+    if conn.dialect.name == "sqlite":
+        # pysqlite doesn't BEGIN before SELECTs; without it each batch is its own snapshot
+        with conn.begin():
+            conn.exec_driver_sql("BEGIN")
+            yield
+        return
+    options = {"isolation_level": "REPEATABLE READ"}
+    if conn.dialect.name == "postgresql":
+        options["postgresql_readonly"] = True
+    conn.execution_options(**options)
+    with conn.begin():
+        yield
+
+
+def iter_export(conn: Connection, class_id: str) -> Iterator[bytes]:
+    """Compressed archive of one class, in chunks of roughly BATCH_SIZE rows.
+
+    `conn` must not be in a transaction: the export opens its own (`_snapshot`)
+    and ends it with the last chunk.
+    """
+    with _snapshot(conn):
+        yield from _export(conn, class_id)
+
+
+def _export(conn: Connection, class_id: str) -> Iterator[bytes]:
+    compressor = _compressor()
+    header = {"format": FORMAT, "version": VERSION, "class_id": class_id,
+              "created_at": datetime.datetime.utcnow()}
+    chunk = compressor.compress(_line(header))
+    counts = {}
+    for model, condition in class_tables(class_id):
+        table = model.__table__
+        chunk += compressor.compress(_line({"table": table.name, "columns": [c.name for c in table.columns]}))
+        counts[table.name] = 0
+        [key] = table.primary_key.columns  # single-column keys throughout
+        query = select(table).where(condition).order_by(key).limit(BATCH_SIZE)
+        position = list(table.columns).index(key)
+        rows = conn.execute(query).all()
+        while rows:
+            counts[table.name] += len(rows)
+            chunk += compressor.compress(b"".join(_line(list(row)) for row in rows))
+            if chunk:
+                yield chunk
+                chunk = b""
+            if len(rows) < BATCH_SIZE:
+                break
+            rows = conn.execute(query.where(key > rows[-1][position])).all()
+    chunk += compressor.compress(_line({"end": counts}))
+    yield chunk + compressor.flush()
+
+
+def open_archive(stream: IO[bytes]) -> IO[bytes]:
+    """Decompressing reader for a zstd, gzip or plain archive (detected by magic bytes)."""
+    stream = io.BufferedReader(stream) if not hasattr(stream, "peek") else stream
+    magic = stream.peek(4)[:4]
+    if magic.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise BackupError("Archive is zstd-compressed, install the 'zstandard' package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream))
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _items(reader: IO[bytes]) -> Iterator:
+    try:
+        for line in reader:
+            yield json.loads(line)
+    except _CORRUPT as exc:
+        raise BackupError(f"Archive is corrupt ({exc})") from exc
+
+
+def _converters(columns: list) -> list:
+    def convert(column):
+        if isinstance(column.type, DateTime):
+            return datetime.datetime.fromisoformat
+        if isinstance(column.type, Date):
+            return datetime.date.fromisoformat
+        if isinstance(column.type, Time):
+            return datetime.time.fromisoformat
+        return None
+    return [convert(column) if column is not None else None for column in columns]
+
+
+def _check_header(header) -> dict:
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise BackupError("Not a Classly backup archive")
+    if header.get("version") != VERSION:
+        raise BackupError(f"Unsupported archive version {header.get('version')}")
+    return header
+
+
+def read_header(stream: IO[bytes]) -> dict:
+    """First line of an archive (format, version, class_id, created_at), validated."""
+    return _check_header(next(_items(open_archive(stream)), None))
+
+
+def delete_class(conn: Connection, class_id: str):
+    """Remove all rows of `class_tables` for `class_id` (children first)."""
+    for model, condition in reversed(class_tables(class_id)):
+        conn.execute(delete(model.__table__).where(condition))
+
+
+def restore(conn: Connection, stream: IO[bytes], replace: bool = False) -> dict:
+    """
+    Insert the class from an archive, returns the row counts per table.
+
+    Runs on `conn` as is; use a transaction (`engine.begin()`) so a truncated
+    or rejected archive leaves nothing behind. An existing class with the same
+    id is only overwritten with `replace=True`. Columns missing in the archive
+    get their defaults, columns the schema no longer has are skipped.
+    """
+    items = _items(open_archive(stream))
+    class_id = _check_header(next(items, None))["class_id"]
+    tables = {model.__table__.name: model.__table__ for model, _ in class_tables(class_id)}
+    if conn.execute(select(models.Class.id).where(models.Class.id == class_id)).first() is not None:
+        if not replace:
+            raise BackupError(f"Class {class_id} already exists (use --replace to overwrite it)")
+        delete_class(conn, class_id)
+
+    table, names, converters, batch = None, [], [], []
+    counts: dict[str, int] = {}
+
+    def flush():
+        if batch:
+            conn.execute(insert(table), batch)
+            counts[table.name] += len(batch)
+            batch.clear()
+
+    for item in items:
+        if isinstance(item, list) and table is not None:
+            batch.append({
+                name: (convert(value) if convert is not None and value is not None else value)
+                for name, convert, value in zip(names, converters, item) if name is not None
+            })
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        elif isinstance(item, dict) and "table" in item:
+            flush()
+            table = tables.get(item["table"])
+            if table is None:
+                raise BackupError(f"Unknown table {item['table']!r} in archive")
+            columns = [table.columns.get(name) for name in item["columns"]]
+            names = [column.name if column is not None else None for column in columns]
+            converters = _converters(columns)
+            counts[table.name] = 0
+        elif isinstance(item, dict) and "end" in item:
+            flush()
+            if counts != item["end"]:
+                raise BackupError("Row counts don't match the archive")
+            return counts
+        else:
+            raise BackupError("Unexpected line in archive")
+    raise BackupError("Archive is truncated")
+
+
+def _restore_engine(class_id: str):
+    """Database to restore `class_id` into: with SHARDS its shard, a new class gets one assigned."""
+    from app.database import engine, shard_map
+
+    if shard_map is None:
+        return engine
+    from app.core.sharding import ACTIVE
+
+    shard_map.create_tables()
+    route = shard_map.route(class_id, fresh=True)
+    if route is None:
+        return shard_map.shards[shard_map.assign(class_id)]
+    if route.state != ACTIVE:
+        raise BackupError(f"Class {class_id} is being moved, try again afterwards")
+    return shard_map.shards[route.shard]
+
+
+def main(argv: list) -> int:
+    from app.database import engine, shard_map
+
+    if len(argv) == 3 and argv[0] == "export":
+        if shard_map is not None:
+            # With SHARDS the class data lives on its shard, DATABASE_URL is only the directory
+            shard = shard_map.shard_for(argv[1])
+            engine = shard_map.shards[shard] if shard is not None else None
+        if engine is None:
+            print(f"Class {argv[1]} not found")
+            return 1
+        with engine.connect() as conn, open(argv[2], "wb") as out:
+            if conn.execute(select(models.Class.id).where(models.Class.id == argv[1])).first() is None:
+                print(f"Class {argv[1]} not found")
+                return 1
+            conn.rollback()  # the export opens its own transaction
+            for chunk in iter_export(conn, argv[1]):
+                out.write(chunk)
+        print(f"Exported class {argv[1]} to {argv[2]} ({compression()})")
+        return 0
+    if len(argv) in (2, 3) and argv[0] == "restore" and argv[2:] in ([], ["--replace"]):
+        try:
+            with open(argv[1], "rb") as archive:
+                engine = _restore_engine(read_header(archive)["class_id"])
+            models.Base.metadata.create_all(bind=engine)
+            with open(argv[1], "rb") as archive, engine.begin() as conn:
+                counts = restore(conn, archive, replace=argv[2:] == ["--replace"])
+        except BackupError as exc:
+            print(f"Restore failed: {exc}")
+            return 1
+        print("Restored " + ", ".join(f"{name}={count}" for name, count in counts.items() if count))
+        return 0
+    print("Usage: python -m app.core.class_backup export <class_id> <file>\n"
+          "       python -m app.core.class_backup restore <file> [--replace]")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,392 @@
+"""
+Scheduled online backups of the SQLite database (DB_BACKUP_ENABLED=true).
+
+Copying `classly.db` while the app writes to it can produce a torn file.
+This uses the SQLite online backup API instead:
+
+1. copy DB_BACKUP_STEP_PAGES pages per step; between steps the read lock is
+   released and the copy pauses DB_BACKUP_STEP_PAUSE_MS, so writers only
+   ever wait for a single step. A commit from another connection makes
+   SQLite restart the copy; after DB_BACKUP_MAX_RESTARTS restarts the rest
+   is copied in one step, so a busy database still gets its backup,
+2. `PRAGMA integrity_check` on the copy (a failed check keeps the previous
+   backups and is reported as an error),
+3. compress (DB_BACKUP_COMPRESS: zstd with the optional `zstandard`
+   package, gzip, or none) and move into DB_BACKUP_DIR atomically,
+4. keep the newest DB_BACKUP_KEEP backups.
+
+With SHARDS (app/core/sharding.py) every run also copies each SQLite shard,
+next to the directory database as `classly-<time>.<shard>.db`; the files of
+one run are kept or pruned together.
+
+Every app worker runs the scheduler thread; a lock file in DB_BACKUP_DIR
+lets only one of them back up, and a backup is due when the newest one is
+older than DB_BACKUP_INTERVAL_HOURS. The last run is recorded in
+`status.json` in the same directory (shown to the operator on /admin/backups).
+
+    python -m app.core.db_backup run      # one backup now
+    python -m app.core.db_backup status
+"""
+
+import contextlib
+import datetime
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one worker expected
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # optional - gzip fallback
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+_PATTERN = "classly-*.db*"
+_SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def sqlite_path(database_url: str) -> Optional[str]:
+    """File behind a sqlite:// URL, None for other databases and in-memory SQLite."""
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+def copy_database(source_path: str, target_path: str, step_pages: int = 256, pause: float = 0.01,
+                  max_restarts: int = 5) -> dict:
+    """Online copy of `source_path` into a new file; returns pages, steps and restarts."""
+    stats = {"pages": 0, "steps": 0, "restarts": 0, "single_step": False}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats["steps"] += 1
+        stats["pages"] = total
+        if last_remaining is not None and remaining > last_remaining:
+            stats["restarts"] += 1
+            if stats["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if remaining and pause:
+            time.sleep(pause)  # lock released between steps: let writers in
+
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=step_pages, progress=progress)
+        except _TooManyRestarts:
+            stats["single_step"] = True
+            source.backup(target, pages=-1)
+            stats["steps"] += 1
+    finally:
+        target.close()
+        source.close()
+    return stats
+
+
+def verify(path: str) -> str:
+    """'ok' or the problems `PRAGMA integrity_check` found."""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    except sqlite3.DatabaseError as exc:
+        return str(exc)
+    finally:
+        conn.close()
+    return "; ".join(row[0] for row in rows[:10])
+
+
+def _compress(path: str, method: str) -> str:
+    if method == "none":
+        return path
+    target = path + _SUFFIXES[method]
+    with open(path, "rb") as src, open(target, "wb") as dst:
+        if method == "zstd":
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(src, gz, 1 << 20)
+    os.remove(path)
+    return target
+
+
+@contextlib.contextmanager
+def _exclusive(directory: str):
+    """True if this process holds the backup lock, False if another one does."""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(directory, ".lock"), "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _run_of(name: str) -> str:
+    """'classly-20240101-120000-000000' for every file of that run."""
+    return name.split(".", 1)[0]
+
+
+class DatabaseBackups:
+    def __init__(self, source: Optional[str], directory: str, enabled: bool = False, interval: float = 86400,
+                 keep: int = 7, compress: str = "auto", step_pages: int = 256, step_pause: float = 0.01,
+                 max_restarts: int = 5, shards: Optional[dict] = None):
+        self.source = source
+        # A shard sharing the directory's file is already in the directory backup
+        self.shards = {name: path for name, path in (shards or {}).items()
+                       if source is None or os.path.abspath(path) != os.path.abspath(source)}
+        self.directory = directory
+        self.enabled = enabled
+        self.interval = interval
+        self.keep = keep
+        if compress == "auto":
+            compress = "zstd" if zstandard is not None else "gzip"
+        if compress not in _SUFFIXES:
+            raise ValueError(f"DB_BACKUP_COMPRESS must be auto, zstd, gzip or none, not {compress!r}")
+        if compress == "zstd" and zstandard is None:
+            logger.warning("DB_BACKUP_COMPRESS=zstd needs the 'zstandard' package, using gzip")
+            compress = "gzip"
+        self.compress = compress
+        self.step_pages = step_pages
+        self.step_pause = step_pause
+        self.max_restarts = max_restarts
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    # --- backups on disk ---
+
+    def backups(self) -> list[dict]:
+        """Existing backups, newest first."""
+        paths = sorted(glob.glob(os.path.join(self.directory, _PATTERN)), reverse=True)
+        return [{
+            "name": os.path.basename(path),
+            "size": os.path.getsize(path),
+            "created_at": datetime.datetime.utcfromtimestamp(os.path.getmtime(path)),
+        } for path in paths]
+
+    def due(self) -> bool:
+        newest = next(iter(self.backups()), None)
+        if newest is None:
+            return True
+        return (datetime.datetime.utcnow() - newest["created_at"]).total_seconds() >= self.interval
+
+    def _prune(self) -> list[str]:
+        removed, runs = [], []
+        for backup in self.backups():
+            run = _run_of(backup["name"])
+            if run not in runs:
+                runs.append(run)
+            if len(runs) > self.keep:
+                os.remove(os.path.join(self.directory, backup["name"]))
+                removed.append(backup["name"])
+        return removed
+
+    # --- status.json ---
+
+    def _status_path(self) -> str:
+        return os.path.join(self.directory, "status.json")
+
+    def status(self) -> dict:
+        try:
+            with open(self._status_path()) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_status(self, status: dict):
+        temp = self._status_path() + ".tmp"
+        with open(temp, "w") as handle:
+            json.dump(status, handle, default=str, indent=2)
+        os.replace(temp, self._status_path())
+
+    # --- one backup ---
+
+    def run(self, force: bool = True) -> Optional[dict]:
+        """
+        Back up now (or only if due, `force=False`). Returns the details of the
+        new backup, None if another process holds the lock or it wasn't due.
+        Raises BackupError if the copy failed verification.
+        """
+        if self.source is None:
+            raise BackupError("Backups need a SQLite database (DATABASE_URL=sqlite:///...)")
+        os.makedirs(self.directory, exist_ok=True)
+        with _exclusive(self.directory) as locked:
+            if not locked or (not force and not self.due()):
+                return None
+            status = self.status()
+            status["last_started"] = datetime.datetime.utcnow()
+            status["running"] = True
+            self._write_status(status)
+            try:
+                result = self._backup()
+            except Exception as exc:
+                status.update(running=False, last_error=str(exc), last_error_at=datetime.datetime.utcnow())
+                self._write_status(status)
+                raise
+            status.update(running=False, last_success=result, last_error=None)
+            self._write_status(status)
+            return result
+
+    def _backup(self) -> dict:
+        now = datetime.datetime.utcnow()
+        run = f"classly-{now:%Y%m%d-%H%M%S}-{now.microsecond:06d}"
+        written = []
+        try:
+            result = self._copy(self.source, f"{run}.db")
+            written.append(result["name"])
+            shards = {}
+            for shard, path in self.shards.items():
+                shards[shard] = self._copy(path, f"{run}.{shard}.db")
+                written.append(shards[shard]["name"])
+        except Exception:
+            # No partial runs: a restore needs the directory and every shard from the same time
+            for name in written:
+                os.remove(os.path.join(self.directory, name))
+            raise
+        result.update(created_at=now, removed=self._prune())
+        if shards:
+            result["shards"] = shards
+        return result
+
+    def _copy(self, source: str, name: str) -> dict:
+        started = time.perf_counter()
+        temp = os.path.join(self.directory, f".{name}.tmp")
+        try:
+            stats = copy_database(source, temp, self.step_pages, self.step_pause, self.max_restarts)
+            copied = time.perf_counter()
+            integrity = verify(temp)
+            if integrity != "ok":
+                raise BackupError(f"integrity_check failed: {integrity}")
+            size = os.path.getsize(temp)
+            compressed = _compress(temp, self.compress)
+            final = os.path.join(self.directory, name + _SUFFIXES[self.compress])
+            os.replace(compressed, final)
+        finally:
+            for leftover in glob.glob(temp + "*"):
+                os.remove(leftover)
+        result = {
+            "name": os.path.basename(final),
+            "size": size,
+            "stored_size": os.path.getsize(final),
+            "compression": self.compress,
+            "integrity": integrity,
+            "copy_seconds": round(copied - started, 3),
+            "total_seconds": round(time.perf_counter() - started, 3),
+            **stats,
+        }
+        logger.info("Database backup %s: %s pages in %s steps (%s restarts), %.1fs",
+                    result["name"], stats["pages"], stats["steps"], stats["restarts"], result["total_seconds"])
+        return result
+
+    # --- scheduler thread ---
+
+    def start(self, poll: float = 60.0):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if self.source is None:
+                logger.warning("DB_BACKUP_ENABLED is set, but DATABASE_URL is not a SQLite file; no backups")
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(poll,), name="db-backup", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, poll: float):
+        while True:
+            try:
+                self.run(force=False)
+            except Exception:
+                logger.exception("Database backup failed")
+            if self._stop.wait(poll):
+                return
+
+
+def _default_directory(source: Optional[str]) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(source)) if source else ".", "backups")
+
+
+def _shard_sources() -> dict:
+    """SQLite files of the SHARDS databases; other backends are backed up with their own tools."""
+    if not os.getenv("SHARDS"):
+        return {}
+    from app.core.sharding import shard_urls
+
+    paths = {name: sqlite_path(url) for name, url in shard_urls().items()}
+    return {name: path for name, path in paths.items() if path is not None}
+
+
+_source = sqlite_path(os.getenv("DATABASE_URL", "sqlite:///./classly.db"))
+
+db_backups = DatabaseBackups(
+    source=_source,
+    directory=os.getenv("DB_BACKUP_DIR") or _default_directory(_source),
+    enabled=os.getenv("DB_BACKUP_ENABLED", "false").lower() == "true",
+    interval=float(os.getenv("DB_BACKUP_INTERVAL_HOURS", "24")) * 3600,
+    keep=int(os.getenv("DB_BACKUP_KEEP", "7")),
+    compress=os.getenv("DB_BACKUP_COMPRESS", "auto").lower(),
+    step_pages=int(os.getenv("DB_BACKUP_STEP_PAGES", "256")),
+    step_pause=float(os.getenv("DB_BACKUP_STEP_PAUSE_MS", "10")) / 1000,
+    max_restarts=int(os.getenv("DB_BACKUP_MAX_RESTARTS", "5")),
+    shards=_shard_sources(),
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["run"]:
+        try:
+            backup = db_backups.run()
+        except BackupError as exc:
+            print(f"Backup failed: {exc}")
+            sys.exit(1)
+        if backup is None:
+            print("Another process is backing up right now")
+            sys.exit(1)
+        print(f"{os.path.join(db_backups.directory, backup['name'])} ({backup['stored_size'] / 1024 / 1024:.1f} MB)")
+    elif sys.argv[1:] == ["status"]:
+        print(json.dumps(db_backups.status(), indent=2, default=str))
+        for backup in db_backups.backups():
+            print(f"{backup['name']}  {backup['size'] / 1024 / 1024:8.1f} MB  {backup['created_at']:%Y-%m-%d %H:%M}")
+    else:
+        print("Usage: python -m app.core.db_backup run|status")
+        sys.exit(1)
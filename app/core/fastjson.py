@@ -0,0 +1,51 @@
+"""
+Fast JSON encoding for API responses.
+
+Uses orjson when installed (native datetime/date/enum/UUID support, returns
+bytes directly) and falls back to the stdlib encoder with the same output
+conventions otherwise.
+
+Endpoints that return `FastJSONResponse(...)` directly also skip FastAPI's
+`jsonable_encoder` pass over the returned dict.
+"""
+
+import datetime
+import enum
+import json
+import uuid
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional - stdlib fallback below
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,96 @@
+"""
+Per-class cache for rendered HTML fragments (dashboard partials).
+
+Entries are keyed by (class_id, fragment name, data version, extra key). Every
+write that changes what a class sees calls `invalidate(class_id)`, which bumps
+the class' data version so all of its cached fragments miss on the next read.
+Old entries are never looked up again and age out of the LRU.
+
+The version lives in process memory. With several workers the singleton is
+attached to `invalidation_bus`, which forwards invalidations to the other
+workers; FRAGMENT_CACHE_TTL stays as the upper bound if the bus is off.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from app.core.invalidation import InvalidationBus, invalidation_bus
+from app.core.metrics import cache_counters
+
+# HX-Trigger event fired by event write routes; dashboard fragments refresh on it
+EVENTS_CHANGED = "classly:events-changed"
+
+_HIT, _MISS = cache_counters("fragments")
+
+
+class FragmentCache:
+    def __init__(self, max_entries: int = 512, ttl: float = 30.0, bus: Optional[InvalidationBus] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bus = bus
+        self._entries: "OrderedDict[tuple, tuple[float, str]]" = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if bus is not None:
+            bus.register("fragments", self._bump, self.clear)
+
+    def version(self, class_id: str) -> int:
+        return self._versions.get(class_id, 0)
+
+    def invalidate(self, class_id: str) -> int:
+        """Bump the data version of a class (in every worker). Returns the new version."""
+        version = self._bump(class_id)
+        if self.bus is not None:
+            self.bus.publish("fragments", class_id)
+        return version
+
+    def _bump(self, class_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(class_id, 0) + 1
+            self._versions[class_id] = version
+            return version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_or_render(self, class_id: str, name: str, key: Hashable, render: Callable[[], str]) -> str:
+        """Return the cached fragment or render (outside the lock) and store it."""
+        if self.max_entries <= 0 or (self.bus is not None and not self.bus.sync()):
+            return render()
+
+        cache_key = (class_id, name, self.version(class_id), key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and (self.ttl <= 0 or now - entry[0] < self.ttl):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                _HIT.inc()
+                return entry[1]
+            self.misses += 1
+        _MISS.inc()
+
+        html = render()
+
+        with self._lock:
+            self._entries[cache_key] = (now, html)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+
+fragment_cache = FragmentCache(
+    max_entries=int(os.getenv("FRAGMENT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("FRAGMENT_CACHE_TTL", "30")),
+    bus=invalidation_bus,
+)
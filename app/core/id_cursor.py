@@ -0,0 +1,51 @@
+"""
+Polling cursor over an autoincrement id that tolerates out-of-order commits.
+
+`WHERE id > last_id` is only safe with a single writer (SQLite). On
+PostgreSQL, ids come from a sequence when the row is inserted, not when it
+commits: a row with id 10 can become visible after id 11 was read, and a
+plain high-water mark would skip it forever.
+
+`IdCursor` remembers the ids it skipped below its mark (the gaps) and asks
+for them again on every poll, until they show up or are older than
+`gap_timeout` seconds (rolled back inserts and sequence caching leave gaps
+that never fill). Each row is returned once; with a single writer there are
+no gaps and the query stays `id > last_id`.
+"""
+
+import time
+from typing import Iterable
+
+from sqlalchemy import or_
+
+
+class IdCursor:
+    def __init__(self, last_id: int = 0, gap_timeout: float = 30.0, max_gaps: int = 10000):
+        self.last_id = last_id
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self.gaps: dict[int, float] = {}  # id -> when the gap was seen (monotonic)
+
+    def condition(self, column):
+        """WHERE clause for the rows not seen yet."""
+        if self.gaps:
+            cutoff = time.monotonic() - self.gap_timeout
+            self.gaps = {row_id: seen for row_id, seen in self.gaps.items() if seen >= cutoff}
+        if self.gaps:
+            return or_(column > self.last_id, column.in_(sorted(self.gaps)))
+        return column > self.last_id
+
+    def advance(self, ids: Iterable[int]):
+        """Record the ids a poll returned (in id order)."""
+        now = time.monotonic()
+        for row_id in ids:
+            if row_id > self.last_id:
+                # Most recent gaps matter most; a huge jump (sequence reset) only keeps the last max_gaps
+                for missing in range(max(self.last_id + 1, row_id - self.max_gaps), row_id):
+                    self.gaps[missing] = now
+                self.last_id = row_id
+            else:
+                self.gaps.pop(row_id, None)
+        if len(self.gaps) > self.max_gaps:
+            for row_id in sorted(self.gaps)[:len(self.gaps) - self.max_gaps]:
+                del self.gaps[row_id]
@@ -0,0 +1,145 @@
+"""
+Cache invalidation across app workers.
+
+The in-process caches (`fragment_cache`, `schedule_index` and everything
+derived from it, like the personal ICS feeds) are invalidated by the worker
+that handled the write. With `uvicorn --workers N` the other workers would
+keep serving their copies until the cache TTL runs out. With the bus enabled,
+each `invalidate()` also appends a row to `cache_invalidations`:
+
+- Before a cache is read, `invalidation_bus.sync()` applies the rows other
+  workers wrote since the last sync. It queries at most once every
+  CACHE_INVALIDATION_INTERVAL seconds, so a worker never serves an entry that
+  was invalidated longer ago than that (plus the time the writer needed to
+  publish). Idle workers don't query at all.
+- If the query fails, `sync()` returns False and the caller renders without
+  the cache, so a broken bus can't turn into stale data.
+- Rows are deleted after CACHE_INVALIDATION_RETENTION seconds. A worker that
+  didn't sync for half that time may have missed purged rows and clears its
+  caches instead of applying them.
+- Rows are read by id, but ids skipped because their insert hadn't committed
+  yet (concurrent writers on PostgreSQL) are asked for again (`IdCursor`).
+
+Enabled with CACHE_INVALIDATION=database, or automatically when
+WEB_CONCURRENCY (the env default of `uvicorn --workers`) is above 1.
+Single-process setups pay nothing.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from app import models
+from app.core.id_cursor import IdCursor
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    def __init__(self, session_factory: Optional[Callable] = None, enabled: bool = False,
+                 interval: float = 0.5, retention: float = 600.0):
+        self.enabled = enabled
+        self.interval = interval
+        self.retention = retention
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._session_factory = session_factory
+        self._handlers: dict[str, tuple[Callable[[str], None], Callable[[], None]]] = {}
+        self._cursor: Optional[IdCursor] = None
+        self._synced_at = float("-inf")
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+        self.applied = 0
+
+    def _db(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def register(self, channel: str, invalidate: Callable[[str], None], clear: Callable[[], None]):
+        """`invalidate(key)` applies one remote invalidation, `clear()` drops everything."""
+        self._handlers[channel] = (invalidate, clear)
+
+    def publish(self, channel: str, key: str):
+        """Tell the other workers; the caller has already invalidated its own cache."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        db = self._db()
+        try:
+            db.execute(insert(models.CacheInvalidation).values(
+                channel=channel, key=key, origin=self.origin, created_at=datetime.datetime.utcnow()))
+            if now >= self._next_purge:
+                self._next_purge = now + self.retention / 4
+                cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.retention)
+                db.execute(delete(models.CacheInvalidation).where(models.CacheInvalidation.created_at < cutoff))
+            db.commit()
+        except Exception:
+            # Other workers catch up via their cache TTL
+            logger.exception("Could not publish cache invalidation %s %s", channel, key)
+        finally:
+            db.close()
+
+    def sync(self) -> bool:
+        """Apply other workers' invalidations. False if caches can't be trusted right now."""
+        if not self.enabled or time.monotonic() - self._synced_at < self.interval:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now - self._synced_at < self.interval:
+                return True  # another thread synced while we waited
+            try:
+                self._sync(now)
+            except Exception:
+                logger.exception("Cache invalidation sync failed")
+                return False
+            self._synced_at = now
+            return True
+
+    def _sync(self, now: float):
+        table = models.CacheInvalidation
+        db = self._db()
+        try:
+            if self._cursor is None or now - self._synced_at > self.retention / 2:
+                # First sync, or rows we haven't seen may already be purged
+                if self._cursor is not None:
+                    self.clear_all()
+                self._cursor = IdCursor(db.execute(select(func.max(table.id))).scalar() or 0)
+                return
+            rows = db.execute(
+                select(table.id, table.channel, table.key, table.origin)
+                .where(self._cursor.condition(table.id))
+                .order_by(table.id)
+            ).all()
+        finally:
+            db.close()
+        self._cursor.advance(row[0] for row in rows)
+        for row_id, channel, key, origin in rows:
+            handlers = self._handlers.get(channel)
+            if handlers is not None and origin != self.origin:
+                handlers[0](key)
+                self.applied += 1
+
+    def clear_all(self):
+        for _, clear in self._handlers.values():
+            clear()
+
+
+def _enabled_from_env() -> bool:
+    mode = os.getenv("CACHE_INVALIDATION", "auto").lower()
+    if mode == "auto":
+        return int(os.getenv("WEB_CONCURRENCY", "1") or 1) > 1
+    return mode == "database"
+
+
+invalidation_bus = InvalidationBus(
+    enabled=_enabled_from_env(),
+    interval=float(os.getenv("CACHE_INVALIDATION_INTERVAL", "0.5")),
+    retention=float(os.getenv("CACHE_INVALIDATION_RETENTION", "600")),
+)
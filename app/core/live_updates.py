@@ -0,0 +1,352 @@
+"""
+Live updates: per-class pub/sub bus behind the Server-Sent Events streams.
+
+Write routes call `live_bus.publish(class_id, topic, **data)` next to their
+cache invalidation; every open stream of that class (`/api/v1/stream`,
+`/live/stream`) receives the message within one event-loop tick. Topics are
+"events", "subjects" and "timetable"; the data only names what changed
+(e.g. the event id), clients refetch what they display.
+
+- Each message gets an increasing id, sent as the SSE `id:`. A reconnecting
+  client sends it back as `Last-Event-ID` and gets the missed messages from a
+  per-class replay buffer (LIVE_REPLAY_SIZE). If they are no longer there,
+  the stream starts with `event: resync` and the client reloads everything.
+- Every connection has a bounded queue (LIVE_BUFFER_SIZE). A client that
+  doesn't read fast enough loses its backlog and gets `resync` instead of
+  growing server memory.
+- Idle streams send a `: ping` comment every LIVE_HEARTBEAT seconds so
+  proxies keep them open and dead connections are noticed.
+
+With several app workers set LIVE_BACKEND=database: messages are then
+written to the `live_updates` table and every worker polls it (every
+LIVE_POLL_INTERVAL seconds), so ids are shared and a client can resume on
+any worker. On PostgreSQL a row can commit after rows with higher ids; the
+poller keeps asking for such gaps for a while (`IdCursor`), so a late
+message still goes out, just after its successors. The default "memory"
+backend only reaches streams of the same process.
+
+`LiveStreamMiddleware` serves the stream endpoints without FastAPI's routing
+and dependency machinery. It is the innermost middleware, so streams still
+get CORS, rate limiting, the security headers and the request metrics like
+every other route.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app import models
+from app.core.fastjson import dumps
+from app.core.id_cursor import IdCursor
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("events", "subjects", "timetable")
+
+HEARTBEAT = b": ping\n\n"
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+class LiveMessage(NamedTuple):
+    id: int
+    class_id: str
+    topic: str
+    encoded: bytes  # complete SSE frame, built once per publish
+
+
+def _frame(message_id: int, topic: str, data: bytes) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (message_id, topic.encode(), data)
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class Subscription:
+    """One open stream. Only touched from the event loop it was created on."""
+
+    __slots__ = ("class_id", "topics", "loop", "queue", "backlog", "resync")
+
+    def __init__(self, class_id: str, topics: frozenset, buffer_size: int):
+        self.class_id = class_id
+        self.topics = topics
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(buffer_size)
+        self.backlog: list[LiveMessage] = []
+        self.resync = False
+
+    def put(self, message: LiveMessage):
+        if message.topic not in self.topics:
+            return
+        if self.queue.full():
+            # Slow reader: drop what it hasn't read, tell it to reload instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(message)
+
+
+def _deliver(subscriptions: Iterable[Subscription], message: LiveMessage):
+    for sub in subscriptions:
+        sub.put(message)
+
+
+class LiveBus:
+    def __init__(self, buffer_size: int = 64, replay_size: int = 256, heartbeat: float = 15.0,
+                 retry_ms: int = 3000, backend: Optional["DatabaseBackend"] = None):
+        self.buffer_size = buffer_size
+        self.replay_size = replay_size
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.backend = backend
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._replay: dict[str, deque] = {}
+        self._evicted: dict[str, int] = {}  # per class: id of the newest message dropped from replay
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    # --- publishing (any thread) ---
+
+    def publish(self, class_id: str, topic: str, **data):
+        """Announce a change to every stream of the class."""
+        if not class_id:
+            return
+        payload = dumps(data)
+        if self.backend is not None:
+            try:
+                self.backend.publish(class_id, topic, payload)
+            except Exception:
+                logger.exception("Could not publish live update")
+            return
+        with self._lock:
+            self._last_id += 1
+            message_id = self._last_id
+        self.dispatch(LiveMessage(message_id, class_id, topic, _frame(message_id, topic, payload)))
+
+    def dispatch(self, message: LiveMessage):
+        """Hand a numbered message to the local streams (used by the backend poller)."""
+        with self._lock:
+            self._last_id = max(self._last_id, message.id)
+            replay = self._replay.get(message.class_id)
+            if replay is None:
+                replay = self._replay[message.class_id] = deque(maxlen=self.replay_size)
+            if len(replay) == replay.maxlen:
+                self._evicted[message.class_id] = replay[0].id
+            replay.append(message)
+            subscriptions = tuple(self._subscriptions.get(message.class_id, ()))
+            self.published += 1
+
+        by_loop: dict[asyncio.AbstractEventLoop, list[Subscription]] = {}
+        for sub in subscriptions:
+            by_loop.setdefault(sub.loop, []).append(sub)
+        for loop, subs in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, subs, message)
+            except RuntimeError:  # loop already closed
+                pass
+
+    # --- subscribing (event loop) ---
+
+    def subscribe(self, class_id: str, topics: Iterable[str] = TOPICS,
+                  last_event_id: Optional[int] = None) -> Subscription:
+        if self.backend is not None:
+            self.backend.start(self)
+        sub = Subscription(class_id, frozenset(topics), self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                if last_event_id > self._last_id or last_event_id < self._evicted.get(class_id, 0):
+                    sub.resync = True
+                else:
+                    sub.backlog = [m for m in self._replay.get(class_id, ())
+                                   if m.id > last_event_id and m.topic in sub.topics]
+            self._subscriptions.setdefault(class_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscriptions.get(sub.class_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscriptions[sub.class_id]
+
+    async def stream(self, class_id: str, topics: Iterable[str] = TOPICS,
+                     last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """SSE body. Subscribes on first iteration and unsubscribes when the client goes away."""
+        sub = self.subscribe(class_id, topics, last_event_id)
+        try:
+            yield b"retry: %d\n\n" % self.retry_ms
+            if sub.resync:
+                yield RESYNC
+            for message in sub.backlog:
+                yield message.encoded
+            sub.backlog = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                yield RESYNC if message is None else message.encoded
+        finally:
+            self.unsubscribe(sub)
+
+    def response(self, class_id: str, topics: Iterable[str] = TOPICS,
+                 last_event_id: Optional[int] = None) -> StreamingResponse:
+        return StreamingResponse(
+            self.stream(class_id, tuple(topics), last_event_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Content-Type-Options": "nosniff"},
+        )
+
+    def clear(self):
+        with self._lock:
+            self._replay.clear()
+            self._evicted.clear()
+
+
+class LiveStreamMiddleware:
+    """Answers GET requests for the stream paths directly; everything else goes to `app`.
+
+    `routes` maps a path to `async (request) -> Response` (the same function
+    the documented FastAPI route calls), HTTPException becomes a JSON error.
+    """
+
+    def __init__(self, app: ASGIApp, routes: dict[str, Callable]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        handler = self.routes.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if handler is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            response = await handler(Request(scope, receive))
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+        await response(scope, receive, send)
+
+
+class DatabaseBackend:
+    """Shares messages between workers through the `live_updates` table."""
+
+    def __init__(self, session_factory: Optional[Callable] = None, poll_interval: float = 0.5,
+                 retention: float = 600.0, batch_size: int = 1000):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def _db(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def publish(self, class_id: str, topic: str, data: bytes):
+        db = self._db()
+        try:
+            db.execute(insert(models.LiveUpdate).values(
+                class_id=class_id, topic=topic, data=data.decode(), created_at=datetime.datetime.utcnow()))
+            db.commit()
+        finally:
+            db.close()
+
+    def start(self, bus: LiveBus):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            db = self._db()
+            try:
+                cursor = IdCursor(db.execute(select(func.max(models.LiveUpdate.id))).scalar() or 0)
+            finally:
+                db.close()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._poll, args=(bus, cursor), name="live-updates", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stopped.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def poll_once(self, bus: LiveBus, cursor: IdCursor):
+        db = self._db()
+        try:
+            rows = db.execute(
+                select(models.LiveUpdate.id, models.LiveUpdate.class_id, models.LiveUpdate.topic, models.LiveUpdate.data)
+                .where(cursor.condition(models.LiveUpdate.id))
+                .order_by(models.LiveUpdate.id)
+                .limit(self.batch_size)
+            ).all()
+        finally:
+            db.close()
+        for message_id, class_id, topic, data in rows:
+            bus.dispatch(LiveMessage(message_id, class_id, topic, _frame(message_id, topic, data.encode())))
+        cursor.advance(row[0] for row in rows)
+
+    def purge(self):
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.retention)
+        db = self._db()
+        try:
+            db.execute(delete(models.LiveUpdate).where(models.LiveUpdate.created_at < cutoff))
+            db.commit()
+        finally:
+            db.close()
+
+    def _poll(self, bus: LiveBus, cursor: IdCursor):
+        next_purge = 0.0
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.poll_once(bus, cursor)
+                next_purge -= self.poll_interval
+                if next_purge <= 0:
+                    self.purge()
+                    next_purge = min(self.retention, 60.0)
+            except Exception:
+                logger.exception("Live update poll failed")
+
+
+def _backend_from_env() -> Optional[DatabaseBackend]:
+    if os.getenv("LIVE_BACKEND", "memory").lower() != "database":
+        return None
+    return DatabaseBackend(
+        poll_interval=float(os.getenv("LIVE_POLL_INTERVAL", "0.5")),
+        retention=float(os.getenv("LIVE_RETENTION", "600")),
+    )
+
+
+live_bus = LiveBus(
+    buffer_size=int(os.getenv("LIVE_BUFFER_SIZE", "64")),
+    replay_size=int(os.getenv("LIVE_REPLAY_SIZE", "256")),
+    heartbeat=float(os.getenv("LIVE_HEARTBEAT", "15")),
+    backend=_backend_from_env(),
+)
@@ -0,0 +1,275 @@
+"""
+Prometheus metrics, served at `/metrics` in the text exposition format.
+
+- classly_http_request_duration_seconds{method,route}: histogram, `route` is
+  the path template (`/api/v1/events/{event_id}`), so ids don't create series
+- classly_http_requests_total{method,route,status}
+- classly_http_requests_in_flight
+- classly_rate_limit_rejections_total{route}: answered with 429
+- classly_db_pool_size / classly_db_pool_connections_in_use
+- classly_sqlite_write_seconds: INSERT/UPDATE/DELETE duration. SQLite waits
+  for the write lock inside the statement (busy timeout), so lock contention
+  shows up in the upper buckets; classly_sqlite_locked_total counts the
+  statements that gave up with "database is locked".
+- classly_cache_requests_total{cache,result}: hit/miss of the in-process caches
+- classly_push_batches_pending, classly_webhook_deliveries_pending
+- classly_ics_renders_total{feed}: ICS documents actually rendered (not cached)
+
+With several workers (`uvicorn --workers N`) every worker writes its values to
+mmap-backed files in PROMETHEUS_MULTIPROC_DIR and `/metrics` sums them up, no
+matter which worker answers the scrape. If only WEB_CONCURRENCY is set, a
+directory per server start (named after the master process) is used.
+
+The values describe the whole instance (traffic per route, pool usage, queue
+depths), so `/metrics` requires `Authorization: Bearer <METRICS_TOKEN>` and
+answers 404 while no token is set.
+"""
+
+import glob
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _multiprocess_dir() -> Optional[str]:
+    # Must be decided before prometheus_client creates its first value
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path and int(os.getenv("WEB_CONCURRENCY", "1") or 1) > 1:
+        path = os.path.join(tempfile.gettempdir(), f"classly-metrics-{os.getppid()}")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    if path:
+        os.makedirs(path, exist_ok=True)
+    return path or None
+
+
+MULTIPROCESS_DIR = _multiprocess_dir()
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from starlette.types import ASGIApp, Message, Receive, Scope, Send  # noqa: E402
+
+from app.core.query_stats import route_template  # noqa: E402
+
+
+# `*_created` samples double the output and nothing here uses them
+disable_created_metrics()
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+
+def metrics_token() -> str:
+    return os.getenv("METRICS_TOKEN", "")
+
+
+REQUEST_DURATION = Histogram(
+    "classly_http_request_duration_seconds", "Time until the response was sent", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter("classly_http_requests", "Handled HTTP requests", ["method", "route", "status"])
+IN_FLIGHT = Gauge("classly_http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum")
+RATE_LIMITED = Counter("classly_rate_limit_rejections", "Requests rejected with 429", ["route"])
+
+POOL_SIZE = Gauge("classly_db_pool_size", "Configured DB pool size", multiprocess_mode="livesum")
+POOL_IN_USE = Gauge("classly_db_pool_connections_in_use", "Checked out DB connections", multiprocess_mode="livesum")
+SQLITE_WRITE = Histogram(
+    "classly_sqlite_write_seconds", "INSERT/UPDATE/DELETE duration, including the wait for the write lock",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SQLITE_LOCKED = Counter("classly_sqlite_locked", "Statements that failed with 'database is locked'")
+
+CACHE_REQUESTS = Counter("classly_cache_requests", "In-process cache lookups", ["cache", "result"])
+PUSH_PENDING = Gauge(
+    "classly_push_batches_pending", "Push batches queued, being sent or waiting for a retry",
+    multiprocess_mode="livesum",
+)
+ICS_RENDERS = Counter("classly_ics_renders", "Rendered ICS documents", ["feed"])
+
+
+def cache_counters(cache: str) -> tuple:
+    """(hit, miss) counters of one cache, bound once so lookups don't resolve labels."""
+    return CACHE_REQUESTS.labels(cache, "hit"), CACHE_REQUESTS.labels(cache, "miss")
+
+
+_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+def _route_label(scope: Scope) -> str:
+    template = route_template(scope)
+    if template is not None:
+        return template
+    if "app_root_path" in scope:  # matched a Mount (static files)
+        return scope.get("root_path", "") + "/{path}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Request count, latency and in-flight requests per route template (pure ASGI)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._children: dict[tuple[str, str], tuple] = {}
+
+    def _observe(self, scope: Scope, status: int, elapsed: float):
+        method = scope["method"]
+        key = (method if method in _METHODS else "other", _route_label(scope))
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (REQUEST_DURATION.labels(*key), {})
+        children[0].observe(elapsed)
+        counter = children[1].get(status)
+        if counter is None:
+            counter = children[1][status] = REQUESTS.labels(*key, str(status))
+        counter.inc()
+        if status == 429:
+            RATE_LIMITED.labels(key[1]).inc()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            self._observe(scope, status, time.perf_counter() - started)
+
+
+# --- database ---
+
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    POOL_IN_USE.inc()
+
+
+def _pool_checkin(dbapi_connection, connection_record):
+    POOL_IN_USE.dec()
+
+
+def _before_write(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        conn.info["write_started"] = time.perf_counter()
+
+
+def _after_write(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("write_started", None)
+    if started is not None:
+        SQLITE_WRITE.observe(time.perf_counter() - started)
+
+
+def _write_failed(exception_context):
+    connection = exception_context.connection
+    if connection is not None:
+        started = connection.info.pop("write_started", None)
+        if started is not None:
+            SQLITE_WRITE.observe(time.perf_counter() - started)
+    if "database is locked" in str(exception_context.original_exception):
+        SQLITE_LOCKED.inc()
+
+
+def instrument(engine):
+    """Pool usage and, for SQLite, write durations of `engine`."""
+    if not metrics_enabled():
+        return
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        POOL_SIZE.inc(size())
+    event.listen(engine, "checkout", _pool_checkout)
+    event.listen(engine, "checkin", _pool_checkin)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "before_cursor_execute", _before_write)
+        event.listen(engine, "after_cursor_execute", _after_write)
+        event.listen(engine, "handle_error", _write_failed)
+
+
+# --- exposition ---
+
+class _WebhookCollector:
+    """Pending webhook deliveries, counted in the shared database at scrape time."""
+
+    def describe(self):
+        # Registering must not query (the models may not even be imported yet)
+        yield GaugeMetricFamily("classly_webhook_deliveries_pending", "Webhook deliveries waiting to be sent")
+
+    def collect(self):
+        from app.core.webhooks import webhooks_enabled
+        if not webhooks_enabled():
+            return
+        from sqlalchemy import func, select
+        from app import models
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            # One count per shard with SHARDS
+            pending = sum(db.execute(
+                select(func.count()).select_from(models.WebhookDelivery)
+                .where(models.WebhookDelivery.status == "pending")
+            ).scalars())
+        except Exception:
+            logger.exception("Counting pending webhook deliveries failed")
+            return
+        finally:
+            db.close()
+        yield GaugeMetricFamily("classly_webhook_deliveries_pending", "Webhook deliveries waiting to be sent",
+                                value=pending)
+
+
+_webhook_collector = _WebhookCollector()
+if MULTIPROCESS_DIR is None:
+    REGISTRY.register(_webhook_collector)
+
+_LIVE_GAUGE_FILE = re.compile(r"gauge_live\w+?_(\d+)\.db$")
+
+
+def _remove_dead_workers():
+    """Drop live gauges (in-flight, pool, push queue) of workers that are gone."""
+    for path in glob.glob(os.path.join(MULTIPROCESS_DIR, "gauge_live*_*.db")):
+        match = _LIVE_GAUGE_FILE.search(path)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid, MULTIPROCESS_DIR)
+        except PermissionError:
+            pass
+
+
+def render() -> tuple[bytes, str]:
+    """Exposition body and content type."""
+    if MULTIPROCESS_DIR is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    _remove_dead_workers()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, MULTIPROCESS_DIR)
+    registry.register(_webhook_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,56 @@
+"""
+Operator credential for instance-wide diagnostics (OPERATOR_TOKEN).
+
+Class owners and admins manage their own class only; whoever creates a class
+becomes its owner. Pages that expose the whole instance (query statistics,
+profiles, database backups) therefore require the operator token instead of
+a class role:
+
+- `Authorization: Bearer <OPERATOR_TOKEN>` (curl, scripts), or
+- HTTP Basic auth with the token as password (any user name), so a browser
+  asks for it.
+
+Without OPERATOR_TOKEN these pages answer 404.
+"""
+
+import base64
+import binascii
+import os
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+REALM = "Classly operator"
+
+
+def operator_token() -> str:
+    return os.getenv("OPERATOR_TOKEN", "")
+
+
+def is_operator(authorization: Optional[str], token: Optional[str] = None) -> bool:
+    """True if the Authorization header carries the operator token (Bearer or Basic password)."""
+    token = operator_token() if token is None else token
+    if not token or not authorization:
+        return False
+    scheme, _, credentials = authorization.partition(" ")
+    credentials = credentials.strip()
+    if scheme.lower() == "basic":
+        try:
+            credentials = base64.b64decode(credentials, validate=True).decode().partition(":")[2]
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+    elif scheme.lower() != "bearer":
+        return False
+    return secrets.compare_digest(credentials.encode(), token.encode())
+
+
+def require_operator(authorization: Optional[str] = Header(None)):
+    if not operator_token():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_operator(authorization):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Operator token required",
+            headers={"WWW-Authenticate": f'Basic realm="{REALM}"'},
+        )
@@ -0,0 +1,316 @@
+"""
+Sampling profiler for production requests (PROFILER_ENABLED=true).
+
+A request is profiled when the operator sends the header
+`X-Classly-Profile: <OPERATOR_TOKEN>` (see app/core/operator.py; class
+owners are not operators), or at random for 1 in
+PROFILER_SAMPLE_RATE requests. While it runs, a background thread takes a
+snapshot of its Python stacks every PROFILER_INTERVAL_MS:
+
+- on the event loop thread, the stack above `ProfilerMiddleware` while the
+  request's coroutine is the one running,
+- on threadpool threads (sync routes and dependencies, template rendering,
+  DB calls), the stack of the job whose context belongs to the request,
+- `(await)` when neither runs, i.e. the request waits for the threadpool,
+  a lock or the network.
+
+Samples are wall-clock, so the time a handler spends rendering templates or
+inside sqlite shows up as the frames that called them. Finished profiles go
+into a ring buffer (PROFILER_BUFFER_SIZE) together with status, duration and
+the request's SQL statistics, and can be downloaded by the operator from
+`/admin/profiles` as collapsed stacks (flamegraph.pl, speedscope, inferno) or speedscope JSON.
+
+Nothing runs while no profile is active; at most PROFILER_MAX_ACTIVE
+requests are profiled at the same time.
+"""
+
+import collections
+import contextvars
+import datetime
+import itertools
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.operator import operator_token
+from app.core.query_stats import current as current_queries, route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-classly-profile"
+MAX_STACKS = 5000  # distinct stacks per profile; more are counted as "(truncated)"
+
+AWAIT = "(await)"
+TRUNCATED = "(truncated)"
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, route: str, reason: str, interval: float,
+                 root_frame, loop_thread: int, class_id: Optional[str] = None):
+        self.id = profile_id
+        self.method = method
+        self.route = route
+        self.reason = reason
+        self.interval = interval
+        self.class_id = class_id
+        self.started_at = datetime.datetime.utcnow()
+        self.status = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.samples = 0
+        self.stacks: collections.Counter = collections.Counter()
+        self._root_frame = root_frame
+        self._loop_thread = loop_thread
+        self._started = time.perf_counter()
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.route}"
+
+    def add(self, stack: tuple):
+        self.samples += 1
+        if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+            stack = (TRUNCATED,)
+        self.stacks[stack] += 1
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "started_at": self.started_at,
+            "method": self.method,
+            "route": self.route,
+            "reason": self.reason,
+            "class_id": self.class_id,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 2),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: `frame;frame;frame count` per line."""
+        root = self.name.replace(";", ",")
+        return "".join(
+            f"{';'.join((root,) + stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])
+        )
+
+    def speedscope(self) -> dict:
+        """https://www.speedscope.app/file-format-schema.json ("sampled" profile, weights in ms)."""
+        frames: dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            samples.append([frames.setdefault(name, len(frames)) for name in (self.name,) + stack])
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.name} #{self.id}",
+            "exporter": "classly",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": name} for name in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+_current: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("profile", default=None)
+
+_labels: dict = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        marker = filename.rfind("site-packages" + os.sep)
+        if marker >= 0:
+            filename = filename[marker + len("site-packages") + 1:]
+        elif filename.startswith(os.getcwd() + os.sep):
+            filename = filename[len(os.getcwd()) + 1:]
+        label = _labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def _worker_job_context(frame) -> Optional[contextvars.Context]:
+    # anyio's WorkerThread.run: `context.run(func, *args)` for every threadpool job
+    code = frame.f_code
+    if code.co_name == "run" and "context" in code.co_varnames:
+        context = frame.f_locals.get("context")
+        if isinstance(context, contextvars.Context):
+            return context
+    return None
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, sample_rate: int = 0, interval: float = 0.005,
+                 buffer_size: int = 20, max_active: int = 2):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_active = max_active
+        self._active: list[Profile] = []
+        self._finished: collections.deque = collections.deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() * self.sample_rate < 1
+
+    def start(self, scope: Scope, reason: str, root_frame, class_id: Optional[str] = None) -> Optional[Profile]:
+        with self._lock:
+            if len(self._active) >= self.max_active:
+                return None
+            profile = Profile(next(self._ids), scope["method"], scope["path"], reason, self.interval,
+                              root_frame, threading.get_ident(), class_id)
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def finish(self, profile: Profile, scope: Scope, status: int):
+        profile.duration = time.perf_counter() - profile._started
+        profile.status = status
+        # Template of the matched route instead of the concrete path (which may carry tokens)
+        profile.route = route_template(scope) or "unmatched"
+        profile._root_frame = None
+        queries = current_queries()
+        if queries is not None:
+            profile.queries, profile.db_time = queries.count, queries.total
+        with self._lock:
+            self._active.remove(profile)
+            self._finished.append(profile)
+
+    def profiles(self) -> list[Profile]:
+        """Finished profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._finished))
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._finished if p.id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._finished.clear()
+
+    # --- sampler thread ---
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                active = tuple(self._active)
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._sample(active, own)
+            except Exception:
+                logger.exception("Profiler sample failed")
+            time.sleep(self.interval)
+
+    def _sample(self, active: tuple, own: int):
+        found: dict[Profile, list] = {}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack, profile = [], None
+            while frame is not None:
+                match = next((p for p in active if frame is p._root_frame), None)
+                if match is not None:
+                    if match._loop_thread == thread_id:
+                        profile = match
+                    break
+                context = _worker_job_context(frame)
+                if context is not None:
+                    profile = context.get(_current)
+                    if profile is not None and profile not in active:
+                        profile = None
+                    break
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if profile is not None and stack:
+                found.setdefault(profile, []).append(tuple(reversed(stack)))
+        for profile in active:
+            for stack in found.get(profile, ((AWAIT,),)):
+                profile.add(stack)
+
+
+def _operator_header(scope: Scope) -> bool:
+    """True if the profile header carries the operator token."""
+    token = operator_token()
+    value = Headers(scope=scope).get(PROFILE_HEADER, "")
+    return bool(token) and secrets.compare_digest(value.encode(), token.encode())
+
+
+class ProfilerMiddleware:
+    """Starts a profile for requests that ask for one (operator header) or are sampled."""
+
+    def __init__(self, app: ASGIApp, profiler: Optional[Profiler] = None,
+                 authorize: Callable[[Scope], bool] = _operator_header):
+        self.app = app
+        self.profiler = profiler or profiler_instance
+        self.authorize = authorize
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = None
+        if any(name == PROFILE_HEADER.encode() for name, _ in scope["headers"]):
+            if self.authorize(scope):
+                profile = self.profiler.start(scope, "header", sys._getframe())
+        elif self.profiler.sampled():
+            profile = self.profiler.start(scope, "sample", sys._getframe())
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_profile(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", []).append((b"x-classly-profile-id", str(profile.id).encode()))
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current.reset(token)
+            self.profiler.finish(profile, scope, status)
+
+
+profiler_instance = Profiler(
+    enabled=os.getenv("PROFILER_ENABLED", "false").lower() == "true",
+    sample_rate=int(os.getenv("PROFILER_SAMPLE_RATE", "0")),
+    interval=float(os.getenv("PROFILER_INTERVAL_MS", "5")) / 1000,
+    buffer_size=int(os.getenv("PROFILER_BUFFER_SIZE", "20")),
+    max_active=int(os.getenv("PROFILER_MAX_ACTIVE", "2")),
+)
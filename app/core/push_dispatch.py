@@ -0,0 +1,438 @@
+"""
+Push notification dispatch (FCM HTTP v1 / APNs).
+
+`notify_event(...)` is called by the event write routes and returns at once.
+The work runs on a dedicated asyncio loop in a background thread:
+
+- the class' device tokens are loaded in one query (the author's own devices
+  are skipped) and grouped per provider into batches of PUSH_BATCH_SIZE
+- batches go through a bounded queue (PUSH_QUEUE_SIZE, overflow is dropped
+  and counted) to PUSH_WORKERS workers
+- each worker sends over its own pooled `httpx.AsyncClient` (HTTP/2 when `h2`
+  is installed); PUSH_CONCURRENCY caps the requests in flight across all
+  workers and is split evenly between them
+- throttled/unavailable responses and network errors are retried with
+  exponential backoff (PUSH_RETRY_BASE * 2^attempt, honouring Retry-After)
+  up to PUSH_MAX_RETRIES times
+- tokens the provider reports as unregistered are deleted from `device_tokens`
+
+FCM v1 and APNs take one recipient per request, so a "batch" is a set of
+requests for one provider sent concurrently over a worker's connection pool.
+Provider URLs are configurable (PUSH_FCM_URL, PUSH_APNS_URL), e.g. to point
+at a local mock server. Nothing is sent unless PUSH_ENABLED=true.
+"""
+
+import asyncio
+import concurrent.futures
+import enum
+import logging
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import httpx
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.metrics import PUSH_PENDING
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:  # optional, APNs in production requires HTTP/2
+    HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+
+def push_enabled() -> bool:
+    return os.getenv("PUSH_ENABLED", "false").lower() == "true"
+
+
+class PushMessage(NamedTuple):
+    title: str
+    body: str
+    data: dict
+
+
+class Outcome(enum.Enum):
+    OK = "ok"
+    RETRY = "retry"  # throttled, provider unavailable, network error
+    DEAD = "dead"  # token unregistered/invalid -> prune
+    FAILED = "failed"  # rejected for another reason, not retried
+
+
+def _error_text(response: httpx.Response) -> str:
+    try:
+        return response.text
+    except Exception:
+        return ""
+
+
+class PushProvider(ABC):
+    name = ""
+
+    def __init__(self, url: str, auth_token: Optional[str] = None):
+        self.url = url
+        self.auth_token = auth_token
+
+    @abstractmethod
+    def request(self, token: str, message: PushMessage) -> tuple[str, dict, dict]:
+        """(url, headers, json body) for one device."""
+
+    @abstractmethod
+    def classify(self, response: httpx.Response) -> Outcome:
+        pass
+
+    @staticmethod
+    def _transient(status: int) -> bool:
+        return status == 429 or status >= 500
+
+
+class FcmProvider(PushProvider):
+    name = "fcm"
+
+    def request(self, token, message):
+        headers = {"Authorization": f"Bearer {self.auth_token}"} if self.auth_token else {}
+        body = {"message": {
+            "token": token,
+            "notification": {"title": message.title, "body": message.body},
+            "data": {key: str(value) for key, value in message.data.items()},
+        }}
+        return self.url, headers, body
+
+    def classify(self, response):
+        if response.status_code == 200:
+            return Outcome.OK
+        if self._transient(response.status_code):
+            return Outcome.RETRY
+        if response.status_code == 404 or "UNREGISTERED" in _error_text(response):
+            return Outcome.DEAD
+        return Outcome.FAILED
+
+
+class ApnsProvider(PushProvider):
+    name = "apns"
+    _DEAD_REASONS = ("BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic")
+
+    def __init__(self, url: str, auth_token: Optional[str] = None, topic: Optional[str] = None):
+        super().__init__(url.rstrip("/"), auth_token)
+        self.topic = topic
+
+    def request(self, token, message):
+        headers = {"apns-push-type": "alert", "apns-priority": "10"}
+        if self.auth_token:
+            headers["authorization"] = f"bearer {self.auth_token}"
+        if self.topic:
+            headers["apns-topic"] = self.topic
+        body = {"aps": {"alert": {"title": message.title, "body": message.body}}, **message.data}
+        return f"{self.url}/3/device/{token}", headers, body
+
+    def classify(self, response):
+        if response.status_code == 200:
+            return Outcome.OK
+        if self._transient(response.status_code):
+            return Outcome.RETRY
+        if response.status_code == 410 or any(reason in _error_text(response) for reason in self._DEAD_REASONS):
+            return Outcome.DEAD
+        return Outcome.FAILED
+
+
+class _Batch(NamedTuple):
+    provider: PushProvider
+    tokens: list[str]
+    message: PushMessage
+    attempt: int = 0
+
+
+def load_class_tokens(db: Session, class_id: str, exclude_user_id: Optional[str] = None) -> list[tuple[str, str]]:
+    """(device_token, platform) of all members of a class."""
+    stmt = (
+        select(models.DeviceToken.device_token, models.DeviceToken.platform)
+        .join(models.User, models.User.id == models.DeviceToken.user_id)
+        .where(models.User.class_id == class_id)
+        .distinct()
+    )
+    if exclude_user_id:
+        stmt = stmt.where(models.DeviceToken.user_id != exclude_user_id)
+    return [tuple(row) for row in db.execute(stmt)]
+
+
+def prune_tokens(db: Session, tokens: Iterable[str]) -> int:
+    result = db.execute(delete(models.DeviceToken).where(models.DeviceToken.device_token.in_(list(tokens))))
+    db.commit()
+    return result.rowcount
+
+
+class PushDispatcher:
+    def __init__(
+        self,
+        providers: dict[str, PushProvider],
+        session_factory: Optional[Callable[[], Session]] = None,
+        workers: int = 4,
+        concurrency: int = 50,
+        batch_size: int = 100,
+        queue_size: int = 1000,
+        max_retries: int = 3,
+        retry_base: float = 0.5,
+        timeout: float = 10.0,
+    ):
+        self.providers = providers
+        self.workers = workers
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.timeout = timeout
+        self.stats: Counter = Counter()
+        self._session_factory = session_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # --- lifecycle (any thread) ---
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="push-dispatch", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain outstanding work, close the client and stop the loop thread."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self.drain(timeout)
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+            self._loop = None
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Block until every queued batch (including scheduled retries) is done."""
+        if self._loop is None:
+            return True
+        try:
+            asyncio.run_coroutine_threadsafe(self._idle.wait(), self._loop).result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            return False
+
+    # --- producers (any thread) ---
+
+    def notify_class(self, class_id: str, message: PushMessage, exclude_user_id: Optional[str] = None):
+        """Fan a message out to every device of a class (returns immediately)."""
+        self.start()
+        self._loop.call_soon_threadsafe(self._begin)
+        asyncio.run_coroutine_threadsafe(self._fan_out_class(class_id, message, exclude_user_id), self._loop)
+
+    def send(self, tokens: Iterable[tuple[str, str]], message: PushMessage):
+        """Fan a message out to explicit (device_token, platform) pairs."""
+        self.start()
+        tokens = list(tokens)
+        self._loop.call_soon_threadsafe(self._fan_out, tokens, message)
+
+    # --- loop thread ---
+
+    def _run(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        per_worker = max(1, self.concurrency // self.workers)
+        self._clients = [
+            httpx.AsyncClient(
+                http2=HTTP2,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=per_worker, max_keepalive_connections=per_worker),
+            )
+            for _ in range(self.workers)
+        ]
+        self._tasks = [loop.create_task(self._worker(client, per_worker)) for client in self._clients]
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for client in self._clients:
+            await client.aclose()
+
+    def _begin(self):
+        self._pending += 1
+        PUSH_PENDING.inc()
+        self._idle.clear()
+
+    def _done(self):
+        self._pending -= 1
+        PUSH_PENDING.dec()
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    def _db(self) -> Session:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _load_tokens(self, class_id: str, exclude_user_id: Optional[str]) -> list[tuple[str, str]]:
+        db = self._db()
+        try:
+            return load_class_tokens(db, class_id, exclude_user_id)
+        finally:
+            db.close()
+
+    def _prune(self, tokens: list[str]) -> int:
+        db = self._db()
+        try:
+            return prune_tokens(db, tokens)
+        finally:
+            db.close()
+
+    async def _fan_out_class(self, class_id: str, message: PushMessage, exclude_user_id: Optional[str]):
+        try:
+            tokens = await asyncio.to_thread(self._load_tokens, class_id, exclude_user_id)
+            self._fan_out(tokens, message)
+        except Exception:
+            logger.exception("Loading device tokens for class %s failed", class_id)
+        finally:
+            self._done()
+
+    def _fan_out(self, tokens: list[tuple[str, str]], message: PushMessage):
+        by_platform: dict[str, list[str]] = {}
+        for token, platform in tokens:
+            by_platform.setdefault(platform, []).append(token)
+        for platform, platform_tokens in by_platform.items():
+            provider = self.providers.get(platform)
+            if provider is None:
+                self.stats["unsupported"] += len(platform_tokens)
+                continue
+            for i in range(0, len(platform_tokens), self.batch_size):
+                self._begin()
+                self._enqueue(_Batch(provider, platform_tokens[i:i + self.batch_size], message))
+
+    def _enqueue(self, batch: _Batch):
+        """Put a batch on the queue; the caller has already counted it as pending."""
+        try:
+            self._queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += len(batch.tokens)
+            logger.warning("Push queue full, dropped %d %s notifications", len(batch.tokens), batch.provider.name)
+            self._done()
+
+    async def _worker(self, client: httpx.AsyncClient, concurrency: int):
+        # One small pool per worker: httpcore scans every connection for every
+        # queued request, so a single large pool gets slower per request as it grows
+        semaphore = asyncio.Semaphore(concurrency)
+        while True:
+            batch = await self._queue.get()
+            try:
+                await self._send_batch(batch, client, semaphore)
+            except Exception:
+                logger.exception("Push batch to %s failed", batch.provider.name)
+            finally:
+                self._queue.task_done()
+                self._done()
+
+    async def _send_one(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                        provider: PushProvider, token: str, message: PushMessage) -> tuple[Outcome, float]:
+        url, headers, body = provider.request(token, message)
+        async with semaphore:
+            try:
+                response = await client.post(url, headers=headers, json=body)
+            except httpx.HTTPError:
+                return Outcome.RETRY, 0.0
+        outcome = provider.classify(response)
+        retry_after = 0.0
+        if outcome is Outcome.RETRY:
+            try:
+                retry_after = float(response.headers.get("retry-after", 0))
+            except ValueError:
+                pass
+        return outcome, retry_after
+
+    async def _send_batch(self, batch: _Batch, client: httpx.AsyncClient, semaphore: asyncio.Semaphore):
+        results = await asyncio.gather(*(
+            self._send_one(client, semaphore, batch.provider, token, batch.message) for token in batch.tokens
+        ))
+
+        retry, dead, retry_after = [], [], 0.0
+        for token, (outcome, wait) in zip(batch.tokens, results):
+            self.stats[outcome.value] += 1
+            if outcome is Outcome.RETRY:
+                retry.append(token)
+                retry_after = max(retry_after, wait)
+            elif outcome is Outcome.DEAD:
+                dead.append(token)
+
+        if dead:
+            pruned = await asyncio.to_thread(self._prune, dead)
+            self.stats["pruned"] += pruned
+
+        if retry:
+            if batch.attempt >= self.max_retries:
+                self.stats["gave_up"] += len(retry)
+                return
+            delay = max(retry_after, self.retry_base * 2 ** batch.attempt * random.uniform(1.0, 1.25))
+            self._begin()
+            self._loop.call_later(delay, self._enqueue, batch._replace(tokens=retry, attempt=batch.attempt + 1))
+
+
+def event_message(event, action: str) -> PushMessage:
+    """Notification for a created/updated event (German, like the calendar feeds)."""
+    event_type = getattr(event.type, "value", event.type)
+    prefix = "Neu" if action == "created" else "Geändert"
+    subject = event.subject_name or event.title or "Eintrag"
+    date = event.date.strftime("%d.%m.%Y") if event.date else ""
+    body = " · ".join(part for part in (event.title if event.subject_name else None, date) if part)
+    return PushMessage(
+        title=f"{prefix}: {event_type} {subject}",
+        body=body,
+        data={"event_id": event.id, "class_id": event.class_id, "action": action},
+    )
+
+
+def notify_event(class_id: str, event, action: str, author_id: Optional[str] = None):
+    """Push an event create/update to the class (no-op unless PUSH_ENABLED)."""
+    if not push_enabled() or event is None:
+        return
+    push_dispatcher.notify_class(class_id, event_message(event, action), exclude_user_id=author_id)
+
+
+push_dispatcher = PushDispatcher(
+    providers={
+        "fcm": FcmProvider(
+            os.getenv("PUSH_FCM_URL", "https://fcm.googleapis.com/v1/projects/%s/messages:send" % os.getenv("PUSH_FCM_PROJECT", "")),
+            os.getenv("PUSH_FCM_TOKEN") or None,
+        ),
+        "apns": ApnsProvider(
+            os.getenv("PUSH_APNS_URL", "https://api.push.apple.com"),
+            os.getenv("PUSH_APNS_TOKEN") or None,
+            os.getenv("PUSH_APNS_TOPIC") or None,
+        ),
+    },
+    workers=int(os.getenv("PUSH_WORKERS", "4")),
+    concurrency=int(os.getenv("PUSH_CONCURRENCY", "50")),
+    batch_size=int(os.getenv("PUSH_BATCH_SIZE", "100")),
+    queue_size=int(os.getenv("PUSH_QUEUE_SIZE", "1000")),
+    max_retries=int(os.getenv("PUSH_MAX_RETRIES", "3")),
+    retry_base=float(os.getenv("PUSH_RETRY_BASE", "0.5")),
+)
@@ -0,0 +1,236 @@
+"""
+Per-request SQL statistics.
+
+`query_stats.instrument(engine)` (called in app/database.py) hooks
+`before_cursor_execute`/`after_cursor_execute`. While a request is handled,
+every statement adds to the request's `RequestQueries`: number of statements,
+total DB time and the slowest statement. `QueryStatsMiddleware` opens the
+collector per request; it lives in a context variable, which FastAPI copies
+into the threadpool that runs sync routes and dependencies.
+
+Per request:
+- QUERY_SERVER_TIMING=true adds `Server-Timing: db;dur=<ms>;desc="<n> queries"`
+  (shown by the browser dev tools next to the request). Statements that run
+  after the response headers (streamed bodies, background tasks) are only in
+  the log line and the totals.
+- One JSON log line on `app.core.query_stats`: DEBUG for every request,
+  WARNING when it reaches QUERY_LOG_MIN_QUERIES statements or
+  QUERY_LOG_MIN_DB_MS milliseconds - an N+1 loop shows up as a high count.
+
+Per route template (`GET /api/events`, not the concrete URL) the worker
+keeps running totals; `query_stats.top(n)` lists the routes with the most DB
+time, served at `/admin/debug/queries` with QUERY_STATS_ENDPOINT=true.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.fastjson import dumps
+
+logger = logging.getLogger(__name__)
+
+SQL_PREVIEW_LENGTH = 500
+
+
+class RequestQueries:
+    """Statements of one request. Times in seconds."""
+
+    __slots__ = ("count", "total", "slowest", "slowest_sql")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql: Optional[str] = None
+
+    def add(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_sql = statement
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total * 1000:.2f};desc="{self.count} queries"'
+
+
+_current: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def current() -> Optional[RequestQueries]:
+    """Collector of the request being handled, None outside of requests."""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    queries = _current.get()
+    if queries is not None and started is not None:
+        queries.add(statement, time.perf_counter() - started)
+
+
+def _preview(statement: Optional[str]) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= SQL_PREVIEW_LENGTH else statement[:SQL_PREVIEW_LENGTH] + "..."
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """Full path template of the matched route (`/api/v1/events/{event_id}`), None if none matched.
+
+    Routes of included routers only know their own part of the path
+    (`/events/{event_id}`), so the prefix is taken from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if template is None or regex is None:
+        return template
+    path = scope["path"]
+    start = 0
+    while start >= 0:
+        if regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+
+class _RouteTotals:
+    __slots__ = ("requests", "queries", "total", "max_queries", "slowest", "slowest_sql")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.total = 0.0
+        self.max_queries = 0
+        self.slowest = 0.0
+        self.slowest_sql: Optional[str] = None
+
+
+class QueryStats:
+    def __init__(self, enabled: bool = True, server_timing: bool = False,
+                 log_min_queries: int = 50, log_min_db_ms: float = 500.0):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self.log_min_queries = log_min_queries
+        self.log_min_db_ms = log_min_db_ms
+        self._routes: dict[str, _RouteTotals] = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, engine):
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def finish(self, scope: Scope, status: int, queries: RequestQueries):
+        """Add a finished request to the route totals and log it."""
+        route = route_template(scope)
+        if route is not None:
+            key = f'{scope["method"]} {route}'
+            with self._lock:
+                totals = self._routes.get(key)
+                if totals is None:
+                    totals = self._routes[key] = _RouteTotals()
+                totals.requests += 1
+                totals.queries += queries.count
+                totals.total += queries.total
+                totals.max_queries = max(totals.max_queries, queries.count)
+                if queries.slowest > totals.slowest:
+                    totals.slowest = queries.slowest
+                    totals.slowest_sql = queries.slowest_sql
+
+        slow = queries.count >= self.log_min_queries or queries.total * 1000 >= self.log_min_db_ms
+        level = logging.WARNING if slow else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, dumps({
+                "event": "request_queries",
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "queries": queries.count,
+                "db_ms": round(queries.total * 1000, 2),
+                "slowest_ms": round(queries.slowest * 1000, 2),
+                "slowest_sql": _preview(queries.slowest_sql),
+            }).decode())
+
+    def top(self, limit: int = 20) -> list[dict]:
+        """Routes with the most DB time since start (or `reset()`), this worker only."""
+        with self._lock:
+            items = sorted(self._routes.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+            return [
+                {
+                    "route": key,
+                    "requests": t.requests,
+                    "queries": t.queries,
+                    "queries_per_request": round(t.queries / t.requests, 2),
+                    "max_queries": t.max_queries,
+                    "db_ms": round(t.total * 1000, 2),
+                    "db_ms_per_request": round(t.total * 1000 / t.requests, 2),
+                    "slowest_ms": round(t.slowest * 1000, 2),
+                    "slowest_sql": _preview(t.slowest_sql),
+                }
+                for key, t in items
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+class QueryStatsMiddleware:
+    """Opens a `RequestQueries` per HTTP request (pure ASGI, no extra task per request)."""
+
+    def __init__(self, app: ASGIApp, stats: Optional[QueryStats] = None):
+        self.app = app
+        self.stats = stats or query_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.stats.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        status = 0
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.stats.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", queries.server_timing())
+            await send(message)
+
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.stats.finish(scope, status, queries)
+
+
+query_stats = QueryStats(
+    enabled=os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true",
+    server_timing=os.getenv("QUERY_SERVER_TIMING", "false").lower() == "true",
+    log_min_queries=int(os.getenv("QUERY_LOG_MIN_QUERIES", "50")),
+    log_min_db_ms=float(os.getenv("QUERY_LOG_MIN_DB_MS", "500")),
+)
+
+
+def endpoint_enabled() -> bool:
+    return os.getenv("QUERY_STATS_ENDPOINT", "false").lower() == "true"
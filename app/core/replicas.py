@@ -0,0 +1,205 @@
+"""
+Read replicas for the SQL repository (DATABASE_REPLICA_URLS).
+
+Sessions from `SessionLocal` are `RoutingSession`s when replicas are
+configured. Everything goes to the primary, except SELECTs issued inside
+`replica_reads(session)`; `SqlAlchemyRepository` wraps its get/list/count
+methods in it. Such a read goes to a replica unless
+
+- the session already wrote (flush, bulk UPDATE/DELETE): read-your-writes
+  for the rest of the request,
+- the browser wrote within the last DB_REPLICA_STICKY_SECONDS: after a write,
+  `ReplicaStickinessMiddleware` sets a short-lived cookie, so the redirect
+  after a form POST still sees the new row,
+- no replica is usable: replicas are checked at most every
+  DB_REPLICA_CHECK_INTERVAL seconds; one that fails the check or lags more
+  than DB_REPLICA_MAX_LAG seconds (PostgreSQL: replay delay) is skipped.
+
+Lazy loads of objects a replica returned go to the primary, they are newer
+or equal. API clients without cookies only get the per-request guarantee.
+
+Code that fills a cache shared beyond the request (schedule index, rendered
+fragments) reads inside `primary_reads(session)`: the write that invalidated
+the cache may not have reached the replica yet, and its old rows would be
+stored under the new version.
+"""
+
+import contextlib
+import contextvars
+import itertools
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import Select, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cookies import cookie_secure
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "classly_primary"
+
+_READS = "replica_reads"
+_WROTE = "replica_wrote"
+_PRIMARY = "replica_primary"
+
+# Per HTTP request: {"primary": cookie says read from the primary, "wrote": a session wrote}
+_request: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("replica_request", default=None)
+
+
+def replica_lag(engine: Engine) -> float:
+    """Seconds `engine` is behind its primary; 0.0 where the database can't tell (e.g. SQLite copies)."""
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # An idle primary sends no WAL: caught up means no lag, however old the last replayed commit
+            lag = conn.execute(text(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )).scalar()
+            return float(lag or 0)
+        conn.execute(text("SELECT 1"))
+        return 0.0
+
+
+class ReplicaRouter:
+    def __init__(self, replicas: list, max_lag: float = 5.0, check_interval: float = 1.0,
+                 lag: Callable[[Engine], Optional[float]] = replica_lag):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = lag
+        self._checks: dict = {}  # engine -> (checked at, usable)
+        self._next = itertools.count()
+
+    def usable(self, engine: Engine) -> bool:
+        now = time.monotonic()
+        checked = self._checks.get(engine)
+        if checked is not None and now - checked[0] < self.check_interval:
+            return checked[1]
+        try:
+            lag = self.lag(engine)
+        except Exception as exc:
+            usable, reason = False, f"check failed: {exc}"
+        else:
+            usable, reason = lag is None or lag <= self.max_lag, f"{lag:.1f}s behind" if lag else ""
+        if checked is not None and checked[1] != usable:
+            if usable:
+                logger.info("Read replica %s is back", engine.url.render_as_string())
+            else:
+                logger.warning("Read replica %s skipped (%s)", engine.url.render_as_string(), reason)
+        self._checks[engine] = (now, usable)
+        return usable
+
+    def choose(self) -> Optional[Engine]:
+        """Next usable replica (round robin), None to read from the primary."""
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            engine = self.replicas[(start + offset) % len(self.replicas)]
+            if self.usable(engine):
+                return engine
+        return None
+
+
+class RoutingSession(Session):
+    """Session that sends `replica_reads` SELECTs to `router`'s replicas, everything else to its bind."""
+
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def reads_from_primary(self) -> bool:
+        state = _request.get()
+        return (self.info.get(_WROTE, False) or self.info.get(_PRIMARY, 0) > 0
+                or (state is not None and state["primary"]))
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (self.router is not None and self.info.get(_READS) and not self._flushing
+                and isinstance(clause, Select) and not self.reads_from_primary()):
+            replica = self.router.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+def _wrote(session: Session):
+    session.info[_WROTE] = True
+    state = _request.get()
+    if state is not None:
+        state["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    _wrote(session)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _wrote(orm_execute_state.session)
+
+
+@contextlib.contextmanager
+def replica_reads(session: Session):
+    """SELECTs of `session` inside this block may go to a replica (no-op for plain sessions)."""
+    session.info[_READS] = session.info.get(_READS, 0) + 1
+    try:
+        yield
+    finally:
+        session.info[_READS] -= 1
+
+
+@contextlib.contextmanager
+def primary_reads(session: Session):
+    """SELECTs of `session` inside this block go to the primary, even from `replica_reads` methods."""
+    session.info[_PRIMARY] = session.info.get(_PRIMARY, 0) + 1
+    try:
+        yield
+    finally:
+        session.info[_PRIMARY] -= 1
+
+
+class ReplicaStickinessMiddleware:
+    """Reads from the primary for DB_REPLICA_STICKY_SECONDS after a request of the same browser wrote."""
+
+    def __init__(self, app: ASGIApp, sticky_seconds: float = 5.0):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookies = cookie_parser(Headers(scope=scope).get("cookie", ""))
+        state = {"primary": STICKY_COOKIE in cookies, "wrote": False}
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and state["wrote"]:
+                secure = "; Secure" if cookie_secure() else ""
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{STICKY_COOKIE}=1; Max-Age={max(1, round(self.sticky_seconds))}; Path=/; HttpOnly; SameSite=Lax{secure}",
+                )
+            await send(message)
+
+        token = _request.set(state)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request.reset(token)
+
+
+def replica_urls() -> list:
+    return [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+def sticky_seconds() -> float:
+    return float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
@@ -0,0 +1,257 @@
+"""
+Compiled weekly schedule per class.
+
+A class' timetable only changes when an admin edits slots or settings, but the
+widget endpoint (`/timetable/next`) is polled constantly. `WeeklySchedule`
+turns the slots plus `TimetableSettings` into one sorted tuple of entries with
+start/end minutes already computed, so "next lesson" is a binary search over
+minute-of-week keys instead of a query per weekday.
+
+`schedule_index.get(db, class_id)` builds on first use and caches the result;
+every slot/settings/holiday write calls `schedule_index.invalidate(class_id)`.
+`schedule_index.selected(db, class_id, user_id)` adds the personal view: the
+set of slots a user picked, loaded with one LEFT JOIN and cached per
+(class, user) until the user (de)selects a slot or the class index changes.
+
+The caches live in process memory. The singleton forwards invalidations to
+the other workers through `invalidation_bus`; TIMETABLE_INDEX_TTL stays as
+the upper bound if the bus is off. Both are loaded from the primary, never
+from a read replica that may not have the invalidating write yet.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Container, Hashable, NamedTuple, Optional, Sequence
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.invalidation import InvalidationBus, invalidation_bus
+from app.core.metrics import cache_counters
+from app.core.replicas import primary_reads
+from app.repository.rows import HolidayRow, SlotRow
+from app.repository.sql import SqlAlchemyRepository
+
+MINUTES_PER_DAY = 24 * 60
+WEEKDAY_NAMES = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
+
+_SETTINGS_COLUMNS = (
+    models.TimetableSettings.slot_duration,
+    models.TimetableSettings.break_duration,
+    models.TimetableSettings.day_start_hour,
+    models.TimetableSettings.day_start_minute,
+    models.TimetableSettings.day_end_hour,
+    models.TimetableSettings.day_end_minute,
+)
+
+_HOLIDAY_COLUMNS = tuple(getattr(models.TimetableHoliday, name) for name in HolidayRow._fields)
+
+
+def slot_minutes(day_start: int, slot_duration: int, break_duration: int, slot_number: int) -> tuple[int, int]:
+    """Start/end of a slot in minutes after midnight."""
+    start = day_start + (slot_number - 1) * (slot_duration + break_duration)
+    return start, start + slot_duration
+
+
+def format_minutes(minutes: int) -> str:
+    return "%02d:%02d" % divmod(minutes, 60)
+
+
+class ScheduleEntry(NamedTuple):
+    weekday: int
+    start_minute: Optional[int]
+    end_minute: Optional[int]
+    slot_id: str
+    start_time: str  # "HH:MM", "" without settings
+    end_time: str
+    slot: SlotRow
+
+
+class WeeklySchedule:
+    """Immutable, sorted view of one class' timetable."""
+
+    __slots__ = ("entries", "settings", "holidays", "_keys")
+
+    def __init__(self, slots: list[SlotRow], settings: Optional[dict] = None, holidays: Sequence[HolidayRow] = ()):
+        """`settings`: the TimetableSettings columns as a dict, or None if the class has none."""
+        self.settings = settings
+        self.holidays: tuple[HolidayRow, ...] = tuple(sorted(holidays, key=lambda h: h.start_date))
+        timing = None
+        if settings is not None:
+            timing = (settings["day_start_hour"] * 60 + settings["day_start_minute"],
+                      settings["slot_duration"], settings["break_duration"])
+        entries = []
+        for slot in slots:
+            if timing is not None:
+                start, end = slot_minutes(*timing, slot.slot_number)
+                entries.append(ScheduleEntry(slot.weekday, start, end, slot.id,
+                                             format_minutes(start), format_minutes(end), slot))
+            else:
+                entries.append(ScheduleEntry(slot.weekday, None, None, slot.id, "", "", slot))
+        entries.sort(key=lambda e: (e.weekday, e.slot.slot_number))
+        self.entries: tuple[ScheduleEntry, ...] = tuple(entries)
+        # Minute-of-week start keys, parallel to entries (sorted: slots never overlap within a day)
+        self._keys = [e.weekday * MINUTES_PER_DAY + e.start_minute for e in entries] if timing is not None else []
+
+    @property
+    def has_settings(self) -> bool:
+        return self.settings is not None
+
+    def next_lesson(self, selected: Container[str], weekday: int, minute: int) -> Optional[tuple[ScheduleEntry, int]]:
+        """
+        First selected entry starting strictly after (weekday, minute), wrapping
+        into next week up to (not including) the current weekday.
+        Returns (entry, day_offset) or None.
+        """
+        if not self.has_settings:
+            return None
+
+        entries = self.entries
+        pos = bisect_right(self._keys, weekday * MINUTES_PER_DAY + minute)
+        for entry in entries[pos:]:
+            if entry.slot_id in selected:
+                return entry, entry.weekday - weekday
+        for entry in entries[:pos]:
+            if entry.weekday >= weekday:
+                break
+            if entry.slot_id in selected:
+                return entry, (entry.weekday - weekday) % 7
+        return None
+
+
+def build_schedule(db: Session, class_id: str) -> WeeklySchedule:
+    with primary_reads(db):
+        settings = db.execute(
+            select(*_SETTINGS_COLUMNS).where(models.TimetableSettings.class_id == class_id)
+        ).first()
+        holidays = db.execute(
+            select(*_HOLIDAY_COLUMNS).where(models.TimetableHoliday.class_id == class_id)
+        ).all()
+        slots = SqlAlchemyRepository(db).list_slot_rows(class_id)
+    return WeeklySchedule(
+        slots,
+        settings._asdict() if settings is not None else None,
+        [HolidayRow._make(row) for row in holidays],
+    )
+
+
+def load_selected(db: Session, class_id: str, user_id: str) -> frozenset:
+    """Ids of the class' slots the user selected (slots LEFT JOIN selections, one query)."""
+    selection = models.UserTimetableSelection
+    with primary_reads(db):
+        rows = db.execute(
+            select(models.TimetableSlot.id, selection.id.is_not(None))
+            .outerjoin(selection, and_(selection.slot_id == models.TimetableSlot.id, selection.user_id == user_id))
+            .where(models.TimetableSlot.class_id == class_id)
+        ).all()
+    return frozenset(slot_id for slot_id, is_selected in rows if is_selected)
+
+
+_SCHEDULE_HIT, _SCHEDULE_MISS = cache_counters("timetable_schedule")
+_SELECTION_HIT, _SELECTION_MISS = cache_counters("timetable_selection")
+
+
+class ScheduleIndex:
+    def __init__(self, ttl: float = 60.0, max_selections: int = 4096, bus: Optional[InvalidationBus] = None):
+        self.ttl = ttl
+        self.max_selections = max_selections
+        self.bus = bus
+        self._schedules: dict[str, tuple[float, int, WeeklySchedule]] = {}
+        self._selected: "OrderedDict[tuple[str, str], tuple[float, int, int, frozenset]]" = OrderedDict()
+        # Bumped by invalidate(); keys are class ids and (class id, user id) pairs
+        self._versions: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        if bus is not None:
+            bus.register("schedule", self._drop_class, self.clear)
+            bus.register("schedule_user", lambda key: self._drop_user(*key.split(":", 1)), self.clear)
+
+    def invalidate(self, class_id: str):
+        """Slots or settings of a class changed (drops all personal views of the class too)."""
+        self._drop_class(class_id)
+        if self.bus is not None:
+            self.bus.publish("schedule", class_id)
+
+    def invalidate_user(self, class_id: str, user_id: str):
+        """A user selected or deselected a slot."""
+        self._drop_user(class_id, user_id)
+        if self.bus is not None:
+            self.bus.publish("schedule_user", f"{class_id}:{user_id}")
+
+    def _drop_class(self, class_id: str):
+        with self._lock:
+            self._versions[class_id] = self._versions.get(class_id, 0) + 1
+            self._schedules.pop(class_id, None)
+
+    def _drop_user(self, class_id: str, user_id: str):
+        key = (class_id, user_id)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._selected.pop(key, None)
+
+    def _synced(self) -> bool:
+        return self.bus is None or self.bus.sync()
+
+    def clear(self):
+        with self._lock:
+            self._schedules.clear()
+            self._selected.clear()
+            self._versions.clear()
+
+    def _fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl <= 0 or now - stored_at < self.ttl
+
+    def get(self, db: Session, class_id: str) -> WeeklySchedule:
+        if not self._synced():
+            return build_schedule(db, class_id)
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions.get(class_id, 0)
+            cached = self._schedules.get(class_id)
+            if cached is not None and cached[1] == version and self._fresh(cached[0], now):
+                _SCHEDULE_HIT.inc()
+                return cached[2]
+
+        _SCHEDULE_MISS.inc()
+        schedule = build_schedule(db, class_id)
+
+        with self._lock:
+            # Don't store an index that a concurrent write already invalidated
+            if self._versions.get(class_id, 0) == version:
+                self._schedules[class_id] = (now, version, schedule)
+        return schedule
+
+    def selected(self, db: Session, class_id: str, user_id: str) -> frozenset:
+        if self.max_selections <= 0 or not self._synced():
+            return load_selected(db, class_id, user_id)
+
+        key = (class_id, user_id)
+        now = time.monotonic()
+        with self._lock:
+            versions = (self._versions.get(class_id, 0), self._versions.get(key, 0))
+            cached = self._selected.get(key)
+            if cached is not None and cached[1:3] == versions and self._fresh(cached[0], now):
+                self._selected.move_to_end(key)
+                _SELECTION_HIT.inc()
+                return cached[3]
+
+        _SELECTION_MISS.inc()
+        selected = load_selected(db, class_id, user_id)
+
+        with self._lock:
+            if (self._versions.get(class_id, 0), self._versions.get(key, 0)) == versions:
+                self._selected[key] = (now, *versions, selected)
+                self._selected.move_to_end(key)
+                while len(self._selected) > self.max_selections:
+                    self._selected.popitem(last=False)
+        return selected
+
+
+schedule_index = ScheduleIndex(
+    ttl=float(os.getenv("TIMETABLE_INDEX_TTL", "60")),
+    max_selections=int(os.getenv("TIMETABLE_SELECTION_CACHE_SIZE", "4096")),
+    bus=invalidation_bus,
+)
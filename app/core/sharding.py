@@ -0,0 +1,618 @@
+"""
+Optional sharding of classes across databases (SHARDS=name=url,...).
+
+Every shard is a complete Classly database (SQLite file or PostgreSQL
+database/schema) holding the classes routed to it. DATABASE_URL becomes the
+directory:
+
+- `class_shards`: the routing table, class_id -> shard (+ state while a
+  class is being moved),
+- `shard_directory`: cross-class lookups (session token, join token, API
+  key, ...) -> class_id. Filled on first use by asking every shard, so it
+  needs no bookkeeping on writes; keys are random tokens, except e-mail
+  addresses, whose entries are re-checked,
+- the tables that are not class data (`GLOBAL_TABLES`: live updates, cache
+  invalidations, OAuth clients).
+
+`ShardSession` routes every statement: global tables to the directory,
+statements filtering on a class_id or a directory key to that class' shard,
+everything else to the shard the session is pinned to (`get_db` and
+`get_repository` pin to the class of the request's session cookie or API
+key) or, unpinned, to all shards (results are concatenated). New rows go to
+the shard of their class_id, or of their parent row.
+
+Moving a class (`move_class`, CLI below) is online: reads keep working,
+writes to that class fail with `ClassMovingError` (503, Retry-After) while
+its rows are copied, other classes are not affected:
+
+1. mark the class `moving`; every flush re-reads the routing row (after
+   locking the class row on PostgreSQL; SQLite's write lock does the same)
+   and rolls back if the class is moving or routed elsewhere,
+2. barrier: lock the class row on the source once, so transactions that
+   started writing before step 1 have committed,
+3. copy with the per-class backup export/restore (app/core/class_backup.py)
+   plus pending webhook deliveries, then route the class to the target,
+4. after SHARD_CACHE_SECONDS (workers may still read the old route) delete
+   the class from the source.
+
+    python -m app.core.sharding status
+    python -m app.core.sharding init                 # route existing classes
+    python -m app.core.sharding move <class_id> <shard>
+"""
+
+import collections
+import datetime
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, String, delete, func, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BindParameter
+
+from app import crud, models
+from app.core import class_backup
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = "directory"
+ACTIVE = "active"
+MOVING = "moving"
+
+GLOBAL_TABLES = frozenset({
+    "live_updates", "cache_invalidations", "oauth_clients", "oauth_client_redirect_uris",
+})
+
+# kind -> (table, key column, class column); the directory keys of `shard_directory`
+LOOKUPS = {
+    "session": ("users", "session_token", "class_id"),
+    "email": ("users", "email", "class_id"),
+    "caldav": ("users", "caldav_token", "class_id"),
+    "join": ("classes", "join_token", "id"),
+    "timetable": ("classes", "timetable_public_token", "id"),
+    "api_key": ("integration_tokens", "token_hash", "class_id"),
+    "api_token": ("integration_tokens", "token", "class_id"),
+    "login": ("login_tokens", "token", "class_id"),
+}
+_LOOKUP_COLUMNS = {(table, key): kind for kind, (table, key, _) in LOOKUPS.items()}
+_RECHECKED = {"email"}  # keys that can move to another class
+
+DirectoryBase = declarative_base()
+
+
+class ClassShard(DirectoryBase):
+    __tablename__ = "class_shards"
+
+    class_id = Column(String, primary_key=True)
+    shard = Column(String, nullable=False, index=True)
+    state = Column(String, nullable=False, default=ACTIVE)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class DirectoryEntry(DirectoryBase):
+    __tablename__ = "shard_directory"
+
+    kind = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    class_id = Column(String, nullable=False, index=True)
+
+
+class ShardingError(Exception):
+    pass
+
+
+class ClassMovingError(Exception):
+    """A write hit a class that is being moved (or was just moved); retry shortly."""
+
+    def __init__(self, class_id: str):
+        super().__init__(f"Class {class_id} is being moved to another shard, try again")
+        self.class_id = class_id
+
+
+class Route(NamedTuple):
+    shard: str
+    state: str
+
+
+def shard_urls() -> dict:
+    """SHARDS=a=sqlite:////data/shard-a.db,b=... as {name: url}, in order."""
+    shards = {}
+    for item in os.getenv("SHARDS", "").split(","):
+        if not item.strip():
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or not name.strip() or not url.strip():
+            raise ValueError(f"SHARDS entries must look like name=url, not {item.strip()!r}")
+        shards[name.strip()] = url.strip()
+    if DIRECTORY in shards:
+        raise ValueError(f"'{DIRECTORY}' is reserved and can't be a shard name")
+    return shards
+
+
+def _comparisons(statement) -> list:
+    """(column, operator, value) of the `column = value` / `column IN (...)` criteria of a statement."""
+    where = getattr(statement, "whereclause", None)
+    if where is None:
+        return []
+    found = []
+
+    def visit_binary(binary):
+        column, param = binary.left, binary.right
+        if isinstance(column, BindParameter):
+            column, param = param, column
+        if (isinstance(column, Column) and isinstance(param, BindParameter)
+                and binary.operator in (operators.eq, operators.in_op)):
+            found.append((column, binary.operator, param.effective_value))
+
+    visitors.traverse(where, {}, {"binary": visit_binary})
+    return found
+
+
+class ShardMap:
+    def __init__(self, directory: Engine, shards: dict, cache_seconds: float = 5.0, lookup_cache_size: int = 10000):
+        if not shards:
+            raise ValueError("Sharding needs at least one shard")
+        self.directory = directory
+        self.shards = dict(shards)
+        self.names = list(shards)
+        self.cache_seconds = cache_seconds
+        self.lookup_cache_size = lookup_cache_size
+        self._routes: dict = {}  # class_id -> (Route, fetched at)
+        self._lookups: collections.OrderedDict = collections.OrderedDict()  # (kind, key) -> class_id
+        self._lock = threading.Lock()
+        self._mappers = {mapper.local_table.name: mapper for mapper in models.Base.registry.mappers}
+
+    def binds(self) -> dict:
+        return {DIRECTORY: self.directory, **self.shards}
+
+    def engines(self) -> list:
+        """Distinct shard engines (a shard may share the directory database)."""
+        return list({id(engine): engine for engine in self.shards.values()}.values())
+
+    def create_tables(self):
+        DirectoryBase.metadata.create_all(bind=self.directory)
+        models.Base.metadata.create_all(
+            bind=self.directory, tables=[models.Base.metadata.tables[name] for name in sorted(GLOBAL_TABLES)])
+
+    # --- routing table ---
+
+    def route(self, class_id: str, fresh: bool = False) -> Optional[Route]:
+        cached = self._routes.get(class_id)
+        if not fresh and cached is not None and time.monotonic() - cached[1] < self.cache_seconds:
+            return cached[0]
+        with self.directory.connect() as conn:
+            row = conn.execute(
+                select(ClassShard.shard, ClassShard.state).where(ClassShard.class_id == class_id)
+            ).first()
+        route = Route(*row) if row is not None else None
+        if route is not None:
+            self._routes[class_id] = (route, time.monotonic())
+        return route
+
+    def shard_for(self, class_id: str) -> Optional[str]:
+        """Shard of a class; classes without a route (from before SHARDS) are looked up and routed."""
+        route = self.route(class_id)
+        if route is not None:
+            return route.shard
+        for name in self.names:
+            with self.shards[name].connect() as conn:
+                if conn.execute(select(models.Class.id).where(models.Class.id == class_id)).first() is not None:
+                    self.set_route(class_id, name)
+                    return name
+        return None
+
+    def set_route(self, class_id: str, shard: str, state: str = ACTIVE):
+        if shard not in self.shards:
+            raise ShardingError(f"Unknown shard {shard!r} (SHARDS: {', '.join(self.names)})")
+        now = datetime.datetime.utcnow()
+        with self.directory.begin() as conn:
+            updated = conn.execute(
+                update(ClassShard).where(ClassShard.class_id == class_id).values(shard=shard, state=state, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(ClassShard).values(class_id=class_id, shard=shard, state=state, updated_at=now))
+        self._routes[class_id] = (Route(shard, state), time.monotonic())
+
+    def assign(self, class_id: str) -> str:
+        """Route a new class to the shard with the fewest classes."""
+        with self.directory.connect() as conn:
+            counts = dict(conn.execute(select(ClassShard.shard, func.count()).group_by(ClassShard.shard)).all())
+        shard = min(self.names, key=lambda name: counts.get(name, 0))
+        try:
+            self.set_route(class_id, shard)
+        except IntegrityError:  # routed concurrently
+            return self.route(class_id, fresh=True).shard
+        return shard
+
+    def forget(self, class_id: str):
+        self._routes.pop(class_id, None)
+
+    # --- directory ---
+
+    def locate(self, kind: str, key: str) -> Optional[str]:
+        """Class of a directory key (`LOOKUPS`), None if no shard has it."""
+        if key is None:
+            return None
+        cached = self._lookups.get((kind, key))
+        if cached is None:
+            with self.directory.connect() as conn:
+                cached = conn.execute(
+                    select(DirectoryEntry.class_id).where(DirectoryEntry.kind == kind, DirectoryEntry.key == key)
+                ).scalar()
+        if cached is not None and (kind not in _RECHECKED or self._holds(kind, key, cached)):
+            self._remember(kind, key, cached)
+            return cached
+        class_id = self._scan(kind, key)
+        if class_id is not None:
+            self._store(kind, key, class_id)
+        return class_id
+
+    def _lookup_query(self, kind: str, key: str):
+        table, key_column, class_column = LOOKUPS[kind]
+        table = models.Base.metadata.tables[table]
+        return select(table.c[class_column]).where(table.c[key_column] == key).limit(1)
+
+    def _holds(self, kind: str, key: str, class_id: str) -> bool:
+        shard = self.shard_for(class_id)
+        if shard is None:
+            return False
+        with self.shards[shard].connect() as conn:
+            return conn.execute(self._lookup_query(kind, key)).scalar() == class_id
+
+    def _scan(self, kind: str, key: str) -> Optional[str]:
+        for name in self.names:
+            with self.shards[name].connect() as conn:
+                class_id = conn.execute(self._lookup_query(kind, key)).scalar()
+            if class_id is not None:
+                return class_id
+        return None
+
+    def _store(self, kind: str, key: str, class_id: str):
+        with self.directory.begin() as conn:
+            updated = conn.execute(
+                update(DirectoryEntry).where(DirectoryEntry.kind == kind, DirectoryEntry.key == key)
+                .values(class_id=class_id)
+            ).rowcount
+            if not updated:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(DirectoryEntry).values(kind=kind, key=key, class_id=class_id))
+                except IntegrityError:
+                    pass  # stored concurrently
+        self._remember(kind, key, class_id)
+
+    def _remember(self, kind: str, key: str, class_id: str):
+        with self._lock:
+            self._lookups[(kind, key)] = class_id
+            self._lookups.move_to_end((kind, key))
+            while len(self._lookups) > self.lookup_cache_size:
+                self._lookups.popitem(last=False)
+
+    def request_class(self, request) -> Optional[str]:
+        """Class of the request's session cookie or API key."""
+        session_token = request.cookies.get("session_token")
+        if session_token:
+            class_id = self.locate("session", session_token)
+            if class_id is not None:
+                return class_id
+        authorization = request.headers.get("authorization", "")
+        if authorization.startswith("Bearer ") and authorization[7:].strip():
+            raw_token = authorization[7:].strip()
+            return self.locate("api_key", crud.hash_api_token(raw_token)) or self.locate("api_token", raw_token)
+        return None
+
+    # --- statement routing ---
+
+    def shards_for_statement(self, statement) -> list:
+        """Shards named by the class_id / directory key criteria of a statement, [] if none."""
+        shards = set()
+        for column, operator, value in _comparisons(statement):
+            table = column.table.name
+            if column.name == "class_id" or (table == "classes" and column.name == "id"):
+                class_ids = value if operator is operators.in_op else [value]
+            elif (table, column.name) in _LOOKUP_COLUMNS:
+                kind = _LOOKUP_COLUMNS[(table, column.name)]
+                keys = value if operator is operators.in_op else [value]
+                class_ids = [self.locate(kind, key) for key in keys]
+            else:
+                continue
+            for class_id in class_ids:
+                shard = self.shard_for(class_id) if isinstance(class_id, str) else None
+                if shard is not None:
+                    shards.add(shard)
+        return sorted(shards, key=self.names.index)
+
+    def mapper_for(self, table_name: str):
+        return self._mappers.get(table_name)
+
+
+class ShardSession(ShardedSession):
+    """Session over all shards of `shard_map`; see the module docstring for the routing rules."""
+
+    def __init__(self, shard_map: ShardMap, **kwargs):
+        self.shard_map = shard_map
+        self.pinned: Optional[str] = None
+        self.pinned_class: Optional[str] = None
+        super().__init__(
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=self._execute_chooser,
+            shards=shard_map.binds(),
+            **kwargs,
+        )
+
+    def pin(self, class_id: Optional[str]):
+        """Route statements without class criteria to the shard of `class_id`."""
+        self.pinned_class = class_id
+        self.pinned = self.shard_map.shard_for(class_id) if class_id else None
+
+    def pin_shard(self, shard: str):
+        self.pinned_class, self.pinned = None, shard
+
+    def execute(self, statement, params=None, **kwargs):
+        if isinstance(params, list) and params and getattr(statement, "is_dml", False):
+            return self._execute_many(statement, params, **kwargs)
+        return super().execute(statement, params, **kwargs)
+
+    def _execute_many(self, statement, rows: list, **kwargs):
+        """ORM bulk INSERT/UPDATE (a list of rows), which ShardedSession can't route: one shard, same transaction."""
+        if statement.table.name in GLOBAL_TABLES:
+            shards = {DIRECTORY}
+        else:
+            shards = {self.shard_map.shard_for(row["class_id"]) for row in rows if row.get("class_id") is not None}
+            if not shards and self.pinned is not None:
+                shards = {self.pinned}
+        if len(shards) != 1 or None in shards:
+            raise ShardingError(f"Bulk statement on {statement.table.name} needs rows of one shard")
+        with Session(bind=self.connection(bind_arguments={"shard_id": shards.pop()})) as session:
+            return session.execute(statement, rows, **kwargs)
+
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kwargs):
+        if shard_id is None and mapper is None and instance is None:
+            shard_id = self._current_shard()
+        return super().get_bind(mapper, shard_id=shard_id, instance=instance, clause=clause, **kwargs)
+
+    def _current_shard(self) -> str:
+        """Shard for plain connections (`session.connection()`): the pinned one or the one being written."""
+        if self.pinned is not None:
+            return self.pinned
+        tokens = {inspect(obj).identity_token for obj in itertools.chain(self.new, self.dirty, self.deleted)}
+        tokens.discard(None)
+        tokens.discard(DIRECTORY)
+        if len(tokens) == 1:
+            return tokens.pop()
+        raise ShardingError("Unpinned session: no single shard for a plain connection")
+
+    def _is_global(self, mapper) -> bool:
+        return mapper is not None and mapper.local_table.name in GLOBAL_TABLES
+
+    def _shard_chooser(self, mapper, instance, clause=None, **kwargs):
+        if self._is_global(mapper):
+            return DIRECTORY
+        if isinstance(instance, models.Class):
+            if inspect(instance).key is None and instance.id is not None:  # new class
+                route = self.shard_map.route(instance.id)
+                return route.shard if route is not None else self.shard_map.assign(instance.id)
+            class_id = instance.id
+        else:
+            class_id = getattr(instance, "class_id", None)
+        if class_id is not None:
+            shard = self.shard_map.shard_for(class_id)
+            if shard is not None:
+                return shard
+        if instance is not None:
+            shard = self._parent_shard(mapper, instance) or self.pinned or self._parent_shard(mapper, instance, query=True)
+        else:
+            shard = self.pinned
+        if shard is not None:
+            return shard
+        raise ShardingError(f"Can't tell the shard of {mapper.class_.__name__} (no class_id, parent or pinned class)")
+
+    def _parent_shard(self, mapper, instance, query: bool = False) -> Optional[str]:
+        """Shard of the row a foreign key of `instance` points to: from this session, or (`query`) the shards."""
+        for fk in mapper.local_table.foreign_keys:
+            value = getattr(instance, mapper.get_property_by_column(fk.parent).key, None)
+            parent = self.shard_map.mapper_for(fk.column.table.name)
+            if value is None or parent is None:
+                continue
+            if query:
+                [key] = parent.local_table.primary_key.columns
+                for shard in self.shard_map.names:
+                    with self.shard_map.shards[shard].connect() as conn:
+                        if conn.execute(select(key).where(key == value)).first() is not None:
+                            return shard
+                continue
+            for shard in self.shard_map.names:
+                if self.identity_map.get(parent.identity_key_from_primary_key([value], shard)) is not None:
+                    return shard
+            for obj in self.new:
+                if isinstance(obj, parent.class_) and inspect(obj).identity_token \
+                        and parent.primary_key_from_instance(obj) == [value]:
+                    return inspect(obj).identity_token
+        return None
+
+    def _identity_chooser(self, mapper, primary_key, *, lazy_loaded_from=None, **kwargs):
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+        if self._is_global(mapper):
+            return [DIRECTORY]
+        if mapper.class_ is models.Class:
+            shard = self.shard_map.shard_for(primary_key[0])
+            return [shard] if shard is not None else []
+        return [self.pinned] if self.pinned is not None else self.shard_map.names
+
+    def _execute_chooser(self, orm_context):
+        if self._is_global(orm_context.bind_mapper):
+            return [DIRECTORY]
+        shards = self.shard_map.shards_for_statement(orm_context.statement)
+        if shards:
+            return shards
+        if self.pinned is not None:
+            return [self.pinned]
+        if orm_context.is_insert:
+            raise ShardingError("INSERT without class_id in an unpinned session")
+        return self.shard_map.names
+
+
+def _assign_class_ids(session, flush_context, instances):
+    # The shard of a new class depends on its id, which is otherwise set during the INSERT
+    for obj in session.new:
+        if isinstance(obj, models.Class) and obj.id is None:
+            obj.id = models.generate_uuid()
+
+
+def _check_moves(session, flush_context):
+    """Roll back writes to a class that is being moved or was routed elsewhere meanwhile."""
+    written = {}
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        shard = inspect(obj).identity_token
+        if shard is None or shard == DIRECTORY:
+            continue
+        class_id = obj.id if isinstance(obj, models.Class) else getattr(obj, "class_id", None) or session.pinned_class
+        if class_id is not None:
+            written[class_id] = shard
+    for class_id, shard in written.items():
+        # PostgreSQL: makes move_class' barrier wait for this transaction (SQLite: the write lock does)
+        session.connection(bind_arguments={"shard_id": shard}).execute(
+            select(models.Class.id).where(models.Class.id == class_id).with_for_update(read=True))
+        route = session.shard_map.route(class_id, fresh=True)
+        if route is not None and (route.state != ACTIVE or route.shard != shard):
+            session.shard_map.forget(class_id)
+            raise ClassMovingError(class_id)
+
+
+_installed = weakref.WeakSet()
+
+
+def install(session_factory):
+    from sqlalchemy import event
+    # Not event.contains(): keyed by id(), it can mistake a new factory for a collected one
+    if session_factory not in _installed:
+        _installed.add(session_factory)
+        event.listen(session_factory, "before_flush", _assign_class_ids)
+        event.listen(session_factory, "after_flush", _check_moves)
+
+
+# --- moving classes ---
+
+def _queue_tables(class_id: str) -> list:
+    """Pending webhook rows and OAuth codes of a class (not part of class backups, but must move with it)."""
+    subscriptions = select(models.WebhookSubscription.id).where(models.WebhookSubscription.class_id == class_id)
+    users = select(models.User.id).where(models.User.class_id == class_id)
+    return [
+        (models.WebhookOutbox.__table__, models.WebhookOutbox.class_id == class_id),
+        (models.WebhookDelivery.__table__, models.WebhookDelivery.subscription_id.in_(subscriptions)),
+        (models.OAuthAuthorizationCode.__table__, models.OAuthAuthorizationCode.user_id.in_(users)),
+    ]
+
+
+def move_class(shard_map: ShardMap, class_id: str, target: str, log: Callable[[str], None] = logger.info) -> dict:
+    """Move a class to `target` while the app keeps running; returns the copied row counts."""
+    if target not in shard_map.shards:
+        raise ShardingError(f"Unknown shard {target!r} (SHARDS: {', '.join(shard_map.names)})")
+    source = shard_map.shard_for(class_id)
+    if source is None:
+        raise ShardingError(f"Class {class_id} not found")
+    if source == target:
+        log(f"Class {class_id} is already on {target}")
+        return {}
+    source_engine, target_engine = shard_map.shards[source], shard_map.shards[target]
+    if source_engine is target_engine:
+        shard_map.set_route(class_id, target)
+        return {}
+
+    shard_map.set_route(class_id, source, MOVING)
+    log(f"Class {class_id}: writes paused, copying {source} -> {target}")
+    try:
+        with source_engine.begin() as conn:  # barrier, see module docstring
+            conn.execute(update(models.Class.__table__).where(models.Class.id == class_id)
+                         .values(name=models.Class.__table__.c.name))
+        with tempfile.SpooledTemporaryFile(max_size=64 << 20) as archive:
+            with source_engine.connect() as src:
+                for chunk in class_backup.iter_export(src, class_id):
+                    archive.write(chunk)
+                queues = [(table, src.execute(select(table).where(condition)).mappings().all())
+                          for table, condition in _queue_tables(class_id)]
+            archive.seek(0)
+            with target_engine.begin() as dst:
+                for table, condition in reversed(_queue_tables(class_id)):
+                    dst.execute(delete(table).where(condition))
+                counts = class_backup.restore(dst, archive, replace=True)
+                for table, rows in queues:
+                    if rows:
+                        dst.execute(insert(table), [dict(row) for row in rows])
+                    counts[table.name] = len(rows)
+    except BaseException:
+        shard_map.set_route(class_id, source)
+        raise
+    shard_map.set_route(class_id, target)
+    log(f"Class {class_id}: now on {target}, removing it from {source} in {shard_map.cache_seconds:g}s")
+
+    time.sleep(shard_map.cache_seconds)  # other workers may still read from the source
+    with source_engine.begin() as conn:
+        for table, condition in reversed(_queue_tables(class_id)):
+            conn.execute(delete(table).where(condition))
+        class_backup.delete_class(conn, class_id)
+    return counts
+
+
+def register_classes(shard_map: ShardMap) -> int:
+    """Route all classes that have no route yet (e.g. after turning SHARDS on)."""
+    routed = 0
+    for name in shard_map.names:
+        with shard_map.shards[name].connect() as conn:
+            class_ids = conn.execute(select(models.Class.id)).scalars().all()
+        for class_id in class_ids:
+            if shard_map.route(class_id, fresh=True) is None:
+                shard_map.set_route(class_id, name)
+                routed += 1
+    return routed
+
+
+def main(argv: list) -> int:
+    from app.database import shard_map
+
+    if shard_map is None:
+        print("Sharding is off (SHARDS is not set)")
+        return 1
+    shard_map.create_tables()
+    if argv == ["status"]:
+        with shard_map.directory.connect() as conn:
+            rows = conn.execute(
+                select(ClassShard.shard, ClassShard.state, func.count()).group_by(ClassShard.shard, ClassShard.state)
+            ).all()
+        counts = collections.defaultdict(dict)
+        for shard, state, count in rows:
+            counts[shard][state] = count
+        for name in shard_map.names:
+            moving = counts[name].get(MOVING, 0)
+            print(f"{name:<12} {counts[name].get(ACTIVE, 0):6} classes" + (f", {moving} moving" if moving else ""))
+        return 0
+    if argv == ["init"]:
+        print(f"Routed {register_classes(shard_map)} classes")
+        return 0
+    if len(argv) == 3 and argv[0] == "move":
+        try:
+            counts = move_class(shard_map, argv[1], argv[2], log=print)
+        except ShardingError as exc:
+            print(f"Move failed: {exc}")
+            return 1
+        print("Moved " + ", ".join(f"{name}={count}" for name, count in counts.items() if count))
+        return 0
+    print("Usage: python -m app.core.sharding status|init|move <class_id> <shard>")
+    return 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
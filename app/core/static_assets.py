@@ -0,0 +1,232 @@
+"""
+Static asset pipeline: fingerprinting, precompression and the /static handler.
+
+Build step (run once per deploy, e.g. in the Dockerfile):
+
+    python -m app.core.static_assets build [target_dir]
+
+- copies app/static into STATIC_BUILD_DIR and adds a content-hashed copy of
+  every file (styles.css -> styles.1a2b3c4d5e.css)
+- writes .gz siblings (and .br when the optional `brotli` package is
+  installed) for text assets, if they are actually smaller
+- writes manifest.json mapping logical names to fingerprinted names
+
+At runtime `static_files` serves the build directory when it exists and falls
+back to app/static otherwise (the manifest is then computed at startup, so
+fingerprinted URLs work without a build). Fingerprinted URLs are cached as
+immutable; everything else is revalidated. Templates use
+`{{ static_url('styles.css') }}`.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+try:
+    import brotli
+except ImportError:  # optional - gzip siblings are always built
+    brotli = None
+
+SOURCE_DIR = "app/static"
+BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "app/static_build")
+MANIFEST_NAME = "manifest.json"
+
+# Text formats worth compressing; images/fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".xml", ".html", ".ico", ".webmanifest"}
+# (Content-Encoding, file suffix) in server preference order
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+
+def fingerprinted_name(name: str, digest: str) -> str:
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest}{ext}"
+
+
+def _walk(directory: str):
+    """Yield file paths relative to `directory`, with "/" separators."""
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            rel = os.path.relpath(os.path.join(root, filename), directory)
+            yield rel.replace(os.sep, "/")
+
+
+def compute_manifest(source_dir: str = SOURCE_DIR) -> dict[str, str]:
+    """{logical name: fingerprinted name} for every file in `source_dir`."""
+    if not os.path.isdir(source_dir):
+        return {}
+    return {
+        name: fingerprinted_name(name, _hash_file(os.path.join(source_dir, name)))
+        for name in _walk(source_dir)
+        if name != MANIFEST_NAME
+    }
+
+
+def _write_compressed(path: str) -> list[str]:
+    with open(path, "rb") as f:
+        data = f.read()
+
+    written = []
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, (".br", brotli.compress(data, quality=11)))
+    for suffix, payload in variants:
+        if len(payload) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(payload)
+            written.append(path + suffix)
+    return written
+
+
+def build(target: str = BUILD_DIR, source_dir: str = SOURCE_DIR) -> dict[str, str]:
+    """Build the fingerprinted + precompressed asset tree. Returns the manifest."""
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+
+    manifest = compute_manifest(source_dir)
+    for name, hashed in manifest.items():
+        src = os.path.join(source_dir, name)
+        for out_name in (name, hashed):
+            out = os.path.join(target, out_name)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            shutil.copy2(src, out)
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                _write_compressed(out)
+
+    with open(os.path.join(target, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(build_dir: str = BUILD_DIR, source_dir: str = SOURCE_DIR) -> tuple[str, dict[str, str]]:
+    """Return (directory to serve, manifest); prefers a finished build."""
+    path = os.path.join(build_dir, MANIFEST_NAME)
+    if os.path.isfile(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return build_dir, json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring broken static manifest {path}: {e}")
+    return source_dir, compute_manifest(source_dir)
+
+
+def accepted_encodings(header: str | None) -> set[str]:
+    """Parse Accept-Encoding, dropping codings with q=0."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(enc for enc, _ in ENCODINGS)
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves `.br`/`.gz` siblings according to Accept-Encoding and
+    resolves fingerprinted names via the manifest (cached as immutable).
+    """
+
+    def __init__(self, *, directory: str, manifest: dict[str, str], **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.manifest = manifest
+        self.logical_names = {hashed: name for name, hashed in manifest.items()}
+
+    def url_for(self, name: str) -> str:
+        return "/static/" + self.manifest.get(name, name)
+
+    def lookup_path(self, path: str):
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is None:
+            # Fingerprinted URL without a build: serve the source file
+            logical = self.logical_names.get(path.replace(os.sep, "/"))
+            if logical:
+                return super().lookup_path(logical)
+        return full_path, stat_result
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            immutable = path.replace(os.sep, "/") in self.logical_names
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        return response
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if os.path.splitext(str(full_path))[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(str(full_path) + suffix)
+            except OSError:
+                continue
+            # media_type from the original name, not from the .gz/.br suffix
+            response = FileResponse(
+                str(full_path) + suffix,
+                status_code=status_code,
+                stat_result=variant_stat,
+                media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding},
+            )
+            break
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+_directory, _manifest = load_manifest()
+static_files = PrecompressedStaticFiles(directory=_directory, manifest=_manifest)
+
+
+def static_url(name: str) -> str:
+    """Template helper: URL of a static asset, fingerprinted if known."""
+    return static_files.url_for(name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        out = sys.argv[2] if len(sys.argv) > 2 else BUILD_DIR
+        manifest = build(out)
+        print(f"Built {len(manifest)} static assets into {out} (brotli: {'yes' if brotli else 'no'})")
+    else:
+        print("Usage: python -m app.core.static_assets build [target_dir]")
+        sys.exit(1)
@@ -0,0 +1,357 @@
+"""
+Whole-week timetable import/export.
+
+Formats:
+- CSV: one slot per line, header `weekday,slot_number,subject_name,group_name,room,subject_id`
+  (weekday as 0-4 or a day name, e.g. `Montag`, `Mo`, `Monday`)
+- JSON: `{"slots": [{...same fields...}]}` or a bare list
+- iCalendar (export only): one weekly recurring VEVENT (RRULE) per slot,
+  holidays as EXDATE
+
+An import is diffed against the class' current slots on the natural key
+(weekday, slot_number, group_name). Only new, changed and (in replace mode)
+missing slots are written, in one transaction. Unchanged slots keep their id,
+so `UserTimetableSelection` rows pointing at them survive a re-import.
+"""
+
+import csv
+import datetime
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Container, Iterable, NamedTuple, Optional
+
+from icalendar import Calendar, Event
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.metrics import ICS_RENDERS, cache_counters
+from app.core.schedule_index import WeeklySchedule
+from app.repository.rows import HolidayRow, SlotRow
+
+FORMATS = ("csv", "json", "ics")
+CSV_FIELDS = ("weekday", "slot_number", "subject_name", "group_name", "room", "subject_id")
+MAX_SLOT_NUMBER = 12
+# A full week is a few KB; anything near this is not a timetable
+IMPORT_MAX_BYTES = int(os.getenv("TIMETABLE_IMPORT_MAX_BYTES", str(1024 * 1024)))
+
+_WEEKDAY_ALIASES = {
+    name: index
+    for index, names in enumerate((
+        ("montag", "mo", "monday", "mon"),
+        ("dienstag", "di", "tuesday", "tue"),
+        ("mittwoch", "mi", "wednesday", "wed"),
+        ("donnerstag", "do", "thursday", "thu"),
+        ("freitag", "fr", "friday", "fri"),
+    ))
+    for name in names
+}
+
+
+class TimetableImportError(ValueError):
+    """Raised with one message per invalid line/entry."""
+
+    def __init__(self, errors: list[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class ImportedSlot(NamedTuple):
+    weekday: int
+    slot_number: int
+    subject_name: str
+    group_name: Optional[str]
+    room: Optional[str]
+    subject_id: Optional[str]
+
+    @property
+    def key(self) -> tuple:
+        return self.weekday, self.slot_number, self.group_name
+
+
+class TimetableDiff(NamedTuple):
+    create: list[ImportedSlot]
+    update: list[tuple[str, ImportedSlot]]  # (existing slot id, new values)
+    delete: list[str]  # existing slot ids
+    unchanged: int
+
+    def summary(self) -> dict:
+        return {
+            "created": len(self.create),
+            "updated": len(self.update),
+            "deleted": len(self.delete),
+            "unchanged": self.unchanged,
+        }
+
+
+# --- Parsing ---
+
+def _optional(value) -> Optional[str]:
+    value = str(value).strip() if value is not None else ""
+    return value or None
+
+
+def _weekday(value) -> int:
+    text = str(value).strip().lower()
+    if text.isdigit():
+        return int(text)
+    if text in _WEEKDAY_ALIASES:
+        return _WEEKDAY_ALIASES[text]
+    raise ValueError(f"unknown weekday {value!r}")
+
+
+def _validate(entries: Iterable[tuple[str, dict]]) -> list[ImportedSlot]:
+    slots, errors, seen = [], [], {}
+    for where, entry in entries:
+        try:
+            slot = ImportedSlot(
+                weekday=_weekday(entry.get("weekday")),
+                slot_number=int(str(entry.get("slot_number", "")).strip()),
+                subject_name=_optional(entry.get("subject_name")),
+                group_name=_optional(entry.get("group_name")),
+                room=_optional(entry.get("room")),
+                subject_id=_optional(entry.get("subject_id")),
+            )
+        except (TypeError, ValueError) as e:
+            errors.append(f"{where}: {e}")
+            continue
+        if not 0 <= slot.weekday <= 4:
+            errors.append(f"{where}: weekday must be 0-4")
+        elif not 1 <= slot.slot_number <= MAX_SLOT_NUMBER:
+            errors.append(f"{where}: slot number must be 1-{MAX_SLOT_NUMBER}")
+        elif not slot.subject_name:
+            errors.append(f"{where}: subject_name is required")
+        elif slot.key in seen:
+            errors.append(f"{where}: duplicate of {seen[slot.key]}")
+        else:
+            seen[slot.key] = where
+            slots.append(slot)
+    if errors:
+        raise TimetableImportError(errors)
+    return slots
+
+
+def parse_csv(text: str) -> list[ImportedSlot]:
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if not reader.fieldnames or not {"weekday", "slot_number", "subject_name"} <= set(reader.fieldnames):
+        raise TimetableImportError(["CSV header must contain weekday, slot_number and subject_name"])
+    return _validate((f"line {reader.line_num}", row) for row in reader)
+
+
+def parse_json(text: str) -> list[ImportedSlot]:
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise TimetableImportError([f"invalid JSON: {e}"])
+    if isinstance(data, dict):
+        data = data.get("slots")
+    if not isinstance(data, list) or not all(isinstance(entry, dict) for entry in data):
+        raise TimetableImportError(['expected a list of slots or {"slots": [...]}'])
+    return _validate((f"slot {i + 1}", entry) for i, entry in enumerate(data))
+
+
+def parse(text: str, format: str) -> list[ImportedSlot]:
+    if format == "csv":
+        return parse_csv(text)
+    if format == "json":
+        return parse_json(text)
+    raise TimetableImportError([f"unsupported import format {format!r}"])
+
+
+# --- Diff + apply ---
+
+def plan_import(existing: Iterable[SlotRow], incoming: list[ImportedSlot], replace: bool = True) -> TimetableDiff:
+    by_key: dict[tuple, SlotRow] = {}
+    leftovers: list[str] = []
+    for slot in existing:
+        key = (slot.weekday, slot.slot_number, slot.group_name)
+        if key in by_key:
+            leftovers.append(slot.id)  # duplicate from older data; the first one is kept
+        else:
+            by_key[key] = slot
+
+    create, changed, unchanged = [], [], 0
+    for new in incoming:
+        current = by_key.pop(new.key, None)
+        if current is None:
+            create.append(new)
+        elif (current.subject_name, current.room, current.subject_id) != (new.subject_name, new.room, new.subject_id):
+            changed.append((current.id, new))
+        else:
+            unchanged += 1
+
+    removed = [slot.id for slot in by_key.values()] + leftovers if replace else []
+    return TimetableDiff(create, changed, removed, unchanged)
+
+
+def apply_import(db: Session, class_id: str, diff: TimetableDiff):
+    """Write a planned diff. Does not commit; the caller owns the transaction."""
+    if diff.delete:
+        db.execute(delete(models.UserTimetableSelection).where(models.UserTimetableSelection.slot_id.in_(diff.delete)))
+        db.execute(delete(models.TimetableSlot).where(models.TimetableSlot.id.in_(diff.delete)))
+    if diff.update:
+        db.execute(update(models.TimetableSlot), [
+            {"id": slot_id, "subject_name": new.subject_name, "room": new.room, "subject_id": new.subject_id}
+            for slot_id, new in diff.update
+        ])
+    if diff.create:
+        db.execute(insert(models.TimetableSlot), [
+            {"class_id": class_id, **new._asdict()} for new in diff.create
+        ])
+
+
+# --- Export ---
+
+def _export_rows(schedule: WeeklySchedule) -> list[dict]:
+    return [
+        {
+            "weekday": entry.weekday,
+            "slot_number": entry.slot.slot_number,
+            "subject_name": entry.slot.subject_name,
+            "group_name": entry.slot.group_name,
+            "room": entry.slot.room,
+            "subject_id": entry.slot.subject_id,
+            "start_time": entry.start_time,
+            "end_time": entry.end_time,
+        }
+        for entry in schedule.entries
+    ]
+
+
+def export_json(schedule: WeeklySchedule) -> str:
+    return json.dumps({"settings": schedule.settings, "slots": _export_rows(schedule)}, ensure_ascii=False, indent=2)
+
+
+def export_csv(schedule: WeeklySchedule) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(_export_rows(schedule))
+    return buffer.getvalue()
+
+
+def week_start(day: datetime.date) -> datetime.date:
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _holiday_dates(holidays: Iterable[HolidayRow], weekday: int, first: datetime.date) -> list[datetime.date]:
+    """Dates on `weekday`, not before `first`, that fall into a holiday."""
+    dates = []
+    for holiday in holidays:
+        day = max(holiday.start_date, first)
+        day += datetime.timedelta(days=(weekday - day.weekday()) % 7)
+        while day <= holiday.end_date:
+            dates.append(day)
+            day += datetime.timedelta(days=7)
+    return dates
+
+
+def lesson_events(schedule: WeeklySchedule, start: datetime.date, selected: Optional[Container[str]] = None,
+                  uid_suffix: str = "classly") -> list[Event]:
+    """
+    One weekly recurring VEVENT per slot (only `selected` slots if given),
+    first occurrence in the week of `start`. Lessons on holidays become EXDATEs.
+    Times are floating local times (the school's wall clock). Requires settings.
+    """
+    monday = week_start(start)
+    stamp = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    events = []
+    for entry in schedule.entries:
+        if entry.start_minute is None or (selected is not None and entry.slot_id not in selected):
+            continue
+        slot = entry.slot
+        day = monday + datetime.timedelta(days=entry.weekday)
+        start_offset = datetime.timedelta(minutes=entry.start_minute)
+        midnight = datetime.datetime.combine(day, datetime.time())
+        event = Event()
+        event.add("uid", f"{slot.id}@{uid_suffix}")
+        event.add("dtstamp", stamp)
+        event.add("summary", f"{slot.subject_name} ({slot.group_name})" if slot.group_name else slot.subject_name)
+        event.add("dtstart", midnight + start_offset)
+        event.add("dtend", midnight + datetime.timedelta(minutes=entry.end_minute))
+        event.add("rrule", {"freq": "weekly"})
+        skipped = _holiday_dates(schedule.holidays, entry.weekday, day)
+        if skipped:
+            event.add("exdate", [datetime.datetime.combine(d, datetime.time()) + start_offset for d in skipped])
+        if slot.room:
+            event.add("location", slot.room)
+        events.append(event)
+    return events
+
+
+_RENDERS = ICS_RENDERS.labels("timetable")
+_HIT, _MISS = cache_counters("timetable_ics")
+
+
+def _render_calendar(calendar_name: str, events: Iterable[Event]) -> str:
+    cal = Calendar()
+    cal.add("prodid", "-//Classly//Timetable//DE")
+    cal.add("version", "2.0")
+    cal.add("x-wr-calname", calendar_name)
+    for event in events:
+        cal.add_component(event)
+    _RENDERS.inc()
+    return cal.to_ical().decode("utf-8")
+
+
+def export_ics(schedule: WeeklySchedule, calendar_name: str, start: datetime.date, uid_suffix: str = "classly") -> str:
+    return _render_calendar(calendar_name, lesson_events(schedule, start, uid_suffix=uid_suffix))
+
+
+class _PersonalCalendar(NamedTuple):
+    schedule: WeeklySchedule
+    selected: frozenset
+    calendar_name: str
+    monday: datetime.date
+    events: tuple
+    ics: str
+
+
+class PersonalCalendarCache:
+    """
+    Rendered personal timetable feed per user.
+
+    An entry is reused while the class' compiled schedule is the same object
+    (`schedule_index` hands out a new one after any slot/settings/holiday
+    write), the user's selection and the calendar name (the class name) are
+    unchanged and the week has not rolled over, so regenerating is only needed after an actual change.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _PersonalCalendar]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, user_id: str, schedule: WeeklySchedule, selected: frozenset, calendar_name: str,
+            today: datetime.date) -> _PersonalCalendar:
+        monday = week_start(today)
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if (cached is not None and cached.schedule is schedule and cached.selected == selected
+                    and cached.calendar_name == calendar_name and cached.monday == monday):
+                self._entries.move_to_end(user_id)
+                _HIT.inc()
+                return cached
+
+        _MISS.inc()
+        events = tuple(lesson_events(schedule, monday, selected))
+        entry = _PersonalCalendar(schedule, selected, calendar_name, monday, events,
+                                  _render_calendar(calendar_name, events))
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+
+personal_calendars = PersonalCalendarCache(max_entries=int(os.getenv("TIMETABLE_ICS_CACHE_SIZE", "1024")))
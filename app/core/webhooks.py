@@ -0,0 +1,603 @@
+"""
+Webhooks: transactional outbox + async delivery worker.
+
+Write path: `install(session_factory)` hooks the session's `after_flush`.
+Every flushed insert/update/delete of an `Event` in a class with an active
+`WebhookSubscription` adds a `WebhookOutbox` row through the same connection,
+so it commits or rolls back together with the change. Routes don't need to
+know about webhooks, and nothing is written for classes without one.
+
+Delivery (`webhook_worker`, own asyncio loop in a background thread):
+
+1. fan out undispatched outbox rows into one `WebhookDelivery` per matching
+   subscription; a worker first claims the rows (sets `dispatched_at` where
+   it is still NULL) and fans out only those, and the unique
+   (subscription, outbox record) index drops any duplicate that slips through
+2. claim due deliveries with a lease (`locked_until`), so several app
+   processes can run workers against the same database; per subscription at
+   most as many as `max_concurrency` slots can send in half the lease, so
+   nothing waits for its slot until the lease has run out. Results are only
+   recorded for rows whose lease the worker still holds
+3. POST them over one pooled `httpx.AsyncClient`, at most
+   `max_concurrency` at a time per subscription
+4. 2xx -> delivered; otherwise retry with exponential backoff
+   (WEBHOOK_RETRY_BASE * 2^attempt, capped at WEBHOOK_RETRY_MAX) until
+   WEBHOOK_MAX_ATTEMPTS, then status "dead" (dead-letter queue, can be
+   redelivered via the API). 410 Gone goes to the dead-letter queue at once.
+
+The worker polls every WEBHOOK_POLL_INTERVAL seconds and is woken right away
+after a commit in this process wrote outbox rows. About once a minute it
+deletes delivered and dead deliveries older than WEBHOOK_RETENTION_DAYS,
+and outbox rows of that age that no delivery refers to any more.
+
+Requests are signed: `X-Classly-Signature: sha256=<hex>` is the HMAC-SHA256
+of `"<X-Classly-Timestamp>.<body>"` with the subscription secret.
+
+Webhook URLs must resolve to public addresses (`check_url` when a webhook is
+created; for deliveries the HTTP client resolves each new connection once,
+checks the addresses and connects to exactly those, so a DNS answer that
+changes after the check can't redirect it); loopback, private, link-local and
+reserved addresses are refused unless WEBHOOK_ALLOW_PRIVATE_URLS=true.
+Redirects are not followed, and only the status line of a failed delivery is
+stored, never the response body.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import weakref
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+from sqlalchemy import and_, bindparam, delete, event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.fastjson import dumps
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_EVENTS = ("event.created", "event.updated", "event.deleted")
+SIGNATURE_HEADER = "X-Classly-Signature"
+TIMESTAMP_HEADER = "X-Classly-Timestamp"
+
+PENDING, DELIVERED, DEAD = "pending", "delivered", "dead"
+
+
+def webhooks_enabled() -> bool:
+    return os.getenv("WEBHOOKS_ENABLED", "true").lower() == "true"
+
+
+def allow_private_urls() -> bool:
+    return os.getenv("WEBHOOK_ALLOW_PRIVATE_URLS", "false").lower() == "true"
+
+
+class UnsafeWebhookURL(ValueError):
+    pass
+
+
+def _target(url: str) -> tuple[str, int]:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeWebhookURL("URL must be http(s)")
+    try:
+        port = parts.port
+    except ValueError:
+        raise UnsafeWebhookURL("Invalid port")
+    return parts.hostname, port or (443 if parts.scheme == "https" else 80)
+
+
+def _public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    # is_global excludes loopback, private, link-local (169.254.169.254), shared and reserved ranges
+    return ip.is_global and not ip.is_multicast
+
+
+def _check_addresses(host: str, infos: list, allow_private: bool):
+    if not infos:
+        raise UnsafeWebhookURL(f"Host {host} can't be resolved")
+    if not allow_private and not all(_public(info[4][0]) for info in infos):
+        raise UnsafeWebhookURL(f"Host {host} resolves to a non-public address")
+
+
+def check_url(url: str, allow_private: bool = False):
+    """Raise `UnsafeWebhookURL` unless `url` is http(s) and its host resolves to public addresses only."""
+    host, port = _target(url)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        infos = []
+    _check_addresses(host, infos, allow_private)
+
+
+class _PublicOnlyBackend(httpcore.AsyncNetworkBackend):
+    """Network backend of the delivery client: connects only to addresses it has checked itself."""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, allow_private: bool):
+        self._backend = backend
+        self.allow_private = allow_private
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None) -> httpcore.AsyncNetworkStream:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError):
+            infos = []
+        _check_addresses(host, infos, self.allow_private)
+        # Connect to the checked IPs, not the name: no second lookup to rebind.
+        # TLS still verifies and sends SNI for the URL's host name.
+        error = None
+        for address in dict.fromkeys(info[4][0] for info in infos):
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options=None) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    return hmac.new(secret.encode(), b"%d." % timestamp + body, hashlib.sha256).hexdigest()
+
+
+def verify(secret: str, timestamp: int, body: bytes, signature: str, tolerance: int = 300) -> bool:
+    """Receiver-side check (also used by the tests)."""
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(signature.removeprefix("sha256="), sign(secret, timestamp, body))
+
+
+# --- Outbox (write path) ---
+
+def _event_data(obj: models.Event) -> dict:
+    from app.routers.api_v1.serializers import event_serializer
+    return event_serializer.one(obj)
+
+
+def _record_changes(session: Session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, models.Event):
+            changes.append(("event.created", obj))
+    for obj in session.dirty:
+        if isinstance(obj, models.Event) and session.is_modified(obj, include_collections=False):
+            changes.append(("event.updated", obj))
+    for obj in session.deleted:
+        if isinstance(obj, models.Event):
+            changes.append(("event.deleted", obj))
+    if not changes:
+        return
+
+    connection = session.connection()
+    subscribed = set(connection.execute(
+        select(models.WebhookSubscription.class_id)
+        .where(models.WebhookSubscription.class_id.in_({obj.class_id for _, obj in changes}),
+               models.WebhookSubscription.active.is_(True))
+        .distinct()
+    ).scalars())
+    if not subscribed:
+        return
+
+    now = datetime.datetime.utcnow()
+    rows = []
+    for event_type, obj in changes:
+        if obj.class_id not in subscribed:
+            continue
+        outbox_id = models.generate_uuid()
+        data = {"id": obj.id, "class_id": obj.class_id} if event_type == "event.deleted" else _event_data(obj)
+        payload = {"id": outbox_id, "type": event_type, "created_at": now, "data": data}
+        rows.append({"id": outbox_id, "class_id": obj.class_id, "event_type": event_type,
+                     "payload": dumps(payload).decode(), "created_at": now})
+    if rows:
+        connection.execute(insert(models.WebhookOutbox), rows)
+        session.info["webhook_outbox"] = True
+
+
+def _after_commit(session: Session):
+    if session.info.pop("webhook_outbox", False):
+        webhook_worker.wake()
+
+
+def _after_rollback(session: Session):
+    session.info.pop("webhook_outbox", None)
+
+
+_installed = weakref.WeakSet()
+
+
+def install(session_factory):
+    """Record Event changes of sessions created by `session_factory` into the outbox."""
+    # Not event.contains(): its registry is keyed by id() and can report a
+    # listener for a new factory that reuses the id of a collected one
+    if session_factory not in _installed:
+        _installed.add(session_factory)
+        event.listen(session_factory, "after_flush", _record_changes)
+        event.listen(session_factory, "after_commit", _after_commit)
+        event.listen(session_factory, "after_soft_rollback", lambda session, previous: _after_rollback(session))
+
+
+# --- Delivery ---
+
+class _Claimed(NamedTuple):
+    delivery_id: str
+    attempts: int
+    subscription_id: str
+    url: str
+    secret: str
+    max_concurrency: int
+    event_type: str
+    payload: str
+    lease_until: datetime.datetime
+
+
+class _Result(NamedTuple):
+    claimed: _Claimed
+    status_code: Optional[int]
+    error: Optional[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+
+def _matches(events: str, event_type: str) -> bool:
+    return events == "*" or event_type in {e.strip() for e in events.split(",")}
+
+
+def _insert_deliveries(db: Session, rows: list):
+    """INSERT that skips rows whose (subscription, outbox record) pair already exists."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:  # the unique index still refuses duplicates
+        db.execute(insert(models.WebhookDelivery), rows)
+        return
+    statement = dialect_insert(models.WebhookDelivery).on_conflict_do_nothing(
+        index_elements=["subscription_id", "outbox_id"])
+    db.execute(statement, rows)
+
+
+def expand_outbox(db: Session, limit: int = 500) -> int:
+    """Turn undispatched outbox rows into deliveries. Returns the number of deliveries created."""
+    outbox = models.WebhookOutbox
+    candidates = list(db.execute(
+        select(outbox.id).where(outbox.dispatched_at.is_(None)).order_by(outbox.created_at).limit(limit)
+    ).scalars())
+    if not candidates:
+        return 0
+
+    # Claim first, in the same transaction as the deliveries: rows another worker
+    # claimed meanwhile no longer match `dispatched_at IS NULL`
+    now = datetime.datetime.utcnow()
+    claim = now + datetime.timedelta(microseconds=random.randrange(1000))
+    db.execute(
+        update(outbox).where(outbox.id.in_(candidates), outbox.dispatched_at.is_(None)).values(dispatched_at=claim)
+    )
+    won = db.execute(
+        select(outbox.id, outbox.class_id, outbox.event_type)
+        .where(outbox.id.in_(candidates), outbox.dispatched_at == claim)
+        .order_by(outbox.created_at)
+    ).all()
+    if not won:
+        db.commit()
+        return 0
+
+    subscriptions: dict[str, list] = {}
+    for sub_id, class_id, events in db.execute(
+        select(models.WebhookSubscription.id, models.WebhookSubscription.class_id, models.WebhookSubscription.events)
+        .where(models.WebhookSubscription.class_id.in_({row.class_id for row in won}),
+               models.WebhookSubscription.active.is_(True))
+    ):
+        subscriptions.setdefault(class_id, []).append((sub_id, events))
+
+    deliveries = [
+        {"id": models.generate_uuid(), "subscription_id": sub_id, "outbox_id": row.id, "status": PENDING,
+         "attempts": 0, "next_attempt_at": now, "created_at": now}
+        for row in won
+        for sub_id, events in subscriptions.get(row.class_id, ())
+        if _matches(events, row.event_type)
+    ]
+    if deliveries:
+        _insert_deliveries(db, deliveries)
+    db.commit()
+    return len(deliveries)
+
+
+def claim_due(db: Session, limit: int = 100, lease: float = 60.0, timeout: float = 10.0) -> list[_Claimed]:
+    """Lease up to `limit` due deliveries to this worker.
+
+    A subscription gets at most `max_concurrency * (lease / 2) / timeout`
+    of them (at least one): even if every request runs into the timeout, the
+    last one starts well before the lease expires and another worker sends
+    it again.
+    """
+    delivery = models.WebhookDelivery
+    sub = models.WebhookSubscription
+    now = datetime.datetime.utcnow()
+    lease_until = now + datetime.timedelta(seconds=lease, microseconds=random.randrange(1000))
+    due = and_(delivery.status == PENDING, delivery.next_attempt_at <= now,
+               or_(delivery.locked_until.is_(None), delivery.locked_until < now))
+
+    ranked = (
+        select(delivery.id, delivery.next_attempt_at, sub.max_concurrency,
+               func.row_number().over(partition_by=delivery.subscription_id,
+                                      order_by=delivery.next_attempt_at).label("position"))
+        .join(sub, sub.id == delivery.subscription_id)
+        .where(due)
+        .subquery()
+    )
+    fits = or_(ranked.c.position == 1,
+               ranked.c.position * timeout <= func.coalesce(ranked.c.max_concurrency, 1) * (lease / 2))
+    ids = list(db.execute(
+        select(ranked.c.id).where(fits).order_by(ranked.c.next_attempt_at).limit(limit)
+    ).scalars())
+    if not ids:
+        return []
+    db.execute(update(delivery).where(delivery.id.in_(ids), due).values(locked_until=lease_until))
+    db.commit()
+
+    rows = db.execute(
+        select(delivery.id, delivery.attempts, sub.id, sub.url, sub.secret, sub.max_concurrency,
+               models.WebhookOutbox.event_type, models.WebhookOutbox.payload, delivery.locked_until)
+        .join(sub, sub.id == delivery.subscription_id)
+        .join(models.WebhookOutbox, models.WebhookOutbox.id == delivery.outbox_id)
+        # Only rows whose lease we actually won
+        .where(delivery.id.in_(ids), delivery.locked_until == lease_until)
+    )
+    return [_Claimed._make(row) for row in rows]
+
+
+def purge(db: Session, retention: float) -> int:
+    """Delete finished deliveries and dispatched outbox rows older than `retention` seconds."""
+    delivery, outbox = models.WebhookDelivery, models.WebhookOutbox
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=retention)
+    deleted = db.execute(
+        delete(delivery).where(delivery.status.in_((DELIVERED, DEAD)), delivery.created_at < cutoff)
+    ).rowcount
+    # Pending deliveries still need their payload
+    deleted += db.execute(
+        delete(outbox).where(outbox.dispatched_at < cutoff,
+                             ~select(delivery.id).where(delivery.outbox_id == outbox.id).exists())
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+class WebhookWorker:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        poll_interval: float = 2.0,
+        batch_size: int = 100,
+        max_attempts: int = 8,
+        retry_base: float = 10.0,
+        retry_max: float = 3600.0,
+        timeout: float = 10.0,
+        max_connections: int = 50,
+        lease: float = 60.0,
+        allow_private: bool = False,
+        retention: float = 30 * 86400,
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.lease = lease
+        self.allow_private = allow_private
+        self.retention = retention
+        self._next_purge = 0.0
+        self._session_factory = session_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._start_lock = threading.Lock()
+        self._limits: dict[str, tuple[int, asyncio.Semaphore]] = {}
+
+    def _factories(self) -> list:
+        # One session factory per database holding deliveries (every shard with SHARDS)
+        if self._session_factory is None:
+            from app.database import session_factories
+            return session_factories()
+        return [self._session_factory]
+
+    # --- lifecycle (any thread) ---
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="webhook-worker", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self, timeout: float = 10.0):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self.wake()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """Check the outbox now instead of at the next poll."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    # --- one round (also used directly by tests/benchmarks) ---
+
+    def client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        transport = httpx.AsyncHTTPTransport(limits=limits)
+        # httpx has no parameter for the network backend; its httpcore pool does
+        pool = transport._pool
+        pool._network_backend = _PublicOnlyBackend(pool._network_backend, self.allow_private)
+        return httpx.AsyncClient(timeout=self.timeout, transport=transport, follow_redirects=False)
+
+    async def run_once(self, client: httpx.AsyncClient) -> int:
+        """Fan out the outbox, deliver one batch of due deliveries. Returns deliveries attempted."""
+        attempted = 0
+        purge_now = time.monotonic() >= self._next_purge
+        if purge_now:
+            self._next_purge = time.monotonic() + min(self.retention, 60.0)
+        for factory in self._factories():
+            if purge_now:
+                await asyncio.to_thread(self._with_db, factory, purge, self.retention)
+            await asyncio.to_thread(self._with_db, factory, expand_outbox)
+            claimed = await asyncio.to_thread(self._with_db, factory, claim_due, self.batch_size, self.lease,
+                                              self.timeout)
+            if not claimed:
+                continue
+            results = await asyncio.gather(*(self._deliver(client, item) for item in claimed))
+            await asyncio.to_thread(self._with_db, factory, self._record, results)
+            attempted += len(claimed)
+        return attempted
+
+    def _with_db(self, factory, fn, *args):
+        db = factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    def _semaphore(self, item: _Claimed) -> asyncio.Semaphore:
+        size = max(1, item.max_concurrency or 1)
+        current = self._limits.get(item.subscription_id)
+        if current is None or current[0] != size:
+            current = (size, asyncio.Semaphore(size))
+            self._limits[item.subscription_id] = current
+        return current[1]
+
+    async def _deliver(self, client: httpx.AsyncClient, item: _Claimed) -> _Result:
+        body = item.payload.encode()
+        timestamp = int(time.time())
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "Classly-Webhooks/1.0",
+            "X-Classly-Event": item.event_type,
+            "X-Classly-Delivery": item.delivery_id,
+            TIMESTAMP_HEADER: str(timestamp),
+            SIGNATURE_HEADER: "sha256=" + sign(item.secret, timestamp, body),
+        }
+        async with self._semaphore(item):
+            try:
+                # The client checks the addresses again: DNS may point elsewhere than at creation
+                response = await client.post(item.url, content=body, headers=headers)
+            except UnsafeWebhookURL as e:
+                return _Result(item, None, str(e))
+            except httpx.HTTPError as e:
+                return _Result(item, None, f"{type(e).__name__}: {e}"[:500])
+        # The body is not stored: it is returned by the deliveries API
+        error = None if response.is_success else f"HTTP {response.status_code} {response.reason_phrase}".strip()
+        return _Result(item, response.status_code, error)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1)) * random.uniform(1.0, 1.2)
+
+    def _record(self, db: Session, results: list[_Result]):
+        now = datetime.datetime.utcnow()
+        rows, succeeded, failed = [], set(), set()
+        for result in results:
+            attempts = result.claimed.attempts + 1
+            row = {"delivery_id": result.claimed.delivery_id, "lease_until": result.claimed.lease_until,
+                   "attempts": attempts, "locked_until": None,
+                   "last_status_code": result.status_code, "last_error": result.error}
+            if result.ok:
+                row.update(status=DELIVERED, delivered_at=now)
+                succeeded.add(result.claimed.subscription_id)
+            else:
+                failed.add(result.claimed.subscription_id)
+                if result.status_code == 410 or attempts >= self.max_attempts:
+                    row.update(status=DEAD)
+                else:
+                    row.update(next_attempt_at=now + datetime.timedelta(seconds=self._backoff(attempts)))
+            rows.append(row)
+
+        # Rows differ in their key sets; group so each executemany has one shape.
+        # A row whose lease expired belongs to the worker that claimed it again: leave it alone
+        table = models.WebhookDelivery.__table__
+        by_shape: dict[tuple, list] = {}
+        for row in rows:
+            by_shape.setdefault(tuple(sorted(row)), []).append(row)
+        for shape, group in by_shape.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("delivery_id"), table.c.locked_until == bindparam("lease_until"))
+                .values({key: bindparam(key) for key in shape if key not in ("delivery_id", "lease_until")})
+            )
+            db.execute(statement, group)
+        subscription = models.WebhookSubscription
+        if succeeded:
+            db.execute(update(subscription).where(subscription.id.in_(succeeded)).values(last_success_at=now))
+        if failed:
+            db.execute(update(subscription).where(subscription.id.in_(failed)).values(last_failure_at=now))
+        db.commit()
+
+    # --- loop thread ---
+
+    def _run(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        ready.set()
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            self._loop = None
+            self._wakeup = None
+            loop.close()
+
+    async def _main(self):
+        async with self.client() as client:
+            while not self._stopping:
+                try:
+                    busy = await self.run_once(client)
+                except Exception:
+                    logger.exception("Webhook delivery round failed")
+                    busy = 0
+                if busy:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+
+webhook_worker = WebhookWorker(
+    poll_interval=float(os.getenv("WEBHOOK_POLL_INTERVAL", "2")),
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+    retry_base=float(os.getenv("WEBHOOK_RETRY_BASE", "10")),
+    retry_max=float(os.getenv("WEBHOOK_RETRY_MAX", "3600")),
+    timeout=float(os.getenv("WEBHOOK_TIMEOUT", "10")),
+    allow_private=allow_private_urls(),
+    retention=float(os.getenv("WEBHOOK_RETENTION_DAYS", "30")) * 86400,
+)
@@ -1,20 +1,124 @@
+import functools
 import os
-from sqlalchemy import create_engine
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.core import metrics, replicas
+from app.core.query_stats import query_stats
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./classly.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def normalize_url(database_url: str) -> str:
+    """postgres:// and driverless postgresql:// URLs use psycopg 3 (the driver in requirements.txt)."""
+    url = make_url(database_url)
+    if url.drivername in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+psycopg")
+    return url.render_as_string(hide_password=False)
+
+
+def engine_options(database_url: str) -> dict:
+    """create_engine() arguments: thread-shared SQLite connections, or a sized and pre-pinged server pool."""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+
+SQLALCHEMY_DATABASE_URL = normalize_url(os.getenv("DATABASE_URL", "sqlite:///./classly.db"))
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+query_stats.instrument(engine)
+metrics.instrument(engine)
+
+# Read replicas (DATABASE_REPLICA_URLS): repository reads, see app/core/replicas.py
+replica_engines = []
+for _url in map(normalize_url, replicas.replica_urls()):
+    replica_engines.append(create_engine(_url, **engine_options(_url)))
+    query_stats.instrument(replica_engines[-1])
+    metrics.instrument(replica_engines[-1])
+
+if replica_engines:
+    replica_router = replicas.ReplicaRouter(
+        replica_engines,
+        max_lag=float(os.getenv("DB_REPLICA_MAX_LAG", "5")),
+        check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "1")),
+    )
+    SessionLocal = sessionmaker(class_=replicas.RoutingSession, router=replica_router,
+                                autocommit=False, autoflush=False, bind=engine)
+else:
+    replica_router = None
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+# Sharding (SHARDS): classes spread over several databases, DATABASE_URL is the directory; see app/core/sharding.py
+shard_map = None
+if os.getenv("SHARDS"):
+    if replica_engines:
+        raise ValueError("SHARDS can't be combined with DATABASE_REPLICA_URLS")
+    from app.core import sharding  # imports the models, which need Base
+
+    _shard_engines = {}
+    for _name, _url in sharding.shard_urls().items():
+        _url = normalize_url(_url)
+        if any(_url == _other.url.render_as_string(hide_password=False) for _other in _shard_engines.values()):
+            raise ValueError(f"SHARDS: {_name} uses the same database as another shard")
+        if _url == SQLALCHEMY_DATABASE_URL:
+            _shard_engines[_name] = engine
+            continue
+        _shard_engines[_name] = create_engine(_url, **engine_options(_url))
+        query_stats.instrument(_shard_engines[_name])
+        metrics.instrument(_shard_engines[_name])
+    shard_map = sharding.ShardMap(engine, _shard_engines, cache_seconds=float(os.getenv("SHARD_CACHE_SECONDS", "5")))
+    SessionLocal = sessionmaker(class_=sharding.ShardSession, shard_map=shard_map, autocommit=False, autoflush=False)
+    sharding.install(SessionLocal)
+
+
+def database_size(bind=None) -> Optional[int]:
+    """Size of the database in bytes from the catalog, None for unsupported backends."""
+    if bind is None and shard_map is not None:  # directory + all shards
+        sizes = [database_size(shard) for shard in {engine, *shard_map.shards.values()}]
+        return None if None in sizes else sum(sizes)
+    bind = bind if bind is not None else engine
+    with bind.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            pages = conn.execute(text("PRAGMA page_count")).scalar()
+            return pages * conn.execute(text("PRAGMA page_size")).scalar()
+        if dialect == "postgresql":
+            return conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+        if dialect in ("mysql", "mariadb"):
+            return int(conn.execute(text(
+                "SELECT COALESCE(SUM(data_length + index_length), 0) "
+                "FROM information_schema.tables WHERE table_schema = DATABASE()"
+            )).scalar())
+    return None
+
+
+def session_factories() -> list:
+    """Session factories covering all class data once: SessionLocal, or one pinned to each shard."""
+    if shard_map is None:
+        return [SessionLocal]
+
+    def pinned(shard: str):
+        db = SessionLocal()
+        db.pin_shard(shard)
+        return db
+    return [functools.partial(pinned, name) for name in shard_map.names]
+
+
+def get_db(request: Request):
     db = SessionLocal()
     try:
+        if shard_map is not None:
+            db.pin(shard_map.request_class(request))
         yield db
     finally:
         db.close()
@@ -1,13 +1,46 @@
 import json
 import os
-from typing import Dict, Any
+import time
+from typing import Callable, Dict, Any
+
+
+def flatten_catalogue(data: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    """
+    Flatten a nested locale dict into dotted keys.
+    {"common": {"save": "Speichern"}} -> {"common.save": "Speichern"}
+    Non-string leaves are dropped (get_translation only ever returned strings).
+    """
+    flat: Dict[str, str] = {}
+    for key, value in data.items():
+        dotted = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_catalogue(value, f"{dotted}."))
+        elif isinstance(value, str):
+            flat[dotted] = value
+    return flat
+
+
+def _make_translator(catalogue: Dict[str, str]) -> Callable[[str], str]:
+    # Bind dict.get as a default arg so a template t() call is a single C-level lookup.
+    def t(key: str, _get=catalogue.get) -> str:
+        return _get(key, key)
+
+    return t
 
 
 class I18n:
     def __init__(self, locales_dir: str = "app/locales", default_lang: str = "de"):
         self.locales_dir = locales_dir
         self.default_lang = default_lang
+        # Raw nested JSON per language (kept for compatibility / `lang in translations` checks)
         self.translations: Dict[str, Dict[str, Any]] = {}
+        # Flat catalogue per language with the default language merged in as fallback
+        self.catalogues: Dict[str, Dict[str, str]] = {}
+        self._translators: Dict[str, Callable[[str], str]] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._last_check = 0.0
+        # Hot reload: re-stat locale files at most every N seconds (0 disables)
+        self.reload_interval = float(os.getenv("I18N_RELOAD_INTERVAL", "2"))
         self.load_translations()
 
     def load_translations(self):
@@ -15,52 +48,95 @@ class I18n:
             print(f"Warning: Locales directory {self.locales_dir} not found.")
             return
 
+        translations: Dict[str, Dict[str, Any]] = {}
+        mtimes: Dict[str, float] = {}
         for filename in os.listdir(self.locales_dir):
             if filename.endswith(".json"):
                 lang = filename[:-5]
+                path = os.path.join(self.locales_dir, filename)
                 try:
-                    with open(
-                        os.path.join(self.locales_dir, filename), "r", encoding="utf-8"
-                    ) as f:
-                        self.translations[lang] = json.load(f)
+                    mtimes[path] = os.path.getmtime(path)
+                    with open(path, "r", encoding="utf-8") as f:
+                        translations[lang] = json.load(f)
                 except Exception as e:
                     print(f"Error loading locale {lang}: {e}")
+                    # Keep the previously loaded version of a broken file
+                    if lang in self.translations:
+                        translations[lang] = self.translations[lang]
+
+        self.translations = translations
+        self._mtimes = mtimes
+        self._last_check = time.monotonic()
+        self._compile()
+
+    def _compile(self):
+        """Build flat catalogues once; lookups afterwards are a single dict.get."""
+        flat = {lang: flatten_catalogue(data) for lang, data in self.translations.items()}
+        default = flat.get(self.default_lang, {})
+
+        catalogues: Dict[str, Dict[str, str]] = {}
+        for lang, entries in flat.items():
+            if lang == self.default_lang:
+                catalogues[lang] = entries
+            else:
+                catalogues[lang] = {**default, **entries}
+
+        # Swap atomically so concurrent requests never see a half-built state
+        self.catalogues = catalogues
+        self._translators = {}
+
+    def reload_if_changed(self) -> bool:
+        """Reload locale files if any mtime changed (throttled by reload_interval)."""
+        if self.reload_interval <= 0:
+            return False
+
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+
+        try:
+            current = {
+                os.path.join(self.locales_dir, f): os.path.getmtime(os.path.join(self.locales_dir, f))
+                for f in os.listdir(self.locales_dir)
+                if f.endswith(".json")
+            }
+        except OSError:
+            return False
+
+        if current == self._mtimes:
+            return False
+
+        self.load_translations()
+        return True
+
+    def translator(self, lang: str) -> Callable[[str], str]:
+        """
+        Cached translator callable for templates: t('common.save').
+        Unknown languages fall back to the default language.
+        """
+        self.reload_if_changed()
+
+        t = self._translators.get(lang)
+        if t is None:
+            catalogue = self.catalogues.get(lang)
+            if catalogue is None:
+                catalogue = self.catalogues.get(self.default_lang, {})
+            t = _make_translator(catalogue)
+            self._translators[lang] = t
+        return t
 
     def get_translation(self, lang: str, key: str) -> str:
         """
         Get translation for a key. Key format: 'section.key' (e.g., 'common.save')
         Falls back to default language if key not found in requested language.
         """
-        # Try requested language
-        val = self._lookup(lang, key)
-        if val is not None:
-            return val
-
-        # Try default language
-        if lang != self.default_lang:
-            val = self._lookup(self.default_lang, key)
-            if val is not None:
-                return val
+        catalogue = self.catalogues.get(lang)
+        if catalogue is None:
+            catalogue = self.catalogues.get(self.default_lang, {})
 
         # Fallback to key itself
-        return key
-
-    def _lookup(self, lang: str, key: str) -> str | None:
-        if lang not in self.translations:
-            return None
-
-        data = self.translations[lang]
-        parts = key.split(".")
-
-        for part in parts:
-            if isinstance(data, dict) and part in data:
-                data = data[part]
-            else:
-                return None
-
-        if isinstance(data, str):
-            return data
-        return None
+        return catalogue.get(key, key)
 
 
 # Singleton instance
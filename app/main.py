@@ -1,8 +1,7 @@
 import os
 from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from app.database import engine, Base, SQLALCHEMY_DATABASE_URL, SessionLocal
+from fastapi.responses import JSONResponse, RedirectResponse
+from app.database import engine, Base, SQLALCHEMY_DATABASE_URL, SessionLocal, replica_router, shard_map
 from app.routers import (
     auth,
     pages,
@@ -16,6 +15,8 @@ from app.routers import (
     i18n_router,
     oauth,
     push,
+    live,
+    metrics,
 )
 from app.routers import api_v1
 from app import fix_db_schema, crud, auto_migrate
@@ -24,6 +25,8 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from app.limiter import limiter
 from app.i18n import i18n
+from app.core.static_assets import static_files
+from app.core.compression import CompressionMiddleware, compression_enabled
 from app.core.csrf import (
     CSRF_COOKIE_NAME,
     CSRF_FORM_FIELD,
@@ -35,10 +38,22 @@ from app.core.csrf import (
     same_token,
 )
 from app.core.cookies import cookie_secure
+from app.core.live_updates import LiveStreamMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.replicas import ReplicaStickinessMiddleware, sticky_seconds
+from app.core.metrics import MetricsMiddleware, metrics_enabled
+from app.core.profiler import ProfilerMiddleware, profiler_instance
+from app.core.webhooks import install as install_webhooks, webhook_worker, webhooks_enabled
+from app.core.db_backup import db_backups
 
 # Fix DB Schema (Add missing columns to old SQLite volumes)
 fix_db_schema.fix_schema(SQLALCHEMY_DATABASE_URL)
 auto_migrate.run_auto_migrations()
+if shard_map is not None:
+    for shard_engine in shard_map.engines():
+        if shard_engine is not engine:
+            auto_migrate.run_auto_migrations(shard_engine)
+    shard_map.create_tables()
 
 # Create Tables
 Base.metadata.create_all(bind=engine)
@@ -65,6 +80,19 @@ if os.getenv("AUTOMIGRATE_TO") == "appwrite":
 
 app = FastAPI(title="Classly")
 
+# Sampling profiler (admin header or 1 in N requests); see app/core/profiler.py.
+# Added first = innermost: the middlewares below run the app in child tasks,
+# whose event loop stacks the profiler could not attribute to the request.
+if profiler_instance.enabled:
+    app.add_middleware(ProfilerMiddleware)
+
+# SSE streams, answered without FastAPI routing but inside every layer added
+# below (CORS, rate limit, security headers, metrics); see app/core/live_updates.py
+app.add_middleware(LiveStreamMiddleware, routes={
+    "/api/v1/stream": api_v1.stream.open_stream,
+    "/live/stream": live.open_stream,
+})
+
 # CORS Middleware
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -89,6 +117,14 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
 
+if shard_map is not None:
+    from app.core.sharding import ClassMovingError
+
+    @app.exception_handler(ClassMovingError)
+    async def class_moving_handler(request: Request, exc: ClassMovingError):
+        # Writes to a class pause while app.core.sharding moves it (seconds)
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
 # Max File Size Middleware
 from fastapi import Request
 from fastapi.responses import JSONResponse
@@ -167,8 +203,8 @@ async def csrf_middleware(request: Request, call_next):
         )
     return response
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Mount static files (fingerprinted + precompressed, see app/core/static_assets.py)
+app.mount("/static", static_files, name="static")
 
 
 @app.middleware("http")
@@ -213,11 +249,8 @@ async def language_middleware(request: Request, call_next):
 
     request.state.lang = lang
 
-    # Helper function for templates
-    def t(key):
-        return i18n.get_translation(request.state.lang, key)
-
-    request.state.t = t
+    # Helper function for templates (precompiled, cached per language)
+    request.state.t = i18n.translator(lang)
 
     response = await call_next(request)
     return response
@@ -246,6 +279,22 @@ async def domain_migration_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+# Response compression (outermost, so it sees the final body of every route)
+if compression_enabled():
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
+# SQL statements per request (count, DB time, Server-Timing); see app/core/query_stats.py
+app.add_middleware(QueryStatsMiddleware)
+
+# Read-your-writes when repository reads go to replicas; see app/core/replicas.py
+if replica_router is not None:
+    app.add_middleware(ReplicaStickinessMiddleware, sticky_seconds=sticky_seconds())
+
+# Prometheus metrics (/metrics); see app/core/metrics.py
+if metrics_enabled():
+    app.add_middleware(MetricsMiddleware)
+
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(pages.router)
@@ -260,3 +309,30 @@ app.include_router(api_v1.router)  # New API v1 (/api/v1/)
 app.include_router(i18n_router.router)
 app.include_router(oauth.router)
 app.include_router(push.router)
+app.include_router(live.router)
+if metrics_enabled():
+    app.include_router(metrics.router)
+
+
+# Webhooks: outbox rows are written with every event change; the worker delivers them
+if webhooks_enabled():
+    install_webhooks(SessionLocal)
+
+    @app.on_event("startup")
+    def start_webhook_worker():
+        webhook_worker.start()
+
+    @app.on_event("shutdown")
+    def stop_webhook_worker():
+        webhook_worker.stop()
+
+
+# Scheduled online backups of the SQLite file; see app/core/db_backup.py
+if db_backups.enabled:
+    @app.on_event("startup")
+    def start_db_backups():
+        db_backups.start()
+
+    @app.on_event("shutdown")
+    def stop_db_backups():
+        db_backups.stop()
@@ -2,7 +2,7 @@ import enum
 import datetime
 import uuid
 import secrets
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Boolean, Enum, Float, Time
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Date, Boolean, Enum, Float, Time, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -307,6 +307,18 @@ class UserTimetableSelection(Base):
     user = relationship("User", backref="timetable_selections")
     slot = relationship("TimetableSlot", backref="user_selections")
 
+class TimetableHoliday(Base):
+    """Unterrichtsfreie Tage (Ferien, Feiertage) - als EXDATE im Stundenplan-Kalender"""
+    __tablename__ = "timetable_holidays"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    class_id = Column(String, ForeignKey("classes.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)  # z.B. "Herbstferien"
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # inklusive
+    
+    clazz = relationship("Class", backref="timetable_holidays")
+
 
 # === OAuth Models ===
 
@@ -370,3 +382,82 @@ class DeviceToken(Base):
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     user = relationship("User", backref="device_tokens")
+
+
+# === Webhooks ===
+
+class WebhookSubscription(Base):
+    """Webhook endpoint of a class (managed via API v1, scope webhooks:manage)"""
+    __tablename__ = "webhook_subscriptions"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    class_id = Column(String, ForeignKey("classes.id"), nullable=False, index=True)
+    url = Column(String, nullable=False)
+    secret = Column(String, nullable=False, default=generate_token)  # HMAC-SHA256 key
+    events = Column(String, nullable=False, default="*")  # comma separated, e.g. "event.created,event.updated"
+    active = Column(Boolean, default=True)
+    max_concurrency = Column(Integer, default=2)  # parallel deliveries to this endpoint
+    created_by = Column(String, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_success_at = Column(DateTime, nullable=True)
+    last_failure_at = Column(DateTime, nullable=True)
+
+class WebhookOutbox(Base):
+    """Change record, written in the same transaction as the change itself"""
+    __tablename__ = "webhook_outbox"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    class_id = Column(String, nullable=False)
+    event_type = Column(String, nullable=False)  # "event.created", "event.updated", "event.deleted"
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    dispatched_at = Column(DateTime, nullable=True, index=True)  # fanned out into deliveries
+
+class WebhookDelivery(Base):
+    """One outbox record for one subscription; status "dead" = dead-letter queue"""
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        # One delivery per record and subscription, even if two workers fan out the same record
+        Index("ix_webhook_deliveries_subscription_outbox", "subscription_id", "outbox_id", unique=True),
+    )
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    subscription_id = Column(String, ForeignKey("webhook_subscriptions.id"), nullable=False, index=True)
+    outbox_id = Column(String, ForeignKey("webhook_outbox.id"), nullable=False)
+    status = Column(String, default="pending", index=True)  # pending, delivered, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    locked_until = Column(DateTime, nullable=True)  # claimed by a worker
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+    
+    subscription = relationship("WebhookSubscription", backref="deliveries")
+    outbox = relationship("WebhookOutbox")
+
+
+# === Live Updates ===
+
+class LiveUpdate(Base):
+    """Change notification shared between app workers (LIVE_BACKEND=database)"""
+    __tablename__ = "live_updates"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # doubles as SSE event id
+    class_id = Column(String, nullable=False)
+    topic = Column(String, nullable=False)  # "events", "subjects", "timetable"
+    data = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+
+# === Cache Invalidation ===
+
+class CacheInvalidation(Base):
+    """Invalidation broadcast between app workers (see app/core/invalidation.py)"""
+    __tablename__ = "cache_invalidations"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # workers remember the last id they applied
+    channel = Column(String, nullable=False)  # "fragments", "schedule", "schedule_user"
+    key = Column(String, nullable=False)
+    origin = Column(String, nullable=False)  # publishing worker, skips its own rows
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
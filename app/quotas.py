@@ -2,6 +2,7 @@ import os
 from app import models
 from fastapi import HTTPException
 from app.models import UserRole
+from app.database import database_size
 from app.repository.base import BaseRepository
 
 # Quota Limits
@@ -36,19 +37,13 @@ def check_class_quota(repo: BaseRepository):
     pass
 
 def check_storage_quota():
-    # Check SQLite DB size via generic OS check - valid for SQL mode.
+    # Database size from the catalog (SQLite pages, pg_database_size, ...).
     # For Appwrite, we rely on Appwrite quotas.
     if os.getenv("APPWRITE", "").lower() == "true":
         return
 
-    db_path = "app.db" # Check database.py or env
-    # Simplification: Assume app.db or check if exists
-    if os.path.exists("classly.db"):
-         # Default name in database.py is classly.db? No, database.py says "sqlite:///./classly.db"
-         db_path = "classly.db"
-    
-    if os.path.exists(db_path):
-        size_bytes = os.path.getsize(db_path)
+    size_bytes = database_size()
+    if size_bytes is not None:
         size_mb = size_bytes / (1024 * 1024)
         if size_mb >= MAX_TOTAL_STORAGE_MB:
              raise HTTPException(status_code=507, detail=f"Storage quota exceeded. Max {MAX_TOTAL_STORAGE_MB} MB allowed.")
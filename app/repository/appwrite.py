@@ -1,9 +1,12 @@
+from dataclasses import replace
 from typing import List, Optional
 import os
 import secrets
 from datetime import datetime
 from app import models
 from app.repository.base import BaseRepository
+from app.repository.dto import ClassDTO, EventDTO, SubjectDTO, UserDTO
+from app.repository.rows import EventRow, MemberRow, SlotRow, SubjectRow
 from appwrite.client import Client
 from appwrite.services.databases import Databases
 from appwrite.services.users import Users
@@ -11,6 +14,19 @@ from appwrite.id import ID
 from appwrite.query import Query
 from appwrite.exception import AppwriteException
 
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+
+def _parse_role(value: Optional[str]) -> models.UserRole:
+    # Prefs are editable outside Classly; an unknown role must not break every request of the user
+    try:
+        return models.UserRole(value)
+    except ValueError:
+        return models.UserRole.MEMBER
+
+
 class AppwriteRepository(BaseRepository):
     def __init__(self):
         self.client = Client()
@@ -22,59 +38,54 @@ class AppwriteRepository(BaseRepository):
         self.users = Users(self.client)
         self.database_id = os.getenv("APPWRITE_DATABASE_ID", "classly_db")
 
-    def _map_doc_to_user(self, doc: dict) -> models.User:
-        user = models.User()
-        user.id = doc.get('$id')
-        user.name = doc.get('name')
-        user.email = doc.get('email')
-        
+    def _map_doc_to_user(self, doc: dict) -> UserDTO:
         prefs = doc.get('prefs', {})
-        user.class_id = prefs.get('class_id')
-        user.role = prefs.get('role', models.UserRole.MEMBER)
-        user.is_registered = prefs.get('is_registered', False)
-        user.language = prefs.get('language', 'de')
-        
-        user.created_at = datetime.fromisoformat(doc.get('registration').replace('Z', '+00:00')) if doc.get('registration') else datetime.now()
-        
-        return user
-
-    def _map_doc_to_class(self, doc: dict) -> models.Class:
-        c = models.Class()
-        c.id = doc.get('$id')
-        c.name = doc.get('name')
-        c.join_token = doc.get('join_token')
-        c.owner_id = doc.get('owner_id')
-        c.join_enabled = doc.get('join_enabled')
-        c.timetable_public_enabled = doc.get('timetable_public_enabled', False)
-        c.timetable_public_token = doc.get('timetable_public_token')
-        c.created_at = datetime.fromisoformat(doc.get('$createdAt').replace('Z', '+00:00')) if doc.get('$createdAt') else datetime.now()
-        return c
-
-    def _map_doc_to_event(self, doc: dict) -> models.Event:
-        e = models.Event()
-        e.id = doc.get('$id')
-        e.class_id = doc.get('class_id')
-        e.title = doc.get('title')
-        e.type = models.EventType(doc.get('type')) if doc.get('type') else models.EventType.INFO
-        e.priority = models.Priority(doc.get('priority')) if doc.get('priority') else models.Priority.MEDIUM
-        e.subject_id = doc.get('subject_id')
-        e.subject_name = doc.get('subject_name')
-        e.author_id = doc.get('author_id')
-        
-        date_str = doc.get('date')
-        if date_str:
-            e.date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            
-        return e
-
-    def get_user(self, user_id: str) -> Optional[models.User]:
+        return UserDTO(
+            id=doc.get('$id'),
+            name=doc.get('name'),
+            class_id=prefs.get('class_id'),
+            role=_parse_role(prefs.get('role')),
+            email=doc.get('email'),
+            is_registered=prefs.get('is_registered', False),
+            language=prefs.get('language', 'de'),
+            created_at=_parse_datetime(doc.get('registration')) or datetime.now(),
+        )
+
+    def _map_doc_to_class(self, doc: dict) -> ClassDTO:
+        return ClassDTO(
+            id=doc.get('$id'),
+            name=doc.get('name'),
+            join_token=doc.get('join_token'),
+            owner_id=doc.get('owner_id'),
+            join_enabled=doc.get('join_enabled'),
+            timetable_public_enabled=doc.get('timetable_public_enabled', False),
+            timetable_public_token=doc.get('timetable_public_token'),
+            created_at=_parse_datetime(doc.get('$createdAt')) or datetime.now(),
+        )
+
+    def _map_doc_to_event(self, doc: dict) -> EventDTO:
+        return EventDTO(
+            id=doc.get('$id'),
+            class_id=doc.get('class_id'),
+            type=models.EventType(doc.get('type')) if doc.get('type') else models.EventType.INFO,
+            priority=models.Priority(doc.get('priority')) if doc.get('priority') else models.Priority.MEDIUM,
+            subject_id=doc.get('subject_id'),
+            subject_name=doc.get('subject_name'),
+            title=doc.get('title'),
+            date=_parse_datetime(doc.get('date')),
+            author_id=doc.get('author_id'),
+            created_at=_parse_datetime(doc.get('$createdAt')),
+            updated_at=_parse_datetime(doc.get('$updatedAt')),
+        )
+
+    def get_user(self, user_id: str) -> Optional[UserDTO]:
         try:
             u = self.users.get(user_id)
             return self._map_doc_to_user(u)
         except AppwriteException:
             return None
 
-    def get_user_by_email(self, email: str) -> Optional[models.User]:
+    def get_user_by_email(self, email: str) -> Optional[UserDTO]:
         try:
             result = self.users.list(queries=[Query.equal('email', email)])
             if result['users']:
@@ -83,7 +94,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return None
 
-    def create_user(self, name: str, class_id: str, role: models.UserRole = models.UserRole.MEMBER, email: str = None, password: str = None) -> models.User:
+    def create_user(self, name: str, class_id: str, role: models.UserRole = models.UserRole.MEMBER, email: str = None, password: str = None) -> UserDTO:
         user_id = ID.unique()
         if not email:
             email = f"{user_id}@classly.local"
@@ -111,14 +122,12 @@ class AppwriteRepository(BaseRepository):
             self.users.update_prefs(user_id, prefs)
             
             u = self.users.get(user_id)
-            user_model = self._map_doc_to_user(u)
-            user_model.session_token = session_token 
-            return user_model
+            return replace(self._map_doc_to_user(u), session_token=session_token)
         except AppwriteException as e:
             print(f"Appwrite Error: {e}")
             raise e
 
-    def register_user(self, user_id: str, email: str, password: str) -> Optional[models.User]:
+    def register_user(self, user_id: str, email: str, password: str) -> Optional[UserDTO]:
         try:
             self.users.update_email(user_id, email)
             self.users.update_password(user_id, password)
@@ -139,7 +148,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return False
 
-    def get_user_by_session(self, session_token: str) -> Optional[models.User]:
+    def get_user_by_session(self, session_token: str) -> Optional[UserDTO]:
         try:
             result = self.db.list_documents(self.database_id, 'sessions', [
                 Query.equal('token', session_token)
@@ -147,18 +156,20 @@ class AppwriteRepository(BaseRepository):
             if result['documents']:
                 user_id = result['documents'][0]['user_id']
                 u = self.users.get(user_id)
-                user_model = self._map_doc_to_user(u)
-                user_model.session_token = session_token
-                return user_model
+                return replace(self._map_doc_to_user(u), session_token=session_token)
             return None
         except AppwriteException:
             return None
 
-    def get_class_members(self, class_id: str) -> List[models.User]:
+    def get_class_members(self, class_id: str) -> List[UserDTO]:
         # Simplified: Empty list as detailed in thought process
         return []
 
-    def update_user_role(self, user_id: str, role: models.UserRole) -> Optional[models.User]:
+    def list_member_rows(self, class_id: str) -> List[MemberRow]:
+        # Same limitation as get_class_members: the Users service cannot filter on prefs
+        return []
+
+    def update_user_role(self, user_id: str, role: models.UserRole) -> Optional[UserDTO]:
         try:
             user = self.users.get(user_id)
             prefs = user.get('prefs', {})
@@ -168,7 +179,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return None
 
-    def get_class(self, class_id: str) -> Optional[models.Class]:
+    def get_class(self, class_id: str) -> Optional[ClassDTO]:
         try:
             doc = self.db.get_document(self.database_id, 'classes', class_id)
             return self._map_doc_to_class(doc)
@@ -183,7 +194,7 @@ class AppwriteRepository(BaseRepository):
         join_enabled: bool = None,
         timetable_public_enabled: bool = None,
         timetable_public_token: str = None,
-    ) -> Optional[models.Class]:
+    ) -> Optional[ClassDTO]:
         data = {}
         if owner_id is not None: data['owner_id'] = owner_id
         if join_token is not None: data['join_token'] = join_token
@@ -197,7 +208,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return None
 
-    def create_class(self, name: str, join_token: str) -> models.Class:
+    def create_class(self, name: str, join_token: str) -> ClassDTO:
         data = {
             'name': name,
             'join_token': join_token,
@@ -210,7 +221,7 @@ class AppwriteRepository(BaseRepository):
             print(f"Appwrite Error: {e}")
             raise e
 
-    def get_class_by_token(self, join_token: str) -> Optional[models.Class]:
+    def get_class_by_token(self, join_token: str) -> Optional[ClassDTO]:
         try:
             result = self.db.list_documents(self.database_id, 'classes', [
                 Query.equal('join_token', join_token)
@@ -237,7 +248,7 @@ class AppwriteRepository(BaseRepository):
             t.class_id = doc['class_id']
             t.user_id = doc.get('user_id')
             t.user_name = doc.get('user_name')
-            t.role = models.UserRole(doc.get('role', 'member'))
+            t.role = _parse_role(doc.get('role'))
             
             # Note: Max uses decrement logic should be handled by caller or here. 
             # In SQL crud, it decrements. Here we should too.
@@ -288,7 +299,7 @@ class AppwriteRepository(BaseRepository):
                 t.token = doc['token']
                 t.user_id = doc.get('user_id')
                 t.user_name = doc.get('user_name')
-                t.role = models.UserRole(doc.get('role', 'member'))
+                t.role = _parse_role(doc.get('role'))
                 t.created_by = doc.get('created_by')
                 t.created_at = datetime.fromisoformat(doc['$createdAt'])
                 if doc.get('expires_at'):
@@ -300,7 +311,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return []
 
-    def get_events_for_class(self, class_id: str) -> List[models.Event]:
+    def get_events_for_class(self, class_id: str) -> List[EventDTO]:
         try:
             result = self.db.list_documents(self.database_id, 'events', [
                 Query.equal('class_id', class_id),
@@ -312,7 +323,7 @@ class AppwriteRepository(BaseRepository):
 
     def create_event(self, class_id: str, author_id: str, type: models.EventType, date: datetime, 
                      subject_id: str = None, subject_name: str = None, title: str = None, 
-                     priority: models.Priority = models.Priority.MEDIUM) -> models.Event:
+                     priority: models.Priority = models.Priority.MEDIUM) -> EventDTO:
         data = {
             'class_id': class_id,
             'author_id': author_id,
@@ -330,7 +341,7 @@ class AppwriteRepository(BaseRepository):
             print(f"Appwrite Error: {e}")
             raise e
 
-    def get_event(self, event_id: str) -> Optional[models.Event]:
+    def get_event(self, event_id: str) -> Optional[EventDTO]:
         try:
             doc = self.db.get_document(self.database_id, 'events', event_id)
             return self._map_doc_to_event(doc)
@@ -338,7 +349,7 @@ class AppwriteRepository(BaseRepository):
             return None
 
     def update_event(self, event_id: str, type: models.EventType = None, subject_name: str = None, 
-                     title: str = None, date: datetime = None, priority: models.Priority = None) -> Optional[models.Event]:
+                     title: str = None, date: datetime = None, priority: models.Priority = None) -> Optional[EventDTO]:
         data = {}
         if type: data['type'] = type.value
         if subject_name is not None: data['subject_name'] = subject_name
@@ -352,7 +363,7 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return None
 
-    def list_events(self, class_id: str, limit: int = 100, updated_since: datetime = None, type: models.EventType = None) -> List[models.Event]:
+    def list_events(self, class_id: str, limit: int = 100, updated_since: datetime = None, type: models.EventType = None) -> List[EventDTO]:
         queries = [
             Query.equal('class_id', class_id),
             Query.limit(limit),
@@ -369,6 +380,40 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return []
 
+    def list_event_rows(self, class_id: str, limit: int = 100, updated_since: datetime = None, type: models.EventType = None) -> List[EventRow]:
+        queries = [
+            Query.equal('class_id', class_id),
+            Query.select(['$id', '$createdAt', '$updatedAt', 'class_id', 'type', 'priority',
+                          'subject_id', 'subject_name', 'title', 'date', 'author_id']),
+            Query.limit(limit),
+            Query.order_desc('$updatedAt')
+        ]
+        if updated_since:
+            queries.append(Query.greater_than_equal('$updatedAt', updated_since.isoformat()))
+        if type:
+            queries.append(Query.equal('type', type.value))
+
+        try:
+            result = self.db.list_documents(self.database_id, 'events', queries)
+        except AppwriteException:
+            return []
+        return [
+            EventRow(
+                doc.get('$id'),
+                doc.get('class_id'),
+                models.EventType(doc.get('type')) if doc.get('type') else models.EventType.INFO,
+                models.Priority(doc.get('priority')) if doc.get('priority') else models.Priority.MEDIUM,
+                doc.get('subject_id'),
+                doc.get('subject_name'),
+                doc.get('title'),
+                _parse_datetime(doc.get('date')),
+                doc.get('author_id'),
+                _parse_datetime(doc.get('$createdAt')),
+                _parse_datetime(doc.get('$updatedAt')),
+            )
+            for doc in result['documents']
+        ]
+
     def count_events(self, class_id: str) -> int:
         try:
             result = self.db.list_documents(self.database_id, 'events', [
@@ -465,15 +510,15 @@ class AppwriteRepository(BaseRepository):
             return False
 
     # --- Subjects ---
-    def _map_doc_to_subject(self, doc: dict) -> models.Subject:
-        s = models.Subject()
-        s.id = doc.get('$id')
-        s.class_id = doc.get('class_id')
-        s.name = doc.get('name')
-        s.color = doc.get('color', '#666666')
-        return s
+    def _map_doc_to_subject(self, doc: dict) -> SubjectDTO:
+        return SubjectDTO(
+            id=doc.get('$id'),
+            class_id=doc.get('class_id'),
+            name=doc.get('name'),
+            color=doc.get('color', '#666666'),
+        )
 
-    def create_subject(self, class_id: str, name: str, color: str = "#666666") -> models.Subject:
+    def create_subject(self, class_id: str, name: str, color: str = "#666666") -> SubjectDTO:
         try:
             doc = self.db.create_document(self.database_id, 'subjects', ID.unique(), {
                 'class_id': class_id, 'name': name, 'color': color
@@ -482,14 +527,14 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException as e:
             raise e
 
-    def get_subject(self, subject_id: str) -> Optional[models.Subject]:
+    def get_subject(self, subject_id: str) -> Optional[SubjectDTO]:
         try:
             doc = self.db.get_document(self.database_id, 'subjects', subject_id)
             return self._map_doc_to_subject(doc)
         except AppwriteException:
             return None
 
-    def get_subjects_for_class(self, class_id: str) -> List[models.Subject]:
+    def get_subjects_for_class(self, class_id: str) -> List[SubjectDTO]:
         try:
             result = self.db.list_documents(self.database_id, 'subjects', [
                 Query.equal('class_id', class_id),
@@ -499,6 +544,17 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return []
 
+    def list_subject_rows(self, class_id: str) -> List[SubjectRow]:
+        try:
+            result = self.db.list_documents(self.database_id, 'subjects', [
+                Query.equal('class_id', class_id),
+                Query.select(['$id', 'name', 'color']),
+                Query.order_asc('name')
+            ])
+        except AppwriteException:
+            return []
+        return [SubjectRow(doc.get('$id'), doc.get('name'), doc.get('color', '#666666')) for doc in result['documents']]
+
     def count_subjects(self, class_id: str) -> int:
         try:
             result = self.db.list_documents(self.database_id, 'subjects', [
@@ -516,6 +572,28 @@ class AppwriteRepository(BaseRepository):
         except AppwriteException:
             return False
 
+    # --- Timetable ---
+    def list_slot_rows(self, class_id: str, weekday: int = None) -> List[SlotRow]:
+        queries = [
+            Query.equal('class_id', class_id),
+            Query.select(['$id', 'weekday', 'slot_number', 'subject_id', 'subject_name', 'group_name', 'room']),
+            Query.order_asc('weekday'),
+            Query.order_asc('slot_number'),
+            Query.limit(500)
+        ]
+        if weekday is not None:
+            queries.append(Query.equal('weekday', weekday))
+
+        try:
+            result = self.db.list_documents(self.database_id, 'timetable_slots', queries)
+        except AppwriteException:
+            return []
+        return [
+            SlotRow(doc.get('weekday'), doc.get('$id'), doc.get('slot_number'), doc.get('subject_id'),
+                    doc.get('subject_name'), doc.get('group_name'), doc.get('room'))
+            for doc in result['documents']
+        ]
+
     # --- Audit ---
     def create_audit_log(self, class_id: str, user_id: str, action: models.AuditAction, 
                          target_id: str = None, data: str = None, permanent: bool = False) -> models.AuditLog:
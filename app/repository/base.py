@@ -1,9 +1,15 @@
+import contextlib
 from abc import ABC, abstractmethod
 from typing import List, Optional
 from app import models
+from app.repository.rows import EventRow, MemberRow, SlotRow, SubjectRow
 import datetime
 
 class BaseRepository(ABC):
+    def primary_reads(self):
+        """Context for reads whose result is cached beyond the request: no replica (backends without replicas: no-op)."""
+        return contextlib.nullcontext()
+
     @abstractmethod
     def get_user(self, user_id: str) -> Optional[models.User]:
         pass
@@ -32,6 +38,10 @@ class BaseRepository(ABC):
     def get_class_members(self, class_id: str) -> List[models.User]:
         pass
 
+    @abstractmethod
+    def list_member_rows(self, class_id: str) -> List[MemberRow]:
+        pass
+
     @abstractmethod
     def update_user_role(self, user_id: str, role: models.UserRole) -> Optional[models.User]:
         pass
@@ -109,6 +119,10 @@ class BaseRepository(ABC):
     def count_events(self, class_id: str) -> int:
         pass
 
+    @abstractmethod
+    def list_event_rows(self, class_id: str, limit: int = 100, updated_since: datetime.datetime = None, type: models.EventType = None) -> List[EventRow]:
+        pass
+
     # --- Topics ---
     @abstractmethod
     def create_event_topic(self, event_id: str, topic_type: str, content: str = None, count: int = None, pages: str = None, order: int = 0, parent_id: str = None) -> models.EventTopic:
@@ -152,10 +166,19 @@ class BaseRepository(ABC):
     def count_subjects(self, class_id: str) -> int:
         pass
 
+    @abstractmethod
+    def list_subject_rows(self, class_id: str) -> List[SubjectRow]:
+        pass
+
     @abstractmethod
     def delete_subject(self, subject_id: str) -> bool:
         pass
 
+    # --- Timetable ---
+    @abstractmethod
+    def list_slot_rows(self, class_id: str, weekday: int = None) -> List[SlotRow]:
+        pass
+
     # --- Audit ---
     @abstractmethod
     def create_audit_log(self, class_id: str, user_id: str, action: models.AuditAction, 
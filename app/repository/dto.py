@@ -0,0 +1,120 @@
+"""
+Immutable, slotted data transfer objects for repository results.
+
+`AppwriteRepository` returns these instead of building transient SQLAlchemy
+models (which carry instrumentation state and can be picked up by a session).
+The SQL repository keeps returning session-bound ORM instances for the write
+paths and relationship access; `to_dto()` adapts those wherever an object
+outlives its session (caches, precomputed indexes).
+
+Every DTO exposes the same attribute names as its model, so callers read both
+interchangeably. Use `dataclasses.replace()` to derive a modified copy.
+"""
+
+import datetime
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+from typing import ClassVar, Optional
+
+from app import models
+
+
+class _FromORM:
+    __slots__ = ()
+
+    # Attributes read by from_orm(); set once per DTO class by @_dto
+    _orm_fields: ClassVar[tuple] = ()
+    _orm_get: ClassVar[attrgetter]
+
+    @classmethod
+    def from_orm(cls, obj):
+        # ORM-backed fields lead the field list, so positional construction lines up
+        return cls(*cls._orm_get(obj))
+
+
+def _dto(cls):
+    # slots + frozen: no per-instance __dict__, no attribute assignment after construction
+    cls = dataclass(frozen=True, slots=True)(cls)
+    cls._orm_fields = tuple(f.name for f in fields(cls) if f.metadata.get("orm", True))
+    cls._orm_get = attrgetter(*cls._orm_fields)
+    return cls
+
+
+@_dto
+class UserDTO(_FromORM):
+    id: str
+    name: str
+    class_id: Optional[str]
+    role: models.UserRole = models.UserRole.MEMBER
+    email: Optional[str] = None
+    is_registered: bool = False
+    language: str = "de"
+    created_at: Optional[datetime.datetime] = None
+    session_token: Optional[str] = field(default=None, repr=False)
+    password_hash: Optional[str] = field(default=None, repr=False)
+
+
+@_dto
+class ClassDTO(_FromORM):
+    id: str
+    name: str
+    join_token: Optional[str] = None
+    owner_id: Optional[str] = None
+    join_enabled: Optional[bool] = True
+    timetable_public_enabled: bool = False
+    timetable_public_token: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+
+
+@_dto
+class EventDTO(_FromORM):
+    id: str
+    class_id: str
+    type: models.EventType
+    priority: Optional[models.Priority] = models.Priority.MEDIUM
+    subject_id: Optional[str] = None
+    subject_name: Optional[str] = None
+    title: Optional[str] = None
+    date: Optional[datetime.datetime] = None
+    author_id: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+    # Not loaded by from_orm() (would lazy-load); fill explicitly when needed
+    topics: tuple = field(default=(), metadata={"orm": False})
+    links: tuple = field(default=(), metadata={"orm": False})
+
+
+@_dto
+class SubjectDTO(_FromORM):
+    id: str
+    class_id: str
+    name: str
+    color: Optional[str] = "#666666"
+
+
+@_dto
+class SlotDTO(_FromORM):
+    id: str
+    class_id: str
+    weekday: int
+    slot_number: int
+    subject_id: Optional[str] = None
+    subject_name: Optional[str] = None
+    group_name: Optional[str] = None
+    room: Optional[str] = None
+
+
+_ADAPTERS = {
+    models.User: UserDTO,
+    models.Class: ClassDTO,
+    models.Event: EventDTO,
+    models.Subject: SubjectDTO,
+    models.TimetableSlot: SlotDTO,
+}
+
+
+def to_dto(obj):
+    """Adapt an ORM instance to its DTO. DTOs and None are passed through."""
+    if obj is None or isinstance(obj, _FromORM):
+        return obj
+    return _ADAPTERS[type(obj)].from_orm(obj)
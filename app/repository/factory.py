@@ -1,5 +1,6 @@
 import os
-from app.database import SessionLocal
+from fastapi import Request
+from app.database import SessionLocal, shard_map
 from app.repository.base import BaseRepository
 from app.repository.sql import SqlAlchemyRepository
 from app.repository.appwrite import AppwriteRepository
@@ -7,7 +8,7 @@ from app.repository.appwrite import AppwriteRepository
 # Global Appwrite Repo instance to reuse client connection
 _appwrite_repo = None
 
-def get_repository() -> BaseRepository:
+def get_repository(request: Request) -> BaseRepository:
     """
     Dependency provider for FastAPI.
     Returns the appropriate repository based on APPWRITE env var.
@@ -20,6 +21,8 @@ def get_repository() -> BaseRepository:
     else:
         db = SessionLocal()
         try:
+            if shard_map is not None:
+                db.pin(shard_map.request_class(request))
             yield SqlAlchemyRepository(db)
         finally:
             db.close()
@@ -0,0 +1,59 @@
+"""
+Projection rows returned by the repository `list_*_rows` read methods.
+
+Plain named tuples: no identity map, no instrumented attributes, no lazy
+relationships. The field order matches the API v1 serializers
+(`app.routers.api_v1.serializers`) so a row can be zipped straight into a
+payload dict. Use the ORM-returning methods when an object is going to be
+modified.
+"""
+
+import datetime
+from typing import NamedTuple, Optional
+
+from app import models
+
+
+class EventRow(NamedTuple):
+    id: str
+    class_id: str
+    type: models.EventType
+    priority: Optional[models.Priority]
+    subject_id: Optional[str]
+    subject_name: Optional[str]
+    title: Optional[str]
+    date: datetime.datetime
+    author_id: Optional[str]
+    created_at: Optional[datetime.datetime]
+    updated_at: Optional[datetime.datetime]
+
+
+class SubjectRow(NamedTuple):
+    id: str
+    name: str
+    color: Optional[str]
+
+
+class MemberRow(NamedTuple):
+    id: str
+    name: str
+    role: models.UserRole
+    created_at: Optional[datetime.datetime]
+
+
+class SlotRow(NamedTuple):
+    # weekday first: the slot payload itself is everything after it
+    weekday: int
+    id: str
+    slot_number: int
+    subject_id: Optional[str]
+    subject_name: Optional[str]
+    group_name: Optional[str]
+    room: Optional[str]
+
+
+class HolidayRow(NamedTuple):
+    id: str
+    name: str
+    start_date: datetime.date
+    end_date: datetime.date  # inclusive
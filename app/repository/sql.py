@@ -1,16 +1,46 @@
+import functools
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app import models, crud
+from app.core.replicas import primary_reads, replica_reads
 from app.repository.base import BaseRepository
+from app.repository.rows import EventRow, MemberRow, SlotRow, SubjectRow
 import datetime
 
+
+def _read_only(method):
+    """Read method: its SELECTs may be served by a read replica (app/core/replicas.py)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with replica_reads(self.db):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _columns(model, row_type):
+    return tuple(getattr(model, field) for field in row_type._fields)
+
+
+# Column projections for the list_*_rows methods (core rows, no ORM objects)
+_EVENT_COLUMNS = _columns(models.Event, EventRow)
+_MEMBER_COLUMNS = _columns(models.User, MemberRow)
+_SUBJECT_COLUMNS = _columns(models.Subject, SubjectRow)
+_SLOT_COLUMNS = _columns(models.TimetableSlot, SlotRow)
+
+
 class SqlAlchemyRepository(BaseRepository):
     def __init__(self, db: Session):
         self.db = db
 
+    def primary_reads(self):
+        return primary_reads(self.db)
+
+    @_read_only
     def get_user(self, user_id: str) -> Optional[models.User]:
         return crud.get_user(self.db, user_id)
 
+    @_read_only
     def get_user_by_email(self, email: str) -> Optional[models.User]:
         return crud.get_user_by_email(self.db, email)
 
@@ -23,15 +53,23 @@ class SqlAlchemyRepository(BaseRepository):
     def delete_user(self, user_id: str) -> bool:
         return crud.delete_user(self.db, user_id)
 
+    @_read_only
     def get_user_by_session(self, session_token: str) -> Optional[models.User]:
         return crud.get_user_by_session(self.db, session_token)
 
+    @_read_only
     def get_class_members(self, class_id: str) -> List[models.User]:
         return crud.get_class_members(self.db, class_id)
 
+    @_read_only
+    def list_member_rows(self, class_id: str) -> List[MemberRow]:
+        stmt = select(*_MEMBER_COLUMNS).where(models.User.class_id == class_id)
+        return [MemberRow._make(row) for row in self.db.execute(stmt)]
+
     def update_user_role(self, user_id: str, role: models.UserRole) -> Optional[models.User]:
         return crud.update_user_role(self.db, user_id, role)
 
+    @_read_only
     def get_class(self, class_id: str) -> Optional[models.Class]:
         return crud.get_class(self.db, class_id)
 
@@ -58,6 +96,7 @@ class SqlAlchemyRepository(BaseRepository):
     def create_class(self, name: str, join_token: str) -> models.Class:
         return crud.create_class(self.db, name, join_token)
 
+    @_read_only
     def get_class_by_token(self, join_token: str) -> Optional[models.Class]:
         return crud.get_class_by_token(self.db, join_token)
     
@@ -71,9 +110,11 @@ class SqlAlchemyRepository(BaseRepository):
     def delete_login_token(self, token_id: str) -> bool:
         return crud.delete_login_token(self.db, token_id)
 
+    @_read_only
     def list_login_tokens(self, class_id: str) -> List[models.LoginToken]:
         return self.db.query(models.LoginToken).filter(models.LoginToken.class_id == class_id).all()
 
+    @_read_only
     def get_events_for_class(self, class_id: str) -> List[models.Event]:
         return crud.get_events_for_class(self.db, class_id)
 
@@ -82,6 +123,7 @@ class SqlAlchemyRepository(BaseRepository):
                      priority: models.Priority = models.Priority.MEDIUM) -> models.Event:
         return crud.create_event(self.db, class_id, author_id, type, date, subject_id, subject_name, title, priority)
 
+    @_read_only
     def get_event(self, event_id: str) -> Optional[models.Event]:
         return crud.get_event(self.db, event_id)
 
@@ -92,6 +134,7 @@ class SqlAlchemyRepository(BaseRepository):
     def delete_event(self, event_id: str) -> bool:
         return crud.delete_event(self.db, event_id)
 
+    @_read_only
     def list_events(self, class_id: str, limit: int = 100, updated_since: datetime.datetime = None, type: models.EventType = None) -> List[models.Event]:
         query = self.db.query(models.Event).filter(models.Event.class_id == class_id)
         if updated_since:
@@ -100,12 +143,24 @@ class SqlAlchemyRepository(BaseRepository):
             query = query.filter(models.Event.type == type)
         return query.order_by(models.Event.updated_at.desc()).limit(limit).all()
 
+    @_read_only
     def count_events(self, class_id: str) -> int:
         return self.db.query(models.Event).filter(models.Event.class_id == class_id).count()
 
+    @_read_only
+    def list_event_rows(self, class_id: str, limit: int = 100, updated_since: datetime.datetime = None, type: models.EventType = None) -> List[EventRow]:
+        stmt = select(*_EVENT_COLUMNS).where(models.Event.class_id == class_id)
+        if updated_since:
+            stmt = stmt.where(models.Event.updated_at >= updated_since)
+        if type:
+            stmt = stmt.where(models.Event.type == type)
+        stmt = stmt.order_by(models.Event.updated_at.desc()).limit(limit)
+        return [EventRow._make(row) for row in self.db.execute(stmt)]
+
     def create_event_topic(self, event_id: str, topic_type: str, content: str = None, count: int = None, pages: str = None, order: int = 0, parent_id: str = None) -> models.EventTopic:
         return crud.create_event_topic(self.db, event_id, topic_type, content, count, pages, order, parent_id)
 
+    @_read_only
     def get_topics_for_event(self, event_id: str) -> List[models.EventTopic]:
         return crud.get_topics_for_event(self.db, event_id)
 
@@ -115,6 +170,7 @@ class SqlAlchemyRepository(BaseRepository):
     def create_event_link(self, event_id: str, url: str, label: str) -> models.EventLink:
         return crud.create_event_link(self.db, event_id, url, label)
 
+    @_read_only
     def get_links_for_event(self, event_id: str) -> List[models.EventLink]:
         return self.db.query(models.EventLink).filter(models.EventLink.event_id == event_id).all()
 
@@ -124,15 +180,31 @@ class SqlAlchemyRepository(BaseRepository):
     def create_subject(self, class_id: str, name: str, color: str = "#666666") -> models.Subject:
         return crud.create_subject(self.db, class_id, name, color)
 
+    @_read_only
     def get_subject(self, subject_id: str) -> Optional[models.Subject]:
         return crud.get_subject(self.db, subject_id)
 
+    @_read_only
     def get_subjects_for_class(self, class_id: str) -> List[models.Subject]:
         return crud.get_subjects_for_class(self.db, class_id)
 
+    @_read_only
     def count_subjects(self, class_id: str) -> int:
         return self.db.query(models.Subject).filter(models.Subject.class_id == class_id).count()
 
+    @_read_only
+    def list_subject_rows(self, class_id: str) -> List[SubjectRow]:
+        stmt = select(*_SUBJECT_COLUMNS).where(models.Subject.class_id == class_id).order_by(models.Subject.name)
+        return [SubjectRow._make(row) for row in self.db.execute(stmt)]
+
+    @_read_only
+    def list_slot_rows(self, class_id: str, weekday: int = None) -> List[SlotRow]:
+        stmt = select(*_SLOT_COLUMNS).where(models.TimetableSlot.class_id == class_id)
+        if weekday is not None:
+            stmt = stmt.where(models.TimetableSlot.weekday == weekday)
+        stmt = stmt.order_by(models.TimetableSlot.weekday, models.TimetableSlot.slot_number)
+        return [SlotRow._make(row) for row in self.db.execute(stmt)]
+
     def delete_subject(self, subject_id: str) -> bool:
         return crud.delete_subject(self.db, subject_id)
 
@@ -140,6 +212,7 @@ class SqlAlchemyRepository(BaseRepository):
                          target_id: str = None, data: str = None, permanent: bool = False) -> models.AuditLog:
         return crud.create_audit_log(self.db, class_id, user_id, action, target_id, data, permanent)
 
+    @_read_only
     def list_audit_logs(self, class_id: str, limit: int = 100) -> List[models.AuditLog]:
         return self.db.query(models.AuditLog).filter(models.AuditLog.class_id == class_id).order_by(models.AuditLog.created_at.desc()).limit(limit).all()
 
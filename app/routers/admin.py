@@ -1,18 +1,22 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, Response, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, Form, HTTPException, Response, Request
 from app.repository.base import BaseRepository
 from app.repository.factory import get_repository
 from app import models
 from app.core.auth import require_admin, require_class_admin, require_user
+from app.core.operator import require_operator
 from app.core import security
+from app.core.query_stats import endpoint_enabled as query_stats_endpoint_enabled, query_stats
+from app.core.profiler import profiler_instance
 import datetime
 import secrets
-from fastapi.templating import Jinja2Templates
 import os
+import tempfile
+from app.database import database_size
 from app.quotas import MAX_EVENTS_PER_CLASS, MAX_SUBJECTS_PER_USER, MAX_CLASSES_PER_USER, MAX_TOTAL_STORAGE_MB
 import logging
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 logger = logging.getLogger(__name__)
 
 @router.get("/admin/quotas")
@@ -29,11 +33,9 @@ def admin_quotas_overview(
     total_subjects = repo.count_subjects(user.class_id)
 
     db_size_mb = 0
-    # Basic size check for SQL/Appwrite generic
-    if os.path.exists("classly.db"): # Check actual DB file if SQL default
-        db_size_mb = os.path.getsize("classly.db") / (1024 * 1024)
-    elif os.path.exists("app.db"): # Fallback
-        db_size_mb = os.path.getsize("app.db") / (1024 * 1024)
+    # SQL mode: size from the database catalog (Appwrite has its own quotas)
+    if os.getenv("APPWRITE", "").lower() != "true":
+        db_size_mb = (database_size() or 0) / (1024 * 1024)
 
     return templates.TemplateResponse("admin_quotas.html", {
         "request": request,
@@ -52,6 +54,21 @@ def admin_quotas_overview(
         }
     })
 
+@router.get("/admin/backups")
+def admin_backups_overview(
+    request: Request,
+    _operator = Depends(require_operator)
+):
+    """Status of the scheduled database backups of the whole instance (DB_BACKUP_ENABLED, OPERATOR_TOKEN)."""
+    from app.core.db_backup import db_backups
+
+    return templates.TemplateResponse("admin_backups.html", {
+        "request": request,
+        "config": db_backups,
+        "status": db_backups.status() if os.path.isdir(db_backups.directory) else {},
+        "backups": db_backups.backups(),
+    })
+
 @router.delete("/admin/members/{user_id}")
 def kick_member(
     user_id: str,
@@ -203,93 +220,91 @@ def delete_login_token(
     response.headers["HX-Redirect"] = "/"
     return {"status": "deleted"}
 
-@router.get("/admin/download-db")
-def download_db(
-    background_tasks: BackgroundTasks,
-    admin: models.User = Depends(require_admin),
-    repo: BaseRepository = Depends(get_repository)
+@router.get("/admin/debug/queries")
+def admin_query_stats(
+    limit: int = 20,
+    _operator = Depends(require_operator)
 ):
-    from fastapi.responses import FileResponse
-    from fastapi import BackgroundTasks
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker, make_transient
-    import tempfile
-    import os
-    import shutil
-    
-    # 1. Create a secure temporary file
-    fd, temp_path = tempfile.mkstemp(suffix=".db", prefix=f"classly_{admin.class_id}_")
-    os.close(fd) # Close the file descriptor, we will access by path
-    
-    try:
-        # 2. Setup destination database (Temp SQLite)
-        dst_engine = create_engine(f"sqlite:///{temp_path}")
-        models.Base.metadata.create_all(bind=dst_engine)
-        DstSession = sessionmaker(bind=dst_engine)
-        dst_db = DstSession()
-        
-        # 3. Fetch Data for this Class ONLY via Repo
-        cid = admin.class_id
-        
-        # Class
-        clazz = repo.get_class(cid)
-        if clazz:
-            dst_db.merge(clazz)
-            
-        # Subjects
-        subjects = repo.get_subjects_for_class(cid)
-        for obj in subjects:
-            dst_db.merge(obj)
-
-        # Users & Preferences
-        users = repo.get_class_members(cid)
-        for obj in users:
-            dst_db.merge(obj)
-            # Merge UserPreferences if available? 
-            # Current implementation of Repo might not load them fully or Appwrite might miss them.
-            # We skip explicit preference merge for now unless attached.
-            
-        # Events & Related
-        events = repo.list_events(cid, limit=10000) # Get all
-        for obj in events:
-            dst_db.merge(obj)
-            # Topics/Links might be missing if lazy loaded and not fetched.
-            
-        # Login Tokens
-        tokens = repo.list_login_tokens(cid)
-        for obj in tokens:
-            dst_db.merge(obj)
-            
-        # Audit Logs
-        logs = repo.list_audit_logs(cid, limit=10000)
-        for obj in logs:
-            dst_db.merge(obj)
-
-        # 4. Commit and Close Logic
-        dst_db.commit()
-        dst_db.close()
-        
-        # 5. Serve File w/ Cleanup
-        def remove_file():
-            try:
-                os.unlink(temp_path)
-            except Exception:
-                pass
-                
-        background_tasks.add_task(remove_file)
-        
-        return FileResponse(
-            temp_path, 
-            media_type='application/octet-stream', 
-            filename=f"classly_backup_{datetime.date.today()}.db"
-        )
-
-    except Exception as e:
-        # Cleanup on error
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        logger.exception("Backup failed for class %s", admin.class_id)
-        raise HTTPException(status_code=500, detail="Backup failed")
+    """Routes with the most SQL time in this worker, all classes (QUERY_STATS_ENDPOINT=true, OPERATOR_TOKEN)."""
+    if not query_stats_endpoint_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "pid": os.getpid(),
+        "routes": query_stats.top(min(max(limit, 1), 200)),
+    }
+
+@router.get("/admin/profiles")
+def admin_profiles(_operator = Depends(require_operator)):
+    """Recorded request profiles of this worker, all classes, newest first (PROFILER_ENABLED=true, OPERATOR_TOKEN)."""
+    if not profiler_instance.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "pid": os.getpid(),
+        "profiles": [profile.summary() for profile in profiler_instance.profiles()],
+    }
+
+@router.get("/admin/profiles/{profile_id}")
+def admin_profile_download(
+    profile_id: int,
+    format: str = "collapsed",
+    _operator = Depends(require_operator)
+):
+    """One profile as collapsed stacks (flamegraph.pl) or speedscope JSON."""
+    if not profiler_instance.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    profile = profiler_instance.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "speedscope":
+        from fastapi.responses import JSONResponse
+        return JSONResponse(profile.speedscope(), headers={
+            "Content-Disposition": f'attachment; filename="classly-profile-{profile.id}.speedscope.json"'
+        })
+    if format != "collapsed":
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'speedscope'")
+    return Response(profile.collapsed(), media_type="text/plain; charset=utf-8", headers={
+        "Content-Disposition": f'attachment; filename="classly-profile-{profile.id}.folded"'
+    })
+
+@router.get("/admin/download-db")
+def download_db(admin: models.User = Depends(require_admin)):
+    """Backup of the admin's class as a compressed NDJSON archive (see app/core/class_backup.py)."""
+    from fastapi.responses import StreamingResponse
+    from app.core import class_backup
+    from app.database import engine, shard_map
+
+    if os.getenv("APPWRITE", "").lower() == "true":
+        raise HTTPException(status_code=501, detail="Backup is only available with the SQL backend")
+    if shard_map is not None:
+        # With SHARDS the class data lives on its shard, DATABASE_URL is only the directory
+        engine = shard_map.shards[shard_map.shard_for(admin.class_id)]
+
+    def export():
+        with engine.connect() as conn:
+            yield from class_backup.iter_export(conn, admin.class_id)
+
+    def spooled():
+        # SQLite: the export's read transaction blocks writers until it ends, so it
+        # must not wait for a slow client. Write the archive to a file, then send that
+        with tempfile.SpooledTemporaryFile(max_size=64 << 20) as spool:
+            for chunk in export():
+                spool.write(chunk)
+            spool.seek(0)
+            yield from iter(lambda: spool.read(1 << 20), b"")
+
+    def archive():
+        # Runs in the threadpool while the response is sent
+        try:
+            yield from spooled() if engine.dialect.name == "sqlite" else export()
+        except Exception:
+            logger.exception("Backup failed for class %s", admin.class_id)
+            raise
+
+    return StreamingResponse(
+        archive(),
+        media_type="application/zstd" if class_backup.compression() == "zstd" else "application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{class_backup.filename(admin.class_id)}"'},
+    )
 
 
 # --- API-Key Management ---
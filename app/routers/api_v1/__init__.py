@@ -5,10 +5,11 @@ Sammelt alle API v1 Sub-Router und exportiert den Haupt-Router.
 """
 
 from fastapi import APIRouter
-from . import classes, users, events, subjects, timetable
+from app.core.fastjson import FastJSONResponse
+from . import classes, users, events, subjects, timetable, webhooks, stream
 
 # Haupt-Router für API v1
-router = APIRouter(prefix="/api/v1", tags=["API v1"])
+router = APIRouter(prefix="/api/v1", tags=["API v1"], default_response_class=FastJSONResponse)
 
 # Sub-Router einbinden
 router.include_router(classes.router)
@@ -16,6 +17,8 @@ router.include_router(users.router)
 router.include_router(events.router)
 router.include_router(subjects.router)
 router.include_router(timetable.router)
+router.include_router(webhooks.router)
+router.include_router(stream.router)
 
 
 # Info-Endpoint für API-Discovery
@@ -38,7 +41,9 @@ def api_info():
             "users": "/api/v1/users",
             "events": "/api/v1/events",
             "subjects": "/api/v1/subjects",
-            "timetable": "/api/v1/timetable"
+            "timetable": "/api/v1/timetable",
+            "webhooks": "/api/v1/webhooks",
+            "stream": "/api/v1/stream"
         },
         "scopes": {
             "classes:read": "Klassen-Informationen lesen",
@@ -46,7 +51,8 @@ def api_info():
             "events:read": "Events lesen",
             "events:write": "Events erstellen/bearbeiten/löschen",
             "subjects:read": "Fächer lesen",
-            "timetable:read": "Stundenplan lesen"
+            "timetable:read": "Stundenplan lesen",
+            "webhooks:manage": "Webhooks verwalten"
         }
     }
 
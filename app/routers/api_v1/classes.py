@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.repository.factory import get_repository
 from app.repository.base import BaseRepository
 from .deps import require_classes_read
+from .serializers import subject_serializer
 
 router = APIRouter(prefix="/classes", tags=["Classes"])
 
@@ -34,7 +35,7 @@ def list_classes(
         "id": clazz.id,
         "name": clazz.name,
         "created_at": clazz.created_at.isoformat() if clazz.created_at else None,
-        "member_count": len(clazz.users) if clazz.users else 0
+        "member_count": len(repo.list_member_rows(class_id))
     }
 
 
@@ -57,15 +58,12 @@ def get_class(
     if not clazz:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    subjects = repo.get_subjects_for_class(class_id)
+    subjects = repo.list_subject_rows(class_id)
     
     return {
         "id": clazz.id,
         "name": clazz.name,
         "created_at": clazz.created_at.isoformat() if clazz.created_at else None,
-        "subjects": [
-            {"id": s.id, "name": s.name, "color": s.color}
-            for s in subjects
-        ],
-        "member_count": len(clazz.users) if clazz.users else 0
+        "subjects": subject_serializer.rows(subjects),
+        "member_count": len(repo.list_member_rows(class_id))
     }
@@ -11,7 +11,12 @@ from datetime import datetime
 from app.repository.factory import get_repository
 from app.repository.base import BaseRepository
 from app import models
+from app.core.fastjson import FastJSONResponse
+from app.core.fragment_cache import fragment_cache
+from app.core.push_dispatch import notify_event
+from app.core.live_updates import live_bus
 from .deps import require_events_read, require_events_write
+from .serializers import serialize_event, serialize_event_rows
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
@@ -63,17 +68,17 @@ def list_events(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid updated_since format. Use ISO 8601.")
     
-    events = repo.list_events(
+    events = repo.list_event_rows(
         class_id=class_id,
         limit=limit,
         updated_since=since_dt
     )
     
-    return {
+    return FastJSONResponse({
         "class_id": class_id,
         "count": len(events),
-        "events": [_serialize_event(e) for e in events]
-    }
+        "events": serialize_event_rows(events)
+    })
 
 
 @router.get("/{event_id}")
@@ -96,7 +101,7 @@ def get_event(
     if event.class_id != class_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return _serialize_event(event, include_topics=True, include_links=True)
+    return FastJSONResponse(serialize_event(event, include_topics=True, include_links=True))
 
 
 @router.post("", status_code=201)
@@ -143,6 +148,10 @@ def create_event(
         priority=priority
     )
     
+    fragment_cache.invalidate(class_id)
+    live_bus.publish(class_id, "events", id=new_event.id)
+    notify_event(class_id, new_event, "created", author_id=user.id)
+    
     # Audit-Log
     repo.create_audit_log(
         class_id=class_id,
@@ -152,11 +161,11 @@ def create_event(
         data=f'{{"via": "api_v1", "key_id": "{api_key.id}", "key_name": "{api_key.name or "unnamed"}"}}'
     )
     
-    return {
+    return FastJSONResponse({
         "id": new_event.id,
         "created": True,
-        "event": _serialize_event(new_event)
-    }
+        "event": serialize_event(new_event)
+    }, status_code=201)
 
 
 @router.put("/{event_id}")
@@ -198,6 +207,10 @@ def update_event(
         priority=priority
     )
     
+    fragment_cache.invalidate(class_id)
+    live_bus.publish(class_id, "events", id=event_id)
+    notify_event(class_id, updated, "updated", author_id=user.id)
+    
     # Audit-Log
     repo.create_audit_log(
         class_id=class_id,
@@ -207,11 +220,11 @@ def update_event(
         data=f'{{"via": "api_v1", "key_id": "{api_key.id}"}}'
     )
     
-    return {
+    return FastJSONResponse({
         "id": event_id,
         "updated": True,
-        "event": _serialize_event(updated)
-    }
+        "event": serialize_event(updated)
+    })
 
 
 @router.delete("/{event_id}")
@@ -237,6 +250,8 @@ def delete_event(
         raise HTTPException(status_code=403, detail="Access denied")
     
     repo.delete_event(event_id)
+    fragment_cache.invalidate(class_id)
+    live_bus.publish(class_id, "events", id=event_id)
     
     # Audit-Log
     repo.create_audit_log(
@@ -249,56 +264,3 @@ def delete_event(
     )
     
     return {"id": event_id, "deleted": True}
-
-
-# --- Helpers ---
-
-def _serialize_event(
-    event: models.Event, 
-    include_topics: bool = False, 
-    include_links: bool = False
-) -> dict:
-    """Serialisiert ein Event-Model zu einem Dict."""
-    result = {
-        "id": event.id,
-        "class_id": event.class_id,
-        "type": event.type.value if hasattr(event.type, "value") else event.type,
-        "priority": event.priority.value if event.priority and hasattr(event.priority, "value") else (event.priority or "MEDIUM"),
-        "subject_id": event.subject_id,
-        "subject_name": event.subject_name,
-        "title": event.title,
-        "date": event.date.isoformat() if event.date else None,
-        "author_id": event.author_id,
-        "created_at": event.created_at.isoformat() if event.created_at else None,
-        "updated_at": event.updated_at.isoformat() if event.updated_at else None
-    }
-    
-    if include_topics:
-        try:
-            topics = event.topics or []
-            result["topics"] = [
-                {
-                    "id": t.id,
-                    "topic_type": t.topic_type,
-                    "content": t.content,
-                    "count": t.count,
-                    "pages": t.pages,
-                    "order": t.order,
-                    "parent_id": t.parent_id
-                }
-                for t in topics
-            ]
-        except Exception:
-            result["topics"] = []
-    
-    if include_links:
-        try:
-            links = event.links or []
-            result["links"] = [
-                {"id": l.id, "url": l.url, "label": l.label}
-                for l in links
-            ]
-        except Exception:
-            result["links"] = []
-    
-    return result
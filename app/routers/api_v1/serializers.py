@@ -0,0 +1,94 @@
+"""
+Classly API v1 - Serializer
+===========================
+Vorkompilierte Serializer pro Model.
+
+Jeder Serializer kennt seine Feldliste einmalig (operator.attrgetter bzw. die
+passenden Spalten für Projektionen). Pro Zeile bleibt damit nur ein
+`dict(zip(...))` übrig; datetime/Enum-Werte werden erst vom JSON-Encoder
+(`app.core.fastjson`) umgewandelt statt per `isoformat()`/`hasattr` pro Feld.
+"""
+
+from operator import attrgetter
+from typing import Iterable, Sequence
+
+from app import models
+
+
+class ModelSerializer:
+    """
+    Serializer für eine feste Feldliste.
+
+    - `one(obj)` / `many(objs)`: ORM-Objekte (oder beliebige Objekte mit den Attributen)
+    - `rows(rows)`: Tupel aus einer Spalten-Projektion `query(*serializer.columns)`
+    """
+
+    __slots__ = ("fields", "columns", "_get")
+
+    def __init__(self, model, fields: Sequence[str], attributes: dict[str, str] | None = None):
+        attributes = attributes or {}
+        names = tuple(attributes.get(f, f) for f in fields)
+        self.fields = tuple(fields)
+        self.columns = tuple(getattr(model, name) for name in names)
+        self._get = attrgetter(*names)
+
+    def one(self, obj) -> dict:
+        return dict(zip(self.fields, self._get(obj)))
+
+    def many(self, objs: Iterable) -> list[dict]:
+        fields, get = self.fields, self._get
+        return [dict(zip(fields, get(obj))) for obj in objs]
+
+    def rows(self, rows: Iterable[Sequence]) -> list[dict]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+
+event_serializer = ModelSerializer(models.Event, (
+    "id", "class_id", "type", "priority", "subject_id", "subject_name", "title",
+    "date", "author_id", "created_at", "updated_at",
+))
+topic_serializer = ModelSerializer(models.EventTopic, (
+    "id", "topic_type", "content", "count", "pages", "order", "parent_id",
+))
+link_serializer = ModelSerializer(models.EventLink, ("id", "url", "label"))
+subject_serializer = ModelSerializer(models.Subject, ("id", "name", "color"))
+user_serializer = ModelSerializer(models.User, ("id", "name", "role", "created_at"))
+slot_serializer = ModelSerializer(models.TimetableSlot, (
+    "id", "slot_number", "subject_id", "subject_name", "group_name", "room",
+))
+
+
+def _default_priority(result: list[dict]) -> list[dict]:
+    for item in result:
+        # Altdaten ohne Priorität (wie bisher als MEDIUM ausgeben)
+        if item["priority"] is None:
+            item["priority"] = "MEDIUM"
+    return result
+
+
+def serialize_events(events: Iterable[models.Event]) -> list[dict]:
+    return _default_priority(event_serializer.many(events))
+
+
+def serialize_event_rows(rows: Iterable[Sequence]) -> list[dict]:
+    """Wie `serialize_events`, aber für `EventRow`s aus `repo.list_event_rows()`."""
+    return _default_priority(event_serializer.rows(rows))
+
+
+def serialize_event(event: models.Event, include_topics: bool = False, include_links: bool = False) -> dict:
+    result = serialize_events((event,))[0]
+
+    if include_topics:
+        try:
+            result["topics"] = topic_serializer.many(event.topics or [])
+        except Exception:
+            result["topics"] = []
+
+    if include_links:
+        try:
+            result["links"] = link_serializer.many(event.links or [])
+        except Exception:
+            result["links"] = []
+
+    return result
@@ -0,0 +1,79 @@
+"""
+Classly API v1 - Live Stream
+============================
+Server-Sent Events mit Änderungen an Events, Fächern und Stundenplan der Klasse.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from app.repository.factory import get_repository_sync
+from app.core.live_updates import TOPICS, live_bus, parse_last_event_id
+from app.core.scopes import APIScope, has_scope
+from .deps import require_any_auth
+
+router = APIRouter(prefix="/stream", tags=["Stream"])
+
+TOPIC_SCOPES = {
+    "events": APIScope.EVENTS_READ,
+    "subjects": APIScope.SUBJECTS_READ,
+    "timetable": APIScope.TIMETABLE_READ,
+}
+
+
+def _authenticate(request: Request, authorization: Optional[str]) -> dict:
+    # Eigene kurze Session statt Depends(get_repository): der Stream läuft
+    # beliebig lange und soll keine DB-Verbindung aus dem Pool festhalten.
+    repo = get_repository_sync()
+    try:
+        return require_any_auth(request, authorization, repo)
+    finally:
+        if hasattr(repo, "db"):
+            repo.db.close()
+
+
+async def open_stream(request: Request):
+    """Auth + Topic-Auswahl; von der Route und von LiveStreamMiddleware aufgerufen."""
+    auth = await run_in_threadpool(_authenticate, request, request.headers.get("authorization"))
+
+    topics = request.query_params.get("topics")
+    wanted = [t.strip() for t in topics.split(",")] if topics else list(TOPICS)
+    unknown = [t for t in wanted if t not in TOPIC_SCOPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid topic. Allowed: {list(TOPICS)}")
+    allowed = [t for t in wanted if has_scope(auth["scopes"], TOPIC_SCOPES[t])]
+    if not allowed:
+        raise HTTPException(
+            status_code=403,
+            detail="Missing required scope: " + " or ".join(TOPIC_SCOPES[t].value for t in wanted)
+        )
+
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("since")
+    return live_bus.response(auth["class_id"], allowed, parse_last_event_id(last_event_id))
+
+
+@router.get("")
+async def stream(
+    request: Request,
+    authorization: str = Header(None),
+    last_event_id: Optional[str] = Header(None),
+    topics: Optional[str] = Query(None, description="Comma separated: events, subjects, timetable"),
+    since: Optional[str] = Query(None, description="Last event id (if the client can't send Last-Event-ID)")
+):
+    """
+    Live-Updates als Server-Sent Events (`text/event-stream`).
+
+    **Erforderlicher Scope:** `events:read`, `subjects:read` und/oder `timetable:read`
+    (es werden nur Topics gesendet, für die der Key einen Scope hat)
+
+    Jede Nachricht hat `event: <topic>` und `data: {"id": ...}` – der Client lädt
+    danach nach, was er anzeigt. Nach einem Reconnect werden verpasste Nachrichten
+    anhand von `Last-Event-ID` nachgeliefert; ist das nicht mehr möglich, kommt
+    `event: resync` und der Client sollte alles neu laden.
+
+    Query-Parameter:
+    - `topics`: Optional, Komma-getrennt (`events`, `subjects`, `timetable`)
+    - `since`: Optional, Alternative zum `Last-Event-ID` Header
+    """
+    return await open_stream(request)
@@ -7,7 +7,9 @@ Endpoints für Fächer-Informationen.
 from fastapi import APIRouter, Depends, HTTPException
 from app.repository.factory import get_repository
 from app.repository.base import BaseRepository
+from app.core.fastjson import FastJSONResponse
 from .deps import require_subjects_read
+from .serializers import subject_serializer
 
 router = APIRouter(prefix="/subjects", tags=["Subjects"])
 
@@ -23,20 +25,13 @@ def list_subjects(
     **Erforderlicher Scope:** `subjects:read`
     """
     class_id = auth["class_id"]
-    subjects = repo.get_subjects_for_class(class_id)
+    subjects = repo.list_subject_rows(class_id)
     
-    return {
+    return FastJSONResponse({
         "class_id": class_id,
         "count": len(subjects),
-        "subjects": [
-            {
-                "id": s.id,
-                "name": s.name,
-                "color": s.color
-            }
-            for s in subjects
-        ]
-    }
+        "subjects": subject_serializer.rows(subjects)
+    })
 
 
 @router.get("/{subject_id}")
@@ -59,8 +54,4 @@ def get_subject(
     if subject.class_id != class_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return {
-        "id": subject.id,
-        "name": subject.name,
-        "color": subject.color
-    }
+    return FastJSONResponse(subject_serializer.one(subject))
@@ -7,8 +7,10 @@ Endpoints für Stundenplan-Informationen.
 from fastapi import APIRouter, Depends, HTTPException, Query
 from app.repository.factory import get_repository
 from app.repository.base import BaseRepository
-from app import models
+from app.core.fastjson import FastJSONResponse
+from app.core.schedule_index import WEEKDAY_NAMES, schedule_index
 from .deps import require_timetable_read
+from .serializers import slot_serializer
 
 router = APIRouter(prefix="/timetable", tags=["Timetable"])
 
@@ -29,46 +31,26 @@ def get_timetable(
     """
     class_id = auth["class_id"]
     
-    # Direkte DB-Abfrage für TimetableSlots
-    query = repo.db.query(models.TimetableSlot).filter(
-        models.TimetableSlot.class_id == class_id
-    )
+    # Vorberechneter Wochenplan (gecacht pro Klasse, bereits nach Tag + Stunde sortiert)
+    schedule = schedule_index.get(repo.db, class_id)
     
-    if weekday is not None:
-        query = query.filter(models.TimetableSlot.weekday == weekday)
-    
-    slots = query.order_by(
-        models.TimetableSlot.weekday,
-        models.TimetableSlot.slot_number
-    ).all()
-    
-    # Nach Tag gruppieren
     days = {}
-    weekday_names = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
-    
-    for slot in slots:
-        day_key = weekday_names[slot.weekday] if slot.weekday < len(weekday_names) else f"Tag {slot.weekday}"
-        if day_key not in days:
-            days[day_key] = []
-        
-        days[day_key].append({
-            "id": slot.id,
-            "slot_number": slot.slot_number,
-            "subject_id": slot.subject_id,
-            "subject_name": slot.subject_name,
-            "group_name": slot.group_name,
-            "room": slot.room
-        })
+    total = 0
+    fields = slot_serializer.fields
     
-    # Slots innerhalb jedes Tages sortieren
-    for day in days:
-        days[day].sort(key=lambda x: x["slot_number"])
+    for entry in schedule.entries:
+        if weekday is not None and entry.weekday != weekday:
+            continue
+        day_key = WEEKDAY_NAMES[entry.weekday] if entry.weekday < len(WEEKDAY_NAMES) else f"Tag {entry.weekday}"
+        # SlotRow: weekday + Slot-Felder in Serializer-Reihenfolge
+        days.setdefault(day_key, []).append(dict(zip(fields, entry.slot[1:])))
+        total += 1
     
-    return {
+    return FastJSONResponse({
         "class_id": class_id,
-        "total_slots": len(slots),
+        "total_slots": total,
         "timetable": days
-    }
+    })
 
 
 @router.get("/settings")
@@ -83,10 +65,7 @@ def get_timetable_settings(
     """
     class_id = auth["class_id"]
     
-    # Direkte DB-Abfrage für TimetableSettings
-    settings = repo.db.query(models.TimetableSettings).filter(
-        models.TimetableSettings.class_id == class_id
-    ).first()
+    settings = schedule_index.get(repo.db, class_id).settings
     
     if not settings:
         # Default-Werte
@@ -100,8 +79,8 @@ def get_timetable_settings(
     
     return {
         "class_id": class_id,
-        "slot_duration": settings.slot_duration,
-        "break_duration": settings.break_duration,
-        "day_start": f"{settings.day_start_hour:02d}:{settings.day_start_minute:02d}",
-        "day_end": f"{settings.day_end_hour:02d}:{settings.day_end_minute:02d}"
+        "slot_duration": settings["slot_duration"],
+        "break_duration": settings["break_duration"],
+        "day_start": f"{settings['day_start_hour']:02d}:{settings['day_start_minute']:02d}",
+        "day_end": f"{settings['day_end_hour']:02d}:{settings['day_end_minute']:02d}"
     }
@@ -7,7 +7,9 @@ Endpoints für Benutzer-Informationen.
 from fastapi import APIRouter, Depends, HTTPException
 from app.repository.factory import get_repository
 from app.repository.base import BaseRepository
+from app.core.fastjson import FastJSONResponse
 from .deps import require_users_read
+from .serializers import user_serializer
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -25,21 +27,13 @@ def list_users(
     > DSGVO-Hinweis: Nur nicht-sensible Daten werden zurückgegeben.
     """
     class_id = auth["class_id"]
-    members = repo.get_class_members(class_id)
+    members = repo.list_member_rows(class_id)
     
-    return {
+    return FastJSONResponse({
         "class_id": class_id,
         "count": len(members),
-        "users": [
-            {
-                "id": user.id,
-                "name": user.name,
-                "role": user.role.value if hasattr(user.role, "value") else user.role,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            }
-            for user in members
-        ]
-    }
+        "users": user_serializer.rows(members)
+    })
 
 
 @router.get("/me")
@@ -55,22 +49,22 @@ def get_current_user(
     user = auth["user"]
     api_key = auth["api_key"]
     
-    return {
+    return FastJSONResponse({
         "user": {
             "id": user.id,
             "name": user.name,
-            "role": user.role.value if hasattr(user.role, "value") else user.role,
+            "role": user.role,
             "class_id": user.class_id,
-            "created_at": user.created_at.isoformat() if user.created_at else None
+            "created_at": user.created_at
         },
         "api_key": {
             "id": api_key.id,
             "name": api_key.name,
             "scopes": api_key.scopes,
-            "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None,
-            "last_used_at": api_key.last_used_at.isoformat() if api_key.last_used_at else None
+            "expires_at": api_key.expires_at,
+            "last_used_at": api_key.last_used_at
         }
-    }
+    })
 
 
 @router.get("/{user_id}")
@@ -94,9 +88,4 @@ def get_user(
     if user.class_id != class_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return {
-        "id": user.id,
-        "name": user.name,
-        "role": user.role.value if hasattr(user.role, "value") else user.role,
-        "created_at": user.created_at.isoformat() if user.created_at else None
-    }
+    return FastJSONResponse(user_serializer.one(user))
@@ -0,0 +1,204 @@
+"""
+Classly API v1 - Webhook Endpoints
+==================================
+Webhook-Abonnements einer Klasse verwalten und Zustellungen einsehen.
+"""
+
+import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from app.repository.factory import get_repository
+from app.repository.base import BaseRepository
+from app import models
+from app.core.fastjson import FastJSONResponse
+from app.core.webhooks import (
+    WEBHOOK_EVENTS, DEAD, PENDING, UnsafeWebhookURL, allow_private_urls, check_url, webhook_worker,
+)
+from .deps import require_webhooks_manage
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+
+# --- Pydantic Schemas ---
+
+class WebhookCreate(BaseModel):
+    """Schema für Webhook-Erstellung."""
+    url: str
+    events: List[str] = ["*"]
+    max_concurrency: int = Field(2, ge=1, le=20)
+
+
+def _serialize_subscription(sub: models.WebhookSubscription) -> dict:
+    return {
+        "id": sub.id,
+        "url": sub.url,
+        "events": sub.events.split(","),
+        "active": sub.active,
+        "max_concurrency": sub.max_concurrency,
+        "created_at": sub.created_at,
+        "last_success_at": sub.last_success_at,
+        "last_failure_at": sub.last_failure_at,
+    }
+
+
+def _get_subscription(repo: BaseRepository, class_id: str, webhook_id: str) -> models.WebhookSubscription:
+    sub = repo.db.get(models.WebhookSubscription, webhook_id)
+    if not sub or sub.class_id != class_id:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return sub
+
+
+@router.get("")
+def list_webhooks(
+    auth = Depends(require_webhooks_manage),
+    repo: BaseRepository = Depends(get_repository)
+):
+    """
+    Listet die Webhooks der Klasse auf (ohne Secret).
+
+    **Erforderlicher Scope:** `webhooks:manage`
+    """
+    subs = repo.db.query(models.WebhookSubscription).filter(
+        models.WebhookSubscription.class_id == auth["class_id"]
+    ).order_by(models.WebhookSubscription.created_at).all()
+
+    return FastJSONResponse({
+        "count": len(subs),
+        "webhooks": [_serialize_subscription(sub) for sub in subs]
+    })
+
+
+@router.post("", status_code=201)
+def create_webhook(
+    webhook: WebhookCreate,
+    auth = Depends(require_webhooks_manage),
+    repo: BaseRepository = Depends(get_repository)
+):
+    """
+    Legt einen Webhook an.
+
+    **Erforderlicher Scope:** `webhooks:manage`
+
+    Das `secret` zum Prüfen der Signatur wird nur in dieser Antwort zurückgegeben.
+    Erlaubte Events: `event.created`, `event.updated`, `event.deleted` oder `*`.
+    Die URL muss auf eine öffentliche Adresse zeigen (keine internen oder privaten Netze).
+    """
+    try:
+        check_url(webhook.url, allow_private_urls())
+    except UnsafeWebhookURL as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    events = sorted(set(webhook.events)) or ["*"]
+    if "*" in events:
+        events = ["*"]
+    elif any(e not in WEBHOOK_EVENTS for e in events):
+        raise HTTPException(status_code=400, detail=f"Invalid event. Allowed: {['*', *WEBHOOK_EVENTS]}")
+
+    sub = models.WebhookSubscription(
+        class_id=auth["class_id"],
+        url=webhook.url,
+        events=",".join(events),
+        max_concurrency=webhook.max_concurrency,
+        created_by=auth["user"].id,
+    )
+    repo.db.add(sub)
+    repo.db.commit()
+
+    return FastJSONResponse({**_serialize_subscription(sub), "secret": sub.secret}, status_code=201)
+
+
+@router.delete("/{webhook_id}")
+def delete_webhook(
+    webhook_id: str,
+    auth = Depends(require_webhooks_manage),
+    repo: BaseRepository = Depends(get_repository)
+):
+    """
+    Löscht einen Webhook inklusive seiner Zustellungen.
+
+    **Erforderlicher Scope:** `webhooks:manage`
+    """
+    sub = _get_subscription(repo, auth["class_id"], webhook_id)
+    repo.db.query(models.WebhookDelivery).filter(
+        models.WebhookDelivery.subscription_id == sub.id
+    ).delete(synchronize_session=False)
+    repo.db.delete(sub)
+    repo.db.commit()
+
+    return FastJSONResponse({"id": webhook_id, "deleted": True})
+
+
+@router.get("/{webhook_id}/deliveries")
+def list_deliveries(
+    webhook_id: str,
+    auth = Depends(require_webhooks_manage),
+    repo: BaseRepository = Depends(get_repository),
+    status: Optional[str] = Query(None, pattern="^(pending|delivered|dead)$", description="Filter by status"),
+    limit: int = Query(50, ge=1, le=500, description="Max entries to return")
+):
+    """
+    Listet die letzten Zustellungen eines Webhooks.
+
+    **Erforderlicher Scope:** `webhooks:manage`
+
+    Query-Parameter:
+    - `status`: Optional, `pending`, `delivered` oder `dead` (Dead-Letter-Queue)
+    - `limit`: Max Einträge (default: 50, max: 500)
+    """
+    sub = _get_subscription(repo, auth["class_id"], webhook_id)
+    query = repo.db.query(models.WebhookDelivery, models.WebhookOutbox.event_type).join(
+        models.WebhookOutbox, models.WebhookOutbox.id == models.WebhookDelivery.outbox_id
+    ).filter(models.WebhookDelivery.subscription_id == sub.id)
+    if status:
+        query = query.filter(models.WebhookDelivery.status == status)
+    rows = query.order_by(models.WebhookDelivery.created_at.desc()).limit(limit).all()
+
+    return FastJSONResponse({
+        "webhook_id": sub.id,
+        "count": len(rows),
+        "deliveries": [
+            {
+                "id": delivery.id,
+                "event_type": event_type,
+                "status": delivery.status,
+                "attempts": delivery.attempts,
+                "next_attempt_at": delivery.next_attempt_at if delivery.status == PENDING else None,
+                "last_status_code": delivery.last_status_code,
+                "last_error": delivery.last_error,
+                "created_at": delivery.created_at,
+                "delivered_at": delivery.delivered_at,
+            }
+            for delivery, event_type in rows
+        ]
+    })
+
+
+@router.post("/{webhook_id}/deliveries/{delivery_id}/redeliver")
+def redeliver(
+    webhook_id: str,
+    delivery_id: str,
+    auth = Depends(require_webhooks_manage),
+    repo: BaseRepository = Depends(get_repository)
+):
+    """
+    Stellt eine Zustellung aus der Dead-Letter-Queue erneut zu.
+
+    **Erforderlicher Scope:** `webhooks:manage`
+    """
+    sub = _get_subscription(repo, auth["class_id"], webhook_id)
+    delivery = repo.db.get(models.WebhookDelivery, delivery_id)
+    if not delivery or delivery.subscription_id != sub.id:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    if delivery.status != DEAD:
+        raise HTTPException(status_code=409, detail="Only dead deliveries can be redelivered")
+
+    delivery.status = PENDING
+    delivery.attempts = 0
+    delivery.next_attempt_at = datetime.datetime.utcnow()
+    delivery.locked_until = None
+    repo.db.commit()
+    webhook_worker.wake()
+
+    return FastJSONResponse({"id": delivery.id, "status": delivery.status})
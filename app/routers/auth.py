@@ -1,15 +1,14 @@
 from fastapi import APIRouter, Depends, Form, HTTPException, Response, Request
 import os
-from fastapi.templating import Jinja2Templates
 from app.repository.base import BaseRepository
 from app.repository.factory import get_repository
 from app import models
 from app.core import security
 from app.core.cookies import cookie_secure
 from app.limiter import limiter
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 # Cookie settings - 30 days persistent login
 COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # 30 days in seconds
@@ -1,20 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, Form, Query
 from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import crud, models
 from app.core.auth import require_user
+from app.core.metrics import ICS_RENDERS
+from app.core.schedule_index import schedule_index
+from app.core.timetable_io import personal_calendars
 from icalendar import Calendar, Event
 import datetime
 
 router = APIRouter()
 
+def _personal_timetable(db: Session, user: models.User, clazz: models.Class):
+    """Selected lessons as weekly RRULE events (cached per user)"""
+    schedule = schedule_index.get(db, user.class_id)
+    selected = schedule_index.selected(db, user.class_id, user.id)
+    return personal_calendars.get(user.id, schedule, selected, f'{clazz.name} - Mein Stundenplan', datetime.date.today())
+
 @router.get("/caldav/{token}/calendar.ics")
 def get_calendar(
     token: str,
+    timetable: bool = Query(False),
     db: Session = Depends(get_db)
 ):
-    """Get calendar as ICS file"""
+    """Get calendar as ICS file (with `?timetable=1` including the personal timetable)"""
     user = crud.get_user_by_caldav_token(db, token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid CalDAV token")
@@ -38,12 +48,34 @@ def get_calendar(
             event.add('description', ev.title)
         cal.add_component(event)
     
+    if timetable:
+        for lesson in _personal_timetable(db, user, clazz).events:
+            cal.add_component(lesson)
+    
+    ICS_RENDERS.labels("calendar").inc()
     return PlainTextResponse(
         content=cal.to_ical().decode('utf-8'),
         media_type='text/calendar',
         headers={'Content-Disposition': 'attachment; filename="calendar.ics"'}
     )
 
+@router.get("/caldav/{token}/timetable.ics")
+def get_timetable_calendar(
+    token: str,
+    db: Session = Depends(get_db)
+):
+    """Get the personal timetable (selected slots) as ICS file"""
+    user = crud.get_user_by_caldav_token(db, token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid CalDAV token")
+    
+    clazz = crud.get_class(db, user.class_id)
+    return PlainTextResponse(
+        content=_personal_timetable(db, user, clazz).ics,
+        media_type='text/calendar',
+        headers={'Content-Disposition': 'attachment; filename="timetable.ics"'}
+    )
+
 # CalDAV settings endpoints
 @router.post("/caldav/enable")
 def enable_caldav(
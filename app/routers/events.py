@@ -1,17 +1,30 @@
 from fastapi import APIRouter, Depends, Form, HTTPException, Response, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, HTMLResponse
 from app.repository.base import BaseRepository
 from app.repository.factory import get_repository
 from app import models
 from app.core.auth import get_current_user, require_user, require_class_admin
 from app.quotas import check_event_quota, check_subject_quota
 from app.limiter import limiter
+from app.core.fragment_cache import fragment_cache, EVENTS_CHANGED
+from app.core.push_dispatch import notify_event
+from app.core.live_updates import live_bus
+from app.templating import templates
+from urllib.parse import urlparse
 import datetime
 import json
 import os
 
 router = APIRouter()
 
+
+def _events_changed(response: Response, class_id: str, event_id: str):
+    """Drop cached dashboard fragments and let HTMX refresh them in place (here and in open live streams)."""
+    fragment_cache.invalidate(class_id)
+    live_bus.publish(class_id, "events", id=event_id)
+    response.headers["HX-Trigger"] = EVENTS_CHANGED
+
+
 @router.post("/events")
 @limiter.limit("5/minute")
 def create_event(
@@ -66,9 +79,54 @@ def create_event(
                           target_id=event.id, data=json.dumps({"type": type, "subject": actual_subject_name, "priority": priority}),
                           permanent=True)
     
-    response.headers["HX-Redirect"] = "/"
+    _events_changed(response, user.class_id, event.id)
+    notify_event(user.class_id, event, "created", author_id=user.id)
     return {"status": "created", "event_id": event.id}
 
+def _event_payload(event, topics, links) -> dict:
+    return {
+        "id": event.id,
+        "type": event.type.value,
+        "priority": event.priority.value if event.priority else "medium", 
+        "subject_name": event.subject_name,
+        "title": event.title,
+        "date": event.date.strftime("%Y-%m-%d") if event.date else None,
+        "author": event.author.name if hasattr(event, 'author') and event.author else "Unbekannt", # Author lookup might need fetching if not eager loaded
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+        "topics": [{"id": t.id, "type": t.topic_type, "content": t.content, "count": t.count, "parent_id": t.parent_id} for t in topics],
+        "links": [{"id": l.id, "url": l.url, "label": l.label} for l in links]
+    }
+
+
+def _topic_tree(topics: list[dict]) -> list[dict]:
+    """Flatten topics into display order (parents before children) with a nesting level."""
+    ids = {t["id"] for t in topics}
+    children: dict[str, list[dict]] = {}
+    roots = []
+    for t in topics:
+        if t["parent_id"] and t["parent_id"] in ids:
+            children.setdefault(t["parent_id"], []).append(t)
+        else:
+            roots.append(t)
+
+    flat = []
+    def walk(node, level):
+        flat.append({**node, "level": level})
+        for child in children.get(node["id"], []):
+            walk(child, level + 1)
+    for root in roots:
+        walk(root, 0)
+    return flat
+
+
+def _safe_href(url: str) -> str:
+    try:
+        scheme = urlparse(url or "").scheme
+    except ValueError:
+        return "#"
+    return url if scheme in ("", "http", "https") else "#"
+
+
 @router.get("/events/{event_id}")
 def get_event_details(
     event_id: str,
@@ -82,18 +140,30 @@ def get_event_details(
     topics = repo.get_topics_for_event(event_id)
     links = repo.get_links_for_event(event_id)
     
-    return {
-        "id": event.id,
-        "type": event.type.value,
-        "priority": event.priority.value if event.priority else "medium", 
-        "subject_name": event.subject_name,
-        "title": event.title,
-        "date": event.date.strftime("%Y-%m-%d") if event.date else None,
-        "author": event.author.name if hasattr(event, 'author') and event.author else "Unbekannt", # Author lookup might need fetching if not eager loaded
-        "created_at": event.created_at.isoformat() if event.created_at else None,
-        "topics": [{"id": t.id, "type": t.topic_type, "content": t.content, "count": t.count, "parent_id": t.parent_id} for t in topics],
-        "links": [{"id": l.id, "url": l.url, "label": l.label} for l in links]
-    }
+    return _event_payload(event, topics, links)
+
+@router.get("/partials/events/{event_id}", response_class=HTMLResponse)
+def event_detail_partial(
+    event_id: str,
+    user: models.User = Depends(require_user),
+    repo: BaseRepository = Depends(get_repository)
+):
+    """Server-rendered body of the event detail modal (cached per class until the next event write)."""
+    # The cached HTML must not come from a replica that lacks the write that invalidated it
+    with repo.primary_reads():
+        event = repo.get_event(event_id)
+        if not event or event.class_id != user.class_id:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        def render():
+            payload = _event_payload(event, repo.get_topics_for_event(event_id), repo.get_links_for_event(event_id))
+            return templates.env.get_template("partials/_event_detail.html").render({
+                "event": payload,
+                "topics": _topic_tree(payload["topics"]),
+                "links": [{**l, "href": _safe_href(l["url"])} for l in payload["links"]],
+            })
+
+        return HTMLResponse(fragment_cache.get_or_render(user.class_id, "event", event_id, render))
 
 @router.put("/events/{event_id}")
 def edit_event(
@@ -132,15 +202,16 @@ def edit_event(
         except:
             pass
     
-    repo.update_event(event_id, type=event_type, subject_name=subject_name, 
-                      title=title, date=event_date, priority=event_priority)
+    updated = repo.update_event(event_id, type=event_type, subject_name=subject_name, 
+                                title=title, date=event_date, priority=event_priority)
     
     # Audit log (permanent)
     repo.create_audit_log(user.class_id, user.id, models.AuditAction.EVENT_EDIT,
                           target_id=event_id, data=json.dumps({"edited_by": user.name}),
                           permanent=True)
     
-    response.headers["HX-Redirect"] = "/"
+    _events_changed(response, user.class_id, event_id)
+    notify_event(user.class_id, updated, "updated", author_id=user.id)
     return {"status": "updated"}
 
 @router.delete("/events/{event_id}")
@@ -160,7 +231,7 @@ def delete_event(
                           permanent=True)
     
     repo.delete_event(event_id)
-    response.headers["HX-Redirect"] = "/"
+    _events_changed(response, user.class_id, event_id)
     return {"status": "deleted"}
 
 # --- Topic Endpoints ---
@@ -200,12 +271,14 @@ def add_topic(
                           target_id=event_id, data=json.dumps({"topic": topic_type}),
                           permanent=True)
     
+    _events_changed(response, user.class_id, event_id)
     return {"status": "created", "topic_id": topic.id}
 
 @router.delete("/events/{event_id}/topics/{topic_id}")
 def delete_topic_endpoint(
     event_id: str,
     topic_id: str,
+    response: Response,
     user: models.User = Depends(require_user),
     repo: BaseRepository = Depends(get_repository)
 ):
@@ -214,12 +287,14 @@ def delete_topic_endpoint(
         raise HTTPException(status_code=404, detail="Event not found")
     
     repo.delete_topic(topic_id)
+    _events_changed(response, user.class_id, event_id)
     return {"status": "deleted"}
 
 # --- Link Endpoints ---
 @router.post("/events/{event_id}/links")
 def add_link(
     event_id: str,
+    response: Response,
     url: str = Form(...),
     label: str = Form(...),
     user: models.User = Depends(require_user),
@@ -235,12 +310,14 @@ def add_link(
         raise HTTPException(status_code=400, detail="Max 10 links")
 
     link = repo.create_event_link(event_id, url, label)
+    _events_changed(response, user.class_id, event_id)
     return {"status": "created", "link_id": link.id}
 
 @router.delete("/events/{event_id}/links/{link_id}")
 def delete_link_endpoint(
     event_id: str,
     link_id: str,
+    response: Response,
     user: models.User = Depends(require_user),
     repo: BaseRepository = Depends(get_repository)
 ):
@@ -249,6 +326,7 @@ def delete_link_endpoint(
         raise HTTPException(status_code=404, detail="Event not found")
     
     repo.delete_link(link_id)
+    _events_changed(response, user.class_id, event_id)
     return {"status": "deleted"}
 
 # --- Subject Endpoints ---
@@ -265,7 +343,8 @@ def create_subject(
     # Check Quota
     check_subject_quota(repo, user)
 
-    repo.create_subject(class_id=user.class_id, name=name, color=color)
+    subject = repo.create_subject(class_id=user.class_id, name=name, color=color)
+    live_bus.publish(user.class_id, "subjects", id=subject.id)
     response.headers["HX-Redirect"] = "/"
     return {"status": "created"}
 
@@ -278,6 +357,8 @@ def delete_subject(
 ):
     deleted = repo.delete_subject(subject_id)
     if deleted:
+        fragment_cache.invalidate(user.class_id)
+        live_bus.publish(user.class_id, "subjects", id=subject_id)
         response.headers["HX-Redirect"] = "/"
         return {"status": "deleted"}
     else:
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from app import crud
+from app.core.live_updates import live_bus, parse_last_event_id
+from app.database import SessionLocal
+
+router = APIRouter()
+
+
+def _session_class_id(session_token: Optional[str]) -> Optional[str]:
+    # Short-lived session: the stream itself must not hold a pooled connection
+    if not session_token:
+        return None
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_session(db, session_token)
+        return user.class_id if user else None
+    finally:
+        db.close()
+
+
+async def open_stream(request: Request):
+    class_id = await run_in_threadpool(_session_class_id, request.cookies.get("session_token"))
+    if not class_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return live_bus.response(class_id, last_event_id=parse_last_event_id(request.headers.get("last-event-id")))
+
+
+@router.get("/live/stream")
+async def live_stream(request: Request):
+    """Live updates for the logged-in user's class (EventSource in the dashboard)."""
+    return await open_stream(request)
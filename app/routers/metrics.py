@@ -0,0 +1,21 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.metrics import metrics_token, render
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str = Header(None)):
+    """Prometheus scrape endpoint (Bearer METRICS_TOKEN; without a token it isn't served)."""
+    token = metrics_token()
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    # Reads the worker files / counts webhook deliveries: keep it off the event loop
+    body, content_type = await run_in_threadpool(render)
+    return Response(body, media_type=content_type)
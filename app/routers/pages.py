@@ -1,35 +1,48 @@
 from fastapi import APIRouter, Request, Depends, Query, Response, HTTPException
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from app.core.auth import get_current_user
+from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
+from app.core.auth import get_current_user, require_user
+from app.core.fragment_cache import fragment_cache
+from app.core.replicas import primary_reads
+from app.core.schedule_index import WEEKDAY_NAMES, schedule_index
+from app.core.static_assets import static_files
 from app import crud, models
 from app.database import get_db
 from sqlalchemy.orm import Session
 from app.core import calendar_utils
+from app.templating import templates
+from markupsafe import Markup
 import datetime
 import os
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-templates.env.globals["gtm_id"] = os.getenv("GTM_ID")
 
 
 def _render_landing(request: Request):
     # Public marketing page, independent from auth/dashboard routing.
     return templates.TemplateResponse("landing.html", {"request": request})
 
+# Not fingerprinted (fixed URLs), but served precompressed with a day of caching
+CRAWLER_FILE_CACHE = "public, max-age=86400"
+
+
+async def _crawler_file(request: Request, name: str):
+    response = await static_files.get_response(name, request.scope)
+    response.headers["Cache-Control"] = CRAWLER_FILE_CACHE
+    return response
+
+
 @router.get("/sitemap.xml")
-def sitemap():
-    return FileResponse("app/static/sitemap.xml")
+async def sitemap(request: Request):
+    return await _crawler_file(request, "sitemap.xml")
 
 @router.get("/robots.txt")
-def robots():
-    return FileResponse("app/static/robots.txt")
+async def robots(request: Request):
+    return await _crawler_file(request, "robots.txt")
 
 
 @router.get("/favicon.ico")
-def favicon():
-    return FileResponse("app/static/brand/classly-logo.png")
+async def favicon(request: Request):
+    return await _crawler_file(request, "brand/classly-logo.png")
 
 @router.get("/impressum")
 def impressum(request: Request):
@@ -51,6 +64,103 @@ def datenschutz(request: Request):
     }
     return templates.TemplateResponse("datenschutz.html", {"request": request, "legal_info": legal_info})
 
+def _month_navigation(year: int | None, month: int | None, today: datetime.datetime) -> dict:
+    # Use query params or default to current month
+    cal_year = year if year else today.year
+    cal_month = month if month else today.month
+    
+    # Validate year range (reasonable bounds)
+    if cal_year < 2020 or cal_year > 2100:
+        cal_year = today.year
+    
+    # Calculate previous and next month
+    prev_month = cal_month - 1
+    prev_year = cal_year
+    if prev_month < 1:
+        prev_month = 12
+        prev_year -= 1
+    
+    next_month = cal_month + 1
+    next_year = cal_year
+    if next_month > 12:
+        next_month = 1
+        next_year += 1
+
+    return {
+        "current_month": datetime.date(cal_year, cal_month, 1).strftime("%B %Y"),
+        "current_year": cal_year,
+        "current_month_num": cal_month,
+        "prev_year": prev_year,
+        "prev_month": prev_month,
+        "next_year": next_year,
+        "next_month": next_month,
+    }
+
+
+def _upcoming_events(events, today: datetime.datetime):
+    # Filter upcoming events (today or future, sorted by date)
+    upcoming_events = [e for e in events if e.date is not None and e.date.date() >= today.date()]
+    
+    # Sort by Date ASC, then Priority (High > Medium > Low)
+    def priority_score(e):
+        val = e.priority.value if e.priority else 'medium'
+        if val == 'high': return 3
+        if val == 'medium': return 2
+        return 1
+        
+    return sorted(upcoming_events, key=lambda x: (x.date.date(), -priority_score(x)))[:10]
+
+
+def _info_events(events):
+    # Infos (Type INFO)
+    infos = [e for e in events if e.type == models.EventType.INFO]
+    return sorted(infos, key=lambda x: x.created_at if x.created_at else datetime.datetime.min, reverse=True)
+
+
+class _DashboardFragments:
+    """
+    Renders the event-driven dashboard regions through the fragment cache.
+    Events are only queried when at least one fragment misses the cache.
+    """
+
+    def __init__(self, db: Session, user: models.User, today: datetime.datetime):
+        self.db = db
+        self.user = user
+        self.today = today
+        self._events = None
+
+    @property
+    def events(self):
+        if self._events is None:
+            self._events = crud.get_events_for_class(self.db, self.user.class_id)
+        return self._events
+
+    def _render(self, name: str, key, template: str, build_context) -> Markup:
+        def render():
+            with primary_reads(self.db):  # cached for the whole class: no replica reads
+                return templates.env.get_template(template).render({"user": self.user, "today": self.today,
+                                                                    **build_context()})
+        return Markup(fragment_cache.get_or_render(self.user.class_id, name, key, render))
+
+    def calendar(self, nav: dict) -> Markup:
+        def context():
+            dated_events = [e for e in self.events if e.date is not None]
+            # Single month calendar
+            calendar_data = calendar_utils.get_month_calendar(nav["current_year"], nav["current_month_num"], dated_events)
+            return {"calendar": calendar_data, **nav}
+        # The "+ Event" button is hidden for guests, so they get their own variant
+        key = (nav["current_year"], nav["current_month_num"], self.today.date(), self.user.role == models.UserRole.GUEST)
+        return self._render("calendar", key, "partials/_calendar.html", context)
+
+    def upcoming(self) -> Markup:
+        return self._render("upcoming", self.today.date(), "partials/_upcoming.html",
+                            lambda: {"upcoming_events": _upcoming_events(self.events, self.today)})
+
+    def infos(self) -> Markup:
+        return self._render("infos", None, "partials/_info_feed.html",
+                            lambda: {"infos": _info_events(self.events)})
+
+
 @router.get("/")
 def index(
     request: Request, 
@@ -68,59 +178,17 @@ def index(
         clazz = crud.get_class(db, user.class_id)
         
         today = datetime.datetime.now()
+        nav = _month_navigation(year, month, today)
+        fragments = _DashboardFragments(db, user, today)
         
-        # Use query params or default to current month
-        cal_year = year if year else today.year
-        cal_month = month if month else today.month
-        
-        # Validate year range (reasonable bounds)
-        if cal_year < 2020 or cal_year > 2100:
-            cal_year = today.year
-        
-        # Calculate previous and next month
-        prev_month = cal_month - 1
-        prev_year = cal_year
-        if prev_month < 1:
-            prev_month = 12
-            prev_year -= 1
-        
-        next_month = cal_month + 1
-        next_year = cal_year
-        if next_month > 12:
-            next_month = 1
-            next_year += 1
-        
-        events = crud.get_events_for_class(db, clazz.id)
         subjects = crud.get_subjects_for_class(db, clazz.id)
         
-        # Filter upcoming events (today or future, sorted by date)
-        # Filter upcoming events (today or future, sorted by date)
-        dated_events = [e for e in events if e.date is not None]
-        upcoming_events = [e for e in dated_events if e.date.date() >= today.date()]
-        
-        # Sort by Date ASC, then Priority (High > Medium > Low)
-        def priority_score(e):
-            val = e.priority.value if e.priority else 'medium'
-            if val == 'high': return 3
-            if val == 'medium': return 2
-            return 1
-            
-        upcoming_events = sorted(upcoming_events, key=lambda x: (x.date.date(), -priority_score(x)))[:10]
-        
-        # Infos (Type INFO)
-        infos = [e for e in events if e.type == models.EventType.INFO]
-        infos = sorted(infos, key=lambda x: x.created_at if x.created_at else datetime.datetime.min, reverse=True)
-        
         members = []
         login_tokens = []
         if user.role in [models.UserRole.OWNER, models.UserRole.ADMIN, models.UserRole.CLASS_ADMIN]:
             members = crud.get_class_members(db, clazz.id)
             login_tokens = crud.get_login_tokens_for_class(db, clazz.id)
         
-        # Single month calendar
-        calendar_data = calendar_utils.get_month_calendar(cal_year, cal_month, dated_events)
-        current_month_name = datetime.date(cal_year, cal_month, 1).strftime("%B %Y")
-        
         # Grade statistics (only for registered users)
         grade_stats = None
         if user.is_registered:
@@ -130,20 +198,14 @@ def index(
             "request": request, 
             "user": user, 
             "clazz": clazz,
-            "calendar": calendar_data,
-            "current_month": current_month_name,
-            "current_year": cal_year,
-            "current_month_num": cal_month,
-            "prev_year": prev_year,
-            "prev_month": prev_month,
-            "next_year": next_year,
-            "next_month": next_month,
+            **nav,
+            "calendar_fragment": fragments.calendar(nav),
+            "upcoming_fragment": fragments.upcoming(),
+            "info_fragment": fragments.infos(),
             "today": today,
             "members": members,
             "subjects": subjects,
             "login_tokens": login_tokens,
-            "upcoming_events": upcoming_events,
-            "infos": infos,
             "base_url": str(request.base_url).rstrip("/"),
             "welcome_back": welcome_back,
             "grade_stats": grade_stats
@@ -152,6 +214,28 @@ def index(
         return _render_landing(request)
 
 
+# --- HTMX partials (dashboard regions, swapped in place after event writes) ---
+
+@router.get("/partials/calendar", response_class=HTMLResponse)
+def calendar_partial(
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+    year: int = Query(default=None),
+    month: int = Query(default=None, ge=1, le=12),
+):
+    today = datetime.datetime.now()
+    return HTMLResponse(_DashboardFragments(db, user, today).calendar(_month_navigation(year, month, today)))
+
+
+@router.get("/partials/upcoming", response_class=HTMLResponse)
+def upcoming_partial(user: models.User = Depends(require_user), db: Session = Depends(get_db)):
+    return HTMLResponse(_DashboardFragments(db, user, datetime.datetime.now()).upcoming())
+
+
+@router.get("/partials/infos", response_class=HTMLResponse)
+def infos_partial(user: models.User = Depends(require_user), db: Session = Depends(get_db)):
+    return HTMLResponse(_DashboardFragments(db, user, datetime.datetime.now()).infos())
+
 
 @router.get("/stundenplan")
 def stundenplan(
@@ -169,17 +253,6 @@ def stundenplan(
     })
 
 
-WEEKDAY_NAMES = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
-
-def _calculate_slot_time(settings: models.TimetableSettings, slot_number: int):
-    start_minutes = settings.day_start_hour * 60 + settings.day_start_minute
-    slot_start = start_minutes + (slot_number - 1) * (settings.slot_duration + settings.break_duration)
-    slot_end = slot_start + settings.slot_duration
-    start_h, start_m = divmod(slot_start, 60)
-    end_h, end_m = divmod(slot_end, 60)
-    return f"{start_h:02d}:{start_m:02d}", f"{end_h:02d}:{end_m:02d}"
-
-
 @router.get("/public/stundenplan/{code}")
 def public_stundenplan(request: Request, code: str, db: Session = Depends(get_db)):
     """
@@ -203,36 +276,11 @@ def public_stundenplan_data(code: str, db: Session = Depends(get_db)):
     if not clazz:
         raise HTTPException(status_code=404, detail="Not found")
 
-    settings = (
-        db.query(models.TimetableSettings)
-        .filter(models.TimetableSettings.class_id == clazz.id)
-        .first()
-    )
-
-    slots = (
-        db.query(models.TimetableSlot)
-        .filter(models.TimetableSlot.class_id == clazz.id)
-        .order_by(models.TimetableSlot.weekday, models.TimetableSlot.slot_number)
-        .all()
-    )
-
-    settings_payload = None
-    if settings:
-        settings_payload = {
-            "slot_duration": settings.slot_duration,
-            "break_duration": settings.break_duration,
-            "day_start_hour": settings.day_start_hour,
-            "day_start_minute": settings.day_start_minute,
-            "day_end_hour": settings.day_end_hour,
-            "day_end_minute": settings.day_end_minute,
-        }
+    schedule = schedule_index.get(db, clazz.id)
 
     result = []
-    for slot in slots:
-        start_time, end_time = ("", "")
-        if settings:
-            start_time, end_time = _calculate_slot_time(settings, slot.slot_number)
-
+    for entry in schedule.entries:
+        slot = entry.slot
         result.append(
             {
                 "id": slot.id,
@@ -242,15 +290,15 @@ def public_stundenplan_data(code: str, db: Session = Depends(get_db)):
                 "subject_name": slot.subject_name,
                 "group_name": slot.group_name,
                 "room": slot.room,
-                "start_time": start_time,
-                "end_time": end_time,
+                "start_time": entry.start_time,
+                "end_time": entry.end_time,
             }
         )
 
     return JSONResponse(
         {
             "class_name": clazz.name,
-            "settings": settings_payload,
+            "settings": schedule.settings,
             "slots": result,
         }
     )
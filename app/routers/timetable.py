@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from app.database import get_db
 from app import crud, models
 from app.core.auth import get_current_user
 from app.core import security
-from datetime import datetime, time, timedelta
+from app.core.schedule_index import WEEKDAY_NAMES, ScheduleEntry, build_schedule, format_minutes, schedule_index, slot_minutes
+from app.core import timetable_io
+from app.core.live_updates import live_bus
+from datetime import date, datetime, time, timedelta
 from typing import Optional
+from time import perf_counter
 
 router = APIRouter(prefix="/timetable", tags=["timetable"])
 
@@ -38,18 +42,36 @@ def require_admin(user: models.User = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
-WEEKDAY_NAMES = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag"]
+def _timetable_changed(class_id: str):
+    """Drop the compiled schedule and notify open live streams."""
+    schedule_index.invalidate(class_id)
+    live_bus.publish(class_id, "timetable")
 
 def calculate_slot_time(settings: models.TimetableSettings, slot_number: int):
     """Calculate start/end time for a slot based on settings"""
-    start_minutes = settings.day_start_hour * 60 + settings.day_start_minute
-    slot_start = start_minutes + (slot_number - 1) * (settings.slot_duration + settings.break_duration)
-    slot_end = slot_start + settings.slot_duration
-    
-    start_h, start_m = divmod(slot_start, 60)
-    end_h, end_m = divmod(slot_end, 60)
-    
-    return f"{start_h:02d}:{start_m:02d}", f"{end_h:02d}:{end_m:02d}"
+    start, end = slot_minutes(
+        settings.day_start_hour * 60 + settings.day_start_minute,
+        settings.slot_duration,
+        settings.break_duration,
+        slot_number,
+    )
+    return format_minutes(start), format_minutes(end)
+
+def _slot_payload(entry: ScheduleEntry) -> dict:
+    slot = entry.slot
+    return {
+        "id": slot.id,
+        "weekday": slot.weekday,
+        "weekday_name": WEEKDAY_NAMES[slot.weekday] if slot.weekday < 5 else "?",
+        "slot_number": slot.slot_number,
+        "subject_id": slot.subject_id,
+        "subject_name": slot.subject_name,
+        "group_name": slot.group_name,
+        "room": slot.room,
+        "start_time": entry.start_time,
+        "end_time": entry.end_time
+    }
+
 
 # === Settings Endpoints ===
 
@@ -112,6 +134,7 @@ def update_settings(
     settings.day_end_minute = day_end_minute
     
     db.commit()
+    _timetable_changed(user.class_id)
     return {"status": "success"}
 
 # === Slot Endpoints ===
@@ -122,34 +145,8 @@ def get_all_slots(
     db: Session = Depends(get_db)
 ):
     """Get all timetable slots for the class"""
-    slots = db.query(models.TimetableSlot).filter(
-        models.TimetableSlot.class_id == user.class_id
-    ).order_by(models.TimetableSlot.weekday, models.TimetableSlot.slot_number).all()
-    
-    settings = db.query(models.TimetableSettings).filter(
-        models.TimetableSettings.class_id == user.class_id
-    ).first()
-    
-    result = []
-    for slot in slots:
-        start_time, end_time = ("", "")
-        if settings:
-            start_time, end_time = calculate_slot_time(settings, slot.slot_number)
-        
-        result.append({
-            "id": slot.id,
-            "weekday": slot.weekday,
-            "weekday_name": WEEKDAY_NAMES[slot.weekday] if slot.weekday < 5 else "?",
-            "slot_number": slot.slot_number,
-            "subject_id": slot.subject_id,
-            "subject_name": slot.subject_name,
-            "group_name": slot.group_name,
-            "room": slot.room,
-            "start_time": start_time,
-            "end_time": end_time
-        })
-    
-    return {"slots": result}
+    schedule = schedule_index.get(db, user.class_id)
+    return {"slots": [_slot_payload(entry) for entry in schedule.entries]}
 
 @router.post("/slots")
 def create_slot(
@@ -180,6 +177,7 @@ def create_slot(
     db.add(slot)
     db.commit()
     db.refresh(slot)
+    _timetable_changed(user.class_id)
     
     return {"status": "created", "id": slot.id}
 
@@ -198,12 +196,11 @@ def create_slots_bulk(
     if weekday < 0 or weekday > 4:
         raise HTTPException(status_code=400, detail="Weekday must be 0-4")
 
-    created_ids: list[str] = []
-    for slot_number in slot_numbers:
-        if slot_number < 1 or slot_number > 12:
-            raise HTTPException(status_code=400, detail="Slot number must be 1-12")
+    if any(slot_number < 1 or slot_number > 12 for slot_number in slot_numbers):
+        raise HTTPException(status_code=400, detail="Slot number must be 1-12")
 
-        slot = models.TimetableSlot(
+    slots = [
+        models.TimetableSlot(
             class_id=user.class_id,
             weekday=weekday,
             slot_number=slot_number,
@@ -212,14 +209,150 @@ def create_slots_bulk(
             group_name=group_name if group_name else None,
             room=room if room else None,
         )
-        db.add(slot)
-        db.flush()
-        created_ids.append(slot.id)
+        for slot_number in slot_numbers
+    ]
+    db.add_all(slots)
+    db.flush()
+    created_ids = [slot.id for slot in slots]
 
     db.commit()
+    _timetable_changed(user.class_id)
     return {"status": "created", "ids": created_ids, "count": len(created_ids)}
 
 
+# === Holidays ===
+
+@router.get("/holidays")
+def list_holidays(
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db)
+):
+    """List lesson-free periods (excluded from the timetable calendar feed)"""
+    return [holiday._asdict() for holiday in schedule_index.get(db, user.class_id).holidays]
+
+@router.post("/holidays")
+def create_holiday(
+    name: str = Form(...),
+    start_date: date = Form(...),
+    end_date: Optional[date] = Form(None),
+    user: models.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Add a holiday or a holiday period, end date inclusive (admin only)"""
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    
+    holiday = models.TimetableHoliday(class_id=user.class_id, name=name, start_date=start_date, end_date=end_date)
+    db.add(holiday)
+    db.commit()
+    _timetable_changed(user.class_id)
+    return {"status": "created", "id": holiday.id}
+
+@router.delete("/holidays/{holiday_id}")
+def delete_holiday(
+    holiday_id: str,
+    user: models.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Delete a holiday (admin only)"""
+    deleted = db.query(models.TimetableHoliday).filter(
+        models.TimetableHoliday.id == holiday_id,
+        models.TimetableHoliday.class_id == user.class_id
+    ).delete()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Holiday not found")
+    
+    db.commit()
+    _timetable_changed(user.class_id)
+    return {"status": "deleted"}
+
+
+# === Import / Export ===
+
+_EXPORT_MEDIA_TYPES = {"csv": "text/csv", "json": "application/json", "ics": "text/calendar"}
+
+@router.get("/export")
+def export_timetable(
+    format: str = Query("csv", pattern="^(csv|json|ics)$"),
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db)
+):
+    """Export the whole week as CSV, JSON or iCalendar (weekly RRULE per slot)"""
+    schedule = schedule_index.get(db, user.class_id)
+    if format == "csv":
+        content = timetable_io.export_csv(schedule)
+    elif format == "json":
+        content = timetable_io.export_json(schedule)
+    else:
+        if not schedule.has_settings:
+            raise HTTPException(status_code=400, detail="Timetable settings required for iCalendar export")
+        clazz = crud.get_class(db, user.class_id)
+        content = timetable_io.export_ics(schedule, f"{clazz.name} - Stundenplan", datetime.now().date())
+    
+    return Response(
+        content=content,
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="stundenplan.{format}"'}
+    )
+
+@router.post("/import")
+def import_timetable(
+    file: Optional[UploadFile] = File(None),
+    content: Optional[str] = Form(None),
+    format: Optional[str] = Form(None),
+    replace: bool = Form(True),
+    dry_run: bool = Form(False),
+    user: models.User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Import a whole week (admin only).
+
+    Diffed against the current slots: only new/changed slots are written and,
+    with `replace`, slots missing from the import are deleted. One transaction.
+    """
+    started = perf_counter()
+    limit = timetable_io.IMPORT_MAX_BYTES
+    if file is not None:
+        raw = file.file.read(limit + 1)  # one byte more tells "too large" from "exactly the limit"
+        format = format or (file.filename or "").rsplit(".", 1)[-1].lower()
+    elif content is not None:
+        raw = content.encode("utf-8")
+    else:
+        raise HTTPException(status_code=400, detail="Upload a file or send content")
+    if len(raw) > limit:
+        raise HTTPException(status_code=413, detail=f"Timetable import is limited to {limit} bytes")
+    format = format or "csv"
+
+    try:
+        incoming = timetable_io.parse(raw.decode("utf-8"), format)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8")
+    except timetable_io.TimetableImportError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+
+    # Diff against the database, not a possibly stale cached index
+    existing = build_schedule(db, user.class_id)
+    diff = timetable_io.plan_import((entry.slot for entry in existing.entries), incoming, replace=replace)
+
+    if not dry_run and (diff.create or diff.update or diff.delete):
+        try:
+            timetable_io.apply_import(db, user.class_id, diff)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            _timetable_changed(user.class_id)
+
+    return {
+        "status": "dry_run" if dry_run else "imported",
+        **diff.summary(),
+        "elapsed_ms": round((perf_counter() - started) * 1000, 2),
+    }
+
+
 # === Public Share (Admin) ===
 
 @router.get("/public/status")
@@ -298,6 +431,7 @@ def update_slot(
     slot.room = room if room else None
     
     db.commit()
+    _timetable_changed(user.class_id)
     return {"status": "updated"}
 
 @router.delete("/slots/{slot_id}")
@@ -322,6 +456,7 @@ def delete_slot(
     
     db.delete(slot)
     db.commit()
+    _timetable_changed(user.class_id)
     return {"status": "deleted"}
 
 # === User Selection Endpoints ===
@@ -332,46 +467,17 @@ def get_my_timetable(
     db: Session = Depends(get_db)
 ):
     """Get personalized timetable for user"""
-    # Get user's selected slots
-    selections = db.query(models.UserTimetableSelection).filter(
-        models.UserTimetableSelection.user_id == user.id
-    ).all()
-    
-    selected_slot_ids = [s.slot_id for s in selections]
-    
-    # Get all slots for the class
-    all_slots = db.query(models.TimetableSlot).filter(
-        models.TimetableSlot.class_id == user.class_id
-    ).order_by(models.TimetableSlot.weekday, models.TimetableSlot.slot_number).all()
-    
-    settings = db.query(models.TimetableSettings).filter(
-        models.TimetableSettings.class_id == user.class_id
-    ).first()
+    schedule = schedule_index.get(db, user.class_id)
+    selected = schedule_index.selected(db, user.class_id, user.id)
     
-    # Build result with selection status
     result = []
-    for slot in all_slots:
-        start_time, end_time = ("", "")
-        if settings:
-            start_time, end_time = calculate_slot_time(settings, slot.slot_number)
-        
-        # Check if this slot is selected by user
-        is_selected = slot.id in selected_slot_ids
-        
-        result.append({
-            "id": slot.id,
-            "weekday": slot.weekday,
-            "weekday_name": WEEKDAY_NAMES[slot.weekday] if slot.weekday < 5 else "?",
-            "slot_number": slot.slot_number,
-            "subject_name": slot.subject_name,
-            "group_name": slot.group_name,
-            "room": slot.room,
-            "start_time": start_time,
-            "end_time": end_time,
-            "selected": is_selected
-        })
+    for entry in schedule.entries:
+        payload = _slot_payload(entry)
+        del payload["subject_id"]
+        payload["selected"] = entry.slot_id in selected
+        result.append(payload)
     
-    return {"slots": result, "selected_count": len(selected_slot_ids)}
+    return {"slots": result, "selected_count": len(selected)}
 
 @router.post("/select/{slot_id}")
 def select_slot(
@@ -401,6 +507,7 @@ def select_slot(
     selection = models.UserTimetableSelection(user_id=user.id, slot_id=slot_id)
     db.add(selection)
     db.commit()
+    schedule_index.invalidate_user(user.class_id, user.id)
     
     return {"status": "selected"}
 
@@ -419,6 +526,7 @@ def deselect_slot(
     if selection:
         db.delete(selection)
         db.commit()
+        schedule_index.invalidate_user(user.class_id, user.id)
     
     return {"status": "deselected"}
 
@@ -431,63 +539,31 @@ def get_next_lesson(
 ):
     """Get the next upcoming lesson for widget"""
     now = datetime.now()
-    current_weekday = now.weekday()  # 0=Monday
-    current_time = now.hour * 60 + now.minute
-    
-    # Get settings
-    settings = db.query(models.TimetableSettings).filter(
-        models.TimetableSettings.class_id == user.class_id
-    ).first()
     
-    if not settings:
+    schedule = schedule_index.get(db, user.class_id)
+    if not schedule.has_settings:
         return {"next_lesson": None}
     
-    # Get user's selected slots
-    selections = db.query(models.UserTimetableSelection).filter(
-        models.UserTimetableSelection.user_id == user.id
-    ).all()
-    
-    selected_slot_ids = [s.slot_id for s in selections]
-    
-    if not selected_slot_ids:
+    selected = schedule_index.selected(db, user.class_id, user.id)
+    if not selected:
         return {"next_lesson": None, "message": "Keine Kurse ausgewählt"}
     
-    # Find next lesson
-    for day_offset in range(7):  # Check up to a week ahead
-        check_day = (current_weekday + day_offset) % 7
-        
-        # Skip weekends
-        if check_day > 4:
-            continue
-        
-        # Get slots for this day
-        day_slots = db.query(models.TimetableSlot).filter(
-            models.TimetableSlot.class_id == user.class_id,
-            models.TimetableSlot.weekday == check_day,
-            models.TimetableSlot.id.in_(selected_slot_ids)
-        ).order_by(models.TimetableSlot.slot_number).all()
-        
-        for slot in day_slots:
-            start_time_str, end_time_str = calculate_slot_time(settings, slot.slot_number)
-            start_h, start_m = map(int, start_time_str.split(":"))
-            slot_start_minutes = start_h * 60 + start_m
-            
-            # For today, check if slot is in the future
-            if day_offset == 0 and slot_start_minutes <= current_time:
-                continue
-            
-            # Found next lesson
-            return {
-                "next_lesson": {
-                    "subject_name": slot.subject_name,
-                    "group_name": slot.group_name,
-                    "room": slot.room,
-                    "weekday": WEEKDAY_NAMES[check_day],
-                    "start_time": start_time_str,
-                    "end_time": end_time_str,
-                    "is_today": day_offset == 0,
-                    "day_offset": day_offset
-                }
-            }
+    # Binary search over the compiled week (wraps into next week)
+    found = schedule.next_lesson(selected, now.weekday(), now.hour * 60 + now.minute)
+    if found is None:
+        return {"next_lesson": None}
     
-    return {"next_lesson": None}
+    entry, day_offset = found
+    slot = entry.slot
+    return {
+        "next_lesson": {
+            "subject_name": slot.subject_name,
+            "group_name": slot.group_name,
+            "room": slot.room,
+            "weekday": WEEKDAY_NAMES[entry.weekday],
+            "start_time": entry.start_time,
+            "end_time": entry.end_time,
+            "is_today": day_offset == 0,
+            "day_offset": day_offset
+        }
+    }
@@ -0,0 +1,139 @@
+"""
+Shared Jinja2 template environment.
+
+All routers render through the single `templates` instance defined here, so
+compiled templates are cached once per worker instead of once per router.
+
+- Bytecode cache: compiled template code is written to TEMPLATE_CACHE_DIR and
+  reused by every worker / restart (skips parsing + compiling on first render).
+- auto_reload is only enabled in development (DEV_MODE=true) or when
+  TEMPLATE_AUTO_RELOAD=true; in production templates never change at runtime.
+- Optional build step: `python -m app.templating precompile` compiles all
+  templates into Python modules (TEMPLATE_PRECOMPILED_DIR). When present,
+  they are loaded directly via ModuleLoader, with the file system as fallback.
+  A manifest stores a hash of the template sources; if the templates changed
+  since (deploy without re-running precompile), the modules are ignored.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+)
+
+from app.core.static_assets import static_url
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = "app/templates"
+PRECOMPILED_DIR = os.getenv("TEMPLATE_PRECOMPILED_DIR", "app/templates_compiled")
+MANIFEST = "manifest.json"
+
+
+def dev_mode() -> bool:
+    return os.getenv("DEV_MODE", "false").lower() == "true"
+
+
+def auto_reload_enabled() -> bool:
+    raw = os.getenv("TEMPLATE_AUTO_RELOAD")
+    if raw is not None and raw.strip() != "":
+        return raw.lower() == "true"
+    return dev_mode()
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache | None:
+    cache_dir = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "classly-jinja-cache"))
+    if cache_dir.lower() in ("", "off", "none"):
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        # Read-only file system etc. - rendering still works without the cache
+        return None
+    return FileSystemBytecodeCache(cache_dir)
+
+
+def sources_hash(template_dir: str = TEMPLATE_DIR) -> str:
+    """SHA-256 over the names and contents of all templates."""
+    digest = hashlib.sha256()
+    for name in sorted(FileSystemLoader(template_dir).list_templates()):
+        digest.update(name.encode() + b"\0")
+        with open(os.path.join(template_dir, name), "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def precompiled_current(precompiled_dir: str, template_dir: str = TEMPLATE_DIR) -> bool:
+    """True if `precompiled_dir` was compiled from the templates as they are now."""
+    try:
+        with open(os.path.join(precompiled_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(manifest, dict) and manifest.get("sources") == sources_hash(template_dir)
+
+
+def build_environment(
+    template_dir: str = TEMPLATE_DIR,
+    precompiled_dir: str | None = PRECOMPILED_DIR,
+    bytecode_cache: FileSystemBytecodeCache | None = None,
+    auto_reload: bool | None = None,
+) -> Environment:
+    """Create the Jinja2 environment used by all routers."""
+    if auto_reload is None:
+        auto_reload = auto_reload_enabled()
+
+    file_loader = FileSystemLoader(template_dir)
+    loader = file_loader
+    # Precompiled modules can't detect template edits, so never use them while reloading
+    if precompiled_dir and not auto_reload and os.path.isdir(precompiled_dir):
+        if precompiled_current(precompiled_dir, template_dir):
+            loader = ChoiceLoader([ModuleLoader(precompiled_dir), file_loader])
+        else:
+            logger.warning("Precompiled templates in %s are outdated or lack a manifest, "
+                           "using %s (re-run python -m app.templating precompile)", precompiled_dir, template_dir)
+
+    env = Environment(
+        loader=loader,
+        autoescape=True,
+        auto_reload=auto_reload,
+        bytecode_cache=bytecode_cache,
+    )
+    env.globals["gtm_id"] = os.getenv("GTM_ID")
+    env.globals["static_url"] = static_url
+    return env
+
+
+def precompile(target: str = PRECOMPILED_DIR, template_dir: str = TEMPLATE_DIR) -> int:
+    """Compile every template into a Python module under `target`. Returns the template count."""
+    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+    os.makedirs(target, exist_ok=True)
+    names = env.list_templates(extensions=["html"])
+    env.compile_templates(target, extensions=["html"], zip=None, ignore_errors=False)
+    with open(os.path.join(target, MANIFEST), "w") as f:
+        json.dump({"sources": sources_hash(template_dir)}, f)
+    return len(names)
+
+
+templates = Jinja2Templates(env=build_environment(bytecode_cache=_bytecode_cache()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "precompile":
+        out = sys.argv[2] if len(sys.argv) > 2 else PRECOMPILED_DIR
+        count = precompile(out)
+        print(f"Precompiled {count} templates into {out}")
+    else:
+        print("Usage: python -m app.templating precompile [target_dir]")
+        sys.exit(1)
@@ -0,0 +1,5 @@
+"""
+Classly benchmarks.
+
+Run from the repository root, e.g. `python -m benchmarks.i18n_render`.
+"""
@@ -0,0 +1,69 @@
+"""
+Benchmark: API v1 event serialization at 500-event pages.
+
+Compares the previous path (per-field `isoformat()`/`hasattr` in
+`_serialize_event`, then FastAPI's `jsonable_encoder` + stdlib `json`) with
+the precompiled serializers + `FastJSONResponse`, both in isolation and end to
+end via GET /api/v1/events?limit=500.
+
+    python -m benchmarks.api_serialization
+"""
+
+import json
+
+from benchmarks.common import boot_app, issue_api_key, measure, report, seed_class
+
+
+def legacy_serialize_event(event) -> dict:
+    """The pre-compiled-serializer version of `_serialize_event` (without topics/links)."""
+    return {
+        "id": event.id,
+        "class_id": event.class_id,
+        "type": event.type.value if hasattr(event.type, "value") else event.type,
+        "priority": event.priority.value if event.priority and hasattr(event.priority, "value") else (event.priority or "MEDIUM"),
+        "subject_id": event.subject_id,
+        "subject_name": event.subject_name,
+        "title": event.title,
+        "date": event.date.isoformat() if event.date else None,
+        "author_id": event.author_id,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+        "updated_at": event.updated_at.isoformat() if event.updated_at else None
+    }
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from app.core.fastjson import dumps, orjson
+    from app.database import SessionLocal
+    from app.repository.sql import SqlAlchemyRepository
+    from app.routers.api_v1.serializers import serialize_events
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=500)
+    api_key = issue_api_key(db, clazz, owner)
+    events = SqlAlchemyRepository(db).list_events(class_id=clazz.id, limit=500)
+    print(f"{len(events)} events, encoder: {'orjson' if orjson else 'stdlib json'}")
+
+    def legacy():
+        payload = {"class_id": clazz.id, "count": len(events), "events": [legacy_serialize_event(e) for e in events]}
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def compiled():
+        return dumps({"class_id": clazz.id, "count": len(events), "events": serialize_events(events)})
+
+    assert json.loads(legacy()) == json.loads(compiled()), "serializers disagree"
+    report("serialize 500 legacy", measure(legacy, iterations=100))
+    report("serialize 500 compiled", measure(compiled, iterations=100))
+    db.close()
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {api_key}", "Accept-Encoding": "identity"}
+    assert client.get("/api/v1/events?limit=500", headers=headers).json()["count"] == 500
+    report("GET /api/v1/events?limit=500", measure(lambda: client.get("/api/v1/events?limit=500", headers=headers), iterations=50))
+
+
+if __name__ == "__main__":
+    main()
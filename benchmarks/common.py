@@ -0,0 +1,249 @@
+"""
+Shared helpers for the benchmark scripts.
+
+`boot_app()` points DATABASE_URL at a throwaway SQLite file *before* importing
+`app.main` (the app runs its migrations at import time), so benchmarks never
+touch a real database.
+"""
+
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def boot_app(db_path: str | None = None):
+    """Import the FastAPI app against a temporary SQLite database."""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix=".db", prefix="classly_bench_")
+        os.close(fd)
+        os.unlink(db_path)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("CSRF_PROTECTION_ENABLED", "false")
+    os.environ.setdefault("IP_RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("COOKIE_SECURE", "false")
+
+    # Templates and static files are resolved relative to the repo root
+    os.chdir(REPO_ROOT)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    from app.main import app
+
+    return app, db_path
+
+
+def seed_class(db, events: int = 200, members: int = 25, subjects: int = 12, seed: int = 42):
+    """
+    Seed one class with an owner, members, subjects and events.
+    Returns (clazz, owner).
+    """
+    from app import models
+
+    rng = random.Random(seed)
+    clazz = models.Class(name="Bench 10a", join_token=f"BENCH{seed}")
+    db.add(clazz)
+    db.flush()
+
+    owner = models.User(name="Bench Owner", class_id=clazz.id, role=models.UserRole.OWNER, is_registered=True)
+    db.add(owner)
+    db.flush()
+    clazz.owner_id = owner.id
+
+    for i in range(members):
+        db.add(models.User(name=f"Member {i}", class_id=clazz.id, role=models.UserRole.MEMBER))
+
+    subject_rows = []
+    for i in range(subjects):
+        s = models.Subject(class_id=clazz.id, name=f"Fach {i}", color="#%06x" % rng.randrange(0xFFFFFF))
+        db.add(s)
+        subject_rows.append(s)
+    db.flush()
+
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    types = list(models.EventType)
+    priorities = list(models.Priority)
+    for i in range(events):
+        subject = rng.choice(subject_rows)
+        db.add(models.Event(
+            class_id=clazz.id,
+            author_id=owner.id,
+            type=rng.choice(types),
+            priority=rng.choice(priorities),
+            subject_id=subject.id,
+            subject_name=subject.name,
+            title=f"Event {i}",
+            date=today + datetime.timedelta(days=rng.randint(-60, 60)),
+        ))
+
+    db.commit()
+    db.refresh(clazz)
+    db.refresh(owner)
+    return clazz, owner
+
+
+class SchoolClass:
+    """Handles for one seeded class (see `seed_school`)."""
+
+    def __init__(self, class_id: str, session_token: str, caldav_token: str, public_token: str,
+                 api_key: str, email: str, event_ids: list[str]):
+        self.class_id = class_id
+        self.session_token = session_token
+        self.caldav_token = caldav_token
+        self.public_token = public_token
+        self.api_key = api_key
+        self.email = email
+        self.event_ids = event_ids
+
+
+SCHOOL_PASSWORD = "bench-password"
+
+
+def seed_school(db, classes: int = 3, users: int = 25, events: int = 200, topics: int = 3, grades: int = 5,
+                slots: int = 40, seed: int = 42) -> list[SchoolClass]:
+    """
+    Seed a synthetic school: per class `users` members, `events` events with
+    `topics` topics each on exams, `grades` grades for the owner and a
+    timetable with `slots` lessons (half of them selected by the owner).
+    The owner is registered (email/password, CalDAV on), the public feed is
+    enabled and an API key is issued.
+    """
+    from app import crud, models
+
+    rng = random.Random(seed)
+    password_hash = crud.hash_password(SCHOOL_PASSWORD)
+    school = []
+    for c in range(classes):
+        clazz, owner = seed_class(db, events=events, members=users, seed=seed + c)
+        clazz.name = f"Bench {5 + c % 8}{'abcd'[c % 4]}"
+        clazz.timetable_public_enabled = True
+        clazz.timetable_public_token = f"public-{seed}-{c}"
+        owner.email = f"owner{c}@bench.classly.site"
+        owner.password_hash = password_hash
+        owner.caldav_enabled = True
+
+        event_rows = db.query(models.Event).filter(models.Event.class_id == clazz.id).all()
+        exams = [e for e in event_rows if e.type in (models.EventType.KA, models.EventType.TEST)]
+        for event in exams:
+            for t in range(topics):
+                db.add(models.EventTopic(event_id=event.id, topic_type=f"Thema {t}", pages=f"S. {10 * t}-{10 * t + 5}", order=t))
+        for event in rng.sample(exams, min(grades, len(exams))):
+            db.add(models.Grade(user_id=owner.id, event_id=event.id, grade=rng.choice([1.0, 1.7, 2.3, 3.0, 4.0]),
+                                weight=1.0 if event.type == models.EventType.KA else 0.5))
+
+        db.add(models.TimetableSettings(class_id=clazz.id))
+        for i in range(slots):
+            weekday, number = divmod(i, 10)
+            slot = models.TimetableSlot(class_id=clazz.id, weekday=weekday % 5, slot_number=number + 1,
+                                        subject_name=f"Fach {i % 12}", room=f"R{100 + i}")
+            db.add(slot)
+            db.flush()
+            if i % 2 == 0:
+                db.add(models.UserTimetableSelection(user_id=owner.id, slot_id=slot.id))
+        db.commit()
+
+        school.append(SchoolClass(
+            class_id=clazz.id, session_token=owner.session_token, caldav_token=owner.caldav_token,
+            public_token=clazz.timetable_public_token, api_key=issue_api_key(db, clazz, owner),
+            email=owner.email, event_ids=[e.id for e in event_rows],
+        ))
+    return school
+
+
+def issue_api_key(db, clazz, owner, scopes: str = "events:read,events:write,timetable:read,subjects:read") -> str:
+    """Create an API v1 key for the seeded class. Returns the raw bearer token."""
+    from app import crud
+
+    _, raw_token = crud.create_api_key(
+        db, name="bench", user_id=owner.id, class_id=clazz.id, created_by=owner.id,
+        scopes=scopes, rate_limit=1_000_000,
+    )
+    return raw_token
+
+
+def measure(fn, iterations: int = 200, warmup: int = 10) -> dict:
+    """Run fn repeatedly and return latency percentiles in milliseconds."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def report(name: str, stats: dict):
+    print(
+        f"{name:<40} mean={stats['mean_ms']:8.3f}ms  p50={stats['p50_ms']:8.3f}ms  "
+        f"p95={stats['p95_ms']:8.3f}ms  p99={stats['p99_ms']:8.3f}ms"
+    )
+
+
+def template_context(events: int = 100, lang: str = "de") -> dict:
+    """
+    Stub render context that satisfies dashboard.html, timetable.html and
+    landing.html without a database or request cycle.
+    """
+    import types
+
+    from app import models
+    from app.core import calendar_utils
+    from app.i18n import i18n
+
+    today = datetime.datetime.now()
+    request = types.SimpleNamespace(
+        state=types.SimpleNamespace(t=i18n.translator(lang), lang=lang),
+        url="http://localhost/",
+        base_url="http://localhost/",
+    )
+    user = types.SimpleNamespace(
+        id="u1", name="Bench Owner", class_id="c1", role=models.UserRole.OWNER,
+        is_registered=True, caldav_token="token", caldav_enabled=False,
+    )
+    clazz = types.SimpleNamespace(id="c1", name="Bench 10a", join_token="BENCH")
+    event_rows = [
+        types.SimpleNamespace(
+            id=f"e{i}", type=list(models.EventType)[i % 4], priority=list(models.Priority)[i % 3],
+            subject_id="s1", subject_name="Mathe", title=f"Event {i}",
+            date=today + datetime.timedelta(days=i % 30), topics=[], created_at=today,
+        )
+        for i in range(events)
+    ]
+    return {
+        "request": request,
+        "user": user,
+        "clazz": clazz,
+        "calendar": calendar_utils.get_month_calendar(today.year, today.month, event_rows),
+        "current_month": today.strftime("%B %Y"),
+        "current_year": today.year,
+        "current_month_num": today.month,
+        "prev_year": today.year,
+        "prev_month": today.month,
+        "next_year": today.year,
+        "next_month": today.month,
+        "today": today,
+        "members": [user],
+        "subjects": [],
+        "login_tokens": [],
+        "upcoming_events": event_rows[:10],
+        "infos": event_rows[:5],
+        "base_url": "http://localhost",
+        "welcome_back": None,
+        "grade_stats": None,
+    }
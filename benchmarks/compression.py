@@ -0,0 +1,86 @@
+"""
+Benchmark: response compression for the large JSON / ICS payloads.
+
+Fetches each endpoint with and without `Accept-Encoding: gzip` (and `br` when
+the optional brotli package is installed), records wire size and server time,
+then estimates the time to first full response over throttled links:
+
+    total = server time + RTT + wire bytes / bandwidth
+
+The link model is deliberately simple (no TCP slow start), so it understates
+the gain on slow links rather than overstating it.
+
+    python -m benchmarks.compression
+"""
+
+import secrets
+
+from benchmarks.common import boot_app, issue_api_key, measure, seed_class
+
+# name, bandwidth in bit/s, round trip in seconds
+LINKS = [
+    ("school wifi (2 Mbit/s, 80ms)", 2_000_000, 0.080),
+    ("3G (750 kbit/s, 150ms)", 750_000, 0.150),
+    ("LAN (100 Mbit/s, 1ms)", 100_000_000, 0.001),
+]
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app import crud, models
+    from app.core.compression import brotli
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=500)
+    for event in db.query(models.Event).filter(models.Event.class_id == clazz.id).limit(150):
+        crud.create_event_topic(db, event.id, "Thema", content="Kapitel 3: Lineare Funktionen und Steigung")
+        crud.create_event_link(db, event.id, "https://example.org/arbeitsblatt.pdf", "Arbeitsblatt")
+    api_key = issue_api_key(db, clazz, owner)
+    legacy_token = crud.create_integration_token(db, owner.id, clazz.id).token
+    crud.enable_caldav(db, owner.id)
+    clazz.timetable_public_enabled = True
+    clazz.timetable_public_token = secrets.token_urlsafe(16)
+    for weekday in range(5):
+        for slot in range(1, 9):
+            db.add(models.TimetableSlot(class_id=clazz.id, weekday=weekday, slot_number=slot,
+                                        subject_name=f"Fach {slot}", room=f"R{100 + slot}"))
+    db.add(models.TimetableSettings(class_id=clazz.id))
+    db.commit()
+    db.refresh(owner)
+    caldav_token, public_token = owner.caldav_token, clazz.timetable_public_token
+    db.close()
+
+    endpoints = [
+        ("/api/v1/events?limit=500", {"Authorization": f"Bearer {api_key}"}),
+        ("/api/events?limit=500", {"Authorization": f"Bearer {legacy_token}"}),
+        (f"/caldav/{caldav_token}/calendar.ics", {}),
+        (f"/public/stundenplan/{public_token}/data", {}),
+    ]
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+    client = TestClient(app)
+    for path, headers in endpoints:
+        print(f"\n{path.split('?')[0]}")
+        for encoding in encodings:
+            request_headers = {**headers, "Accept-Encoding": encoding}
+
+            def fetch() -> int:
+                # iter_raw() yields the bytes as sent, before transparent decoding
+                with client.stream("GET", path, headers=request_headers) as response:
+                    assert response.status_code == 200, (path, response.status_code)
+                    return sum(len(chunk) for chunk in response.iter_raw())
+
+            wire = fetch()
+            stats = measure(fetch, iterations=50, warmup=5)
+            server_s = stats["p50_ms"] / 1000
+            modelled = "  ".join(
+                f"{name.split(' (')[0]}={(server_s + rtt + wire * 8 / bw) * 1000:7.1f}ms" for name, bw, rtt in LINKS
+            )
+            print(f"  {encoding:<8} {wire:>9,d} B  server p50={stats['p50_ms']:7.2f}ms  {modelled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: precompiled i18n catalogue vs. the old nested-dict walk.
+
+Measures raw t() lookups and a full `dashboard.html` render (GET /) with both
+translators plugged into the language middleware.
+
+    python -m benchmarks.i18n_render
+"""
+
+from benchmarks.common import boot_app, seed_class, measure, report
+
+
+def legacy_translator(i18n, lang):
+    """The pre-compilation lookup: split the key and walk nested dicts (twice on miss)."""
+
+    def lookup(lang_, key):
+        data = i18n.translations.get(lang_)
+        if data is None:
+            return None
+        for part in key.split("."):
+            if isinstance(data, dict) and part in data:
+                data = data[part]
+            else:
+                return None
+        return data if isinstance(data, str) else None
+
+    def t(key):
+        val = lookup(lang, key)
+        if val is None and lang != i18n.default_lang:
+            val = lookup(i18n.default_lang, key)
+        return key if val is None else val
+
+    return t
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.i18n import i18n, flatten_catalogue
+
+    keys = list(flatten_catalogue(i18n.translations[i18n.default_lang]).keys())
+    print(f"{len(keys)} keys, languages: {sorted(i18n.translations)}")
+
+    for lang in ("de", "en"):
+        legacy = legacy_translator(i18n, lang)
+        compiled = i18n.translator(lang)
+        report(f"lookup x{len(keys)} legacy [{lang}]", measure(lambda: [legacy(k) for k in keys]))
+        report(f"lookup x{len(keys)} compiled [{lang}]", measure(lambda: [compiled(k) for k in keys]))
+
+    db = SessionLocal()
+    _, owner = seed_class(db, events=300)
+    session_token = owner.session_token
+    db.close()
+
+    client = TestClient(app)
+    client.cookies.set("session_token", session_token)
+    assert client.get("/").status_code == 200
+
+    compiled_factory = i18n.translator
+    for lang in ("de", "en"):
+        client.cookies.set("lang", lang)
+        i18n.translator = lambda l: legacy_translator(i18n, l)
+        report(f"GET / dashboard legacy [{lang}]", measure(lambda: client.get("/"), iterations=100))
+        i18n.translator = compiled_factory
+        report(f"GET / dashboard compiled [{lang}]", measure(lambda: client.get("/"), iterations=100))
+
+
+if __name__ == "__main__":
+    main()
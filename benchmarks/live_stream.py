@@ -0,0 +1,124 @@
+"""
+Benchmark: 2,000 concurrent idle SSE connections on `/api/v1/stream`.
+
+Runs the app under uvicorn (in-process thread), opens the connections with
+plain asyncio sockets and reports:
+
+- time to open all streams and memory (RSS) per idle connection
+- fan-out latency: `POST /api/v1/events` until every stream received the frame
+- CPU used by the server while all connections sit idle (heartbeats included)
+
+    python -m benchmarks.live_stream [connections] [heartbeat_s]
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from benchmarks.common import boot_app, seed_class, issue_api_key
+
+
+def rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_server(app) -> int:
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", backlog=4096, timeout_keep_alive=60))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return sock.getsockname()[1]
+
+
+async def open_stream(port: int, token: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /api/v1/stream HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+                 f"Accept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200"), head[:100]
+    return reader, writer
+
+
+async def wait_for_event(reader, marker: bytes) -> float:
+    buffer = b""
+    while marker not in buffer:
+        chunk = await reader.read(4096)
+        if not chunk:
+            raise ConnectionError("stream closed")
+        buffer += chunk
+    return time.perf_counter()
+
+
+async def run(port: int, token: str, connections: int, heartbeat: float):
+    import httpx
+    from app.core.live_updates import live_bus
+
+    base = rss_mib()
+    started = time.perf_counter()
+    streams = []
+    for offset in range(0, connections, 200):  # stay below the listen backlog
+        streams += await asyncio.gather(*(open_stream(port, token) for _ in range(min(200, connections - offset))))
+    opened = time.perf_counter() - started
+    while live_bus.connections < connections:
+        await asyncio.sleep(0.01)
+    per_connection = (rss_mib() - base) * 1024 / connections
+    print(f"opened {connections} streams in {opened * 1000:.0f} ms, "
+          f"RSS +{rss_mib() - base:.1f} MiB ({per_connection:.1f} KiB/connection incl. client side)")
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        for round_ in range(3):
+            waiters = [asyncio.create_task(wait_for_event(reader, b"event: events")) for reader, _ in streams]
+            await asyncio.sleep(0.05)
+            sent = time.perf_counter()
+            response = await client.post("/api/v1/events", headers={"Authorization": f"Bearer {token}"},
+                                         json={"type": "HA", "date": "2026-03-02T00:00:00", "title": f"Live {round_}"})
+            assert response.status_code == 201
+            received = sorted(t - sent for t in await asyncio.gather(*waiters))
+            print(f"fan-out #{round_ + 1}: first {received[0] * 1000:6.1f} ms  p50 {received[len(received) // 2] * 1000:6.1f} ms  "
+                  f"last {received[-1] * 1000:6.1f} ms")
+
+    idle = max(heartbeat * 2, 2.0)
+    cpu = time.process_time()
+    await asyncio.sleep(idle)
+    print(f"idle {idle:.0f} s with {live_bus.connections} streams: {(time.process_time() - cpu) / idle * 100:.1f}% CPU "
+          f"(heartbeat every {heartbeat:.0f} s)")
+
+    for _, writer in streams:
+        writer.close()
+    deadline = time.perf_counter() + 10
+    while live_bus.connections and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    print(f"streams left after client disconnect: {live_bus.connections}")
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    heartbeat = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    os.environ["LIVE_HEARTBEAT"] = str(heartbeat)
+    app, _ = boot_app()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=10, members=5)
+    token = issue_api_key(db, clazz, owner)
+    db.close()
+
+    port = start_server(app)
+    asyncio.run(run(port, token, connections, heartbeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: cost of the Prometheus instrumentation per request.
+
+Calls a minimal ASGI app directly (no HTTP, no routing work besides the
+route template lookup) with and without `MetricsMiddleware` and reports the
+difference per request, once with the in-memory values (single worker) and
+once in multiprocess mode (mmap files in PROMETHEUS_MULTIPROC_DIR, what
+`uvicorn --workers N` uses). Also times one `/metrics` render with all
+label combinations populated.
+
+For scale: the cheapest scenarios of `benchmarks.suite` take ~4-6 ms.
+
+    python -m benchmarks.metrics_overhead [requests]
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure(requests: int) -> dict:
+    from fastapi import APIRouter, FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    from app.core import metrics
+
+    items = APIRouter(prefix="/items")
+
+    @items.get("/{item_id}")
+    async def item(item_id: int):
+        return PlainTextResponse("ok")
+
+    app = FastAPI()
+    app.include_router(items, prefix="/api")
+    instrumented = metrics.MetricsMiddleware(app)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i: int) -> dict:
+        return {"type": "http", "method": "GET", "path": f"/api/items/{i % 50}", "raw_path": b"",
+                "query_string": b"", "headers": [], "root_path": "", "app": app}
+
+    async def run(target) -> float:
+        for i in range(200):
+            await target(scope(i), receive, send)
+        started = time.perf_counter()
+        for i in range(requests):
+            await target(scope(i), receive, send)
+        return (time.perf_counter() - started) / requests * 1e6
+
+    async def best(target) -> float:
+        return min([await run(target) for _ in range(3)])
+
+    bare = asyncio.run(best(app))
+    with_metrics = asyncio.run(best(instrumented))
+
+    metrics.render()  # first call imports the exposition code
+    started = time.perf_counter()
+    body, _ = metrics.render()
+    render_ms = (time.perf_counter() - started) * 1000
+    return {"bare": bare, "metrics": with_metrics, "render_ms": render_ms, "render_bytes": len(body)}
+
+
+def report(mode: str, result: dict):
+    overhead = result["metrics"] - result["bare"]
+    print(f"{mode:<13} bare={result['bare']:7.1f}us  with metrics={result['metrics']:7.1f}us  "
+          f"overhead={overhead:6.1f}us/request ({overhead / 5000 * 100:.2f}% of a 5 ms request)  "
+          f"/metrics render={result['render_ms']:.1f}ms ({result['render_bytes'] / 1024:.0f} KiB)")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "--child" else 5000
+    if "--child" in sys.argv:
+        result = measure(requests)
+        print(" ".join(f"{k}={v}" for k, v in result.items()))
+        return
+
+    directory = tempfile.mkdtemp(prefix="classly-metrics-bench-")
+    try:
+        for mode, env in (("single", {}), ("multiprocess", {"PROMETHEUS_MULTIPROC_DIR": directory})):
+            child_env = {k: v for k, v in os.environ.items() if k != "PROMETHEUS_MULTIPROC_DIR"}
+            child_env.update(env, WEBHOOKS_ENABLED="false")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.metrics_overhead", str(requests), "--child"],
+                env=child_env, capture_output=True, text=True, check=True,
+            ).stdout.split()[-4:]
+            report(mode, {k: float(v) for k, v in (item.split("=") for item in output)})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: slotted DTOs vs. transient SQLAlchemy models as data carriers.
+
+Reproduces what `AppwriteRepository._map_doc_to_event` / `_map_doc_to_user`
+used to do (instantiate the model, assign each column through the
+instrumented attributes) and what they do now (construct the DTO), for 1,000
+documents. Reports tracemalloc bytes per retained object, construction time,
+and the cost of the `to_dto()` adapter on loaded ORM instances.
+
+    python -m benchmarks.repository_dto
+"""
+
+import datetime
+import gc
+import tracemalloc
+
+from benchmarks.common import boot_app, measure, report, seed_class
+
+N = 1_000
+
+
+def bytes_per_object(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = build()
+        after = tracemalloc.get_traced_memory()[0]
+        return (after - before) / len(objects)
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    boot_app()
+
+    from app import models
+    from app.database import SessionLocal
+    from app.repository.dto import EventDTO, UserDTO, to_dto
+    from app.repository.sql import SqlAlchemyRepository
+
+    now = datetime.datetime(2026, 3, 2, 8, 0)
+    docs = [
+        {"id": f"e{i}", "class_id": "c1", "type": models.EventType.HA, "priority": models.Priority.MEDIUM,
+         "subject_id": "s1", "subject_name": "Mathe", "title": f"Aufgabe {i}", "date": now,
+         "author_id": "u1", "created_at": now, "updated_at": now}
+        for i in range(N)
+    ]
+    users = [
+        {"id": f"u{i}", "name": f"Member {i}", "class_id": "c1", "role": models.UserRole.MEMBER,
+         "email": None, "is_registered": False, "language": "de", "created_at": now}
+        for i in range(N)
+    ]
+
+    def orm_events():
+        result = []
+        for doc in docs:
+            e = models.Event()
+            for key, value in doc.items():
+                setattr(e, key, value)
+            result.append(e)
+        return result
+
+    def orm_users():
+        result = []
+        for doc in users:
+            u = models.User()
+            for key, value in doc.items():
+                setattr(u, key, value)
+            result.append(u)
+        return result
+
+    cases = [
+        ("event", orm_events, lambda: [EventDTO(**doc) for doc in docs]),
+        ("user", orm_users, lambda: [UserDTO(**doc) for doc in users]),
+    ]
+    for name, orm, dto in cases:
+        print(f"{name}: bytes/object model={bytes_per_object(orm):7.0f}  dto={bytes_per_object(dto):7.0f}")
+        report(f"build {N} {name} models", measure(orm, iterations=50))
+        report(f"build {N} {name} DTOs", measure(dto, iterations=50))
+
+    db = SessionLocal()
+    clazz, _ = seed_class(db, events=500)
+    events = SqlAlchemyRepository(db).list_events(clazz.id, limit=500)
+    report("to_dto() x500 loaded events", measure(lambda: [to_dto(e) for e in events], iterations=100))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: ORM hydration vs. projection rows for the list read paths.
+
+For each pair (`list_events` vs `list_event_rows`, subjects, members, the
+timetable) measures the repository call plus serialization with a fresh
+session per call (so the identity map starts empty, as it does per request),
+and the peak memory of one call via tracemalloc. Ends with the API v1
+endpoints that now use the row methods.
+
+    python -m benchmarks.repository_projection
+"""
+
+import tracemalloc
+
+from benchmarks.common import boot_app, issue_api_key, measure, report, seed_class
+
+
+def peak_kib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.database import SessionLocal
+    from app.repository.sql import SqlAlchemyRepository
+    from app.routers.api_v1.serializers import (
+        serialize_event_rows, serialize_events, slot_serializer, subject_serializer, user_serializer,
+    )
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=500, members=30, subjects=15)
+    for weekday in range(5):
+        for slot in range(1, 11):
+            db.add(models.TimetableSlot(class_id=clazz.id, weekday=weekday, slot_number=slot,
+                                        subject_name=f"Fach {slot}", room=f"R{100 + slot}"))
+    db.commit()
+    class_id = clazz.id
+    api_key = issue_api_key(db, clazz, owner, scopes="events:read,subjects:read,users:read,timetable:read")
+    db.close()
+
+    def with_repo(fn):
+        def run():
+            session = SessionLocal()
+            try:
+                return fn(SqlAlchemyRepository(session))
+            finally:
+                session.close()
+        return run
+
+    def orm_slots(repo):
+        slots = (
+            repo.db.query(models.TimetableSlot)
+            .filter(models.TimetableSlot.class_id == class_id)
+            .order_by(models.TimetableSlot.weekday, models.TimetableSlot.slot_number)
+            .all()
+        )
+        return slot_serializer.many(slots)
+
+    cases = [
+        ("events x500",
+         with_repo(lambda repo: serialize_events(repo.list_events(class_id, limit=500))),
+         with_repo(lambda repo: serialize_event_rows(repo.list_event_rows(class_id, limit=500)))),
+        ("subjects",
+         with_repo(lambda repo: subject_serializer.many(repo.get_subjects_for_class(class_id))),
+         with_repo(lambda repo: subject_serializer.rows(repo.list_subject_rows(class_id)))),
+        ("members",
+         with_repo(lambda repo: user_serializer.many(repo.get_class_members(class_id))),
+         with_repo(lambda repo: user_serializer.rows(repo.list_member_rows(class_id)))),
+        ("timetable x50", with_repo(orm_slots),
+         with_repo(lambda repo: slot_serializer.rows(row[1:] for row in repo.list_slot_rows(class_id)))),
+    ]
+
+    for name, orm, rows in cases:
+        assert orm() == rows(), f"{name}: payloads differ"
+        print(f"{name}: peak memory orm={peak_kib(orm):8.1f} KiB  rows={peak_kib(rows):8.1f} KiB")
+        report(f"{name} orm", measure(orm, iterations=100))
+        report(f"{name} rows", measure(rows, iterations=100))
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {api_key}", "Accept-Encoding": "identity"}
+    for path in ("/api/v1/events?limit=500", "/api/v1/subjects", "/api/v1/users", "/api/v1/timetable"):
+        assert client.get(path, headers=headers).status_code == 200, path
+        report(f"GET {path}", measure(lambda: client.get(path, headers=headers), iterations=50))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark suite: the hot endpoints end to end, in-process.
+
+Seeds a synthetic school (`seed_school`) into a throwaway SQLite file and
+drives the full ASGI app (middleware, auth, templates) through
+`httpx.ASGITransport`, rotating over the seeded classes:
+
+    dashboard        GET  /                         (session cookie)
+    caldav_ics       GET  /caldav/{token}/calendar.ics
+    api_events       GET  /api/v1/events            (API key)
+    timetable_my     GET  /timetable/my
+    timetable_next   GET  /timetable/next
+    rss              GET  /feed/rss
+    event_create     POST /events                   (form, writes)
+    login            POST /auth/login               (password hash)
+
+Reports throughput and mean/p50/p95/p99 per scenario. Each scenario runs
+`--rounds` times and the round with the lowest p50 counts (like `timeit`):
+noise on a shared machine only ever adds time. `--save` writes the
+results as a JSON baseline, `--baseline` compares against one and exits with
+status 1 if p50 or p95 of a scenario got slower than `--threshold` (default
+25%). Baselines are only comparable on the same machine and settings.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --save benchmarks/baselines/local.json
+    python -m benchmarks.suite --baseline benchmarks/baselines/local.json --threshold 0.2
+    python -m benchmarks.suite --only dashboard,api_events --requests 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, NamedTuple
+
+from benchmarks.common import REPO_ROOT, SCHOOL_PASSWORD, SchoolClass, boot_app, seed_school
+
+
+# Scenarios that are slow by design (password hashing) run fewer requests
+MAX_REQUESTS = {"login": 30}
+
+
+class Call(NamedTuple):
+    method: str
+    url: str
+    kwargs: dict
+    expect: int = 200
+
+
+def _cookie(cls: SchoolClass) -> dict:
+    return {"headers": {"Cookie": f"session_token={cls.session_token}"}}
+
+
+SCENARIOS: dict[str, Callable[[SchoolClass, int], Call]] = {
+    "dashboard": lambda cls, i: Call("GET", "/", _cookie(cls)),
+    "caldav_ics": lambda cls, i: Call("GET", f"/caldav/{cls.caldav_token}/calendar.ics", {}),
+    "api_events": lambda cls, i: Call("GET", "/api/v1/events", {"headers": {"Authorization": f"Bearer {cls.api_key}"}}),
+    "timetable_my": lambda cls, i: Call("GET", "/timetable/my", _cookie(cls)),
+    "timetable_next": lambda cls, i: Call("GET", "/timetable/next", _cookie(cls)),
+    "rss": lambda cls, i: Call("GET", f"/feed/rss?class_id={cls.class_id}&token={cls.public_token}", {}),
+    "event_create": lambda cls, i: Call("POST", "/events", {
+        **_cookie(cls),
+        "data": {"type": "HA", "subject_name": "Fach 1", "title": f"Bench {i}", "date": "2026-03-02", "priority": "medium"},
+    }),
+    "login": lambda cls, i: Call("POST", "/auth/login", {"data": {"email": cls.email, "password": SCHOOL_PASSWORD}}),
+}
+
+
+def percentile(samples: list[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def run_scenario(client, school: list[SchoolClass], build: Callable, requests: int, warmup: int,
+                       concurrency: int) -> dict:
+    async def one(i: int) -> float:
+        call = build(school[i % len(school)], i)
+        started = time.perf_counter()
+        response = await client.request(call.method, call.url, **call.kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != call.expect:
+            raise AssertionError(f"{call.method} {call.url} -> {response.status_code}: {response.text[:200]}")
+        return elapsed
+
+    for i in range(warmup):
+        await one(i)
+
+    samples: list[float] = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def worker(i: int):
+        async with gate:
+            samples.append(await one(warmup + i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        "requests": requests,
+        "rps": requests / wall,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 0.50),
+        "p95_ms": percentile(samples, 0.95),
+        "p99_ms": percentile(samples, 0.99),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Scenarios whose p50/p95 got slower than the baseline by more than `threshold`."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if stats[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name} {metric}: {base[metric]:.2f} -> {stats[metric]:.2f} ms "
+                                   f"(+{(stats[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--users", type=int, default=25, help="members per class")
+    parser.add_argument("--events", type=int, default=200, help="events per class")
+    parser.add_argument("--topics", type=int, default=3, help="topics per exam")
+    parser.add_argument("--grades", type=int, default=5, help="grades of the owner per class")
+    parser.add_argument("--slots", type=int, default=40, help="timetable slots per class")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=3, help="best round (lowest p50) counts")
+    parser.add_argument("--only", help="comma separated scenario names")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"unknown scenario(s): {', '.join(unknown)}; available: {', '.join(SCENARIOS)}")
+        return 2
+
+    # Every created event stays; keep the quota out of the way
+    os.environ.setdefault("MAX_EVENTS_PER_CLASS", "1000000")
+    app, _ = boot_app()
+
+    import httpx
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    school = seed_school(db, classes=args.classes, users=args.users, events=args.events, topics=args.topics,
+                         grades=args.grades, slots=args.slots)
+    db.close()
+    # Boot and seed objects are long-lived; keep them out of the GC's way
+    gc.collect()
+    gc.freeze()
+
+    async def run() -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench.classly.site") as client:
+            results = {}
+            for name in names:
+                requests = min(args.requests, MAX_REQUESTS.get(name, args.requests))
+                rounds = []
+                for _ in range(args.rounds):
+                    gc.collect()
+                    rounds.append(await run_scenario(
+                        client, school, SCENARIOS[name], requests, args.warmup, args.concurrency))
+                results[name] = stats = min(rounds, key=lambda r: r["p50_ms"])
+                print(f"{name:<16} {stats['rps']:8.1f} req/s  mean={stats['mean_ms']:8.2f}ms  "
+                      f"p50={stats['p50_ms']:8.2f}ms  p95={stats['p95_ms']:8.2f}ms  p99={stats['p99_ms']:8.2f}ms")
+            return results
+
+    results = asyncio.run(run())
+    document = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "only")},
+        },
+        "results": results,
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("config") != document["meta"]["config"]:
+            print("warning: baseline was recorded with different settings")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSION (threshold {args.threshold * 100:.0f}%):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regression against {args.baseline} (threshold {args.threshold * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Benchmark: cold vs. warm template loading for the shared Jinja2 environment.
+
+For dashboard.html, timetable.html and landing.html it measures the first
+render in a fresh environment (what a new worker pays) in three setups:
+
+- source:      parse + compile from the .html files (no caches)
+- bytecode:    FileSystemBytecodeCache already populated by a previous worker
+- precompiled: modules produced by `python -m app.templating precompile`
+
+plus the steady-state render with the in-memory template cache.
+
+    python -m benchmarks.template_render
+"""
+
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import REPO_ROOT, measure, report, template_context
+
+TEMPLATES = ["dashboard.html", "timetable.html", "landing.html"]
+
+
+def main():
+    os.chdir(REPO_ROOT)
+
+    from jinja2 import FileSystemBytecodeCache
+    from app.templating import build_environment, precompile
+
+    ctx = template_context()
+    workdir = tempfile.mkdtemp(prefix="classly_tpl_bench_")
+    bytecode_dir = os.path.join(workdir, "bytecode")
+    compiled_dir = os.path.join(workdir, "compiled")
+    os.makedirs(bytecode_dir)
+    precompile(compiled_dir)
+
+    def fresh_env(kind):
+        if kind == "source":
+            return build_environment(precompiled_dir=None, auto_reload=False)
+        if kind == "bytecode":
+            return build_environment(
+                precompiled_dir=None, auto_reload=False,
+                bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+            )
+        return build_environment(precompiled_dir=compiled_dir, auto_reload=False)
+
+    # Populate the bytecode cache once, like a previous worker would have
+    for name in TEMPLATES:
+        fresh_env("bytecode").get_template(name).render(ctx)
+
+    try:
+        for name in TEMPLATES:
+            for kind in ("source", "bytecode", "precompiled"):
+                stats = measure(lambda: fresh_env(kind).get_template(name).render(ctx), iterations=30, warmup=2)
+                report(f"{name} cold [{kind}]", stats)
+
+            env = fresh_env("source")
+            template = env.get_template(name)
+            report(f"{name} warm [in-memory]", measure(lambda: template.render(ctx), iterations=100))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: personal timetable feed as RRULE events vs. expanded occurrences.
+
+Seeds a full week (5 days x 10 slots) with a user who selected 30 of them and
+three holiday periods, then compares a feed with one VEVENT per lesson
+occurrence over a school year (40 weeks, holidays skipped) with the RRULE
+feed (one VEVENT per selected slot, holidays as EXDATE): size and build
+time, plus `GET /caldav/{token}/timetable.ics` and the combined
+`calendar.ics?timetable=1` with the per-user cache warm.
+
+    python -m benchmarks.timetable_ics
+"""
+
+import datetime
+
+from benchmarks.common import boot_app, measure, report, seed_class
+
+WEEKS = 40
+
+
+def expanded_ics(schedule, selected, monday) -> str:
+    from icalendar import Calendar, Event
+
+    holidays = [(h.start_date, h.end_date) for h in schedule.holidays]
+    cal = Calendar()
+    cal.add("prodid", "-//Classly//Timetable//DE")
+    cal.add("version", "2.0")
+    for week in range(WEEKS):
+        for entry in schedule.entries:
+            if entry.slot_id not in selected:
+                continue
+            day = monday + datetime.timedelta(days=7 * week + entry.weekday)
+            if any(start <= day <= end for start, end in holidays):
+                continue
+            midnight = datetime.datetime.combine(day, datetime.time())
+            event = Event()
+            event.add("uid", f"{entry.slot_id}-{day.isoformat()}@classly")
+            event.add("summary", entry.slot.subject_name)
+            event.add("dtstart", midnight + datetime.timedelta(minutes=entry.start_minute))
+            event.add("dtend", midnight + datetime.timedelta(minutes=entry.end_minute))
+            cal.add_component(event)
+    return cal.to_ical().decode("utf-8")
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.core.schedule_index import schedule_index
+    from app.core.timetable_io import PersonalCalendarCache, export_ics, personal_calendars
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=20)
+    owner.caldav_enabled = True
+    db.add(models.TimetableSettings(class_id=clazz.id))
+    for weekday in range(5):
+        for number in range(1, 11):
+            slot = models.TimetableSlot(class_id=clazz.id, weekday=weekday, slot_number=number, subject_name=f"Fach {number}")
+            db.add(slot)
+            db.flush()
+            if number <= 6:
+                db.add(models.UserTimetableSelection(user_id=owner.id, slot_id=slot.id))
+    for name, start, end in [("Herbstferien", (2026, 10, 12), (2026, 10, 23)),
+                             ("Weihnachtsferien", (2026, 12, 21), (2027, 1, 2)),
+                             ("Winterferien", (2027, 2, 15), (2027, 2, 19))]:
+        db.add(models.TimetableHoliday(class_id=clazz.id, name=name, start_date=datetime.date(*start),
+                                       end_date=datetime.date(*end)))
+    db.commit()
+
+    schedule = schedule_index.get(db, clazz.id)
+    selected = schedule_index.selected(db, clazz.id, owner.id)
+    monday = datetime.date(2026, 9, 7)
+
+    expanded = expanded_ics(schedule, selected, monday)
+    rrule = PersonalCalendarCache(max_entries=0).get(owner.id, schedule, selected, "10a", monday).ics
+    print(f"feed size: expanded {WEEKS} weeks={len(expanded) / 1024:7.1f} KiB "
+          f"({expanded.count('BEGIN:VEVENT')} events)  rrule={len(rrule) / 1024:5.1f} KiB "
+          f"({rrule.count('BEGIN:VEVENT')} events)")
+
+    uncached = PersonalCalendarCache(max_entries=0)
+    report("build expanded feed", measure(lambda: expanded_ics(schedule, selected, monday), iterations=10))
+    report("build rrule feed (uncached)", measure(lambda: uncached.get(owner.id, schedule, selected, "10a", monday), iterations=100))
+    report("class export_ics (all slots)", measure(lambda: export_ics(schedule, "10a", monday), iterations=100))
+
+    token = owner.caldav_token
+    db.close()
+    personal_calendars.clear()
+
+    client = TestClient(app)
+    for path in (f"/caldav/{token}/timetable.ics", f"/caldav/{token}/calendar.ics?timetable=1", f"/caldav/{token}/calendar.ics"):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        report(f"GET {path.split('/')[-1]}", measure(lambda: client.get(path), iterations=100))
+
+
+if __name__ == "__main__":
+    main()
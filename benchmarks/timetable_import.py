@@ -0,0 +1,86 @@
+"""
+Benchmark: whole-week timetable import.
+
+Builds a 60-slot week (5 days x 12 slots) and compares the previous way of
+getting it into the database (one `POST /timetable/slots/bulk` per subject,
+one flush per slot) with `POST /timetable/import`: a fresh import, re-importing
+the unchanged file (diff only, no writes) and an import that changes a room
+in every tenth slot.
+
+    python -m benchmarks.timetable_import
+"""
+
+from benchmarks.common import boot_app, measure, report, seed_class
+
+SUBJECTS = ["Mathe", "Deutsch", "Englisch", "Physik", "Chemie", "Biologie"]
+
+
+def week_csv(room_for=lambda weekday, number: "") -> str:
+    lines = ["weekday,slot_number,subject_name,room"]
+    for weekday in range(5):
+        for number in range(1, 13):
+            lines.append(f"{weekday},{number},{SUBJECTS[(weekday + number) % len(SUBJECTS)]},{room_for(weekday, number)}")
+    return "\n".join(lines) + "\n"
+
+
+def legacy_insert(db, models, class_id):
+    """Per-slot add + flush, as `/slots/bulk` did before."""
+    for weekday in range(5):
+        for number in range(1, 13):
+            db.add(models.TimetableSlot(class_id=class_id, weekday=weekday, slot_number=number,
+                                        subject_name=SUBJECTS[(weekday + number) % len(SUBJECTS)]))
+            db.flush()
+    db.commit()
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=0)
+    class_id = clazz.id
+
+    def clear():
+        db.query(models.TimetableSlot).filter_by(class_id=class_id).delete()
+        db.commit()
+
+    def legacy():
+        clear()
+        legacy_insert(db, models, class_id)
+
+    report("legacy per-slot flush (60)", measure(legacy, iterations=30))
+    clear()
+
+    client = TestClient(app, cookies={"session_token": owner.session_token})
+    fresh, changed = week_csv(), week_csv(lambda weekday, number: "R1" if number % 10 == 0 else "")
+
+    def post(text):
+        response = client.post("/timetable/import", data={"content": text, "format": "csv"})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def fresh_import():
+        clear()
+        return post(fresh)
+
+    assert fresh_import()["created"] == 60
+    report("import fresh (60)", measure(fresh_import, iterations=30))
+    assert post(fresh)["unchanged"] == 60
+    report("import unchanged", measure(lambda: post(fresh), iterations=30))
+
+    def changed_import():
+        post(fresh)
+        return post(changed)
+
+    assert changed_import()["updated"] == 5
+    report("import fresh + changed rooms", measure(changed_import, iterations=30))
+    print("server-side elapsed_ms:", post(fresh)["elapsed_ms"], "(revert)", post(changed)["elapsed_ms"], "(5 updates)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: /timetable/next, /my and /slots on the compiled schedule index.
+
+Seeds a full week (5 days x 10 slots) with a user who selected half of them,
+checks the index against the previous per-weekday query loop for a grid of
+times, then measures the previous loops (next lesson; /my with three queries
+and a list membership test per slot) against the index and the cached
+personal selection, and the three endpoints end to end (caches warm, as for a
+polling widget).
+
+    python -m benchmarks.timetable_next
+"""
+
+import datetime
+
+from benchmarks.common import boot_app, measure, report, seed_class
+
+
+def legacy_next_lesson(db, models, user, settings, now):
+    """The previous body of get_next_lesson (one slot query per weekday)."""
+    from app.routers.timetable import calculate_slot_time
+
+    current_weekday, current_time = now.weekday(), now.hour * 60 + now.minute
+    selected = [s.slot_id for s in db.query(models.UserTimetableSelection).filter(
+        models.UserTimetableSelection.user_id == user.id).all()]
+    for day_offset in range(7):
+        check_day = (current_weekday + day_offset) % 7
+        if check_day > 4:
+            continue
+        day_slots = db.query(models.TimetableSlot).filter(
+            models.TimetableSlot.class_id == user.class_id,
+            models.TimetableSlot.weekday == check_day,
+            models.TimetableSlot.id.in_(selected),
+        ).order_by(models.TimetableSlot.slot_number).all()
+        for slot in day_slots:
+            start, _ = calculate_slot_time(settings, slot.slot_number)
+            h, m = map(int, start.split(":"))
+            if day_offset == 0 and h * 60 + m <= current_time:
+                continue
+            return slot.id, day_offset
+    return None
+
+
+def legacy_my(db, models, user):
+    """The previous body of get_my_timetable, minus the time formatting."""
+    selected_slot_ids = [s.slot_id for s in db.query(models.UserTimetableSelection).filter(
+        models.UserTimetableSelection.user_id == user.id).all()]
+    slots = db.query(models.TimetableSlot).filter(models.TimetableSlot.class_id == user.class_id).order_by(
+        models.TimetableSlot.weekday, models.TimetableSlot.slot_number).all()
+    db.query(models.TimetableSettings).filter(models.TimetableSettings.class_id == user.class_id).first()
+    return [(slot.id, slot.id in selected_slot_ids) for slot in slots]
+
+
+def main():
+    app, _ = boot_app()
+
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.core.schedule_index import load_selected, schedule_index
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    clazz, owner = seed_class(db, events=10)
+    settings = models.TimetableSettings(class_id=clazz.id)
+    db.add(settings)
+    for weekday in range(5):
+        for number in range(1, 11):
+            slot = models.TimetableSlot(class_id=clazz.id, weekday=weekday, slot_number=number, subject_name=f"Fach {number}")
+            db.add(slot)
+            db.flush()
+            if number % 2:
+                db.add(models.UserTimetableSelection(user_id=owner.id, slot_id=slot.id))
+    db.commit()
+
+    selected = {s.slot_id for s in db.query(models.UserTimetableSelection).filter_by(user_id=owner.id)}
+    schedule = schedule_index.get(db, clazz.id)
+    monday = datetime.datetime(2026, 3, 2)
+    for step in range(0, 7 * 24 * 4):
+        now = monday + datetime.timedelta(minutes=15 * step)
+        found = schedule.next_lesson(selected, now.weekday(), now.hour * 60 + now.minute)
+        got = (found[0].slot_id, found[1]) if found else None
+        assert got == legacy_next_lesson(db, models, owner, settings, now), now
+
+    friday_evening = monday + datetime.timedelta(days=4, hours=18)
+    report("legacy next (Fri evening)", measure(lambda: legacy_next_lesson(db, models, owner, settings, friday_evening), iterations=200))
+    report("index next_lesson() only", measure(lambda: schedule.next_lesson(selected, 4, 18 * 60), iterations=200))
+    assert legacy_my(db, models, owner) == [(e.slot_id, e.slot_id in selected) for e in schedule.entries]
+    report("legacy /my queries", measure(lambda: legacy_my(db, models, owner), iterations=200))
+    report("LEFT JOIN selection (uncached)", measure(lambda: load_selected(db, clazz.id, owner.id), iterations=200))
+
+    def indexed_my():
+        picked = schedule_index.selected(db, clazz.id, owner.id)
+        return [(e.slot_id, e.slot_id in picked) for e in schedule_index.get(db, clazz.id).entries]
+
+    report("index + cached selection", measure(indexed_my, iterations=200))
+    cookies = {"session_token": owner.session_token}
+    db.close()
+
+    client = TestClient(app, cookies=cookies)
+    for path in ("/timetable/next", "/timetable/my", "/timetable/slots"):
+        assert client.get(path).status_code == 200, path
+        report(f"GET {path}", measure(lambda: client.get(path), iterations=200))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import datetime
+import json
+import unittest
+
+from app import models
+from app.core.fastjson import FastJSONResponse, _default
+from app.routers.api_v1.serializers import serialize_event, slot_serializer, user_serializer
+
+
+class ApiSerializerTests(unittest.TestCase):
+    def make_event(self, **overrides):
+        values = dict(
+            id="e1", class_id="c1", type=models.EventType.KA, priority=models.Priority.HIGH,
+            subject_id="s1", subject_name="Mathe", title="Klassenarbeit",
+            date=datetime.datetime(2026, 3, 2), author_id="u1",
+            created_at=datetime.datetime(2026, 2, 1, 12, 30, 15, 250000), updated_at=None,
+        )
+        values.update(overrides)
+        return models.Event(**values)
+
+    def render(self, content):
+        return json.loads(FastJSONResponse(content).body)
+
+    def test_event_payload_matches_previous_format(self):
+        event = self.make_event()
+        event.topics = [models.EventTopic(id="t1", topic_type="Thema", content="Brüche", order=0)]
+        event.links = []
+
+        payload = self.render(serialize_event(event, include_topics=True, include_links=True))
+        self.assertEqual(payload["type"], "KA")
+        self.assertEqual(payload["priority"], "HIGH")
+        self.assertEqual(payload["date"], "2026-03-02T00:00:00")
+        self.assertEqual(payload["created_at"], "2026-02-01T12:30:15.250000")
+        self.assertIsNone(payload["updated_at"])
+        self.assertEqual(payload["topics"][0]["topic_type"], "Thema")
+        self.assertEqual(payload["topics"][0]["content"], "Brüche")
+        self.assertEqual(payload["links"], [])
+
+    def test_missing_priority_defaults_to_medium(self):
+        payload = self.render(serialize_event(self.make_event(priority=None)))
+        self.assertEqual(payload["priority"], "MEDIUM")
+
+    def test_projection_rows_and_objects_serialize_alike(self):
+        slot = models.TimetableSlot(id="x", slot_number=3, subject_id=None, subject_name="Deutsch", group_name=None, room="R1")
+        row = tuple(getattr(slot, column.key) for column in slot_serializer.columns)
+        self.assertEqual(slot_serializer.rows([row]), [slot_serializer.one(slot)])
+
+        user = models.User(id="u1", name="Anna", role=models.UserRole.MEMBER, created_at=None)
+        self.assertEqual(self.render(user_serializer.one(user)), {"id": "u1", "name": "Anna", "role": "member", "created_at": None})
+
+    def test_stdlib_fallback_handles_dates_and_enums(self):
+        self.assertEqual(_default(datetime.date(2026, 1, 5)), "2026-01-05")
+        self.assertEqual(_default(models.Priority.LOW), "LOW")
+        with self.assertRaises(TypeError):
+            _default(object())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.fragment_cache import FragmentCache
+from app.core.invalidation import InvalidationBus
+from app.core.schedule_index import ScheduleIndex
+from app.database import Base
+
+INTERVAL = 0.1
+
+
+def make_bus(db_url: str, **kwargs) -> InvalidationBus:
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    return InvalidationBus(sessionmaker(bind=engine), enabled=True, interval=INTERVAL, **kwargs)
+
+
+def worker_main(db_url: str, commands, results):
+    """One app worker: a fragment cache attached to the bus, driven through a queue."""
+    cache = FragmentCache(max_entries=16, ttl=0, bus=make_bus(db_url))
+    renders = 0
+
+    def render():
+        nonlocal renders
+        renders += 1
+        return f"{os.getpid()}:{renders}"
+
+    for command, class_id in iter(commands.get, None):
+        if command == "get":
+            results.put(cache.get_or_render(class_id, "calendar", None, render))
+        elif command == "invalidate":
+            cache.invalidate(class_id)
+            results.put("ok")
+
+
+class InvalidationBusTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.db_url = f"sqlite:///{self.path}"
+        engine = create_engine(self.db_url)
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        return str(self.renders)
+
+    def wait_for_sync(self):
+        time.sleep(INTERVAL * 1.5)
+
+    def test_invalidation_reaches_other_worker_but_not_itself(self):
+        a = FragmentCache(ttl=0, bus=make_bus(self.db_url))
+        b = FragmentCache(ttl=0, bus=make_bus(self.db_url))
+        a.get_or_render("c1", "calendar", None, self.render)
+        b.get_or_render("c1", "calendar", None, self.render)
+        b.get_or_render("c2", "calendar", None, self.render)
+
+        a.invalidate("c1")
+        self.wait_for_sync()
+        self.assertEqual(b.get_or_render("c1", "calendar", None, self.render), "4")
+        self.assertEqual(b.get_or_render("c2", "calendar", None, self.render), "3")
+        self.assertEqual(a.version("c1"), 1)  # own row not applied a second time
+        a.get_or_render("c1", "calendar", None, self.render)
+        self.assertEqual((a.bus.applied, b.bus.applied), (0, 1))
+
+    def test_schedule_index_channels(self):
+        a = ScheduleIndex(ttl=0, bus=make_bus(self.db_url))
+        b = ScheduleIndex(ttl=0, bus=make_bus(self.db_url))
+        b.bus.sync()
+        a.invalidate("c1")
+        a.invalidate_user("c2", "u1")
+        self.wait_for_sync()
+        b.bus.sync()
+        self.assertEqual((b._versions.get("c1"), b._versions.get(("c2", "u1"))), (1, 1))
+
+    def test_failed_sync_bypasses_cache(self):
+        cache = FragmentCache(ttl=0, bus=make_bus(self.db_url))
+        cache.get_or_render("c1", "calendar", None, self.render)
+        self.wait_for_sync()
+        with mock.patch.object(cache.bus, "_session_factory", side_effect=RuntimeError("db gone")), \
+                self.assertLogs("app.core.invalidation", "ERROR"):
+            self.assertEqual(cache.get_or_render("c1", "calendar", None, self.render), "2")
+        self.assertEqual(cache.get_or_render("c1", "calendar", None, self.render), "1")
+
+    def test_worker_that_fell_behind_retention_clears(self):
+        cache = FragmentCache(ttl=0, bus=make_bus(self.db_url, retention=1.0))
+        cache.get_or_render("c1", "calendar", None, self.render)
+        time.sleep(0.6)  # longer than retention / 2 without a sync
+        cache.get_or_render("c1", "calendar", None, self.render)
+        self.assertEqual(self.renders, 2)
+
+    def test_multiple_worker_processes(self):
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = []
+        for _ in range(3):
+            commands = context.Queue()
+            process = context.Process(target=worker_main, args=(self.db_url, commands, results), daemon=True)
+            process.start()
+            workers.append((process, commands))
+
+        def call(worker, command, class_id="c1"):
+            worker[1].put((command, class_id))
+            return results.get(timeout=30)
+
+        try:
+            before = [call(worker, "get") for worker in workers]
+            self.assertEqual([call(worker, "get") for worker in workers], before)  # cached everywhere
+
+            call(workers[0], "invalidate")
+            invalidated = time.monotonic()
+            for worker, old in zip(workers[1:], before[1:]):
+                while call(worker, "get") == old:
+                    time.sleep(0.01)
+            staleness = time.monotonic() - invalidated
+            self.assertLess(staleness, INTERVAL + 0.5)
+            self.assertNotEqual(call(workers[0], "get"), before[0])
+            self.assertEqual(call(workers[1], "get", "c2"), call(workers[1], "get", "c2"))
+        finally:
+            for process, commands in workers:
+                commands.put(None)
+                process.join(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import datetime
+import io
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core import class_backup
+from app.database import Base
+
+
+def seed_class(db, name: str, events: int) -> str:
+    clazz = models.Class(name=name, join_token=f"join-{name}")
+    db.add(clazz)
+    db.flush()
+    admin = models.User(name=f"{name}-admin", class_id=clazz.id, role=models.UserRole.ADMIN,
+                        email=f"{name}@example.com", password_hash="hash", is_registered=True)
+    member = models.User(name=f"{name}-member", class_id=clazz.id)
+    subject = models.Subject(class_id=clazz.id, name="Mathe")
+    db.add_all([admin, member, subject])
+    db.flush()
+    db.add(models.UserPreferences(user_id=member.id, filter_subjects='["Mathe"]'))
+    for i in range(events):
+        event = models.Event(class_id=clazz.id, type=models.EventType.KA, subject_id=subject.id, title=f"KA {i}",
+                             date=datetime.datetime(2026, 3, 1, 8) + datetime.timedelta(days=i), author_id=admin.id)
+        db.add(event)
+        db.flush()
+        topic = models.EventTopic(event_id=event.id, topic_type="Vokabeln", pages="S. 10")
+        db.add(topic)
+        db.flush()
+        db.add(models.EventTopic(event_id=event.id, topic_type="Unit 1", parent_id=topic.id))
+        db.add(models.EventLink(event_id=event.id, url="https://example.com", label="Blatt"))
+        db.add(models.Grade(user_id=member.id, event_id=event.id, grade=2.3))
+        db.add(models.AuditLog(class_id=clazz.id, user_id=admin.id, action=models.AuditAction.EVENT_CREATE,
+                               target_id=event.id))
+    db.add(models.LoginToken(class_id=clazz.id, user_name="Neu", created_by=admin.id))
+    db.add(models.TimetableSettings(class_id=clazz.id))
+    slot = models.TimetableSlot(class_id=clazz.id, weekday=0, slot_number=1, subject_id=subject.id, room="A1")
+    db.add(slot)
+    db.flush()
+    db.add(models.UserTimetableSelection(user_id=member.id, slot_id=slot.id))
+    db.add(models.TimetableHoliday(class_id=clazz.id, name="Herbstferien",
+                                   start_date=datetime.date(2026, 10, 5), end_date=datetime.date(2026, 10, 16)))
+    db.add(models.DeviceToken(user_id=member.id, device_token="fcm-token", platform="fcm"))
+    db.add(models.WebhookSubscription(class_id=clazz.id, url="https://example.com/hook"))
+    db.commit()
+    return clazz.id
+
+
+def snapshot(conn, class_id: str) -> dict:
+    return {
+        model.__table__.name: sorted(tuple(row) for row in conn.execute(select(model.__table__).where(condition)))
+        for model, condition in class_backup.class_tables(class_id)
+    }
+
+
+class ClassBackupTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(class_backup, "BATCH_SIZE", 50)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        db = sessionmaker(bind=self.engine)()
+        # More events than one batch, so pagination is exercised
+        self.class_id = seed_class(db, "a", events=class_backup.BATCH_SIZE + 5)
+        self.other_id = seed_class(db, "b", events=3)
+        db.close()
+
+    def export(self) -> bytes:
+        with self.engine.connect() as conn:
+            return b"".join(class_backup.iter_export(conn, self.class_id))
+
+    def test_round_trip(self):
+        with self.engine.connect() as conn:
+            before = snapshot(conn, self.class_id)
+            other = snapshot(conn, self.other_id)
+        self.assertEqual(len(before["event_topics"]), 2 * (class_backup.BATCH_SIZE + 5))
+        archive = self.export()
+
+        with self.engine.begin() as conn:
+            class_backup.delete_class(conn, self.class_id)
+            self.assertEqual(sum(map(len, snapshot(conn, self.class_id).values())), 0)
+            counts = class_backup.restore(conn, io.BytesIO(archive))
+
+        self.assertEqual(counts["events"], class_backup.BATCH_SIZE + 5)
+        with self.engine.connect() as conn:
+            self.assertEqual(snapshot(conn, self.class_id), before)
+            self.assertEqual(snapshot(conn, self.other_id), other)
+
+    def test_only_the_class_is_exported(self):
+        with class_backup.open_archive(io.BytesIO(self.export())) as reader:
+            text = reader.read().decode()
+        self.assertIn("a-admin", text)
+        self.assertNotIn("b-admin", text)
+        self.assertNotIn("join-b", text)
+
+    def test_existing_class_needs_replace(self):
+        archive = self.export()
+        with self.engine.begin() as conn:
+            with self.assertRaises(class_backup.BackupError):
+                class_backup.restore(conn, io.BytesIO(archive))
+            counts = class_backup.restore(conn, io.BytesIO(archive), replace=True)
+        self.assertEqual(counts["classes"], 1)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(select(func.count()).select_from(models.User)).scalar(), 4)
+
+    def test_truncated_archive_is_rejected(self):
+        archive = self.export()
+        with self.engine.connect() as conn:
+            class_backup.delete_class(conn, self.class_id)
+            with self.assertRaises(class_backup.BackupError):
+                class_backup.restore(conn, io.BytesIO(archive[: len(archive) // 2]))
+            conn.rollback()
+
+    def test_gzip_fallback(self):
+        with mock.patch.object(class_backup, "zstandard", None):
+            archive = self.export()
+        self.assertTrue(archive.startswith(b"\x1f\x8b"))
+        with self.engine.begin() as conn:
+            counts = class_backup.restore(conn, io.BytesIO(archive), replace=True)
+        self.assertEqual(counts["grades"], class_backup.BATCH_SIZE + 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import gzip
+import json
+import unittest
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, is_compressible
+
+EVENTS = {"events": [{"id": i, "title": f"Event {i}", "type": "HA"} for i in range(200)]}
+ICS = "BEGIN:VCALENDAR\r\n" + "BEGIN:VEVENT\r\nSUMMARY:Mathe\r\nEND:VEVENT\r\n" * 100 + "END:VCALENDAR\r\n"
+
+
+def _events(request):
+    return JSONResponse(EVENTS)
+
+
+def _small(request):
+    return JSONResponse({"ok": True})
+
+
+def _image(request):
+    return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+
+def _precompressed(request):
+    return Response(b"x" * 4096, media_type="text/css", headers={"Content-Encoding": "gzip"})
+
+
+def _stream(request):
+    def body():
+        yield ICS[: len(ICS) // 2]
+        yield ICS[len(ICS) // 2:]
+    return StreamingResponse(body(), media_type="text/calendar")
+
+
+def _sse(request):
+    return PlainTextResponse("data: x\n\n" * 500, media_type="text/event-stream")
+
+
+class CompressionMiddlewareTests(unittest.TestCase):
+    def setUp(self):
+        app = Starlette(routes=[
+            Route("/events", _events),
+            Route("/small", _small),
+            Route("/image", _image),
+            Route("/precompressed", _precompressed),
+            Route("/stream", _stream),
+            Route("/sse", _sse),
+        ])
+        app.add_middleware(CompressionMiddleware, minimum_size=500)
+        self.client = TestClient(app)
+
+    def get(self, path, encoding="gzip"):
+        with self.client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            raw = b"".join(response.iter_raw())
+        return response, raw
+
+    def test_large_json_is_gzipped(self):
+        response, raw = self.get("/events")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertEqual(int(response.headers["content-length"]), len(raw))
+        body = gzip.decompress(raw)
+        self.assertLess(len(raw), len(body) / 4)
+        self.assertEqual(json.loads(body), EVENTS)
+
+    def test_identity_when_not_accepted(self):
+        response, raw = self.get("/events", encoding="identity")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(json.loads(raw), EVENTS)
+
+    def test_small_bodies_and_other_media_types_pass_through(self):
+        for path in ("/small", "/image", "/sse"):
+            response, _ = self.get(path)
+            self.assertNotIn("content-encoding", response.headers, path)
+
+    def test_already_encoded_response_is_untouched(self):
+        response, raw = self.get("/precompressed")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(raw, b"x" * 4096)
+
+    def test_streamed_body_is_compressed_incrementally(self):
+        response, raw = self.get("/stream")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(gzip.decompress(raw).decode(), ICS)
+        self.assertLess(len(raw), len(ICS))
+
+    def test_media_type_policy(self):
+        self.assertTrue(is_compressible("application/json"))
+        self.assertTrue(is_compressible("text/calendar; charset=utf-8"))
+        self.assertFalse(is_compressible("image/png"))
+        self.assertFalse(is_compressible("text/event-stream"))
+        self.assertFalse(is_compressible(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from app.core import db_backup
+
+
+def make_database(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, body BLOB)")
+    conn.executemany("INSERT INTO notes (body) VALUES (?)", [(os.urandom(2000),)] * rows)
+    conn.commit()
+    conn.close()
+
+
+def count_rows(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM notes").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class DatabaseBackupTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, "classly.db")
+        make_database(self.source, rows=3000)  # ~7 MB, ~1800 pages
+        self.backups_dir = os.path.join(self.directory, "backups")
+
+    def backups(self, **options) -> db_backup.DatabaseBackups:
+        options = {"step_pages": 64, "step_pause": 0.002, "compress": "gzip", **options}
+        return db_backup.DatabaseBackups(self.source, self.backups_dir, enabled=True, **options)
+
+    def test_backup_while_writing(self):
+        stop = threading.Event()
+        written, slowest = [0], [0.0]
+
+        def writer():
+            conn = sqlite3.connect(self.source, timeout=30)
+            while not stop.is_set():
+                started = time.perf_counter()
+                conn.execute("INSERT INTO notes (body) VALUES (?)", (os.urandom(2000),))
+                conn.commit()
+                slowest[0] = max(slowest[0], time.perf_counter() - started)
+                written[0] += 1
+                time.sleep(0.001)
+            conn.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            time.sleep(0.05)
+            before = written[0]
+            result = self.backups(max_restarts=3).run()
+            after = written[0]
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertGreater(after - before, 10, "writer was blocked during the backup")
+        self.assertLess(slowest[0], 2.0)
+        self.assertEqual(result["integrity"], "ok")
+        self.assertTrue(result["name"].endswith(".db.gz"))
+
+        restored = os.path.join(self.directory, "restored.db")
+        with gzip.open(os.path.join(self.backups_dir, result["name"])) as src, open(restored, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        self.assertEqual(db_backup.verify(restored), "ok")
+        self.assertGreaterEqual(count_rows(restored), 3000 + before)
+        self.assertLessEqual(count_rows(restored), 3000 + written[0])
+
+    def test_retention_and_status(self):
+        backups = self.backups(keep=2, compress="none")
+        names = [backups.run()["name"] for _ in range(3)]
+        self.assertEqual([b["name"] for b in backups.backups()], names[:0:-1])
+        self.assertEqual(count_rows(os.path.join(self.backups_dir, names[-1])), 3000)
+        status = backups.status()
+        self.assertFalse(status["running"])
+        self.assertEqual(status["last_success"]["removed"], [names[0]])
+        self.assertFalse(backups.due())
+        self.assertIsNone(backups.run(force=False))
+
+    def test_shards_are_backed_up_with_each_run(self):
+        shards = {"a": self.source}  # the first shard may be the directory itself
+        for name, rows in (("b", 10), ("c", 20)):
+            shards[name] = os.path.join(self.directory, f"shard-{name}.db")
+            make_database(shards[name], rows=rows)
+        backups = self.backups(keep=1, compress="none", shards=shards)
+
+        first = backups.run()
+        second = backups.run()
+        self.assertEqual(sorted(second["shards"]), ["b", "c"])
+        self.assertEqual(count_rows(os.path.join(self.backups_dir, second["shards"]["c"]["name"])), 20)
+        self.assertEqual(sorted(b["name"] for b in backups.backups()),
+                         sorted([second["name"], second["shards"]["b"]["name"], second["shards"]["c"]["name"]]))
+        self.assertEqual(sorted(second["removed"]),
+                         sorted([first["name"], first["shards"]["b"]["name"], first["shards"]["c"]["name"]]))
+
+    def test_verify_detects_corruption(self):
+        copy = os.path.join(self.directory, "copy.db")
+        db_backup.copy_database(self.source, copy)
+        self.assertEqual(db_backup.verify(copy), "ok")
+        with open(copy, "r+b") as handle:
+            handle.seek(4096 * 20)
+            handle.write(b"\xff" * 4096)
+        self.assertNotEqual(db_backup.verify(copy), "ok")
+
+    def test_sqlite_path(self):
+        self.assertEqual(db_backup.sqlite_path("sqlite:////data/classly.db"), "/data/classly.db")
+        self.assertIsNone(db_backup.sqlite_path("sqlite://"))
+        self.assertIsNone(db_backup.sqlite_path("postgresql://user@localhost/classly"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+
+from app.core.fragment_cache import FragmentCache
+
+
+class FragmentCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = FragmentCache(max_entries=4, ttl=30)
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        return f"<div>{self.renders}</div>"
+
+    def test_hit_until_class_is_invalidated(self):
+        first = self.cache.get_or_render("c1", "calendar", (2026, 3), self.render)
+        self.assertEqual(self.cache.get_or_render("c1", "calendar", (2026, 3), self.render), first)
+        self.assertEqual(self.renders, 1)
+
+        self.cache.invalidate("c1")
+        self.assertNotEqual(self.cache.get_or_render("c1", "calendar", (2026, 3), self.render), first)
+        self.assertEqual(self.renders, 2)
+
+    def test_invalidation_is_per_class(self):
+        self.cache.get_or_render("c1", "infos", None, self.render)
+        self.cache.get_or_render("c2", "infos", None, self.render)
+        self.cache.invalidate("c2")
+
+        self.cache.get_or_render("c1", "infos", None, self.render)
+        self.cache.get_or_render("c2", "infos", None, self.render)
+        self.assertEqual(self.renders, 3)
+
+    def test_lru_is_bounded(self):
+        for month in range(1, 7):
+            self.cache.get_or_render("c1", "calendar", month, self.render)
+        self.assertEqual(len(self.cache._entries), 4)
+
+        # Oldest months were evicted, newest still cached
+        self.cache.get_or_render("c1", "calendar", 6, self.render)
+        self.assertEqual(self.renders, 6)
+        self.cache.get_or_render("c1", "calendar", 1, self.render)
+        self.assertEqual(self.renders, 7)
+
+    def test_entries_expire_after_ttl(self):
+        with mock.patch("app.core.fragment_cache.time.monotonic", return_value=100.0):
+            self.cache.get_or_render("c1", "upcoming", None, self.render)
+        with mock.patch("app.core.fragment_cache.time.monotonic", return_value=129.0):
+            self.cache.get_or_render("c1", "upcoming", None, self.render)
+        self.assertEqual(self.renders, 1)
+        with mock.patch("app.core.fragment_cache.time.monotonic", return_value=131.0):
+            self.cache.get_or_render("c1", "upcoming", None, self.render)
+        self.assertEqual(self.renders, 2)
+
+    def test_disabled_cache_always_renders(self):
+        cache = FragmentCache(max_entries=0)
+        cache.get_or_render("c1", "infos", None, self.render)
+        cache.get_or_render("c1", "infos", None, self.render)
+        self.assertEqual(self.renders, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.i18n import I18n
+
+
+class I18nCatalogueTests(unittest.TestCase):
+    def setUp(self):
+        self.locales_dir = tempfile.mkdtemp()
+        self._write("de", {"common": {"save": "Speichern", "back": "Zurück"}, "title": "Klasse"})
+        self._write("en", {"common": {"save": "Save"}})
+        self.i18n = I18n(locales_dir=self.locales_dir, default_lang="de")
+        self.i18n.reload_interval = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.locales_dir)
+
+    def _write(self, lang, data):
+        with open(os.path.join(self.locales_dir, f"{lang}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_compiled_catalogue_merges_default_language(self):
+        self.assertEqual(
+            self.i18n.catalogues["en"],
+            {"common.save": "Save", "common.back": "Zurück", "title": "Klasse"},
+        )
+
+    def test_translator_matches_get_translation(self):
+        t = self.i18n.translator("en")
+        for key in ("common.save", "common.back", "title", "common", "missing.key"):
+            self.assertEqual(t(key), self.i18n.get_translation("en", key))
+        self.assertEqual(t("common"), "common")
+        self.assertEqual(t("missing.key"), "missing.key")
+
+    def test_unknown_language_uses_default(self):
+        self.assertEqual(self.i18n.translator("fr")("common.save"), "Speichern")
+        self.assertEqual(self.i18n.get_translation("fr", "common.save"), "Speichern")
+
+    def test_translator_is_cached_per_language(self):
+        self.assertIs(self.i18n.translator("en"), self.i18n.translator("en"))
+
+    def test_hot_reload_on_mtime_change(self):
+        before = self.i18n.translator("en")
+        self._write("en", {"common": {"save": "Store"}})
+        path = os.path.join(self.locales_dir, "en.json")
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+
+        self.i18n.reload_interval = 0.001
+        self.i18n._last_check = 0.0
+        after = self.i18n.translator("en")
+
+        self.assertIsNot(before, after)
+        self.assertEqual(after("common.save"), "Store")
+        self.assertEqual(before("common.save"), "Save")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.live_updates import HEARTBEAT, RESYNC, DatabaseBackend, LiveBus
+from app.database import Base
+
+
+async def read(stream, count: int, timeout: float = 1.0) -> list[bytes]:
+    return [await asyncio.wait_for(stream.__anext__(), timeout) for _ in range(count)]
+
+
+class LiveBusTests(unittest.TestCase):
+    def test_publish_reaches_subscribed_topics_of_the_class(self):
+        bus = LiveBus()
+
+        async def run():
+            events = bus.stream("c1", ["events"])
+            everything = bus.stream("c1")
+            self.assertEqual((await read(events, 1))[0], b"retry: 3000\n\n")
+            await read(everything, 1)
+
+            bus.publish("c1", "timetable")
+            bus.publish("c2", "events", id="other-class")
+            bus.publish("c1", "events", id="e1")
+            self.assertEqual(await read(events, 1), [b'id: 3\nevent: events\ndata: {"id":"e1"}\n\n'])
+            self.assertEqual(await read(everything, 2), [
+                b"id: 1\nevent: timetable\ndata: {}\n\n",
+                b'id: 3\nevent: events\ndata: {"id":"e1"}\n\n',
+            ])
+            self.assertEqual(bus.connections, 2)
+            await events.aclose()
+            await everything.aclose()
+            self.assertEqual(bus.connections, 0)
+
+        asyncio.run(run())
+
+    def test_resume_from_last_event_id(self):
+        bus = LiveBus(replay_size=2)
+        for i in range(3):
+            bus.publish("c1", "events", id=f"e{i}")
+
+        async def run():
+            resumed = bus.stream("c1", last_event_id=1)
+            frames = await read(resumed, 3)
+            self.assertEqual([f.split(b"\n")[0] for f in frames[1:]], [b"id: 2", b"id: 3"])
+            await resumed.aclose()
+
+            # id 1 already dropped from the replay buffer, id 99 never existed (e.g. server restart)
+            for last_event_id in (0, 99):
+                stale = bus.stream("c1", last_event_id=last_event_id)
+                self.assertEqual((await read(stale, 2))[1], RESYNC)
+                await stale.aclose()
+
+        asyncio.run(run())
+
+    def test_slow_reader_gets_resync_instead_of_backlog(self):
+        bus = LiveBus(buffer_size=3, heartbeat=0.05)
+
+        async def run():
+            stream = bus.stream("c1")
+            await read(stream, 1)
+            for i in range(10):
+                bus.publish("c1", "events", id=f"e{i}")
+            await asyncio.sleep(0)  # deliveries are scheduled on the loop
+            self.assertEqual(await read(stream, 2), [RESYNC, HEARTBEAT])
+            bus.publish("c1", "events", id="after")
+            self.assertIn(b'"after"', (await read(stream, 1))[0])
+            await stream.aclose()
+
+        asyncio.run(run())
+
+    def test_database_backend_shares_messages_between_workers(self):
+        # A database file with an engine per worker: one shared in-memory connection
+        # would be used from both poller threads at once
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workers = []
+        for _ in range(2):
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+            self.addCleanup(engine.dispose)
+            Base.metadata.create_all(bind=engine)
+            bus = LiveBus(backend=DatabaseBackend(sessionmaker(bind=engine), poll_interval=0.01))
+            self.addCleanup(bus.backend.stop)
+            workers.append(bus)
+
+        async def run():
+            streams = [bus.stream("c1") for bus in workers]
+            for stream in streams:
+                await read(stream, 1)
+            workers[0].publish("c1", "events", id="e1")
+            workers[1].publish("c1", "subjects", id="s1")
+            for stream in streams:
+                frames = await read(stream, 2)
+                self.assertEqual([f.split(b"\n")[:2] for f in frames],
+                                 [[b"id: 1", b"event: events"], [b"id: 2", b"event: subjects"]])
+                await stream.aclose()
+
+            # A client can resume on the other worker with the shared ids
+            resumed = workers[1].stream("c1", last_event_id=1)
+            self.assertIn(b"id: 2\n", (await read(resumed, 2))[1])
+            await resumed.aclose()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from starlette.testclient import TestClient
+
+from app.core import metrics
+from app.routers.metrics import router as metrics_router
+
+
+AUTH = {"Authorization": "Bearer secret"}
+
+
+def make_app() -> FastAPI:
+    items = APIRouter(prefix="/items")
+
+    @items.get("/{item_id}")
+    def item(item_id: int):
+        if item_id == 429:
+            raise HTTPException(status_code=429, detail="Too many requests")
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(items, prefix="/api")
+    app.include_router(metrics_router)
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+def sample(name: str, **labels) -> float:
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def worker_main(commands, results):
+    """One app worker in multiprocess mode (PROMETHEUS_MULTIPROC_DIR inherited)."""
+    from app.core import metrics as worker_metrics
+    client = TestClient(make_app())
+    for command in iter(commands.get, None):
+        if command == "request":
+            results.put(client.get("/api/items/1").status_code)
+        elif command == "push":
+            worker_metrics.PUSH_PENDING.inc(5)
+            results.put("ok")
+        elif command == "scrape":
+            results.put(client.get("/metrics", headers=AUTH).text)
+
+
+@mock.patch.dict(os.environ, {"WEBHOOKS_ENABLED": "false", "METRICS_TOKEN": "secret"})  # no database behind these apps
+class MetricsTests(unittest.TestCase):
+    def test_requests_per_route_template(self):
+        client = TestClient(make_app())
+        labels = {"method": "GET", "route": "/api/items/{item_id}"}
+        before = sample("classly_http_request_duration_seconds_count", **labels)
+        limited = sample("classly_rate_limit_rejections_total", route="/api/items/{item_id}")
+
+        client.get("/api/items/1")
+        client.get("/api/items/2")
+        client.get("/api/items/429")
+        client.get("/nothing-here")
+
+        self.assertEqual(sample("classly_http_request_duration_seconds_count", **labels), before + 3)
+        self.assertGreaterEqual(sample("classly_http_requests_total", status="200", **labels), 2)
+        self.assertEqual(sample("classly_rate_limit_rejections_total", route="/api/items/{item_id}"), limited + 1)
+        self.assertGreaterEqual(sample("classly_http_requests_total", method="GET", route="unmatched", status="404"), 1)
+        self.assertEqual(sample("classly_http_requests_in_flight"), 0)
+
+        body = client.get("/metrics", headers=AUTH).text
+        self.assertIn('classly_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/items/{item_id}"}',
+                      body)
+
+    def test_token(self):
+        client = TestClient(make_app())
+        self.assertEqual(client.get("/metrics").status_code, 401)
+        self.assertEqual(client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+        self.assertEqual(client.get("/metrics", headers=AUTH).status_code, 200)
+        with mock.patch.dict(os.environ, {"METRICS_TOKEN": ""}):
+            self.assertEqual(client.get("/metrics").status_code, 404)
+
+    def test_cache_counters(self):
+        from app.core.fragment_cache import FragmentCache
+        cache = FragmentCache(ttl=0)
+        hits = sample("classly_cache_requests_total", cache="fragments", result="hit")
+        misses = sample("classly_cache_requests_total", cache="fragments", result="miss")
+        for _ in range(3):
+            cache.get_or_render("c1", "calendar", None, lambda: "html")
+        self.assertEqual(sample("classly_cache_requests_total", cache="fragments", result="hit"), hits + 2)
+        self.assertEqual(sample("classly_cache_requests_total", cache="fragments", result="miss"), misses + 1)
+
+    def test_multiple_worker_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = []
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+            for _ in range(3):
+                commands = context.Queue()
+                process = context.Process(target=worker_main, args=(commands, results), daemon=True)
+                process.start()
+                workers.append((process, commands))
+
+        def call(worker, command):
+            worker[1].put(command)
+            return results.get(timeout=60)
+
+        def value(body: str, prefix: str) -> float:
+            line = next(line for line in body.splitlines() if line.startswith(prefix))
+            return float(line.rsplit(" ", 1)[1])
+
+        try:
+            for worker, requests in zip(workers, (1, 2, 3)):
+                for _ in range(requests):
+                    self.assertEqual(call(worker, "request"), 200)
+            self.assertEqual(call(workers[2], "push"), "ok")
+
+            # Any worker answers with the sum of all of them
+            body = call(workers[0], "scrape")
+            self.assertEqual(value(body, 'classly_http_requests_total{method="GET",route="/api/items/{item_id}"'), 6)
+            self.assertEqual(value(body, "classly_push_batches_pending "), 5)
+
+            # Counters of a dead worker stay, its live gauges go
+            workers[2][1].put(None)
+            workers[2][0].join(30)
+            body = call(workers[1], "scrape")
+            self.assertEqual(value(body, 'classly_http_requests_total{method="GET",route="/api/items/{item_id}"'), 6)
+            self.assertEqual(value(body, "classly_push_batches_pending "), 0)
+        finally:
+            for process, commands in workers:
+                commands.put(None)
+                process.join(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
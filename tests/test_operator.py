@@ -0,0 +1,47 @@
+import base64
+import os
+import unittest
+from unittest import mock
+
+from fastapi import Depends, FastAPI
+from starlette.testclient import TestClient
+
+from app.core.operator import is_operator, require_operator
+
+
+def basic(password: str, user: str = "ops") -> str:
+    return "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode()
+
+
+class OperatorTests(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+
+        @app.get("/ops")
+        def ops(_operator=Depends(require_operator)):
+            return {"ok": True}
+
+        self.client = TestClient(app)
+
+    def test_disabled_without_token(self):
+        with mock.patch.dict(os.environ, {"OPERATOR_TOKEN": ""}):
+            self.assertEqual(self.client.get("/ops", headers={"Authorization": "Bearer "}).status_code, 404)
+
+    def test_bearer_or_basic_password(self):
+        with mock.patch.dict(os.environ, {"OPERATOR_TOKEN": "s3cret"}):
+            response = self.client.get("/ops")
+            self.assertEqual(response.status_code, 401)
+            self.assertIn("Basic", response.headers["www-authenticate"])
+            self.assertEqual(self.client.get("/ops", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+            self.assertEqual(self.client.get("/ops", headers={"Authorization": "Bearer s3cret"}).status_code, 200)
+            self.assertEqual(self.client.get("/ops", headers={"Authorization": basic("s3cret")}).status_code, 200)
+            self.assertEqual(self.client.get("/ops", headers={"Authorization": basic("x", "s3cret")}).status_code, 401)
+
+    def test_malformed_headers(self):
+        for header in (None, "", "Bearer", "Basic !!!", "Token s3cret", basic("s3cret")[:-2]):
+            with self.subTest(header=header):
+                self.assertFalse(is_operator(header, "s3cret"))
+
+
+if __name__ == "__main__":
+    unittest.main()
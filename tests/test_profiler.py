@@ -0,0 +1,109 @@
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.core.profiler import Profiler, ProfilerMiddleware, _operator_header
+from app.core.query_stats import QueryStats, QueryStatsMiddleware
+
+
+def busy_loop(seconds: float) -> int:
+    total, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+def make_app(profiler: Profiler, authorize=lambda scope: True):
+    app = FastAPI()
+
+    @app.get("/sync/{item_id}")
+    def sync_handler(item_id: int):
+        return {"n": busy_loop(0.15)}
+
+    @app.get("/async")
+    async def async_handler():
+        return {"n": busy_loop(0.15)}
+
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, authorize=authorize)
+    app.add_middleware(QueryStatsMiddleware, stats=QueryStats(enabled=True))
+    return app
+
+
+class ProfilerTests(unittest.TestCase):
+    def test_threadpool_handler_on_header(self):
+        profiler = Profiler(enabled=True, interval=0.002)
+        client = TestClient(make_app(profiler))
+
+        self.assertEqual(client.get("/sync/7").status_code, 200)
+        self.assertEqual(profiler.profiles(), [])
+
+        response = client.get("/sync/7", headers={"X-Classly-Profile": "1"})
+        [profile] = profiler.profiles()
+        self.assertEqual(response.headers["x-classly-profile-id"], str(profile.id))
+        self.assertEqual(profile.route, "/sync/{item_id}")
+        self.assertEqual((profile.reason, profile.status), ("header", 200))
+        self.assertGreater(profile.samples, 10)
+
+        collapsed = profile.collapsed()
+        self.assertTrue(collapsed.startswith("GET /sync/{item_id};"))
+        busy = sum(int(line.rsplit(" ", 1)[1]) for line in collapsed.splitlines()
+                   if "sync_handler" in line and "busy_loop" in line)
+        self.assertGreater(busy, profile.samples / 2)
+
+    def test_event_loop_handler(self):
+        profiler = Profiler(enabled=True, sample_rate=1, interval=0.002)
+        client = TestClient(make_app(profiler))
+        client.get("/async")
+        [profile] = profiler.profiles()
+        self.assertEqual(profile.reason, "sample")
+        self.assertIn("async_handler", profile.collapsed())
+
+    def test_speedscope(self):
+        profiler = Profiler(enabled=True, sample_rate=1, interval=0.002)
+        TestClient(make_app(profiler)).get("/sync/1")
+        [profile] = profiler.profiles()
+        document = json.loads(json.dumps(profile.speedscope()))
+        [sampled] = document["profiles"]
+        self.assertEqual(sampled["type"], "sampled")
+        self.assertEqual(len(sampled["samples"]), len(sampled["weights"]))
+        frames = document["shared"]["frames"]
+        self.assertTrue(all(0 <= i < len(frames) for stack in sampled["samples"] for i in stack))
+        self.assertAlmostEqual(sampled["endValue"], profile.samples * 2, places=3)
+
+    def test_header_requires_operator_token(self):
+        profiler = Profiler(enabled=True, interval=0.002)
+        client = TestClient(make_app(profiler, authorize=_operator_header))
+        for token, value in (("", ""), ("", "1"), ("s3cret", "1"), ("s3cret", "s3cre")):
+            with self.subTest(token=token, value=value), mock.patch.dict(os.environ, {"OPERATOR_TOKEN": token}):
+                response = client.get("/sync/1", headers={"X-Classly-Profile": value})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("x-classly-profile-id", response.headers)
+        self.assertEqual(profiler.profiles(), [])
+
+        with mock.patch.dict(os.environ, {"OPERATOR_TOKEN": "s3cret"}):
+            response = client.get("/sync/1", headers={"X-Classly-Profile": "s3cret"})
+        self.assertIn("x-classly-profile-id", response.headers)
+
+    def test_ring_buffer(self):
+        profiler = Profiler(enabled=True, sample_rate=1, interval=0.002, buffer_size=2)
+        app = FastAPI()
+
+        @app.get("/")
+        def index():
+            return {}
+
+        app.add_middleware(ProfilerMiddleware, profiler=profiler)
+        client = TestClient(app)
+        for _ in range(5):
+            client.get("/")
+        self.assertEqual([profile.id for profile in profiler.profiles()], [5, 4])
+        self.assertIsNone(profiler.get(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
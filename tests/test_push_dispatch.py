@@ -0,0 +1,160 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.core.push_dispatch import ApnsProvider, FcmProvider, PushDispatcher, PushMessage, load_class_tokens
+from app.database import Base
+
+
+class MockPushServer(ThreadingHTTPServer):
+    """Stands in for FCM (POST /fcm) and APNs (POST /3/device/<token>)."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _MockHandler)
+        self.requests: list[tuple[str, str]] = []  # (provider, token)
+        self.failed_once: set[str] = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return "http://%s:%d" % self.server_address
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/fcm":
+            provider, token = "fcm", body["message"]["token"]
+        else:
+            provider, token = "apns", self.path.rsplit("/", 1)[-1]
+
+        with self.server.lock:
+            self.server.requests.append((provider, token))
+            first_try = token not in self.server.failed_once
+            self.server.failed_once.add(token)
+
+        if token.startswith("dead"):
+            status, payload = (404, b'{"error": {"status": "NOT_FOUND", "details": [{"errorCode": "UNREGISTERED"}]}}') \
+                if provider == "fcm" else (410, b'{"reason": "Unregistered"}')
+        elif token.startswith("flaky") and first_try:
+            status, payload = 503, b"{}"
+        elif token.startswith("rejected"):
+            status, payload = 400, b'{"reason": "PayloadTooLarge"}'
+        else:
+            status, payload = 200, b"{}"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class PushDispatchTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.server = MockPushServer()
+        self.message = PushMessage("Neu: KA Mathe", "02.03.2026", {"event_id": "e1"})
+
+    def tearDown(self):
+        self.server.close()
+        self.engine.dispose()
+
+    def dispatcher(self, **kwargs) -> PushDispatcher:
+        dispatcher = PushDispatcher(
+            {"fcm": FcmProvider(f"{self.server.url}/fcm", "fcm-token"),
+             "apns": ApnsProvider(self.server.url, "jwt", "de.classly.app")},
+            session_factory=self.Session,
+            retry_base=0.01,
+            **kwargs,
+        )
+        self.addCleanup(dispatcher.stop)
+        return dispatcher
+
+    def seed(self):
+        db = self.Session()
+        clazz = models.Class(name="10a", join_token="JOIN10A")
+        db.add(clazz)
+        db.flush()
+        author = models.User(name="Author", class_id=clazz.id, role=models.UserRole.OWNER)
+        member = models.User(name="Member", class_id=clazz.id, role=models.UserRole.MEMBER)
+        outsider = models.User(name="Other", class_id="other", role=models.UserRole.MEMBER)
+        db.add_all([author, member, outsider])
+        db.flush()
+        tokens = [
+            (author.id, "author-device-fcm", "fcm"),
+            (member.id, "ok-fcm-1", "fcm"),
+            (member.id, "ok-fcm-2", "fcm"),
+            (member.id, "flaky-fcm", "fcm"),
+            (member.id, "dead-fcm", "fcm"),
+            (member.id, "ok-apns", "apns"),
+            (member.id, "dead-apns", "apns"),
+            (member.id, "rejected-apns", "apns"),
+            (outsider.id, "outsider-fcm", "fcm"),
+        ]
+        db.add_all([models.DeviceToken(user_id=u, device_token=t, platform=p) for u, t, p in tokens])
+        db.commit()
+        ids = clazz.id, author.id
+        db.close()
+        return ids
+
+    def test_fan_out_retries_and_prunes(self):
+        class_id, author_id = self.seed()
+        dispatcher = self.dispatcher(batch_size=2)
+        dispatcher.notify_class(class_id, self.message, exclude_user_id=author_id)
+        self.assertTrue(dispatcher.drain(5))
+
+        sent = sorted(token for _, token in self.server.requests)
+        self.assertEqual(sent, sorted(["ok-fcm-1", "ok-fcm-2", "flaky-fcm", "flaky-fcm", "dead-fcm",
+                                       "ok-apns", "dead-apns", "rejected-apns"]))
+        self.assertEqual(dispatcher.stats["ok"], 4)
+        self.assertEqual(dispatcher.stats["retry"], 1)
+        self.assertEqual(dispatcher.stats["failed"], 1)
+        self.assertEqual(dispatcher.stats["pruned"], 2)
+
+        db = self.Session()
+        remaining = {token for token, _ in load_class_tokens(db, class_id)}
+        db.close()
+        self.assertNotIn("dead-fcm", remaining)
+        self.assertNotIn("dead-apns", remaining)
+        self.assertIn("author-device-fcm", remaining)
+
+    def test_gives_up_after_max_retries(self):
+        dispatcher = self.dispatcher(max_retries=2)
+        # Unreachable provider: every attempt is a network error
+        dispatcher.providers["fcm"] = FcmProvider("http://127.0.0.1:1/fcm")
+        dispatcher.send([("flaky-x", "fcm")], self.message)
+        self.assertTrue(dispatcher.drain(5))
+        self.assertEqual(dispatcher.stats["retry"], 3)
+        self.assertEqual(dispatcher.stats["gave_up"], 1)
+
+    def test_bounded_queue_drops_overflow(self):
+        dispatcher = self.dispatcher(workers=1, batch_size=1, queue_size=2)
+        dispatcher.send([(f"ok-{i}", "fcm") for i in range(5)] + [("ok-web", "web")], self.message)
+        self.assertTrue(dispatcher.drain(5))
+        self.assertEqual(dispatcher.stats["dropped"], 3)
+        self.assertEqual(dispatcher.stats["ok"], 2)
+        self.assertEqual(dispatcher.stats["unsupported"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
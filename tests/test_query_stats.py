@@ -0,0 +1,85 @@
+import json
+import unittest
+
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
+
+from app.core.query_stats import QueryStats, QueryStatsMiddleware, current
+
+
+def make_app(stats: QueryStats):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    stats.instrument(engine)
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    items = APIRouter(prefix="/items")
+
+    @items.get("/{item_id}")
+    def item(item_id: int, db=Depends(get_db)):
+        # one statement per "child row", like a lazy-loaded relationship in a loop
+        return [db.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(item_id)]
+
+    api = APIRouter(prefix="/api")
+    api.include_router(items)
+    app = FastAPI()
+    app.include_router(api)
+
+    @app.get("/none")
+    async def none():
+        return {"collector": current() is not None}
+
+    app.add_middleware(QueryStatsMiddleware, stats=stats)
+    return app
+
+
+class QueryStatsTests(unittest.TestCase):
+    def test_counts_statements_per_request_and_route(self):
+        stats = QueryStats(server_timing=True)
+        client = TestClient(make_app(stats))
+
+        response = client.get("/api/items/3")
+        self.assertEqual(response.json(), [0, 1, 2])
+        self.assertRegex(response.headers["server-timing"], r'^db;dur=[0-9.]+;desc="3 queries"$')
+        client.get("/api/items/5")
+        client.get("/none")
+
+        top = stats.top(10)
+        self.assertEqual([r["route"] for r in top][0], "GET /api/items/{item_id}")
+        self.assertEqual((top[0]["requests"], top[0]["queries"], top[0]["max_queries"]), (2, 8, 5))
+        self.assertEqual(top[0]["slowest_sql"], "SELECT ?")
+        self.assertEqual(top[1]["queries"], 0)
+        self.assertIsNone(current())
+
+    def test_server_timing_is_opt_in(self):
+        response = TestClient(make_app(QueryStats())).get("/api/items/1")
+        self.assertNotIn("server-timing", response.headers)
+
+    def test_many_queries_log_a_warning(self):
+        client = TestClient(make_app(QueryStats(log_min_queries=10)))
+        with self.assertLogs("app.core.query_stats", "WARNING") as logs:
+            client.get("/api/items/12")
+            client.get("/api/items/2")
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["route"], line["path"], line["queries"], line["status"]),
+                         ("/api/items/{item_id}", "/api/items/12", 12, 200))
+
+    def test_disabled(self):
+        stats = QueryStats(enabled=False, server_timing=True)
+        response = TestClient(make_app(stats)).get("/api/items/2")
+        self.assertNotIn("server-timing", response.headers)
+        self.assertEqual(stats.top(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
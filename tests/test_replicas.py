@@ -0,0 +1,156 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import models
+from app.core import replicas
+from app.core.schedule_index import ScheduleIndex
+from app.database import Base
+from app.repository.sql import SqlAlchemyRepository
+
+
+class ReplicatedDatabase:
+    """Primary and replica SQLite files; `sync()` copies the primary into the replica (the replication)."""
+
+    def __init__(self, directory: str):
+        self.primary_path = os.path.join(directory, "primary.db")
+        self.replica_path = os.path.join(directory, "replica.db")
+        self.primary = create_engine(f"sqlite:///{self.primary_path}")
+        self.replica = create_engine(f"sqlite:///{self.replica_path}")
+        Base.metadata.create_all(bind=self.primary)
+        self.sync()
+
+    def sync(self):
+        source, target = sqlite3.connect(self.primary_path), sqlite3.connect(self.replica_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def dispose(self):
+        self.primary.dispose()
+        self.replica.dispose()
+
+
+class ReplicaRoutingTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.db = ReplicatedDatabase(directory)
+        self.addCleanup(self.db.dispose)
+        self.lag = 0.0
+        self.router = replicas.ReplicaRouter([self.db.replica], max_lag=5.0, check_interval=0,
+                                             lag=lambda engine: self.lag)
+        self.sessions = sessionmaker(class_=replicas.RoutingSession, router=self.router, bind=self.db.primary)
+
+        primary = sessionmaker(bind=self.db.primary)()
+        clazz = models.Class(name="5a", join_token="join")
+        primary.add(clazz)
+        primary.flush()
+        self.class_id = clazz.id
+        primary.add(models.Subject(class_id=clazz.id, name="Mathe"))
+        primary.commit()
+        primary.close()
+        self.db.sync()
+
+    def repository(self) -> SqlAlchemyRepository:
+        session = self.sessions()
+        self.addCleanup(session.close)
+        return SqlAlchemyRepository(session)
+
+    def write_unsynced(self, name: str = "Deutsch"):
+        primary = sessionmaker(bind=self.db.primary)()
+        primary.add(models.Subject(class_id=self.class_id, name=name))
+        primary.commit()
+        primary.close()
+
+    def test_reads_go_to_the_replica(self):
+        self.write_unsynced()
+        self.assertEqual(self.repository().count_subjects(self.class_id), 1)
+        self.db.sync()
+        self.assertEqual(self.repository().count_subjects(self.class_id), 2)
+
+    def test_session_reads_its_own_writes(self):
+        repo = self.repository()
+        self.assertEqual(repo.get_class(self.class_id).name, "5a")
+        repo.create_subject(self.class_id, "Englisch")
+        names = [subject.name for subject in repo.get_subjects_for_class(self.class_id)]
+        self.assertEqual(names, ["Englisch", "Mathe"])
+        self.assertEqual(self.repository().count_subjects(self.class_id), 1)  # other sessions: replica
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.write_unsynced()
+        self.lag = 30.0
+        self.assertEqual(self.repository().count_subjects(self.class_id), 2)
+        self.lag = 1.0
+        self.assertEqual(self.repository().count_subjects(self.class_id), 1)
+
+    def test_shared_caches_are_filled_from_the_primary(self):
+        primary = sessionmaker(bind=self.db.primary)()
+        slot = models.TimetableSlot(class_id=self.class_id, weekday=0, slot_number=1, subject_name="Mathe")
+        user = models.User(name="Anna", class_id=self.class_id)
+        primary.add_all([slot, user])
+        primary.flush()
+        primary.add(models.UserTimetableSelection(user_id=user.id, slot_id=slot.id))
+        primary.commit()
+        slot_id, user_id = slot.id, user.id
+        primary.close()
+
+        # The replica is behind (within DB_REPLICA_MAX_LAG): it has neither the slot nor the selection
+        self.lag = 1.0
+        repo = self.repository()
+        index = ScheduleIndex()
+        self.assertEqual([entry.slot_id for entry in index.get(repo.db, self.class_id).entries], [slot_id])
+        self.assertEqual(index.selected(repo.db, self.class_id, user_id), frozenset({slot_id}))
+        self.assertEqual(repo.list_slot_rows(self.class_id), [])  # uncached reads still use the replica
+        with repo.primary_reads():
+            self.assertEqual(len(repo.list_slot_rows(self.class_id)), 1)
+
+    def test_failing_replica_falls_back_to_primary(self):
+        def unreachable(engine):
+            raise ConnectionError("replica down")
+
+        self.write_unsynced()
+        self.router.lag = unreachable
+        self.assertEqual(self.repository().count_subjects(self.class_id), 2)
+
+    def test_checks_are_cached(self):
+        checks = []
+        self.router.lag = lambda engine: checks.append(engine) or 0.0
+        self.router.check_interval = 60
+        for _ in range(5):
+            self.repository().count_subjects(self.class_id)
+        self.assertEqual(len(checks), 1)
+
+    def test_browser_sticks_to_primary_after_a_write(self):
+        def subjects(request):
+            repo = self.repository()
+            if request.method == "POST":
+                repo.create_subject(self.class_id, "Physik")
+            return PlainTextResponse(str(repo.count_subjects(self.class_id)))
+
+        app = replicas.ReplicaStickinessMiddleware(
+            Starlette(routes=[Route("/subjects", subjects, methods=["GET", "POST"])]), sticky_seconds=5)
+        client = TestClient(app)
+        self.assertEqual(client.get("/subjects").text, "1")
+        self.assertNotIn(replicas.STICKY_COOKIE, client.cookies)
+
+        response = client.post("/subjects")
+        self.assertEqual(response.text, "2")
+        self.assertIn("Max-Age=5", response.headers["set-cookie"])
+        self.assertEqual(client.get("/subjects").text, "2")  # replica hasn't caught up yet
+        self.assertEqual(TestClient(app).get("/subjects").text, "1")  # other browsers read the replica
+
+
+if __name__ == "__main__":
+    unittest.main()
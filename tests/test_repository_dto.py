@@ -0,0 +1,71 @@
+import dataclasses
+import datetime
+import unittest
+
+from app import models
+from app.repository.appwrite import AppwriteRepository
+from app.repository.dto import ClassDTO, EventDTO, SlotDTO, SubjectDTO, UserDTO, to_dto
+from app.routers.api_v1.serializers import serialize_event
+
+
+class RepositoryDTOTests(unittest.TestCase):
+    def test_dtos_are_slotted_and_immutable(self):
+        user = UserDTO(id="u1", name="Anna", class_id="c1")
+        self.assertFalse(hasattr(user, "__dict__"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            user.name = "Bert"
+        with_token = dataclasses.replace(user, session_token="secret-session")
+        self.assertEqual(with_token.session_token, "secret-session")
+        self.assertNotIn("secret-session", repr(with_token))
+
+    def test_orm_adapter_copies_columns(self):
+        created = datetime.datetime(2026, 2, 1, 12, 0)
+        event = models.Event(
+            id="e1", class_id="c1", type=models.EventType.KA, priority=models.Priority.LOW,
+            subject_id="s1", subject_name="Mathe", title="KA", date=created, author_id="u1",
+            created_at=created, updated_at=created,
+        )
+        dto = to_dto(event)
+        self.assertIsInstance(dto, EventDTO)
+        self.assertEqual(serialize_event(dto, include_topics=True), serialize_event(event) | {"topics": []})
+
+        slot = models.TimetableSlot(id="x", class_id="c1", weekday=2, slot_number=3, subject_name="Deutsch", room="R1")
+        self.assertEqual(to_dto(slot), SlotDTO(id="x", class_id="c1", weekday=2, slot_number=3, subject_name="Deutsch", room="R1"))
+        self.assertEqual(to_dto(models.Subject(id="s1", class_id="c1", name="Mathe", color="#fff")).color, "#fff")
+        self.assertEqual(to_dto(models.Class(id="c1", name="10a")).name, "10a")
+
+    def test_to_dto_passes_through_dtos_and_none(self):
+        dto = SubjectDTO(id="s1", class_id="c1", name="Mathe")
+        self.assertIs(to_dto(dto), dto)
+        self.assertIsNone(to_dto(None))
+
+    def test_appwrite_documents_map_to_dtos(self):
+        repo = AppwriteRepository.__new__(AppwriteRepository)
+        user = repo._map_doc_to_user({
+            "$id": "u1", "name": "Anna", "email": "a@example.org",
+            "registration": "2026-01-05T10:00:00.000Z",
+            "prefs": {"class_id": "c1", "role": "admin", "is_registered": True},
+        })
+        self.assertIsInstance(user, UserDTO)
+        self.assertEqual(user.role, models.UserRole.ADMIN)
+        self.assertEqual(user.created_at.year, 2026)
+        for role in ("superuser", None):
+            prefs = {"class_id": "c1"} if role is None else {"class_id": "c1", "role": role}
+            self.assertEqual(repo._map_doc_to_user({"$id": "u2", "name": "Bert", "prefs": prefs}).role,
+                             models.UserRole.MEMBER)
+
+        event = repo._map_doc_to_event({
+            "$id": "e1", "class_id": "c1", "type": "HA", "date": "2026-03-02T00:00:00.000Z",
+            "$createdAt": "2026-02-01T00:00:00.000Z", "$updatedAt": "2026-02-02T00:00:00.000Z",
+        })
+        self.assertEqual(event.priority, models.Priority.MEDIUM)
+        self.assertEqual(event.topics, ())
+        self.assertEqual(event.updated_at.day, 2)
+
+        clazz = repo._map_doc_to_class({"$id": "c1", "name": "10a", "join_token": "J"})
+        self.assertIsInstance(clazz, ClassDTO)
+        self.assertFalse(clazz.timetable_public_enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import datetime
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.repository.rows import EventRow, MemberRow, SlotRow, SubjectRow
+from app.repository.sql import SqlAlchemyRepository
+from app.routers.api_v1.serializers import (
+    event_serializer,
+    serialize_event_rows,
+    serialize_events,
+    slot_serializer,
+    subject_serializer,
+    user_serializer,
+)
+
+
+class ProjectionRowTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite:///:memory:",
+            connect_args={"check_same_thread": False},
+        )
+        TestingSessionLocal = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=self.engine,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.db = TestingSessionLocal()
+        self.repo = SqlAlchemyRepository(self.db)
+
+        self.clazz = models.Class(name="10a", join_token="ROWS")
+        self.db.add(self.clazz)
+        self.db.flush()
+        self.owner = models.User(name="Owner", class_id=self.clazz.id, role=models.UserRole.OWNER)
+        self.db.add(self.owner)
+        self.db.add(models.User(name="Member", class_id=self.clazz.id))
+        mathe = models.Subject(class_id=self.clazz.id, name="Mathe", color="#ff0000")
+        self.db.add_all([mathe, models.Subject(class_id=self.clazz.id, name="Deutsch")])
+        self.db.flush()
+
+        base = datetime.datetime(2026, 3, 2, 8, 0)
+        for i, event_type in enumerate([models.EventType.KA, models.EventType.HA, models.EventType.INFO]):
+            self.db.add(models.Event(
+                class_id=self.clazz.id, author_id=self.owner.id, type=event_type,
+                priority=None if i == 2 else models.Priority.HIGH,
+                subject_id=mathe.id, subject_name="Mathe", title=f"Event {i}",
+                date=base + datetime.timedelta(days=i), updated_at=base + datetime.timedelta(hours=i),
+            ))
+        for weekday in (1, 0):
+            for slot_number in (2, 1):
+                self.db.add(models.TimetableSlot(class_id=self.clazz.id, weekday=weekday, slot_number=slot_number,
+                                                 subject_name="Mathe", room=f"R{slot_number}"))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def test_row_fields_match_serializers(self):
+        self.assertEqual(EventRow._fields, event_serializer.fields)
+        self.assertEqual(SubjectRow._fields, subject_serializer.fields)
+        self.assertEqual(MemberRow._fields, user_serializer.fields)
+        self.assertEqual(SlotRow._fields[1:], slot_serializer.fields)
+
+    def test_event_rows_serialize_like_orm_objects(self):
+        rows = self.repo.list_event_rows(self.clazz.id, limit=10)
+        events = self.repo.list_events(self.clazz.id, limit=10)
+        self.assertIsInstance(rows[0], EventRow)
+        self.assertEqual(serialize_event_rows(rows), serialize_events(events))
+        self.assertEqual([row.title for row in rows], ["Event 2", "Event 1", "Event 0"])
+
+    def test_event_row_filters(self):
+        rows = self.repo.list_event_rows(self.clazz.id, type=models.EventType.HA)
+        self.assertEqual([row.type for row in rows], [models.EventType.HA])
+
+        since = datetime.datetime(2026, 3, 2, 9, 0)
+        self.assertEqual(len(self.repo.list_event_rows(self.clazz.id, updated_since=since)), 2)
+        self.assertEqual(len(self.repo.list_event_rows(self.clazz.id, limit=1)), 1)
+
+    def test_subject_and_member_rows(self):
+        subjects = self.repo.list_subject_rows(self.clazz.id)
+        self.assertEqual(subject_serializer.rows(subjects), subject_serializer.many(self.repo.get_subjects_for_class(self.clazz.id)))
+
+        members = self.repo.list_member_rows(self.clazz.id)
+        self.assertEqual(sorted(row.name for row in members), ["Member", "Owner"])
+        self.assertEqual({row.role for row in members}, {models.UserRole.OWNER, models.UserRole.MEMBER})
+
+    def test_slot_rows_are_ordered_and_filterable(self):
+        rows = self.repo.list_slot_rows(self.clazz.id)
+        self.assertEqual([(row.weekday, row.slot_number) for row in rows], [(0, 1), (0, 2), (1, 1), (1, 2)])
+        self.assertEqual([row.weekday for row in self.repo.list_slot_rows(self.clazz.id, weekday=1)], [1, 1])
+
+    def test_rows_do_not_enter_the_identity_map(self):
+        class_id = self.clazz.id
+        self.db.expunge_all()
+        self.assertEqual(len(self.repo.list_event_rows(class_id)), 3)
+        self.assertEqual(len(self.repo.list_slot_rows(class_id)), 4)
+        self.assertEqual(len(self.db.identity_map), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core.schedule_index import ScheduleIndex, WeeklySchedule, format_minutes, slot_minutes
+from app.database import Base
+from app.repository.rows import SlotRow
+
+# 08:00 start, 45 min lessons, 15 min breaks
+SETTINGS = dict(slot_duration=45, break_duration=15, day_start_hour=8, day_start_minute=0, day_end_hour=16, day_end_minute=0)
+TIMING = (8 * 60, 45, 15)
+
+
+def slot(slot_id, weekday, slot_number):
+    return SlotRow(weekday, slot_id, slot_number, None, f"Fach {slot_id}", None, None)
+
+
+def legacy_next(slots, selected, weekday, minute):
+    """The per-weekday loop the index replaced."""
+    for day_offset in range(7):
+        check_day = (weekday + day_offset) % 7
+        if check_day > 4:
+            continue
+        for s in sorted((s for s in slots if s.weekday == check_day and s.id in selected), key=lambda s: s.slot_number):
+            start, _ = slot_minutes(*TIMING, s.slot_number)
+            if day_offset == 0 and start <= minute:
+                continue
+            return s.id, day_offset
+    return None
+
+
+class WeeklyScheduleTests(unittest.TestCase):
+    def setUp(self):
+        self.slots = [slot(f"{d}-{n}", d, n) for d in range(5) for n in (1, 2, 3, 5, 6) if (d + n) % 3]
+        self.schedule = WeeklySchedule(list(reversed(self.slots)), SETTINGS)
+
+    def test_entries_are_sorted_with_precomputed_times(self):
+        keys = [(e.weekday, e.slot.slot_number) for e in self.schedule.entries]
+        self.assertEqual(keys, sorted(keys))
+        first = self.schedule.entries[0]
+        self.assertEqual((first.start_time, first.end_time), ("08:00", "08:45"))
+        self.assertEqual(format_minutes(slot_minutes(*TIMING, 3)[0]), "10:00")
+
+    def test_matches_previous_loop_for_every_quarter_hour(self):
+        selections = [
+            {s.id for s in self.slots},
+            {s.id for s in self.slots if s.weekday == 2},
+            {self.slots[0].id},
+            set(),
+        ]
+        for selected in selections:
+            for weekday in range(7):
+                for minute in range(0, 24 * 60, 15):
+                    found = self.schedule.next_lesson(selected, weekday, minute)
+                    got = (found[0].slot_id, found[1]) if found else None
+                    self.assertEqual(got, legacy_next(self.slots, selected, weekday, minute), (weekday, minute))
+
+    def test_without_settings_there_is_no_next_lesson(self):
+        schedule = WeeklySchedule(self.slots, None)
+        self.assertEqual(schedule.entries[0].start_time, "")
+        self.assertIsNone(schedule.next_lesson({s.id for s in self.slots}, 0, 0))
+
+
+class ScheduleIndexCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add(models.TimetableSettings(class_id="c1"))
+        self.db.add(models.TimetableSlot(class_id="c1", weekday=0, slot_number=1, subject_name="Mathe"))
+        self.db.commit()
+        self.index = ScheduleIndex(ttl=0)
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_cached_until_invalidated(self):
+        first = self.index.get(self.db, "c1")
+        self.assertIs(self.index.get(self.db, "c1"), first)
+        self.assertTrue(first.has_settings)
+
+        self.db.add(models.TimetableSlot(class_id="c1", weekday=1, slot_number=2, subject_name="Deutsch"))
+        self.db.commit()
+        self.assertEqual(len(self.index.get(self.db, "c1").entries), 1)
+
+        self.index.invalidate("c1")
+        rebuilt = self.index.get(self.db, "c1")
+        self.assertIsNot(rebuilt, first)
+        self.assertEqual([e.slot.subject_name for e in rebuilt.entries], ["Mathe", "Deutsch"])
+
+    def test_personal_selection_is_cached_per_user(self):
+        mathe = self.db.query(models.TimetableSlot).one()
+        other_class = models.TimetableSlot(class_id="c2", weekday=0, slot_number=1, subject_name="Physik")
+        self.db.add(other_class)
+        self.db.flush()
+        self.db.add_all([
+            models.UserTimetableSelection(user_id="u1", slot_id=mathe.id),
+            models.UserTimetableSelection(user_id="u1", slot_id=other_class.id),
+            models.UserTimetableSelection(user_id="u2", slot_id=other_class.id),
+        ])
+        self.db.commit()
+
+        self.assertEqual(self.index.selected(self.db, "c1", "u1"), {mathe.id})
+        self.assertEqual(self.index.selected(self.db, "c1", "u2"), frozenset())
+
+        self.db.query(models.UserTimetableSelection).filter_by(user_id="u1").delete()
+        self.db.commit()
+        self.assertEqual(self.index.selected(self.db, "c1", "u1"), {mathe.id})
+        self.index.invalidate_user("c1", "u1")
+        self.assertEqual(self.index.selected(self.db, "c1", "u1"), frozenset())
+
+        self.db.add(models.UserTimetableSelection(user_id="u2", slot_id=mathe.id))
+        self.db.commit()
+        self.index.invalidate("c1")
+        self.assertEqual(self.index.selected(self.db, "c1", "u2"), {mathe.id})
+
+
+if __name__ == "__main__":
+    unittest.main()
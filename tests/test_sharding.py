@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.core import class_backup, sharding
+from app.database import Base, engine_options
+from app.repository.sql import SqlAlchemyRepository
+
+
+class ShardedDatabases:
+    """Directory and two shards, each its own SQLite file."""
+
+    def __init__(self, directory: str, cache_seconds: float = 0.2):
+        def make(name):
+            url = f"sqlite:///{os.path.join(directory, name + '.db')}"
+            return create_engine(url, **engine_options(url))
+
+        self.directory = make("directory")
+        self.shards = {"a": make("shard-a"), "b": make("shard-b")}
+        for shard in self.shards.values():
+            Base.metadata.create_all(bind=shard)
+        self.map = sharding.ShardMap(self.directory, self.shards, cache_seconds=cache_seconds)
+        self.map.create_tables()
+        self.sessions = sessionmaker(class_=sharding.ShardSession, shard_map=self.map)
+        sharding.install(self.sessions)
+
+    def count(self, shard: str, model, class_id: str) -> int:
+        column = model.id if model is models.Class else model.class_id
+        with self.shards[shard].connect() as conn:
+            return conn.execute(select(func.count()).select_from(model).where(column == class_id)).scalar()
+
+    def dispose(self):
+        for engine in [self.directory, *self.shards.values()]:
+            engine.dispose()
+
+
+class ShardingTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.db = ShardedDatabases(directory)
+        self.addCleanup(self.db.dispose)
+
+    def session(self, class_id=None):
+        session = self.db.sessions()
+        session.pin(class_id)
+        self.addCleanup(session.close)
+        return session
+
+    def create_class(self, name: str) -> models.Class:
+        session = self.session()
+        clazz = crud.create_class(session, name, join_token=f"join-{name}")
+        crud.create_user(session, "Anna", clazz.id, role=models.UserRole.OWNER)
+        SqlAlchemyRepository(session).create_subject(clazz.id, "Mathe")
+        return clazz
+
+    def test_classes_are_spread_and_keep_their_rows_together(self):
+        first, second = self.create_class("5a"), self.create_class("5b")
+        self.assertEqual({self.db.map.shard_for(first.id), self.db.map.shard_for(second.id)}, {"a", "b"})
+        shard = self.db.map.shard_for(second.id)
+        for model in (models.Class, models.User, models.Subject):
+            self.assertEqual(self.db.count(shard, model, second.id), 1)
+        other = "a" if shard == "b" else "b"
+        self.assertEqual(self.db.count(other, models.User, second.id), 0)
+
+    def test_directory_lookups_find_the_class(self):
+        self.create_class("5a")
+        clazz = self.create_class("5b")
+        user = self.session().execute(select(models.User).where(models.User.class_id == clazz.id)).scalar_one()
+
+        session = self.session()  # unpinned: routed by the token
+        self.assertEqual(crud.get_user_by_session(session, user.session_token).class_id, clazz.id)
+        self.assertEqual(crud.get_class_by_token(session, "join-5b").id, clazz.id)
+        self.assertEqual(self.db.map.locate("session", user.session_token), clazz.id)
+        self.assertIsNone(self.db.map.locate("session", "unknown"))
+
+    def test_pinned_session_reads_its_class_shard(self):
+        self.create_class("5a")
+        clazz = self.create_class("5b")
+        repo = SqlAlchemyRepository(self.session(clazz.id))
+        self.assertEqual([subject.name for subject in repo.get_subjects_for_class(clazz.id)], ["Mathe"])
+        repo.create_subject(clazz.id, "Deutsch")
+        self.assertEqual(self.db.count(self.db.map.shard_for(clazz.id), models.Subject, clazz.id), 2)
+
+    def test_global_tables_live_in_the_directory(self):
+        session = self.session()
+        session.add(models.LiveUpdate(class_id="c1", topic="events", data="{}"))
+        session.commit()
+        with self.db.directory.connect() as conn:
+            self.assertEqual(conn.execute(select(func.count()).select_from(models.LiveUpdate)).scalar(), 1)
+
+    def test_class_export_reads_the_class_shard(self):
+        from app.routers.admin import download_db
+
+        clazz = self.create_class("5a")
+        owner = self.session(clazz.id).query(models.User).filter_by(class_id=clazz.id).one()
+
+        async def body(response):
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        with mock.patch("app.database.shard_map", self.db.map):
+            archive = asyncio.run(body(download_db(owner)))
+        self.assertIn(b'"Mathe"', class_backup.open_archive(io.BytesIO(archive)).read())
+
+    def test_class_backup_cli_uses_the_class_shard(self):
+        self.create_class("5a")
+        clazz = self.create_class("5b")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "5b.ndjson")
+
+        def run(*argv):
+            with mock.patch("app.database.shard_map", self.db.map), \
+                    mock.patch("app.database.engine", self.db.directory), contextlib.redirect_stdout(io.StringIO()):
+                return class_backup.main(list(argv))
+
+        self.assertEqual(run("export", clazz.id, path), 0)
+        shard = self.db.map.shard_for(clazz.id)
+        with self.db.shards[shard].begin() as conn:
+            class_backup.delete_class(conn, clazz.id)
+        with self.db.directory.begin() as conn:
+            conn.execute(delete(sharding.ClassShard).where(sharding.ClassShard.class_id == clazz.id))
+        self.db.map.forget(clazz.id)
+
+        self.assertEqual(run("restore", path), 0)  # no route: gets a shard assigned
+        shard = self.db.map.route(clazz.id, fresh=True).shard
+        self.assertEqual(self.db.count(shard, models.Subject, clazz.id), 1)
+        self.assertEqual(run("restore", path, "--replace"), 0)  # routed: restored on its shard
+        self.assertEqual(sum(self.db.count(name, models.User, clazz.id) for name in self.db.shards), 1)
+
+    def test_install_on_new_factories(self):
+        # A new factory may get the id() of a collected one
+        for i in range(100):
+            factory = sessionmaker(class_=sharding.ShardSession, shard_map=self.db.map)
+            sharding.install(factory)
+            del factory
+            if i % 10 == 0:
+                gc.collect()
+        self.db.sessions = sessionmaker(class_=sharding.ShardSession, shard_map=self.db.map)
+        sharding.install(self.db.sessions)
+        clazz = self.create_class("5a")
+        self.assertEqual(self.db.count(self.db.map.shard_for(clazz.id), models.Subject, clazz.id), 1)
+
+    def test_unpinned_insert_without_class_is_refused(self):
+        with self.assertRaises(sharding.ShardingError):
+            self.session().execute(models.Subject.__table__.insert().values(id="s", name="x", class_id=None))
+
+    def test_move_class_while_writing(self):
+        self.create_class("5a")
+        clazz = self.create_class("5b")
+        source = self.db.map.shard_for(clazz.id)
+        target = "a" if source == "b" else "b"
+        written, retried, stop = [], [], threading.Event()
+
+        def writer():
+            while not stop.is_set():
+                session = self.db.sessions()
+                session.pin(clazz.id)
+                name = f"Fach {len(written)}"
+                try:
+                    SqlAlchemyRepository(session).create_subject(clazz.id, name)
+                    written.append(name)
+                except sharding.ClassMovingError:
+                    retried.append(name)
+                    time.sleep(0.01)
+                finally:
+                    session.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            while len(written) < 5:
+                time.sleep(0.01)
+            counts = sharding.move_class(self.db.map, clazz.id, target, log=lambda message: None)
+            while len(written) < counts["subjects"] + 5:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual(self.db.map.route(clazz.id, fresh=True), sharding.Route(target, sharding.ACTIVE))
+        self.assertEqual(self.db.count(target, models.Subject, clazz.id), len(written) + 1)
+        self.assertEqual(self.db.count(source, models.Subject, clazz.id), 0)
+        self.assertEqual(self.db.count(source, models.Class, clazz.id), 0)
+        self.assertEqual(self.db.count(target, models.User, clazz.id), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.core.static_assets import (
+    IMMUTABLE_CACHE,
+    PrecompressedStaticFiles,
+    accepted_encodings,
+    build,
+    compute_manifest,
+    load_manifest,
+)
+
+CSS = b"body { color: red; }\n" * 200
+
+
+class StaticAssetsTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.workdir, "static")
+        os.makedirs(os.path.join(self.source, "brand"))
+        with open(os.path.join(self.source, "styles.css"), "wb") as f:
+            f.write(CSS)
+        with open(os.path.join(self.source, "brand", "logo.png"), "wb") as f:
+            f.write(b"\x89PNG fake")
+        self.target = os.path.join(self.workdir, "build")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def client(self, directory, manifest):
+        static = PrecompressedStaticFiles(directory=directory, manifest=manifest)
+        return TestClient(Starlette(routes=[Mount("/static", app=static)])), static
+
+    def test_build_writes_fingerprints_siblings_and_manifest(self):
+        manifest = build(self.target, self.source)
+
+        hashed_css = manifest["styles.css"]
+        self.assertRegex(hashed_css, r"^styles\.[0-9a-f]{10}\.css$")
+        self.assertTrue(manifest["brand/logo.png"].startswith("brand/logo."))
+        with gzip.open(os.path.join(self.target, hashed_css + ".gz")) as f:
+            self.assertEqual(f.read(), CSS)
+        # Images are not compressed again
+        self.assertFalse(os.path.exists(os.path.join(self.target, manifest["brand/logo.png"] + ".gz")))
+        self.assertEqual(load_manifest(self.target, self.source), (self.target, manifest))
+
+    def test_serves_precompressed_variant_with_immutable_caching(self):
+        manifest = build(self.target, self.source)
+        client, static = self.client(self.target, manifest)
+        url = static.url_for("styles.css")
+
+        response = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["cache-control"], IMMUTABLE_CACHE)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertTrue(response.headers["content-type"].startswith("text/css"))
+        self.assertEqual(response.content, CSS)
+
+        identity = client.get(url, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", identity.headers)
+        self.assertEqual(identity.content, CSS)
+
+        not_modified = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unbuilt_source_still_resolves_fingerprinted_names(self):
+        manifest = compute_manifest(self.source)
+        client, static = self.client(self.source, manifest)
+
+        response = client.get(static.url_for("styles.css"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], IMMUTABLE_CACHE)
+
+        plain = client.get("/static/styles.css")
+        self.assertEqual(plain.headers["cache-control"], "no-cache")
+        self.assertEqual(client.get("/static/styles.0000000000.css").status_code, 404)
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(accepted_encodings("gzip;q=1.0, br;q=0"), {"gzip"})
+        self.assertEqual(accepted_encodings(None), set())
+        self.assertIn("br", accepted_encodings("*"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from jinja2 import ChoiceLoader, FileSystemLoader
+
+from app.templating import build_environment, precompile
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app", "templates")
+
+
+class TemplatingTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_auto_reload_follows_dev_mode(self):
+        with mock.patch.dict(os.environ, {"DEV_MODE": "false", "TEMPLATE_AUTO_RELOAD": ""}):
+            self.assertFalse(build_environment(TEMPLATE_DIR, precompiled_dir=None).auto_reload)
+        with mock.patch.dict(os.environ, {"DEV_MODE": "true", "TEMPLATE_AUTO_RELOAD": ""}):
+            self.assertTrue(build_environment(TEMPLATE_DIR, precompiled_dir=None).auto_reload)
+
+    def test_precompiled_templates_render_like_source(self):
+        target = os.path.join(self.workdir, "compiled")
+        self.assertGreater(precompile(target, TEMPLATE_DIR), 0)
+
+        source_env = build_environment(TEMPLATE_DIR, precompiled_dir=None, auto_reload=False)
+        compiled_env = build_environment(TEMPLATE_DIR, precompiled_dir=target, auto_reload=False)
+
+        self.assertIsInstance(source_env.loader, FileSystemLoader)
+        self.assertIsInstance(compiled_env.loader, ChoiceLoader)
+        request = types.SimpleNamespace(
+            state=types.SimpleNamespace(t=lambda key: key, lang="de"), url="http://localhost/"
+        )
+        ctx = {"request": request, "legal_info": {"name": "X"}}
+        self.assertEqual(
+            compiled_env.get_template("impressum.html").render(ctx),
+            source_env.get_template("impressum.html").render(ctx),
+        )
+
+    def test_precompiled_modules_ignored_when_reloading(self):
+        target = os.path.join(self.workdir, "compiled")
+        precompile(target, TEMPLATE_DIR)
+        env = build_environment(TEMPLATE_DIR, precompiled_dir=target, auto_reload=True)
+        self.assertIsInstance(env.loader, FileSystemLoader)
+
+    def test_outdated_precompiled_modules_are_ignored(self):
+        source = os.path.join(self.workdir, "templates")
+        shutil.copytree(TEMPLATE_DIR, source)
+        target = os.path.join(self.workdir, "compiled")
+        precompile(target, source)
+        self.assertIsInstance(build_environment(source, precompiled_dir=target, auto_reload=False).loader, ChoiceLoader)
+
+        with open(os.path.join(source, "impressum.html"), "a") as f:
+            f.write("<!-- changed -->")
+        env = build_environment(source, precompiled_dir=target, auto_reload=False)
+        self.assertIsInstance(env.loader, FileSystemLoader)
+
+        precompile(target, source)
+        self.assertIsInstance(build_environment(source, precompiled_dir=target, auto_reload=False).loader, ChoiceLoader)
+        os.remove(os.path.join(target, "manifest.json"))  # compiled before manifests existed
+        self.assertIsInstance(build_environment(source, precompiled_dir=target, auto_reload=False).loader, FileSystemLoader)
+
+
+if __name__ == "__main__":
+    unittest.main()
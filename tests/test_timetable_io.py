@@ -0,0 +1,168 @@
+import datetime
+import io
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException, UploadFile
+from icalendar import Calendar
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.core import timetable_io
+from app.core.schedule_index import WeeklySchedule, build_schedule
+from app.database import Base
+from app.repository.rows import HolidayRow, SlotRow
+
+SETTINGS = dict(slot_duration=45, break_duration=15, day_start_hour=8, day_start_minute=0, day_end_hour=16, day_end_minute=0)
+
+
+class ParseTests(unittest.TestCase):
+    def test_csv_accepts_day_names_and_optional_columns(self):
+        slots = timetable_io.parse_csv(
+            "\ufeffweekday,slot_number,subject_name,group_name,room\n"
+            "Montag,1,Mathe,,A1\n"
+            "tue,2,Englisch,E1,\n"
+            "4,3,Sport,,\n"
+        )
+        self.assertEqual([(s.weekday, s.slot_number, s.group_name, s.room) for s in slots],
+                         [(0, 1, None, "A1"), (1, 2, "E1", None), (4, 3, None, None)])
+
+    def test_errors_are_collected_per_line(self):
+        with self.assertRaises(timetable_io.TimetableImportError) as ctx:
+            timetable_io.parse_csv(
+                "weekday,slot_number,subject_name\n"
+                "Samstag,1,Mathe\n"
+                "0,13,Mathe\n"
+                "0,1,\n"
+                "0,2,Deutsch\n"
+                "Mo,2,Physik\n"
+            )
+        self.assertEqual(len(ctx.exception.errors), 4)
+        self.assertTrue(ctx.exception.errors[0].startswith("line 2"))
+        self.assertIn("duplicate of line 5", ctx.exception.errors[-1])
+
+    def test_json_accepts_export_shape(self):
+        slots = timetable_io.parse_json('{"settings": null, "slots": [{"weekday": 2, "slot_number": 4, "subject_name": "Chemie"}]}')
+        self.assertEqual(slots[0].key, (2, 4, None))
+        with self.assertRaises(timetable_io.TimetableImportError):
+            timetable_io.parse_json('{"slots": "nope"}')
+
+
+class PlanTests(unittest.TestCase):
+    def test_diff_on_natural_key(self):
+        existing = [
+            SlotRow(0, "a", 1, None, "Mathe", None, None),
+            SlotRow(0, "b", 2, None, "Deutsch", None, None),
+            SlotRow(1, "c", 1, None, "Physik", None, None),
+        ]
+        incoming = timetable_io.parse_csv(
+            "weekday,slot_number,subject_name,room\n"
+            "0,1,Mathe,\n"
+            "0,2,Deutsch,B2\n"
+            "2,1,Kunst,\n"
+        )
+        diff = timetable_io.plan_import(existing, incoming)
+        self.assertEqual(diff.summary(), {"created": 1, "updated": 1, "deleted": 1, "unchanged": 1})
+        self.assertEqual([slot_id for slot_id, _ in diff.update], ["b"])
+        self.assertEqual(diff.delete, ["c"])
+        self.assertEqual(timetable_io.plan_import(existing, incoming, replace=False).delete, [])
+
+
+class ApplyTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_reimport_keeps_ids_and_selections(self):
+        csv_text = "weekday,slot_number,subject_name\n0,1,Mathe\n0,2,Deutsch\n1,1,Physik\n"
+        timetable_io.apply_import(self.db, "c1", timetable_io.plan_import([], timetable_io.parse_csv(csv_text)))
+        self.db.commit()
+        mathe = self.db.query(models.TimetableSlot).filter_by(subject_name="Mathe").one()
+        physik = self.db.query(models.TimetableSlot).filter_by(subject_name="Physik").one()
+        self.db.add_all([
+            models.UserTimetableSelection(user_id="u1", slot_id=mathe.id),
+            models.UserTimetableSelection(user_id="u1", slot_id=physik.id),
+        ])
+        self.db.commit()
+
+        changed = "weekday,slot_number,subject_name,room\n0,1,Mathe,A1\n0,2,Deutsch,\n"
+        existing = [entry.slot for entry in build_schedule(self.db, "c1").entries]
+        diff = timetable_io.plan_import(existing, timetable_io.parse_csv(changed))
+        timetable_io.apply_import(self.db, "c1", diff)
+        self.db.commit()
+        self.db.expire_all()
+
+        self.assertEqual(diff.summary(), {"created": 0, "updated": 1, "deleted": 1, "unchanged": 1})
+        self.assertEqual(self.db.get(models.TimetableSlot, mathe.id).room, "A1")
+        self.assertEqual(self.db.query(models.TimetableSlot).count(), 2)
+        self.assertEqual([s.slot_id for s in self.db.query(models.UserTimetableSelection)], [mathe.id])
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self.schedule = WeeklySchedule([
+            SlotRow(2, "s1", 3, None, "Chemie", "Ch1", "R12"),
+            SlotRow(0, "s2", 1, None, "Mathe", None, None),
+        ], SETTINGS)
+
+    def test_csv_roundtrip(self):
+        slots = timetable_io.parse_csv(timetable_io.export_csv(self.schedule))
+        self.assertEqual([(s.weekday, s.slot_number, s.subject_name, s.group_name, s.room) for s in slots],
+                         [(0, 1, "Mathe", None, None), (2, 3, "Chemie", "Ch1", "R12")])
+
+    def test_ics_has_one_weekly_event_per_slot(self):
+        cal = Calendar.from_ical(timetable_io.export_ics(self.schedule, "10a", datetime.date(2026, 3, 5)))
+        events = sorted(cal.walk("VEVENT"), key=lambda e: e.decoded("dtstart"))
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0].decoded("dtstart"), datetime.datetime(2026, 3, 2, 8, 0))
+        self.assertEqual(events[1].decoded("dtstart"), datetime.datetime(2026, 3, 4, 10, 0))
+        self.assertEqual(str(events[1]["summary"]), "Chemie (Ch1)")
+        self.assertEqual(events[1]["rrule"]["FREQ"], ["WEEKLY"])
+        self.assertIn("dtstamp", events[0])
+
+    def test_holidays_become_exdates(self):
+        schedule = WeeklySchedule([e.slot for e in self.schedule.entries], SETTINGS, [
+            HolidayRow("h1", "Herbstferien", datetime.date(2026, 10, 12), datetime.date(2026, 10, 23)),
+            HolidayRow("h2", "Brückentag", datetime.date(2026, 10, 2), datetime.date(2026, 10, 2)),
+            HolidayRow("h3", "Vergangen", datetime.date(2026, 9, 1), datetime.date(2026, 9, 4)),
+        ])
+        events = timetable_io.lesson_events(schedule, datetime.date(2026, 10, 1), selected={"s1"})
+        self.assertEqual(len(events), 1)
+        exdates = [d.dt for d in events[0].get("exdate").dts]
+        self.assertEqual(exdates, [datetime.datetime(2026, 10, 14, 10, 0), datetime.datetime(2026, 10, 21, 10, 0)])
+        monday_lesson = timetable_io.lesson_events(schedule, datetime.date(2026, 10, 1), selected={"s2"})[0]
+        self.assertEqual([d.dt.date() for d in monday_lesson.get("exdate").dts],
+                         [datetime.date(2026, 10, 12), datetime.date(2026, 10, 19)])
+        self.assertNotIn("exdate", timetable_io.lesson_events(schedule, datetime.date(2026, 10, 26), selected={"s2"})[0])
+
+    def test_personal_calendar_cached_until_inputs_change(self):
+        cache = timetable_io.PersonalCalendarCache()
+        monday = datetime.date(2026, 3, 2)
+        first = cache.get("u1", self.schedule, frozenset({"s1"}), "10a", monday)
+        self.assertEqual(len(first.events), 1)
+        self.assertIs(cache.get("u1", self.schedule, frozenset({"s1"}), "10a", monday + datetime.timedelta(days=4)), first)
+        self.assertIsNot(cache.get("u1", self.schedule, frozenset({"s1", "s2"}), "10a", monday), first)
+        renamed = cache.get("u1", self.schedule, frozenset({"s1", "s2"}), "10b", monday)  # class renamed
+        self.assertIn("10b", renamed.ics)
+        rebuilt = WeeklySchedule([e.slot for e in self.schedule.entries], SETTINGS)
+        self.assertEqual(len(cache.get("u1", rebuilt, frozenset({"s1", "s2"}), "10a", monday).events), 2)
+        self.assertNotEqual(cache.get("u1", rebuilt, frozenset({"s1", "s2"}), "10a", monday + datetime.timedelta(days=7)).monday, monday)
+
+    def test_oversized_import_is_refused(self):
+        from app.routers.timetable import import_timetable
+
+        upload = UploadFile(io.BytesIO(b"weekday,slot_number,subject_name\n" + b"0,1,Mathe\n" * 10), filename="plan.csv")
+        with mock.patch.object(timetable_io, "IMPORT_MAX_BYTES", 64), self.assertRaises(HTTPException) as raised:
+            import_timetable(file=upload, content=None, format=None, replace=True, dry_run=True, user=None, db=None)
+        self.assertEqual(raised.exception.status_code, 413)
+        self.assertLessEqual(upload.file.tell(), 65)  # the rest of the upload is not read
+
+
+if __name__ == "__main__":
+    unittest.main()
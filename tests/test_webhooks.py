@@ -0,0 +1,369 @@
+import asyncio
+import collections
+import datetime
+import gc
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.core.webhooks import (UnsafeWebhookURL, WebhookWorker, _insert_deliveries, _Result, check_url, claim_due,
+                               expand_outbox, install, purge, verify)
+from app.database import Base
+
+
+class MockReceiver(ThreadingHTTPServer):
+    """Webhook endpoint: /ok, /flaky (fails first), /fail, /gone, /slow; records requests and parallelism."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _ReceiverHandler)
+        self.requests: list[tuple[str, dict, bytes]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return "http://%s:%d" % self.server_address
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            first_try = not any(path == self.path for path, _, _ in server.requests)
+            server.requests.append((self.path, dict(self.headers), body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        if self.path == "/slow":
+            time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+
+        status = {"/fail": 500, "/gone": 410}.get(self.path, 200)
+        if self.path == "/flaky" and first_try:
+            status = 503
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class WebhookTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        install(self.Session)
+        self.server = MockReceiver()
+        self.addCleanup(self.server.close)
+
+        db = self.Session()
+        clazz = models.Class(name="10a", join_token="JOIN10A")
+        other = models.Class(name="10b", join_token="JOIN10B")
+        db.add_all([clazz, other])
+        db.flush()
+        owner = models.User(name="Owner", class_id=clazz.id, role=models.UserRole.OWNER)
+        db.add(owner)
+        db.commit()
+        self.class_id, self.other_id, self.owner_id = clazz.id, other.id, owner.id
+        db.close()
+
+    def subscribe(self, path: str, events: str = "*", max_concurrency: int = 2) -> models.WebhookSubscription:
+        db = self.Session()
+        sub = models.WebhookSubscription(class_id=self.class_id, url=self.server.url + path, events=events,
+                                         max_concurrency=max_concurrency)
+        db.add(sub)
+        db.commit()
+        db.refresh(sub)
+        db.expunge(sub)
+        db.close()
+        return sub
+
+    def add_event(self, db, class_id=None, title="KA Mathe") -> models.Event:
+        event = models.Event(class_id=class_id or self.class_id, author_id=self.owner_id, type=models.EventType.KA,
+                             title=title, date=datetime.datetime(2026, 3, 2))
+        db.add(event)
+        db.commit()
+        return event
+
+    def worker(self, **kwargs) -> WebhookWorker:
+        kwargs.setdefault("allow_private", True)  # the receiver listens on 127.0.0.1
+        return WebhookWorker(session_factory=self.Session, retry_base=0, **kwargs)
+
+    def run_rounds(self, worker: WebhookWorker, rounds: int = 1):
+        async def run():
+            async with worker.client() as client:
+                for _ in range(rounds):
+                    await worker.run_once(client)
+        asyncio.run(run())
+
+    def outbox(self):
+        db = self.Session()
+        rows = [(row.event_type, json.loads(row.payload)) for row in db.query(models.WebhookOutbox).order_by(models.WebhookOutbox.created_at)]
+        db.close()
+        return rows
+
+    def test_outbox_written_in_same_transaction(self):
+        db = self.Session()
+        self.add_event(db)
+        self.assertEqual(self.outbox(), [])  # no subscription, nothing recorded
+
+        self.subscribe("/ok")
+        event = self.add_event(db)
+        event.title = "KA Mathe (verschoben)"
+        db.commit()
+        self.add_event(db, class_id=self.other_id)  # other class: not subscribed
+
+        rolled_back = models.Event(class_id=self.class_id, author_id=self.owner_id, type=models.EventType.HA,
+                                   date=datetime.datetime(2026, 3, 3))
+        db.add(rolled_back)
+        db.flush()
+        db.rollback()
+
+        db.delete(db.get(models.Event, event.id))
+        db.commit()
+        db.close()
+
+        rows = self.outbox()
+        self.assertEqual([t for t, _ in rows], ["event.created", "event.updated", "event.deleted"])
+        self.assertEqual(rows[1][1]["data"]["title"], "KA Mathe (verschoben)")
+        self.assertEqual(rows[2][1]["data"], {"id": event.id, "class_id": self.class_id})
+
+    def test_install_on_new_factories(self):
+        # Factories come and go (one per test); a new one may get the id() of a collected one
+        self.subscribe("/ok")
+        for i in range(100):
+            factory = sessionmaker(bind=self.engine)
+            install(factory)
+            del factory
+            if i % 10 == 0:
+                gc.collect()
+        self.Session = sessionmaker(bind=self.engine)
+        install(self.Session)
+        db = self.Session()
+        self.add_event(db)
+        db.close()
+        self.assertEqual(len(self.outbox()), 1)
+
+    def test_delivery_is_signed_and_filtered(self):
+        sub = self.subscribe("/ok")
+        self.subscribe("/flaky", events="event.deleted")
+        db = self.Session()
+        self.add_event(db)
+        db.close()
+
+        self.run_rounds(self.worker())
+        self.assertEqual(len(self.server.requests), 1)
+        path, headers, body = self.server.requests[0]
+        self.assertEqual(path, "/ok")
+        self.assertEqual(headers["X-Classly-Event"], "event.created")
+        self.assertTrue(verify(sub.secret, int(headers["X-Classly-Timestamp"]), body, headers["X-Classly-Signature"]))
+        self.assertFalse(verify("wrong", int(headers["X-Classly-Timestamp"]), body, headers["X-Classly-Signature"]))
+
+        db = self.Session()
+        delivery = db.query(models.WebhookDelivery).one()
+        self.assertEqual((delivery.status, delivery.attempts), ("delivered", 1))
+        self.assertIsNotNone(db.get(models.WebhookSubscription, sub.id).last_success_at)
+        db.close()
+
+    def test_retries_then_dead_letter(self):
+        for path in ("/flaky", "/fail", "/gone"):
+            self.subscribe(path)
+        db = self.Session()
+        self.add_event(db)
+        db.close()
+
+        self.run_rounds(self.worker(max_attempts=3), rounds=4)
+
+        db = self.Session()
+        result = {sub.url.rsplit("/", 1)[-1]: (d.status, d.attempts, d.last_status_code, d.last_error)
+                  for d, sub in db.query(models.WebhookDelivery, models.WebhookSubscription)
+                  .join(models.WebhookSubscription)}
+        db.close()
+        self.assertEqual(result, {
+            "flaky": ("delivered", 2, 200, None),
+            "fail": ("dead", 3, 500, "HTTP 500 Internal Server Error"),
+            "gone": ("dead", 1, 410, "HTTP 410 Gone"),
+        })
+
+    def test_per_endpoint_concurrency_limit(self):
+        self.subscribe("/slow", max_concurrency=2)
+        db = self.Session()
+        for i in range(8):
+            self.add_event(db, title=f"Event {i}")
+        db.close()
+
+        self.run_rounds(self.worker(), rounds=2)  # 6 per round, see test_claims_fit_into_the_lease
+        self.assertEqual(len(self.server.requests), 8)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_claims_fit_into_the_lease(self):
+        slow = self.subscribe("/slow", max_concurrency=1)
+        self.subscribe("/ok", max_concurrency=2)
+        db = self.Session()
+        for i in range(8):
+            self.add_event(db, title=f"Event {i}")
+        expand_outbox(db)
+
+        # 60 s lease, 10 s timeout: one slot sends 3 in half the lease, two slots 6
+        claimed = claim_due(db, limit=100, lease=60, timeout=10)
+        per_subscription = collections.Counter(item.subscription_id for item in claimed)
+        self.assertEqual(per_subscription[slow.id], 3)
+        self.assertEqual(len(claimed), 9)
+        db.close()
+
+    def test_results_need_the_lease(self):
+        self.subscribe("/ok")
+        db = self.Session()
+        self.add_event(db)
+        expand_outbox(db)
+        claimed = claim_due(db)
+        # The lease ran out and another worker claimed the delivery again
+        db.query(models.WebhookDelivery).update({"locked_until": datetime.datetime.utcnow()})
+        db.commit()
+
+        self.worker()._record(db, [_Result(claimed[0], 500, "HTTP 500")])
+        delivery = db.query(models.WebhookDelivery).one()
+        self.assertEqual((delivery.attempts, delivery.last_error), (0, None))
+        self.worker()._record(db, [_Result(claimed[0]._replace(lease_until=delivery.locked_until), 500, "HTTP 500")])
+        db.refresh(delivery)
+        self.assertEqual((delivery.attempts, delivery.last_error), (1, "HTTP 500"))
+        db.close()
+
+    def test_outbox_is_fanned_out_once_by_racing_workers(self):
+        self.subscribe("/ok")
+        self.subscribe("/other")
+        db = self.Session()
+        for i in range(3):
+            self.add_event(db, title=f"Event {i}")
+        db.close()
+
+        other_worker = []
+        Session_ = self.Session
+
+        class RacingSession(Session):
+            def execute(self, statement, *args, **kwargs):
+                # The other worker expands the same rows between our SELECT and our claim
+                if getattr(statement, "is_update", False) and statement.table.name == "webhook_outbox" \
+                        and not other_worker:
+                    other = Session_()
+                    other_worker.append(expand_outbox(other))
+                    other.close()
+                return super().execute(statement, *args, **kwargs)
+
+        db = RacingSession(bind=self.engine)
+        created = expand_outbox(db)
+        db.close()
+        self.assertEqual((other_worker, created), ([6], 0))
+        db = self.Session()
+        self.assertEqual(db.query(models.WebhookDelivery).count(), 6)
+        db.close()
+
+    def test_duplicate_fan_out_is_ignored(self):
+        sub = self.subscribe("/ok")
+        db = self.Session()
+        self.add_event(db)
+        expand_outbox(db)
+        outbox_id = db.query(models.WebhookOutbox.id).scalar()
+        _insert_deliveries(db, [{"id": "again", "subscription_id": sub.id, "outbox_id": outbox_id,
+                                 "status": "pending", "attempts": 0}])
+        db.commit()
+        self.assertEqual(db.query(models.WebhookDelivery).count(), 1)
+        db.close()
+
+    def test_retention_keeps_pending_deliveries(self):
+        self.subscribe("/ok")
+        db = self.Session()
+        for title in ("delivered", "dead", "pending", "recent"):
+            self.add_event(db, title=title)
+        expand_outbox(db)
+        old = datetime.datetime.utcnow() - datetime.timedelta(days=40)
+        for delivery, outbox in db.query(models.WebhookDelivery, models.WebhookOutbox).join(models.WebhookOutbox):
+            title = json.loads(outbox.payload)["data"]["title"]
+            delivery.status = {"delivered": "delivered", "dead": "dead", "recent": "delivered"}.get(title, "pending")
+            if title != "recent":
+                delivery.created_at = outbox.dispatched_at = old
+        db.commit()
+
+        self.assertEqual(purge(db, retention=30 * 86400), 4)
+        remaining = db.query(models.WebhookOutbox.payload).all()
+        self.assertEqual(sorted(json.loads(payload)["data"]["title"] for payload, in remaining), ["pending", "recent"])
+        self.assertEqual(db.query(models.WebhookDelivery).count(), 2)
+        db.close()
+
+    def test_private_addresses_are_not_called(self):
+        self.subscribe("/ok")
+        db = self.Session()
+        self.add_event(db)
+        db.close()
+
+        self.run_rounds(self.worker(allow_private=False))
+        self.assertEqual(self.server.requests, [])
+        db = self.Session()
+        delivery = db.query(models.WebhookDelivery).one()
+        self.assertEqual(delivery.status, "pending")
+        self.assertIn("non-public address", delivery.last_error)
+        db.close()
+
+    def test_dns_rebinding_is_not_followed(self):
+        # Public on the first lookup, loopback (the receiver) on every later one
+        port = self.server.server_address[1]
+        db = self.Session()
+        db.add(models.WebhookSubscription(class_id=self.class_id, url=f"http://hooks.example:{port}/ok"))
+        db.commit()
+        self.add_event(db)
+        db.close()
+        lookups = []
+        resolve = socket.getaddrinfo
+
+        def rebinding(host, *args, **kwargs):
+            if host not in ("hooks.example", b"hooks.example"):
+                return resolve(host, *args, **kwargs)
+            lookups.append("93.184.215.14" if not lookups else "127.0.0.1")
+            return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (lookups[-1], port))]
+
+        with mock.patch("socket.getaddrinfo", rebinding):
+            self.run_rounds(self.worker(allow_private=False, timeout=0.5))
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(lookups, ["93.184.215.14"])  # connected to the address that was checked
+
+
+class WebhookURLTests(unittest.TestCase):
+    def test_internal_addresses_are_refused(self):
+        for url in ("http://127.0.0.1/hook", "http://localhost:8000/", "http://10.1.2.3/", "http://172.16.0.1/",
+                    "http://192.168.1.1/", "http://169.254.169.254/latest/meta-data/", "http://[::1]/",
+                    "http://[::ffff:127.0.0.1]/", "http://0.0.0.0/", "http://100.64.0.1/"):
+            with self.subTest(url=url), self.assertRaises(UnsafeWebhookURL):
+                check_url(url)
+
+    def test_public_addresses_and_opt_in(self):
+        check_url("https://93.184.215.14/hook")
+        check_url("http://127.0.0.1:8000/hook", allow_private=True)
+        for url in ("ftp://93.184.215.14/", "http:///path", "http://93.184.215.14:99999/"):
+            with self.subTest(url=url), self.assertRaises(UnsafeWebhookURL):
+                check_url(url)
+
+
+if __name__ == "__main__":
+    unittest.main()